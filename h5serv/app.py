@@ -22,29 +22,85 @@ import logging.handlers
 import os
 import os.path as op
 import tornado.httpserver
+import tornado.netutil
+import tornado.process
 import sys
 import ssl
+import socket
 import base64
 import binascii
+import errno
+import hashlib
+import calendar
+import email.utils
+import threading
+import tempfile
+import shutil
+import atexit
 if six.PY3:
     from queue import Queue
 else:
     from Queue import Queue
+from tornado import gen
 from tornado.ioloop import IOLoop
 from tornado.web import RequestHandler, Application, url, HTTPError
-from tornado.escape import json_encode, json_decode, url_escape, url_unescape
+import tornado.escape
+import tornado.log
+import tornado.httputil
+from tornado.escape import url_escape, url_unescape
+from tornado.iostream import StreamClosedError
+
+import h5serv.config as config
+if int(config.get('workers')) > 1:
+    # worker processes lock files themselves (see dbPool), HDF5's locking has
+    # to be turned off before the library is loaded
+    os.environ.setdefault('HDF5_USE_FILE_LOCKING', 'FALSE')
 
 from h5json import Hdf5db
 import h5json
+import numpy as np
 
-import h5serv.config as config
 from h5serv.timeUtil import unixTimeToUTC
 import h5serv.fileUtil as fileUtil
 import h5serv.tocUtil as tocUtil
+import h5serv.dbPool as dbPool
+import h5serv.metaCache as metaCache
+import h5serv.domainCache as domainCache
+import h5serv.executorUtil as executorUtil
+import h5serv.selectionUtil as selectionUtil
+import h5serv.metricsUtil as metricsUtil
+import h5serv.compressUtil as compressUtil
+import h5serv.jsonUtil as jsonUtil
+import h5serv.npyUtil as npyUtil
+import h5serv.arrowUtil as arrowUtil
+import h5serv.queryUtil as queryUtil
+import h5serv.sidecarUtil as sidecarUtil
+import h5serv.indexUtil as indexUtil
+import h5serv.reduceUtil as reduceUtil
+import h5serv.statsUtil as statsUtil
+import h5serv.pyramidUtil as pyramidUtil
 from h5serv.httpErrorUtil import errNoToHttpStatus
 from h5serv.h5watchdog import h5observe
 from h5serv.passwordUtil import getAuthClient
 
+# time spent in JSON encoding/decoding is reported by /metrics
+json_encode = jsonUtil.encode
+json_decode = jsonUtil.decode
+
+metricsUtil.Gauge("h5serv_open_files", "Number of HDF5 files held open by dbPool",
+    dbPool.getOpenCount)
+metricsUtil.Gauge("h5serv_executor_pending",
+    "Number of requests submitted to the executor and not yet complete",
+    executorUtil.getPendingCount)
+metricsUtil.Gauge("h5serv_meta_cache_items", "Number of items in the metadata cache",
+    metaCache.getCount)
+metricsUtil.Gauge("h5serv_domain_cache_items",
+    "Number of domain resolutions and file checks cached", domainCache.getCount)
+metricsUtil.Gauge("h5serv_meta_cache_hits_total", "Metadata cache hits",
+    metaCache.getHits, metric_type='counter')
+metricsUtil.Gauge("h5serv_meta_cache_misses_total", "Metadata cache misses",
+    metaCache.getMisses, metric_type='counter')
+
 
 def to_bytes(a_string):
     if type(a_string) is unicode:
@@ -109,6 +165,7 @@ class BaseHandler(tornado.web.RequestHandler):
     """
     Override of Tornado get_current_user
     """
+    @metricsUtil.timed('auth')
     def get_current_user(self):
         user = None
         pswd = None
@@ -156,6 +213,148 @@ class BaseHandler(tornado.web.RequestHandler):
         self.log.info("unauthorized access for userid: " + str(self.userid))
         raise HTTPError(403, "Access is not permitted")
 
+    """
+    Conditional GET - set the Etag and Last-Modified headers from the state of
+    the file and the request, and return True (with status 304) if the
+    If-None-Match or If-Modified-Since request header shows the client already
+    has the response.  Call with the file held (inside dbPool.getDb) after
+    the ACL check, and before reading the object.
+    """
+    def isNotModified(self):
+        if self.request.method not in ('GET', 'HEAD'):
+            return False
+        version = dbPool.getVersion(self.filePath)
+        if version is None:
+            return False
+        # the response depends on the selection (query) and host used in hrefs
+        key = str(version) + ' ' + self.href + ' ' + self.request.uri
+        key += ' ' + self.request.headers.get('Accept', '')
+        key += ' ' + self.request.headers.get('Accept-Encoding', '')
+        etag = '"' + hashlib.sha1(to_bytes(key)).hexdigest() + '"'
+        mtime = version[2]
+        self.set_header('Etag', etag)
+        self.set_header('Last-Modified', tornado.httputil.format_timestamp(mtime))
+
+        if self.request.headers.get('If-None-Match'):
+            # takes precedence over If-Modified-Since
+            if not self.check_etag_header():
+                return False
+        else:
+            ims_value = self.request.headers.get('If-Modified-Since')
+            if not ims_value:
+                return False
+            date_tuple = email.utils.parsedate(ims_value)
+            if date_tuple is None or int(mtime) > calendar.timegm(date_tuple):
+                return False
+        self.log.info("not modified: " + self.request.uri)
+        self.set_status(304)
+        return True
+
+    """
+    Override of Tornado clear - the compression of the response is decided
+    again if the response is reset (e.g. to send an error)
+    """
+    def clear(self):
+        super(BaseHandler, self).clear()
+        self.compressor = None  # set on first write, False if not compressed
+
+    """
+    Override of Tornado write - compress the response if the client accepts
+    it (see compressUtil) and count response bytes for /metrics.  For methods
+    run on the executor the compression is done on the worker thread.
+    """
+    def write(self, chunk):
+        if isinstance(chunk, dict):
+            self.set_header('Content-Type', 'application/json; charset=UTF-8')
+            chunk = json_encode(chunk)
+        if isinstance(chunk, np.ndarray):
+            # the bytes of the array values, compressed without a copy
+            chunk = np.ascontiguousarray(chunk).reshape(-1).view(np.uint8)
+        else:
+            chunk = tornado.escape.utf8(chunk)
+        if self.compressor is None and len(chunk):
+            self.compressor = self.getCompressor(len(chunk))
+        if self.compressor:
+            chunk = self.compressor.compress(chunk)
+        self.writeOutput(chunk)
+
+    def writeOutput(self, chunk):
+        self.bytesOut = getattr(self, 'bytesOut', 0) + len(chunk)
+        if not isinstance(chunk, bytes):
+            chunk = chunk.tobytes()
+        super(BaseHandler, self).write(chunk)
+
+    """
+    Return a Compressor for the response if it should be compressed, else
+    False.  Called on the first write, after the Content-Type is set.  size
+    is the size of the first write, or the Content-Length if given.
+    """
+    def getCompressor(self, size):
+        if not config.get('compress_response') or self._headers_written:
+            return False
+        if 'Content-Length' in self._headers:
+            size = int(self._headers['Content-Length'])
+        if size < int(config.get('compress_min_size')):
+            return False
+        if 'Content-Encoding' in self._headers:
+            return False
+        if not compressUtil.isCompressibleType(self._headers.get('Content-Type')):
+            return False
+        encoding = compressUtil.getEncoding(self.request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return False
+        self.set_header('Content-Encoding', encoding)
+        self.add_header('Vary', 'Accept-Encoding')
+        self.clear_header('Content-Length')  # given for binary responses
+        return compressUtil.Compressor(encoding)
+
+    """
+    Override of Tornado finish - write the end of the compressed stream
+    """
+    def finish(self, chunk=None):
+        if chunk is not None:
+            self.write(chunk)
+        if self.compressor:
+            self.writeOutput(self.compressor.finish())
+            self.compressor = False
+        return super(BaseHandler, self).finish()
+
+    """
+    Write obj as JSON.  Numeric arrays in obj (see jsonUtil.iterEncode) are
+    encoded and sent in pieces, so the whole response isn't held in memory.
+    """
+    def writeJson(self, obj):
+        bufferSize = int(config.get('stream_buffer_size'))
+        pieces = []
+        pending = 0
+        for piece in jsonUtil.iterEncode(obj):
+            pieces.append(piece)
+            pending += len(piece)
+            if pending >= bufferSize:
+                self.write(b''.join(pieces))
+                pieces = []
+                pending = 0
+                try:
+                    self.flushOutput()
+                except StreamClosedError:
+                    self.log.info("client closed connection")
+                    return
+        self.write(b''.join(pieces))
+
+    """
+    Send the response written so far to the client and wait for it to be sent,
+    so that large responses can be written in pieces.  Only has an effect for
+    methods run on the executor (see executorUtil).
+    """
+    def flushOutput(self):
+        io_loop = getattr(self, 'ioLoop', None)
+        if io_loop is None:
+            return
+        if self.compressor:
+            # so the client can decode everything sent so far
+            self.writeOutput(self.compressor.sync())
+        executorUtil.callOnIOLoop(io_loop, self.flush)
+
     """
     baseHandler - log request and set state to be used by method implementation
     """
@@ -200,6 +399,58 @@ class BaseHandler(tornado.web.RequestHandler):
         msg += "}"
         self.log.info(msg)
 
+    """
+    getRootUUID - return root group uuid for the request file
+    """
+    def getRootUUID(self, db):
+        rootUUID = metaCache.get(self.filePath, '/', 'root')
+        if rootUUID is None:
+            rootUUID = db.getUUIDByPath('/')
+            metaCache.put(self.filePath, '/', 'root', rootUUID)
+        elif getattr(db, 'dbGrp', None) is None:
+            db.initFile()  # newly opened handle, as getUUIDByPath would do
+        return rootUUID
+
+    """
+    getAcl - return ACL of the given object for the request user.  ACL
+      decisions are cached until AclHandler updates any ACL in the file
+      (the ACL of the root group applies to other objects).
+    """
+    def getAcl(self, db, obj_uuid):
+        kind = ('acl', self.userid)
+        acl = metaCache.get(self.filePath, obj_uuid, kind)
+        if acl is None:
+            if getattr(db, 'dbGrp', None) is None:
+                db.initFile()
+            acl = db.getAcl(obj_uuid, self.userid)
+            metaCache.put(self.filePath, obj_uuid, kind, acl)
+        return acl
+
+    """
+    getDatasetItem - return dataset item (as returned by getDatasetItemByUuid)
+      for the request uuid, from metaCache if possible
+    """
+    def getDatasetItem(self, db):
+        item = metaCache.get(self.filePath, self.reqUuid, 'dataset')
+        if item is None:
+            item = db.getDatasetItemByUuid(self.reqUuid)
+            metaCache.put(self.filePath, self.reqUuid, 'dataset', item)
+        return item
+
+    """
+    getDatasetTypeItem - return dataset type item (as returned by
+      getDatasetTypeItemByUuid) for the request uuid, from the dataset item
+    """
+    def getDatasetTypeItem(self, db):
+        item = self.getDatasetItem(db)
+        typeItem = dict(item['type'])
+        typeItem.pop('uuid', None)  # set for committed types
+        typeItem = {'id': item['id'], 'type': typeItem}
+        for key in ('ctime', 'mtime'):
+            if key in item:
+                typeItem[key] = item[key]
+        return typeItem
+
     """
     getExternal uri - return url for given domain
        Use protocol and host of current request
@@ -233,6 +484,16 @@ class BaseHandler(tornado.web.RequestHandler):
         
         return target
 
+    # convert embedded list (list of lists) to tuples
+    def convertToTuple(self, data):
+        if type(data) == list or type(data) == tuple:
+            sublist = []
+            for e in data:
+                sublist.append(self.convertToTuple(e))
+            return tuple(sublist)
+        else:
+            return data
+
     """
     Convience method to compute href links
     """
@@ -269,7 +530,7 @@ class BaseHandler(tornado.web.RequestHandler):
             log.info("toc file doesn't exist, returning")
             return
         try:
-            with Hdf5db(filePath, app_logger=self.log) as db:
+            with dbPool.getDb(filePath, app_logger=self.log) as db:
                 rootUUID = db.getUUIDByPath('/')
                 current_user_acl = db.getAcl(rootUUID, self.userid)
                 acl = db.getDefaultAcl()
@@ -289,9 +550,19 @@ class BaseHandler(tornado.web.RequestHandler):
         """ Helper method - return file path for given domain.
         """
         self.log.info("getFilePath: " + domain + " checkExists: " + str(checkExists))
+        host_query = self.get_query_argument("host", default=None)
+        cache_key = (domain, host_query is not None, checkExists)
+        resolved = domainCache.getResolution(cache_key)
+        if resolved is not None:
+            tocFilePath, filePath = resolved
+            if domainCache.isFile(tocFilePath) and (
+                    not checkExists or domainCache.isFile(filePath)):
+                self.log.info("getFilePath: " + filePath + " (cached)")
+                return filePath
+
         tocFilePath = fileUtil.getTocFilePathForDomain(domain, auth)
         self.log.info("tocFilePath: " + tocFilePath)
-        if not fileUtil.isFile(tocFilePath):
+        if not domainCache.isFile(tocFilePath):
             tocUtil.createTocFile(tocFilePath)
             if self.userid > 0:
                 # setup the permision to grant this user exclusive write access
@@ -305,13 +576,13 @@ class BaseHandler(tornado.web.RequestHandler):
          
         if checkExists:
             while True:
-                if fileUtil.isFile(filePath):
+                found = domainCache.isFile(filePath)
+                if found:
                     break
                 # Unfortunately the host query parameter substitues '/' for "%2E",
                 # so check to see if any slashes should really be dots.
                 # clients should prefer using the host header if this is an issue
                 self.log.info("filePath: " + filePath + " not found")
-                host_query = self.get_query_argument("host", default=None)
                 if host_query is None:
                     # If using host header, we don't need to guess about the %2E substitution
                     break  
@@ -325,9 +596,11 @@ class BaseHandler(tornado.web.RequestHandler):
                     filePath = self.nameDecode(filePath)
                 else:
                     break
-            self.log.info("verifyFile: " + filePath)    
-            fileUtil.verifyFile(filePath)  # throws exception if not found  
-        
+            if not found:
+                self.log.info("verifyFile: " + filePath)
+                fileUtil.verifyFile(filePath)  # throws exception if not found
+
+        domainCache.putResolution(cache_key, (tocFilePath, filePath))
         return filePath
 
     def convertExternalPath(self, path_name):
@@ -487,10 +760,15 @@ class BaseHandler(tornado.web.RequestHandler):
             self.log.info("CONTENT_TYPE:" + content_type)
         if content_type == "application/octet-stream":
             return "binary"
+        elif content_type == npyUtil.CONTENT_TYPE:
+            return "npy"
+        elif content_type == arrowUtil.CONTENT_TYPE:
+            return "arrow"
         else:
             return "json"       
 
 class LinkCollectionHandler(BaseHandler):
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
 
@@ -510,10 +788,12 @@ class LinkCollectionHandler(BaseHandler):
         items = None
         rootUUID = None
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                current_user_acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                current_user_acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(current_user_acl, 'read')  # throws exception is unauthorized
+                if self.isNotModified():
+                    return
                 items = db.getLinkItems(self.reqUuid, marker=marker, limit=limit)
 
         except IOError as e:
@@ -604,6 +884,7 @@ class LinkHandler(BaseHandler):
     
 
 
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
          
@@ -615,10 +896,12 @@ class LinkHandler(BaseHandler):
 
         rootUUID = None
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                if self.isNotModified():
+                    return
                 item = db.getLinkItemByUuid(self.reqUuid, linkName)
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
@@ -672,6 +955,7 @@ class LinkHandler(BaseHandler):
         self.set_header('Content-Type', 'application/json')
         self.write(json_encode(response))
 
+    @executorUtil.runInExecutor
     def put(self):
         self.baseHandler()
          
@@ -727,9 +1011,9 @@ class LinkHandler(BaseHandler):
 
         rootUUID = None
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'create')  # throws exception is unauthorized
                 try:
                     existingItem = db.getLinkItemByUuid(self.reqUuid, linkName)
@@ -776,6 +1060,7 @@ class LinkHandler(BaseHandler):
         self.write(json_encode(response))
         self.set_status(201)
 
+    @executorUtil.runInExecutor
     def delete(self):
         self.baseHandler()
          
@@ -790,9 +1075,9 @@ class LinkHandler(BaseHandler):
             self.log.info(msg)
             raise HTTPError(403, reason=msg)
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'delete')  # throws exception is unauthorized
                 db.unlinkItem(self.reqUuid, linkName)
         except IOError as e:
@@ -907,6 +1192,7 @@ class AclHandler(BaseHandler):
                     acl_out[key] = True if value else False
         return acl_out
 
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
          
@@ -937,15 +1223,17 @@ class AclHandler(BaseHandler):
         acl = None
         current_user_acl = None
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
                 if req_uuid:
                     obj_uuid = req_uuid
                 else:
                     obj_uuid = rootUUID
 
-                current_user_acl = db.getAcl(obj_uuid, self.userid)
+                current_user_acl = self.getAcl(db, obj_uuid)
                 self.verifyAcl(current_user_acl, 'readACL')  # throws exception is unauthorized
+                if self.isNotModified():
+                    return
                 if req_userid is None:
                     acl = db.getAcls(obj_uuid)
                 else:
@@ -998,6 +1286,7 @@ class AclHandler(BaseHandler):
         self.set_header('Content-Type', 'application/json')
         self.write(json_encode(response))
 
+    @executorUtil.runInExecutor
     def put(self):
         self.baseHandler()
          
@@ -1053,15 +1342,16 @@ class AclHandler(BaseHandler):
         rootUUID = None
         obj_uuid = None
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
                 if req_uuid is None:
                     obj_uuid = rootUUID
                 else:
                     obj_uuid = req_uuid
-                current_user_acl = db.getAcl(obj_uuid, self.userid)
+                current_user_acl = self.getAcl(db, obj_uuid)
                 self.verifyAcl(current_user_acl, 'updateACL')  # throws exception is unauthorized
                 db.setAcl(obj_uuid, acl)
+                metaCache.invalidate(self.filePath, kind='acl')
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
             status = errNoToHttpStatus(e.errno)
@@ -1089,6 +1379,7 @@ class AclHandler(BaseHandler):
 
 
 class TypeHandler(BaseHandler):
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
          
@@ -1103,10 +1394,12 @@ class TypeHandler(BaseHandler):
         rootUUID = None
         item = None
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                if self.isNotModified():
+                    return
                 item = db.getCommittedTypeItemByUuid(self.reqUuid)
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
@@ -1137,6 +1430,7 @@ class TypeHandler(BaseHandler):
         self.set_header('Content-Type', 'application/json')
         self.write(json_encode(response))
 
+    @executorUtil.runInExecutor
     def delete(self):
         self.baseHandler()
 
@@ -1145,9 +1439,9 @@ class TypeHandler(BaseHandler):
         hrefs = []
         rootUUID = None
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'delete')  # throws exception is unauthorized
                 db.deleteObjectByUuid('datatype', self.reqUuid)
         except IOError as e:
@@ -1169,6 +1463,7 @@ class TypeHandler(BaseHandler):
 
 
 class DatatypeHandler(BaseHandler):
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
         
@@ -1177,11 +1472,13 @@ class DatatypeHandler(BaseHandler):
         rootUUID = None
         item = None
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
-                item = db.getDatasetTypeItemByUuid(self.reqUuid)
+                if self.isNotModified():
+                    return
+                item = self.getDatasetTypeItem(db)
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
             status = errNoToHttpStatus(e.errno)
@@ -1207,6 +1504,7 @@ class DatatypeHandler(BaseHandler):
 
 class ShapeHandler(BaseHandler):
 
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
          
@@ -1216,11 +1514,13 @@ class ShapeHandler(BaseHandler):
         item = None
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
-                item = db.getDatasetItemByUuid(self.reqUuid)
+                if self.isNotModified():
+                    return
+                item = self.getDatasetItem(db)
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
             status = errNoToHttpStatus(e.errno)
@@ -1243,6 +1543,7 @@ class ShapeHandler(BaseHandler):
         self.set_header('Content-Type', 'application/json')
         self.write(json_encode(response))
 
+    @executorUtil.runInExecutor
     def put(self):
         self.baseHandler()
          
@@ -1287,11 +1588,13 @@ class ShapeHandler(BaseHandler):
                 raise HTTPError(400, reason=msg)
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'update')  # throws exception is unauthorized
                 db.resizeDataset(self.reqUuid, shape)
+                metaCache.invalidate(self.filePath, self.reqUuid)
+                sidecarUtil.invalidate(self.filePath, self.reqUuid)
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
             status = errNoToHttpStatus(e.errno)
@@ -1373,6 +1676,20 @@ class DatasetHandler(BaseHandler):
         select += "]"
         return select
 
+    def getLevelPreviewQuery(self, shape_item, level, axes):
+        """Helper method - return query options for a preview of the whole
+        dataset: the top level of its pyramid (of the first index of other
+        dimensions than the pyramid axes).
+
+        """
+        query = ['level=' + str(level)]
+        dims = shape_item['dims']
+        if len(axes) < len(dims):
+            select = [':' if dim in axes else '0' for dim in range(len(dims))]
+            query.insert(0, 'select=[' + ','.join(select) + ']')
+        return query
+
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
          
@@ -1380,12 +1697,19 @@ class DatasetHandler(BaseHandler):
         hrefs = []
         rootUUID = None
         item = None
+        preview_level = None
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
-                item = db.getDatasetItemByUuid(self.reqUuid)
+                if self.isNotModified():
+                    return
+                item = self.getDatasetItem(db)
+                if self.getDatasetNumElements(item['shape']) > 100:
+                    dset = db.getDatasetObjByUuid(self.reqUuid)
+                    preview_level = pyramidUtil.getPreviewLevel(self.filePath, self.reqUuid,
+                        dset, db.getModifiedTime(self.reqUuid))
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
             status = errNoToHttpStatus(e.errno)
@@ -1402,7 +1726,10 @@ class DatasetHandler(BaseHandler):
             })
         else:
             # large number of values, create preview link
-            previewQuery = self.getPreviewQuery(item['shape'])
+            if preview_level is not None:
+                previewQuery = self.getLevelPreviewQuery(item['shape'], *preview_level)
+            else:
+                previewQuery = self.getPreviewQuery(item['shape'])
             hrefs.append({
                 'rel': 'preview',
                 'href': self.getHref('datasets/' + self.reqUuid + '/value', query=previewQuery)
@@ -1437,6 +1764,7 @@ class DatasetHandler(BaseHandler):
 
         self.write(json_rsp)
 
+    @executorUtil.runInExecutor
     def delete(self):
         self.baseHandler()
          
@@ -1447,11 +1775,13 @@ class DatasetHandler(BaseHandler):
         rootUUID = None
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'delete')  # throws exception is unauthorized
                 db.deleteObjectByUuid('dataset', self.reqUuid)
+                metaCache.invalidate(self.filePath, self.reqUuid)
+                sidecarUtil.invalidate(self.filePath, self.reqUuid, remove=True)
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
             status = errNoToHttpStatus(e.errno)
@@ -1472,166 +1802,1411 @@ class DatasetHandler(BaseHandler):
         self.write(json_encode(response))
 
 
-class ValueHandler(BaseHandler):
+class IndexHandler(BaseHandler):
 
-    def getSliceQueryParam(self, dim, extent):
-        """
-        Helper method - return slice for dim based on query params
+    def getRequestName(self):
+        # request is in the form /datasets/<id>/indexes(/<field>), return
+        # <field>, or None if the uri doesn't end with ".../<field>"
+        uri = self.request.path[len('/datasets/' + self.reqUuid):]
+        if not uri.startswith('/indexes'):
+            msg = "Bad Request: URI is invalid"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        uri = uri[len('/indexes'):]
+        name = None
+        if uri[0:1] == '/' and len(uri) > 1:
+            name = url_unescape(uri[1:])
+            self.log.info('got field name: [' + name + ']')
+        return name
 
-        Query arg should be in the form: [<dim1>, <dim2>, ... , <dimn>]
-         brackets are optional for one dimensional arrays.
-         Each dimension, valid formats are:
-            single integer: n
-            start and end: n:m
-            start, end, and stride: n:m:s
-        """
-        
-        # Get optional query parameters for given dim
-        self.log.info("getSliceQueryParam: " + str(dim) + ", " + str(extent))
-        query = self.get_query_argument("select", default='ALL')
-        if query == 'ALL':
-            # just return a slice for the entire dimension
-            self.log.info("getSliceQueryParam: return default")
-            return slice(0, extent)
-
-        self.log.info("select query value: [" + query + "]")
-
-        if not query.startswith('['):
-            msg = "Bad Request: selection query missing start bracket"
+    def getIndexResponseItem(self, item):
+        responseItem = {}
+        responseItem['field'] = item['field']
+        responseItem['type'] = item['type']
+        responseItem['stale'] = item['stale']
+        responseItem['rows'] = item['nrows']
+        if 'keyCount' in item:
+            responseItem['keyCount'] = item['keyCount']
+        responseItem['created'] = unixTimeToUTC(item['ctime'])
+        return responseItem
+
+    @executorUtil.runInExecutor
+    def get(self):
+        self.baseHandler()
+
+        field = self.getRequestName()
+        response = {}
+        hrefs = []
+        rootUUID = None
+        items = []
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
+                self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                dset = db.getDatasetObjByUuid(self.reqUuid)
+                if dset is None:
+                    msg = "Dataset not found: " + self.reqUuid
+                    self.log.info(msg)
+                    raise HTTPError(404, reason=msg)
+                modified = db.getModifiedTime(self.reqUuid)
+                with sidecarUtil.openSidecar(self.filePath) as f:
+                    if field is None:
+                        grps = indexUtil.getIndexGroups(f, self.reqUuid)
+                    else:
+                        grp = indexUtil.getIndexGroup(f, self.reqUuid, dset.dtype, field)
+                        if grp is None:
+                            msg = "Index not found: " + field
+                            self.log.info(msg)
+                            raise HTTPError(404, reason=msg)
+                        grps = [grp]
+                    for grp in grps:
+                        items.append(indexUtil.getIndexItem(grp, dset, modified))
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+
+        # got everything we need, put together the response
+        owner_uri = 'datasets/' + self.reqUuid
+        self_uri = owner_uri + '/indexes'
+        if field is not None:
+            self_uri += '/' + url_escape(field)
+
+        responseItems = []
+        for item in items:
+            responseItem = self.getIndexResponseItem(item)
+            if field is None:
+                responseItem['href'] = self.getHref(self_uri + '/' + url_escape(item['field']))
+            responseItems.append(responseItem)
+
+        hrefs.append({'rel': 'self', 'href': self.getHref(self_uri)})
+        hrefs.append({'rel': 'owner', 'href': self.getHref(owner_uri)})
+        hrefs.append({'rel': 'root', 'href': self.getHref('groups/' + rootUUID)})
+        hrefs.append({'rel': 'home', 'href': self.getHref('')})
+
+        if field is None:
+            response['indexes'] = responseItems
+        else:
+            for k in responseItems[0]:
+                response[k] = responseItems[0][k]
+        response['hrefs'] = hrefs
+
+        self.set_header('Content-Type', 'application/json')
+        self.write(json_encode(response))
+
+    @executorUtil.runInExecutor
+    def put(self):
+        self.baseHandler()
+
+        field = self.getRequestName()
+        if field is None:
+            msg = "Bad Request: field name not specified"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+
+        body = {}
+        if self.request.body:
+            try:
+                body = json_decode(self.request.body)
+            except ValueError as e:
+                msg = "JSON Parser Error: " + str(e)
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+        if not isinstance(body, dict):
+            msg = "Bad Request: expected JSON object in body"
             self.log.info(msg)
             raise HTTPError(400, reason=msg)
-        if not query.endswith(']'):
-            msg = "Bad Request: selection query missing end bracket"
+        indexType = body.get('type', indexUtil.SORTED)
+        if indexType not in indexUtil.INDEX_TYPES:
+            msg = "Bad Request: invalid index type"
             self.log.info(msg)
             raise HTTPError(400, reason=msg)
 
-        # now strip out brackets
-        query = query[1:-1]
+        response = {}
+        hrefs = []
+        rootUUID = None
+        item = None
+        build = None
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
+                self.verifyAcl(acl, 'update')  # throws exception is unauthorized
+                dset = db.getDatasetObjByUuid(self.reqUuid)
+                if dset is None:
+                    msg = "Dataset not found: " + self.reqUuid
+                    self.log.info(msg)
+                    raise HTTPError(404, reason=msg)
+                try:
+                    indexUtil.getFieldType(dset.dtype, field)
+                except ValueError as e:
+                    msg = "Bad Request: " + str(e)
+                    self.log.info(msg)
+                    raise HTTPError(400, reason=msg)
+                modified = db.getModifiedTime(self.reqUuid)
+                build = sidecarUtil.Build(self.filePath, indexUtil.INDEX_KIND,
+                    self.reqUuid, modified, name=indexUtil.getGroupName(dset.dtype, field))
+
+            # build the index without holding the file or the sidecar
+            reader = dbPool.DatasetReader(self.filePath, self.reqUuid, app_logger=self.log)
+            try:
+                indexUtil.buildIndex(build.f, self.reqUuid, modified, reader,
+                    field, indexType)
+            except ValueError as e:
+                msg = "Bad Request: " + str(e)
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                dset = db.getDatasetObjByUuid(self.reqUuid)
+                if dset is None:
+                    msg = "Dataset not found: " + self.reqUuid
+                    self.log.info(msg)
+                    raise HTTPError(404, reason=msg)
+                modified = db.getModifiedTime(self.reqUuid)
+                with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+                    if f is None:
+                        msg = "Internal Server Error: unable to write index"
+                        self.log.error(msg)
+                        raise HTTPError(500, reason=msg)
+                    grp = build.finish(f)
+                    if grp is None:
+                        msg = "Conflict: the dataset was modified while the index was built"
+                        self.log.info(msg)
+                        raise HTTPError(409, reason=msg)
+                    item = indexUtil.getIndexItem(grp, dset, modified)
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+        finally:
+            if build is not None:
+                build.close()
+
+        # got everything we need, put together the response
+        owner_uri = 'datasets/' + self.reqUuid
+        response = self.getIndexResponseItem(item)
+        hrefs.append({'rel': 'self',
+            'href': self.getHref(owner_uri + '/indexes/' + url_escape(field))})
+        hrefs.append({'rel': 'owner', 'href': self.getHref(owner_uri)})
+        hrefs.append({'rel': 'root', 'href': self.getHref('groups/' + rootUUID)})
+        response['hrefs'] = hrefs
+
+        self.set_status(201)  # resource created
+        self.set_header('Content-Type', 'application/json')
+        self.write(json_encode(response))
+
+    @executorUtil.runInExecutor
+    def delete(self):
+        self.baseHandler()
 
-        query_array = query.split(',')
-        if dim > len(query_array):
-            msg = "Not enough dimensions supplied to query argument"
+        field = self.getRequestName()
+        if field is None:
+            msg = "Bad Request: field name not specified"
             self.log.info(msg)
             raise HTTPError(400, reason=msg)
-        dim_query = query_array[dim].strip()
-        start = 0
-        stop = extent
-        step = 1
-        if dim_query.find(':') < 0:
-            # just a number - return start = stop for this value
-            try:
-                start = int(dim_query)
-            except ValueError:
-                msg = "Bad Request: invalid selection parameter (can't convert to int) for dimension: " + str(dim)
+
+        response = {}
+        hrefs = []
+        rootUUID = None
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
+                self.verifyAcl(acl, 'update')  # throws exception is unauthorized
+                dset = db.getDatasetObjByUuid(self.reqUuid)
+                if dset is None:
+                    msg = "Dataset not found: " + self.reqUuid
+                    self.log.info(msg)
+                    raise HTTPError(404, reason=msg)
+                with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+                    grp = indexUtil.getIndexGroup(f, self.reqUuid, dset.dtype, field)
+                    if grp is None:
+                        msg = "Index not found: " + field
+                        self.log.info(msg)
+                        raise HTTPError(404, reason=msg)
+                    del f[grp.name]
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+
+        # got everything we need, put together the response
+        owner_uri = 'datasets/' + self.reqUuid
+        hrefs.append({'rel': 'self', 'href': self.getHref(owner_uri + '/indexes')})
+        hrefs.append({'rel': 'owner', 'href': self.getHref(owner_uri)})
+        hrefs.append({'rel': 'root', 'href': self.getHref('groups/' + rootUUID)})
+        hrefs.append({'rel': 'home', 'href': self.getHref('')})
+        response['hrefs'] = hrefs
+
+        self.set_header('Content-Type', 'application/json')
+        self.write(json_encode(response))
+
+        self.log.info("Index delete succeeded")
+
+
+class StatsHandler(BaseHandler):
+
+    @executorUtil.runInExecutor
+    def get(self):
+        self.baseHandler()
+
+        response = {}
+        hrefs = []
+        rootUUID = None
+        stats = None
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
+                self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                dset = db.getDatasetObjByUuid(self.reqUuid)
+                if dset is None:
+                    msg = "Dataset not found: " + self.reqUuid
+                    self.log.info(msg)
+                    raise HTTPError(404, reason=msg)
+                if not statsUtil.hasStats(dset.dtype):
+                    msg = "Bad Request: statistics are only supported for integer and "
+                    msg += "float types"
+                    self.log.info(msg)
+                    raise HTTPError(400, reason=msg)
+                modified = db.getModifiedTime(self.reqUuid)
+                stats = statsUtil.getStats(self.filePath, self.reqUuid, dset, modified)
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+
+        # got everything we need, put together the response
+        response = stats.getSummary()
+        response['chunkShape'] = list(stats.chunkShape)
+        response['chunks'] = int(stats.valid.size)
+        response['lastModified'] = unixTimeToUTC(stats.modified)
+
+        owner_uri = 'datasets/' + self.reqUuid
+        hrefs.append({'rel': 'self', 'href': self.getHref(owner_uri + '/stats')})
+        hrefs.append({'rel': 'owner', 'href': self.getHref(owner_uri)})
+        hrefs.append({'rel': 'root', 'href': self.getHref('groups/' + rootUUID)})
+        hrefs.append({'rel': 'home', 'href': self.getHref('')})
+        response['hrefs'] = hrefs
+
+        self.set_header('Content-Type', 'application/json')
+        self.write(json_encode(response))
+
+
+class PyramidHandler(BaseHandler):
+
+    def getPyramidResponse(self, item, rootUUID):
+        response = {}
+        response['method'] = item['method']
+        response['axes'] = item['axes']
+        response['stale'] = item['stale']
+        response['levels'] = []
+        for level, shape in enumerate(item['levels'], 1):
+            response['levels'].append({
+                'level': level,
+                'shape': shape,
+                'href': self.getHref('datasets/' + self.reqUuid + '/value',
+                    query=['level=' + str(level)])
+            })
+        response['created'] = unixTimeToUTC(item['ctime'])
+
+        owner_uri = 'datasets/' + self.reqUuid
+        hrefs = []
+        hrefs.append({'rel': 'self', 'href': self.getHref(owner_uri + '/pyramid')})
+        hrefs.append({'rel': 'owner', 'href': self.getHref(owner_uri)})
+        hrefs.append({'rel': 'root', 'href': self.getHref('groups/' + rootUUID)})
+        hrefs.append({'rel': 'home', 'href': self.getHref('')})
+        response['hrefs'] = hrefs
+        return response
+
+    @executorUtil.runInExecutor
+    def get(self):
+        self.baseHandler()
+
+        rootUUID = None
+        item = None
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
+                self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                dset = db.getDatasetObjByUuid(self.reqUuid)
+                modified = db.getModifiedTime(self.reqUuid)
+                with sidecarUtil.openSidecar(self.filePath) as f:
+                    grp = None
+                    if dset is not None:
+                        grp = pyramidUtil.getPyramidGroup(f, self.reqUuid)
+                    if grp is None:
+                        msg = "Pyramid not found"
+                        self.log.info(msg)
+                        raise HTTPError(404, reason=msg)
+                    item = pyramidUtil.getPyramidItem(grp, dset, modified)
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+
+        # got everything we need, put together the response
+        response = self.getPyramidResponse(item, rootUUID)
+
+        self.set_header('Content-Type', 'application/json')
+        self.write(json_encode(response))
+
+    @executorUtil.runInExecutor
+    def put(self):
+        self.baseHandler()
+
+        body = {}
+        if self.request.body:
+            try:
+                body = json_decode(self.request.body)
+            except ValueError as e:
+                msg = "JSON Parser Error: " + str(e)
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+        if not isinstance(body, dict):
+            msg = "Bad Request: expected JSON object in body"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        method = body.get('method', pyramidUtil.MEAN)
+
+        rootUUID = None
+        item = None
+        build = None
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
+                self.verifyAcl(acl, 'update')  # throws exception is unauthorized
+                modified = db.getModifiedTime(self.reqUuid)
+                build = sidecarUtil.Build(self.filePath, pyramidUtil.PYRAMID_KIND,
+                    self.reqUuid, modified)
+
+            # build the pyramid without holding the file or the sidecar
+            reader = dbPool.DatasetReader(self.filePath, self.reqUuid, app_logger=self.log)
+            try:
+                pyramidUtil.buildPyramid(build.f, self.reqUuid, modified, reader,
+                    method=method, axes=body.get('axes'))
+            except ValueError as e:
+                msg = "Bad Request: " + str(e)
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                dset = db.getDatasetObjByUuid(self.reqUuid)
+                modified = db.getModifiedTime(self.reqUuid)
+                with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+                    if f is None:
+                        msg = "Internal Server Error: unable to write pyramid"
+                        self.log.error(msg)
+                        raise HTTPError(500, reason=msg)
+                    grp = build.finish(f)
+                    if grp is None:
+                        msg = "Conflict: the dataset was modified while the pyramid was built"
+                        self.log.info(msg)
+                        raise HTTPError(409, reason=msg)
+                    item = pyramidUtil.getPyramidItem(grp, dset, modified)
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+        finally:
+            if build is not None:
+                build.close()
+
+        # got everything we need, put together the response
+        response = self.getPyramidResponse(item, rootUUID)
+
+        self.set_status(201)  # resource created
+        self.set_header('Content-Type', 'application/json')
+        self.write(json_encode(response))
+
+    @executorUtil.runInExecutor
+    def delete(self):
+        self.baseHandler()
+
+        response = {}
+        hrefs = []
+        rootUUID = None
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
+                self.verifyAcl(acl, 'update')  # throws exception is unauthorized
+                with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+                    grp = pyramidUtil.getPyramidGroup(f, self.reqUuid)
+                    if grp is None:
+                        msg = "Pyramid not found"
+                        self.log.info(msg)
+                        raise HTTPError(404, reason=msg)
+                    del f[grp.name]
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+
+        # got everything we need, put together the response
+        owner_uri = 'datasets/' + self.reqUuid
+        hrefs.append({'rel': 'self', 'href': self.getHref(owner_uri + '/pyramid')})
+        hrefs.append({'rel': 'owner', 'href': self.getHref(owner_uri)})
+        hrefs.append({'rel': 'root', 'href': self.getHref('groups/' + rootUUID)})
+        hrefs.append({'rel': 'home', 'href': self.getHref('')})
+        response['hrefs'] = hrefs
+
+        self.set_header('Content-Type', 'application/json')
+        self.write(json_encode(response))
+
+        self.log.info("Pyramid delete succeeded")
+
+
+@tornado.web.stream_request_body
+class ValueHandler(BaseHandler):
+
+    def getSelection(self, db, dims, select=None, mask=None):
+        """
+        Helper method - return the selectionUtil.Selection of the select
+        string (all of the dataset if None), restricted to the nonzero
+        elements of the dataset with UUID mask if given.
+        """
+        mask_dset = None
+        if mask is not None:
+            mask_dset = db.getDatasetObjByUuid(mask)
+            if mask_dset is None:
+                msg = "Bad Request: mask dataset: " + mask + " not found"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            acl = self.getAcl(db, mask)
+            self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+        try:
+            if select is None:
+                return selectionUtil.Selection(dims, mask=mask_dset)
+            self.log.info("select query value: [" + select + "]")
+            return selectionUtil.parseSelection(select, dims, mask=mask_dset)
+        except ValueError as ve:
+            msg = "Bad Request: " + str(ve)
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+
+    def getSelectionQueryParam(self, db, dims):
+        """
+        Helper method - return the Selection given by the select and mask
+        query params.
+
+        select should be in the form: [<dim1>, <dim2>, ... , <dimn>], or
+        several of these separated by '|' for their union.  For each
+        dimension, valid formats are:
+            single integer: n
+            start and end: n:m (either can be omitted)
+            start, end, and stride: n:m:s
+            list of indexes: [i,j,k]
+        Negative values count back from the end of the dimension.
+        """
+        select = self.get_query_argument("select", default=None)
+        mask = self.get_query_argument("mask", default=None)
+        return self.getSelection(db, dims, select, mask)
+
+    def getFieldsQueryParam(self, typeItem):
+        """
+        Helper method - return the list of field names given by the fields
+        query param (e.g. fields=date,time) or None if not given.  Only valid
+        for compound types.
+        """
+        query = self.get_query_argument("fields", default=None)
+        if query is None:
+            return None
+        self.log.info("fields query value: [" + query + "]")
+        if typeItem['class'] != 'H5T_COMPOUND':
+            msg = "Bad Request: fields selection is only supported for compound types"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        field_names = [field['name'] for field in typeItem['fields']]
+        fields = [name.strip() for name in query.split(',')]
+        for name in fields:
+            if name not in field_names:
+                msg = "Bad Request: unknown field name: [" + name + "]"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+        if len(set(fields)) != len(fields):
+            msg = "Bad Request: field names given more than once"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        return fields
+
+    def getFieldsType(self, typeItem, fields):
+        """
+        Return the type item of compound type typeItem with just the given
+        fields (in that order).
+        """
+        fieldItems = {}
+        for field in typeItem['fields']:
+            fieldItems[field['name']] = field
+        fieldsType = {'class': 'H5T_COMPOUND'}
+        fieldsType['fields'] = [fieldItems[name] for name in fields]
+        return fieldsType
+
+    def getHyperslabSelection(self, dsetshape, start, stop, step):
+        """
+        Get slices given lists of start, stop, step values
+        """
+        rank = len(dsetshape)
+        if start:
+            if type(start) is not list:
+                start = [start]
+            if len(start) != rank:
+                msg = "Bad Request: start array length not equal to dataset rank"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            for dim in range(rank):
+                if start[dim] < 0 or start[dim] >= dsetshape[dim]:
+                    msg = "Bad Request: start index invalid for dim: " + str(dim)
+                    self.log.info(msg)
+                    raise HTTPError(400, reason=msg)
+        else:
+            start = []
+            for dim in range(rank):
+                start.append(0)
+
+        if stop:
+            if type(stop) is not list:
+                stop = [stop]
+            if len(stop) != rank:
+                msg = "Bad Request: stop array length not equal to dataset rank"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            for dim in range(rank):
+                if stop[dim] <= start[dim] or stop[dim] > dsetshape[dim]:
+                    msg = "Bad Request: stop index invalid for dim: " + str(dim)
+                    self.log.info(msg)
+                    raise HTTPError(400, reason=msg)
+        else:
+            stop = []
+            for dim in range(rank):
+                stop.append(dsetshape[dim])
+
+        if step:
+            if type(step) is not list:
+                step = [step]
+            if len(step) != rank:
+                msg = "Bad Request: step array length not equal to dataset rank"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            for dim in range(rank):
+                if step[dim] <= 0 or step[dim] > dsetshape[dim]:
+                    msg = "Bad Request: step index invalid for dim: " + str(dim)
+                    self.log.info(msg)
+                    raise HTTPError(400, reason=msg)
+        else:
+            step = []
+            for dim in range(rank):
+                step.append(1)
+
+        slices = []
+        for dim in range(rank):
+            try:
+                s = slice(int(start[dim]), int(stop[dim]), int(step[dim]))
+            except ValueError:
+                msg = "Bad Request: invalid start/stop/step value"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            slices.append(s)
+        return tuple(slices)
+
+    def getQueryIntList(self, name):
+        """
+        Helper method - return list of ints for the given query param (None if
+        not given).  Values are comma separated, brackets are optional:
+        e.g. start=[0,5] or start=0,5
+        """
+        query = self.get_query_argument(name, default=None)
+        if query is None:
+            return None
+        query = query.strip()
+        if query.startswith('[') and query.endswith(']'):
+            query = query[1:-1]
+        try:
+            values = [int(x) for x in query.split(',')]
+        except ValueError:
+            msg = "Bad Request: invalid " + name + " parameter (can't convert to int)"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        return values
+
+    def getRequestContentType(self):
+        """
+        Return the media type of the request body (without any parameters)
+        """
+        content_type = self.request.headers.get('Content-Type', '')
+        return content_type.split(';')[0].strip()
+
+    def isBinaryUpload(self):
+        """
+        Return True if the request is a PUT with a raw binary body
+        """
+        if self.request.method != 'PUT':
+            return False
+        return self.getRequestContentType() == 'application/octet-stream'
+
+    @gen.coroutine
+    def prepare(self):
+        """
+        The request body is streamed (see data_received).  For binary PUT
+        requests validate the selection before any of the body is read,
+        otherwise the body is collected for the handler method.
+        """
+        self.bodyChunks = []
+        self.upload = None
+        if self.isBinaryUpload():
+            self.upload = yield executorUtil.submit(self.startBinaryUpload)
+            max_body_size = self.upload['nbytes']
+            if 'X-Consumed-Content-Encoding' in self.request.headers:
+                # gzip body (decompressed by the server), allow for data
+                # that doesn't compress
+                max_body_size += max_body_size // 1000 + 1024
+            self.request.connection.set_max_body_size(max_body_size)
+
+    def writePointValues(self, db, dims, points, data, format="json"):
+        """
+        Write data (a list of JSON values, or bytes for binary) to the dataset
+        at points (a JSON list or an array from selectionUtil.getPoints).
+        Values beyond the number of points are ignored.  Returns the points
+        as an array of coordinates.
+        """
+        dset = db.getDatasetObjByUuid(self.reqUuid)
+        try:
+            points = selectionUtil.getPoints(points, dims)
+        except ValueError as ve:
+            msg = "Bad Request: " + str(ve)
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        count = len(points)
+        dtype = dset.dtype
+        if format == "binary":
+            if len(data) < count * dtype.itemsize:
+                msg = "Bad Request: more points provided than values"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            values = np.frombuffer(data, dtype=dtype, count=count)
+        else:
+            values = np.zeros((count,), dtype=dtype)
+            try:
+                if dtype.names:
+                    values[...] = [self.convertToTuple(v) for v in data[:count]]
+                else:
+                    values[...] = data[:count]
+            except (ValueError, TypeError) as e:
+                msg = "Bad Request: values don't match the dataset type: " + str(e)
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+        try:
+            selectionUtil.writePoints(dset, points, values)
+        except TypeError as te:
+            self.log.info("h5py setitem exception: " + str(te))
+            raise IOError(errno.EINVAL, str(te))
+        db.setModifiedTime(self.reqUuid)
+        return points
+
+    def valuesChanged(self, db, boxes=None, points=None):
+        """
+        Invalidate cached data for the dataset after its values are written,
+        updating the statistics (see statsUtil) and pyramid (see pyramidUtil)
+        for just the regions in boxes (tuples of slices) or the points
+        written (the whole dataset if neither is given).
+        """
+        metaCache.invalidate(self.filePath, self.reqUuid)  # mtime
+        dset = db.getDatasetObjByUuid(self.reqUuid)
+        modified = db.getModifiedTime(self.reqUuid)
+        statsUtil.updateStats(self.filePath, self.reqUuid, dset, modified,
+            boxes=boxes, points=points)
+        pyramidUtil.updatePyramid(self.filePath, self.reqUuid, dset, modified,
+            boxes=boxes, points=points)
+        sidecarUtil.invalidate(self.filePath, self.reqUuid,
+            keep=(statsUtil.STATS_KIND, pyramidUtil.PYRAMID_KIND))
+
+    def writeSelectionValues(self, db, selection, data, format="json"):
+        """
+        Write data (JSON values, or bytes for binary) to the elements of the
+        dataset given by selection (a selectionUtil.Selection).  The values
+        have the shape of the selection if it is a single hyperslab, and are
+        one dimensional (in row-major order) otherwise.
+        """
+        dset = db.getDatasetObjByUuid(self.reqUuid)
+        dtype = dset.dtype
+        shape = selection.getShape()
+        try:
+            if format == "binary":
+                values = np.frombuffer(data, dtype=dtype)
+            elif dtype.names:
+                rank = len(shape) if shape is not None else 1
+                values = np.array(db.toTuple(rank, data), dtype=dtype)
+            else:
+                values = np.asarray(data, dtype=dtype)
+            if shape is not None:
+                values = values.reshape(shape + dtype.shape)
+            selection.write(dset, values, int(config.get('stream_buffer_size')))
+        except (ValueError, TypeError) as e:
+            msg = "Bad Request: values don't match the selection: " + str(e)
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        db.setModifiedTime(self.reqUuid)
+
+    def startBinaryUpload(self):
+        """
+        Verify a binary PUT request and return the upload state: the slabs
+        the selection will be written in and the number of bytes expected.
+        Selection is given by the start, stop, and step query params, or the
+        select and mask query params (as for GET), or for a point selection
+        the points query param gives the number of points: the body is the
+        points (rank little-endian uint64 coordinates each) followed by the
+        values.  Point selections, and select values other than a single
+        hyperslab, are written when the body has been read.
+        """
+        self.baseHandler()
+        start = self.getQueryIntList('start')
+        stop = self.getQueryIntList('stop')
+        step = self.getQueryIntList('step')
+        select = self.get_query_argument('select', default=None)
+        mask = self.get_query_argument('mask', default=None)
+        points = self.get_query_argument('points', default=None)
+        if select is not None or mask is not None:
+            if start is not None or stop is not None or step is not None or \
+                    points is not None:
+                msg = "Bad Request: can't use select or mask with start/stop/step or points"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+        if points is not None:
+            try:
+                points = int(points)
+            except ValueError:
+                points = -1
+            if points < 0:
+                msg = "Bad Request: invalid points parameter (expected number of points)"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            if start is not None or stop is not None or step is not None:
+                msg = "Bad Request: can't use hyperslab selection and points selection in one request"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
+                self.verifyAcl(acl, 'update')  # throws exception is unauthorized
+                item = self.getDatasetItem(db)
+                dset = db.getDatasetObjByUuid(self.reqUuid)
+                dtype = dset.dtype
+                chunks = dset.chunks
+                selection = None
+                count = None
+                if (select is not None or mask is not None) and \
+                        item['shape']['class'] == 'H5S_SIMPLE':
+                    selection = self.getSelection(db, item['shape']['dims'], select, mask)
+                    if selection.getSlices() is None:
+                        count = selection.getCount(dset, int(config.get('stream_buffer_size')))
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+
+        if 'shape' not in item:
+            msg = "Unexpected error, shape information not found"
+            self.log.info(msg)
+            raise HTTPError(500, reason=msg)
+        datashape = item['shape']
+        if datashape['class'] == 'H5S_NULL':
+            msg = "Bad Request: PUT value can't be used with Null Space datasets"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        itemSize = h5json.getItemSize(item['type'])
+        if itemSize == "H5T_VARIABLE":
+            msg = "binary data cannot be used with variable length types"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)  # need to use json
+
+        if datashape['class'] == 'H5S_SCALAR':
+            if start is not None or stop is not None or step is not None:
+                msg = "Bad Request: start/stop/step option can't be used with Scalar Space datasets"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            if points is not None:
+                msg = "Bad Request: Point selection can't be used with scalar datasets"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            if select is not None or mask is not None:
+                msg = "Bad Request: select and mask can't be used with scalar datasets"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            slices = ()
+            slabs = [None]  # one write of the single element
+            rowSize = itemSize
+        elif points is not None:
+            slices = None
+            slabs = []  # written by finishBinaryUpload
+            rowSize = 8 * len(datashape['dims']) + itemSize  # point and value
+            nbytes = points * rowSize
+        elif count is not None:
+            slices = None
+            slabs = []  # written by finishBinaryUpload
+            rowSize = itemSize
+            nbytes = count * itemSize
+        else:
+            if selection is not None:
+                slices = selection.getSlices()
+            else:
+                slices = self.getHyperslabSelection(datashape['dims'], start, stop, step)
+            rowSize = itemSize
+            for s in slices[1:]:
+                rowSize *= selectionUtil.getSliceCount(s)
+            bufferSize = int(config.get('stream_buffer_size'))
+            slabs = selectionUtil.getSlabs(slices[0], rowSize, bufferSize, chunks)
+
+        if slices is not None:
+            nbytes = 0
+            for slab in slabs:
+                if slab is not None:
+                    nbytes += selectionUtil.getSliceCount(slab) * rowSize
+                else:
+                    nbytes += rowSize
+        content_length = self.request.headers.get('Content-Length')
+        if 'X-Consumed-Content-Encoding' in self.request.headers:
+            # compressed body, the size is checked as it is received
+            content_length = None
+        if content_length is not None and int(content_length) != nbytes:
+            msg = "Bad Request: expected " + str(nbytes) + " bytes, but got: " + content_length
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+
+        upload = {}
+        upload['slices'] = slices
+        upload['slabs'] = slabs
+        upload['points'] = points
+        upload['select'] = None
+        if count is not None:
+            upload['select'] = (select, mask)
+        upload['dims'] = datashape.get('dims')
+        upload['rowSize'] = rowSize
+        upload['dtype'] = dtype
+        upload['nbytes'] = nbytes
+        upload['received'] = 0
+        upload['buffer'] = bytearray()
+        upload['error'] = None
+        upload['written'] = None  # box of the slabs written so far
+        upload['writing'] = False  # writeBinarySlab is running
+        upload['closed'] = False  # connection closed before the end of the body
+        return upload
+
+    def writeBinarySlab(self, slab, data):
+        """
+        Write data (bytes) to the dataset for the given first dimension slab
+        of the upload selection (None for a scalar dataset).
+        """
+        upload = self.upload
+        dtype = upload['dtype']
+        shape = []
+        slices = ()
+        if slab is not None:
+            slices = (slab,) + upload['slices'][1:]
+            for s in slices:
+                shape.append(selectionUtil.getSliceCount(s))
+        shape.extend(dtype.shape)  # array types
+        arr = np.frombuffer(data, dtype=dtype.base).reshape(shape)
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                dset = db.getDatasetObjByUuid(self.reqUuid)
+                try:
+                    dset[slices] = arr
+                except TypeError as te:
+                    self.log.info("h5py setitem exception: " + str(te))
+                    raise IOError(errno.EINVAL, str(te))
+                db.setModifiedTime(self.reqUuid)
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+        # valuesChanged is called for all the slabs in finishBinaryUpload
+        written = upload['written']
+        if slab is not None and written is not None:
+            slices = (slice(min(slab.start, written[0].start),
+                max(slab.stop, written[0].stop)),) + slices[1:]
+        upload['written'] = slices
+
+    def slabsWritten(self):
+        """
+        Call valuesChanged for the slabs written by writeBinarySlab.
+        """
+        box = self.upload['written']
+        self.upload['written'] = None
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                self.valuesChanged(db, boxes=[box])
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+
+    @gen.coroutine
+    def data_received(self, chunk):
+        """
+        For binary PUT requests write each slab to the dataset as soon as the
+        bytes for it have arrived.  Reading of the body is paused while a slab
+        is written.
+        """
+        upload = self.upload
+        if upload is None:
+            self.bodyChunks.append(chunk)
+            return
+        upload['received'] += len(chunk)
+        if upload['error'] is not None:
+            return  # discard the rest of the body
+        if upload['received'] > upload['nbytes']:
+            return  # too much data (e.g. a gzip body), see finishBinaryUpload
+        buffer = upload['buffer']
+        buffer.extend(chunk)
+        slabs = upload['slabs']
+        while slabs:
+            slab = slabs[0]
+            if slab is None:
+                size = upload['rowSize']
+            else:
+                size = selectionUtil.getSliceCount(slab) * upload['rowSize']
+            if len(buffer) < size:
+                break
+            data = bytes(buffer[:size])
+            del buffer[:size]
+            slabs.pop(0)
+            upload['writing'] = True
+            try:
+                yield executorUtil.submit(self.writeBinarySlab, slab, data)
+            except HTTPError as e:
+                # reported when the body has been read
+                upload['error'] = e
+                return
+            finally:
+                upload['writing'] = False
+                if upload['closed']:
+                    self.slabsWrittenOnClose()
+            if upload['closed']:
+                return
+
+    def on_connection_close(self):
+        upload = getattr(self, 'upload', None)  # set by prepare
+        if upload is not None and upload['received'] < upload['nbytes']:
+            # put won't be called to finish the upload
+            upload['closed'] = True
+            if not upload['writing']:
+                self.slabsWrittenOnClose()
+        super(ValueHandler, self).on_connection_close()
+
+    def slabsWrittenOnClose(self):
+        """
+        Call valuesChanged (on the executor) for the slabs written before the
+        client closed the connection.
+        """
+        if self.upload['written'] is None:
+            return
+
+        def run():
+            try:
+                self.slabsWritten()
+            except HTTPError as e:
+                self.log.warning("unable to update data derived from the values: " +
+                    str(e.reason))
+        executorUtil.submit(run)
+
+    def finishBinaryUpload(self):
+        upload = self.upload
+        if upload['written'] is not None:
+            self.slabsWritten()  # even if the upload failed
+        if upload['error'] is not None:
+            raise upload['error']
+        if upload['received'] != upload['nbytes']:
+            msg = "Bad Request: expected " + str(upload['nbytes']) + " bytes, but got: "
+            msg += str(upload['received'])
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        if upload['points'] is not None:
+            self.writeBinaryPoints()
+        elif upload['select'] is not None:
+            self.writeBinarySelection()
+        self.log.info("value put succeeded")
+
+    def writeBinarySelection(self):
+        """
+        Write the values of a binary upload for select and mask query params
+        other than a single hyperslab (see startBinaryUpload).
+        """
+        upload = self.upload
+        select, mask = upload['select']
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                selection = self.getSelection(db, upload['dims'], select, mask)
+                self.writeSelectionValues(db, selection, bytes(upload['buffer']),
+                    format="binary")
+                self.valuesChanged(db, boxes=selection.getBoxes())
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+
+    def writeBinaryPoints(self):
+        """
+        Write the values of a binary point selection upload (see
+        startBinaryUpload).
+        """
+        upload = self.upload
+        data = bytes(upload['buffer'])
+        nbytes = upload['points'] * 8 * len(upload['dims'])
+        try:
+            points = selectionUtil.getBinaryPoints(data[:nbytes], upload['dims'])
+        except ValueError as ve:
+            msg = "Bad Request: " + str(ve)
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        try:
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                points = self.writePointValues(db, upload['dims'], points, data[nbytes:],
+                    format="binary")
+                self.valuesChanged(db, points=points)
+        except IOError as e:
+            self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+            status = errNoToHttpStatus(e.errno)
+            raise HTTPError(status, reason=e.strerror)
+
+    def writeBinarySlabs(self, slices, itemSize, chunks, dtype=None, header=b'',
+            fields=None):
+        """
+        Write the selected values as binary data.  The selection is read in
+        slabs along the first dimension (aligned with the dataset chunks) of at
+        most stream_buffer_size bytes, and each slab is sent before the next
+        one is read.  If dtype is given the values are sent as that type,
+        after the header (see writeNpy).  slices is () for a scalar dataset.
+        If fields is given (with dtype) just those fields are read.
+        """
+        rowSize = itemSize
+        for s in slices[1:]:
+            rowSize *= selectionUtil.getSliceCount(s)
+        bufferSize = int(config.get('stream_buffer_size'))
+        if slices:
+            nrows = selectionUtil.getSliceCount(slices[0])
+            slabs = selectionUtil.getSlabs(slices[0], rowSize, bufferSize, chunks)
+        else:
+            nrows = 1
+            slabs = [None]
+        self.set_header('Content-Length', str(len(header) + nrows * rowSize))
+        if header:
+            self.write(header)
+        for slab in slabs:
+            selection = slices
+            if slab is not None:
+                selection = (slab,) + slices[1:]
+            try:
+                # don't hold the file while the slab is sent
+                with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                    if dtype is None:
+                        values = db.getDatasetValuesByUuid(
+                            self.reqUuid, selection, format="binary")
+                    else:
+                        dset = db.getDatasetObjByUuid(self.reqUuid)
+                        values = npyUtil.getValues(
+                            selectionUtil.readValues(dset, selection, fields), dtype)
+            except IOError as e:
+                self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+                status = errNoToHttpStatus(e.errno)
+                raise HTTPError(status, reason=e.strerror)
+            self.write(values)
+            values = None
+            try:
+                self.flushOutput()
+            except StreamClosedError:
+                self.log.info("client closed connection")
+                return
+
+    def writeNpy(self, slices, typeItem, chunks, fields=None):
+        """
+        Write the selected values in NumPy .npy format: the header, with the
+        dtype from the dataset type item and the shape of the selection,
+        followed by the values sent in slabs as for writeBinarySlabs.
+        """
+        dtype = h5json.createDataType(typeItem)
+        shape = [selectionUtil.getSliceCount(s) for s in slices]
+        header = npyUtil.getHeader(dtype, shape)
+        self.writeBinarySlabs(slices, dtype.itemsize, chunks, dtype=dtype, header=header,
+            fields=fields)
+
+    def getArrowSchema(self, dtype, index=False):
+        """
+        Return the Arrow schema for rows of the dataset (see arrowUtil).
+        """
+        if not arrowUtil.isAvailable():
+            msg = "Not Implemented: Arrow responses require the pyarrow package"
+            self.log.info(msg)
+            raise HTTPError(501, reason=msg)
+        try:
+            return arrowUtil.getSchema(dtype, index=index)
+        except TypeError as e:
+            msg = "Bad Request: " + str(e)
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+
+    def writeArrow(self, schema, s, itemSize, chunks, fields=None, result=None):
+        """
+        Write the rows of a one dimensional dataset selected by slice s as an
+        Arrow IPC stream, with a record batch for each slab of at most
+        stream_buffer_size bytes.  If fields is given just those fields are
+        read.  For query results (result, a queryUtil.QueryResult) the
+        matching rows are written, with their indexes as the first column.
+        """
+        bufferSize = int(config.get('stream_buffer_size'))
+        writer = arrowUtil.StreamWriter(schema)
+        if result is None:
+            slabs = selectionUtil.getSlabs(s, itemSize, bufferSize, chunks)
+        else:
+            nrows = max(1, bufferSize // max(itemSize, 1))
+            slabs = [slice(i, i + nrows) for i in range(0, result.count, nrows)]
+        for slab in slabs:
+            indexes = None
+            if result is not None:
+                rows = result.values[slab]
+                indexes = result.indexes[slab]
+            else:
+                try:
+                    # don't hold the file while the batch is sent
+                    with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                        dset = db.getDatasetObjByUuid(self.reqUuid)
+                        rows = selectionUtil.readValues(dset, slab, fields)
+                except IOError as e:
+                    self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
+                    status = errNoToHttpStatus(e.errno)
+                    raise HTTPError(status, reason=e.strerror)
+            try:
+                data = writer.write(arrowUtil.getRecordBatch(schema, rows, indexes))
+            except (TypeError, ValueError) as e:
+                msg = "Bad Request: unable to convert values to Arrow: " + str(e)
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            rows = None
+            self.write(data)
+            data = None
+            try:
+                self.flushOutput()
+            except StreamClosedError:
+                self.log.info("client closed connection")
+                return
+        self.write(writer.close())
+
+    def runQuery(self, db, query_selection, s, limit=None, count=False, fields=None):
+        """
+        Return the rows of the dataset selected by slice s that meet the
+        query condition (a queryUtil.QueryResult).  If the cursor query param
+        is given the query continues from the cursor rather than s.  Indexes
+        of the dataset's fields are used to find the candidate rows if they
+        can narrow them down enough.
+        """
+        dset = db.getDatasetObjByUuid(self.reqUuid)
+        try:
+            query = queryUtil.Query(query_selection, dset.dtype)
+        except ValueError as e:
+            msg = "Bad Request: " + str(e)
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        cursor = self.get_query_argument("cursor", default=None)
+        if cursor:
+            try:
+                start, stop, step = queryUtil.decodeCursor(cursor, query_selection)
+            except ValueError as e:
+                msg = "Bad Request: " + str(e)
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            s = slice(start, stop, step)
+        candidates = None
+        modified = db.getModifiedTime(self.reqUuid)
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            indexes = indexUtil.getIndexes(f, self.reqUuid, dset, modified)
+            if indexes:
+                maxRows = int(dset.shape[0] * config.get('index_max_fraction'))
+                candidates = query.getCandidates(indexes, maxRows)
+        summary = None
+        if candidates is None and config.get('query_summary'):
+            summary = queryUtil.getSummary(self.filePath, self.reqUuid, dset, modified)
+        try:
+            result = queryUtil.runQuery(dset, query, s, limit=limit, count=count,
+                fields=fields, summary=summary, candidates=candidates)
+        except (ValueError, TypeError) as e:
+            # e.g. comparing a string field with a number
+            msg = "Bad Request: unable to evaluate query: " + str(e)
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        if summary is not None:
+            queryUtil.saveSummary(self.filePath, self.reqUuid, summary)
+        if result.next is not None:
+            result.cursor = queryUtil.encodeCursor(query_selection, result.next,
+                s.stop, s.step or 1)
+        return result
+
+    def runArrayQuery(self, db, query_selection, slices, limit=None, count=False):
+        """
+        Return the elements of a numeric dataset selected by slices that meet
+        the query condition (a queryUtil.QueryResult with the coordinates of
+        each match).  If the cursor query param is given the query continues
+        from the cursor rather than slices.
+        """
+        dset = db.getDatasetObjByUuid(self.reqUuid)
+        try:
+            query = queryUtil.Query(query_selection, dset.dtype)
+        except ValueError as e:
+            msg = "Bad Request: " + str(e)
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        position = None
+        cursor = self.get_query_argument("cursor", default=None)
+        if cursor:
+            try:
+                slices, position = queryUtil.decodeArrayCursor(cursor, query_selection)
+            except ValueError as e:
+                msg = "Bad Request: " + str(e)
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+            if len(slices) != len(dset.shape):
+                msg = "Bad Request: cursor is not for this dataset"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+        try:
+            result = queryUtil.runArrayQuery(dset, query, slices, limit=limit, count=count,
+                position=position)
+        except (ValueError, TypeError) as e:
+            msg = "Bad Request: unable to evaluate query: " + str(e)
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        if result.next is not None:
+            result.cursor = queryUtil.encodeArrayCursor(query_selection, slices, result.next)
+        return result
+
+    def getLevelQueryParam(self):
+        """
+        Return the level query param as an int, or None if it isn't given.
+        """
+        level = self.get_query_argument("level", default=None)
+        if level is None:
+            return None
+        try:
+            level = int(level)
+        except ValueError:
+            level = -1
+        if level < 0:
+            msg = "Bad Request: invalid level: " + self.get_query_argument("level")
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        return level
+
+    def readLevel(self, db, level):
+        """
+        Return the values of the select query param (or all the values) of
+        level of the dataset's pyramid (see pyramidUtil).
+        """
+        dset = db.getDatasetObjByUuid(self.reqUuid)
+        modified = db.getModifiedTime(self.reqUuid)
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            grp = pyramidUtil.getPyramidGroup(f, self.reqUuid)
+            if grp is None:
+                msg = "Pyramid not found"
+                self.log.info(msg)
+                raise HTTPError(404, reason=msg)
+            if pyramidUtil.isStale(grp, dset, modified):
+                msg = "Conflict: pyramid is stale, it needs to be rebuilt"
                 self.log.info(msg)
-                raise HTTPError(400, reason=msg)
-            stop = start
-        elif dim_query == ':':
-            # select everything
-            pass
-        else:
-            fields = dim_query.split(":")
-            if len(fields) > 3:
-                msg = "Bad Request: Too many ':' seperators for dimension: " + str(dim)
+                raise HTTPError(409, reason=msg)
+            level_dset = pyramidUtil.getLevel(grp, level)
+            if level_dset is None:
+                msg = "Bad Request: the pyramid has " + str(pyramidUtil.getLevelCount(grp))
+                msg += " levels"
                 self.log.info(msg)
                 raise HTTPError(400, reason=msg)
+            select = self.get_query_argument("select", default=None)
             try:
-                if fields[0]:
-                    start = int(fields[0])
-                if fields[1]:
-                    stop = int(fields[1])
-                if len(fields) > 2 and fields[2]:
-                    step = int(fields[2])
-            except ValueError:
-                msg = "Bad Request: invalid selection parameter (can't convert to int) for dimension: " + str(dim)
+                if select:
+                    selection = selectionUtil.parseSelection(select, level_dset.shape)
+                else:
+                    selection = selectionUtil.Selection(level_dset.shape)
+            except ValueError as e:
+                msg = "Bad Request: " + str(e)
                 self.log.info(msg)
                 raise HTTPError(400, reason=msg)
+            slices = selection.getSlices()
+            if slices is not None:
+                return level_dset[tuple(slices)]
+            return selection.read(level_dset, int(config.get('stream_buffer_size')))
 
-        if start < 0 or start > extent:
-            msg = "Bad Request: Invalid selection start parameter for dimension: " + str(dim)
-            self.log.info(msg)
-            raise HTTPError(400, reason=msg)
-        if stop > extent:
-            msg = "Bad Request: Invalid selection stop parameter for dimension: " + str(dim)
-            self.log.info(msg)
-            raise HTTPError(400, reason=msg)
-        if step <= 0:
-            msg = "Bad Request: invalid selection step parameter for dimension: " + str(dim)
+    def runReduce(self, db, op, slices):
+        """
+        Return the result of the reduction op (reduce query param) of the
+        dataset selection slices over the axis query param (all axes if not
+        given).  Elements equal to the fill value are skipped if skipfill is
+        set.
+        """
+        dset = db.getDatasetObjByUuid(self.reqUuid)
+        skip_fill = self.get_query_argument("skipfill", default='').lower() in ('1', 'true')
+        try:
+            axes = reduceUtil.getAxes(self.get_query_argument("axis", default=None),
+                len(slices))
+            reduction = reduceUtil.reduceSelection(dset, slices, op, axes,
+                int(config.get('stream_buffer_size')), skipFill=skip_fill,
+                processes=int(config.get('reduce_processes')),
+                processSize=int(config.get('reduce_process_size')))
+        except ValueError as e:
+            msg = "Bad Request: " + str(e)
             self.log.info(msg)
             raise HTTPError(400, reason=msg)
-        s = slice(start, stop, step)
-        self.log.info(
-            "dim query[" + str(dim) + "] returning: start: " +
-            str(start) + " stop: " + str(stop) + " step: " + str(step))
-        return s
+        return reduction.getResult()
 
-    def getHyperslabSelection(self, dsetshape, start, stop, step):
+    def writeArray(self, values, typeItem, npy=False):
         """
-        Get slices given lists of start, stop, step values
+        Write the array values as binary data of the dataset type item
+        typeItem, preceded by the .npy header if npy is True.
         """
-        rank = len(dsetshape)
-        if start:
-            if type(start) is not list:
-                start = [start]
-            if len(start) != rank:
-                msg = "Bad Request: start array length not equal to dataset rank"
-                self.log.info(msg)
-                raise HTTPError(400, reason=msg)
-            for dim in range(rank):
-                if start[dim] < 0 or start[dim] >= dsetshape[dim]:
-                    msg = "Bad Request: start index invalid for dim: " + str(dim)
-                    self.log.info(msg)
-                    raise HTTPError(400, reason=msg)
-        else:
-            start = []
-            for dim in range(rank):
-                start.append(0)
-
-        if stop:
-            if type(stop) is not list:
-                stop = [stop]
-            if len(stop) != rank:
-                msg = "Bad Request: stop array length not equal to dataset rank"
-                self.log.info(msg)
-                raise HTTPError(400, reason=msg)
-            for dim in range(rank):
-                if stop[dim] <= start[dim] or stop[dim] > dsetshape[dim]:
-                    msg = "Bad Request: stop index invalid for dim: " + str(dim)
-                    self.log.info(msg)
-                    raise HTTPError(400, reason=msg)
+        dtype = h5json.createDataType(typeItem)
+        values = npyUtil.getValues(values, dtype)
+        header = b''
+        if npy:
+            self.set_header('Content-Type', npyUtil.CONTENT_TYPE)
+            header = npyUtil.getHeader(dtype, values.shape[:values.ndim - len(dtype.shape)])
         else:
-            stop = []
-            for dim in range(rank):
-                stop.append(dsetshape[dim])
+            self.set_header('Content-Type', 'application/octet-stream')
+        self.set_header('Content-Length', str(len(header) + values.nbytes))
+        if header:
+            self.write(header)
+        self.write(values.tobytes())
 
-        if step:
-            if type(step) is not list:
-                step = [step]
-            if len(step) != rank:
-                msg = "Bad Request: step array length not equal to dataset rank"
-                self.log.info(msg)
-                raise HTTPError(400, reason=msg)
-            for dim in range(rank):
-                if step[dim] <= 0 or step[dim] > dsetshape[dim]:
-                    msg = "Bad Request: step index invalid for dim: " + str(dim)
-                    self.log.info(msg)
-                    raise HTTPError(400, reason=msg)
+    def writeQueryRecords(self, result, npy=False):
+        """
+        Write the matches of a query result as binary records of the index
+        (or coordinates) and value of each match (see queryUtil.getRecords),
+        preceded by the .npy header if npy is True.  A cursor to continue the
+        query is returned in the X-Query-Cursor header.
+        """
+        records = queryUtil.getRecords(result)
+        header = b''
+        if npy:
+            self.set_header('Content-Type', npyUtil.CONTENT_TYPE)
+            header = npyUtil.getHeader(records.dtype, records.shape)
         else:
-            step = []
-            for dim in range(rank):
-                step.append(1)
-
-        slices = []
-        for dim in range(rank):
+            self.set_header('Content-Type', 'application/octet-stream')
+        if result.cursor is not None:
+            self.set_header('X-Query-Cursor', result.cursor)
+        self.set_header('Content-Length', str(len(header) + records.nbytes))
+        if header:
+            self.write(header)
+        bufferSize = int(config.get('stream_buffer_size'))
+        nrows = max(1, bufferSize // max(records.dtype.itemsize, 1))
+        for i in range(0, len(records), nrows):
+            self.write(records[i:i + nrows].tobytes())
             try:
-                s = slice(int(start[dim]), int(stop[dim]), int(step[dim]))
-            except ValueError:
-                msg = "Bad Request: invalid start/stop/step value"
-                self.log.info(msg)
-                raise HTTPError(400, reason=msg)
-            slices.append(s)
-        return tuple(slices)
+                self.flushOutput()
+            except StreamClosedError:
+                self.log.info("client closed connection")
+                return
 
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
          
@@ -1643,13 +3218,22 @@ class ValueHandler(BaseHandler):
         hrefs = []
         rootUUID = None
         item = None
+        itemSize = None
+        chunks = None
+        schema = None
         item_shape = None
         rank = None
         item_type = None
         values = None
         indexes = None
+        fields = None
+        result = None
+        selection = None
         slices = []
         query_selection = self.get_query_argument("query", default=None)
+        reduce_op = self.get_query_argument("reduce", default=None)
+        level = self.getLevelQueryParam()
+        count_only = self.get_query_argument("count", default='').lower() in ('1', 'true')
         limit = self.get_query_argument("Limit", default=None)
         if limit:
             try:
@@ -1661,13 +3245,28 @@ class ValueHandler(BaseHandler):
                 
         if query_selection:
             self.log.info("query: " + query_selection)
+        elif count_only or self.get_query_argument("cursor", default=None):
+            msg = "Bad Request: count and cursor are only valid with a query"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        if reduce_op is not None and query_selection:
+            msg = "Bad Request: reduce is not valid with a query"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
+        if level and (query_selection or reduce_op is not None or
+                self.get_query_argument("mask", default=None)):
+            msg = "Bad Request: level is not valid with query, reduce or mask"
+            self.log.info(msg)
+            raise HTTPError(400, reason=msg)
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
-                item = db.getDatasetItemByUuid(self.reqUuid)
+                if self.isNotModified():
+                    return
+                item = self.getDatasetItem(db)
                 item_type = item['type']
                 
                 if item_type['class'] == 'H5T_OPAQUE':
@@ -1675,58 +3274,137 @@ class ValueHandler(BaseHandler):
                     msg = "Not Implemented: GET OPAQUE data not supported"
                     self.log.info(msg)
                     raise HTTPError(501, reason=msg)  # Not implemented
-                elif item_type['class'] != 'H5T_COMPOUND' and query_selection:
-                    msg = "Bad Request: query selection is only supported for compound types"
+                elif item_type['class'] not in ('H5T_COMPOUND', 'H5T_INTEGER', 'H5T_FLOAT') \
+                        and query_selection:
+                    msg = "Bad Request: query selection is only supported for compound "
+                    msg += "and numeric types"
+                    self.log.info(msg)
+                    raise HTTPError(400, reason=msg)
+                elif item_type['class'] not in ('H5T_INTEGER', 'H5T_FLOAT') and reduce_op:
+                    msg = "Bad Request: reduce is only supported for numeric types"
                     self.log.info(msg)
                     raise HTTPError(400, reason=msg)
+                fields = self.getFieldsQueryParam(item_type)
+                if fields is not None:
+                    # values are returned as a compound type of just these fields
+                    item_type = self.getFieldsType(item_type, fields)
             
                 
                 item_shape = item['shape']
-                if item_shape['class'] == 'H5S_NULL':
+                if item_shape['class'] != 'H5S_SIMPLE' and reduce_op:
+                    msg = "Bad Request: reduce is only supported for simple dataspaces"
+                    self.log.info(msg)
+                    raise HTTPError(400, reason=msg)
+                if level:
+                    values = self.readLevel(db, level)
+                    if request_content_type in ("binary", "npy"):
+                        response_content_type = request_content_type
+                elif item_shape['class'] == 'H5S_NULL':
                     pass   # don't return a value
                 elif item_shape['class'] == 'H5S_SCALAR':
                     if query_selection:
                         msg = "Bad Request: query selection not valid with scalar dataset"
                         self.log.info(msg)
                         raise HTTPError(400, reason=msg)
-                    values = db.getDatasetValuesByUuid(self.reqUuid, Ellipsis)
+                    if request_content_type == "npy" and \
+                            h5json.getItemSize(item_type) != "H5T_VARIABLE":
+                        response_content_type = "npy"
+                    elif fields is not None:
+                        dset = db.getDatasetObjByUuid(self.reqUuid)
+                        values = db.bytesArrayToList(selectionUtil.readValues(dset, (), fields))
+                    else:
+                        values = db.getDatasetValuesByUuid(self.reqUuid, Ellipsis)
                 elif item_shape['class'] == 'H5S_SIMPLE':
                     dims = item_shape['dims']
                     rank = len(dims)
-                    if query_selection and rank != 1:
+                    if query_selection and rank != 1 and item_type['class'] == 'H5T_COMPOUND':
                         msg = "Bad Request: query selection is only supported for "
-                        msg += "one dimensional datasets"
+                        msg += "one dimensional compound datasets"
                         self.log.info(msg)
                         raise HTTPError(400, reason=msg)
-                    nelements = 1
-                    for dim in range(rank):
-                        dim_slice = self.getSliceQueryParam(dim, dims[dim])
-                        self.log.info("dim_size[{}]: {}".format(dim, dim_slice))
-                        nelements *= (dim_slice.stop - dim_slice.start)
-                        slices.append(dim_slice)
-                    if query_selection:
-                        start = slices[0].start
-                        stop = slices[0].stop
-                        step = slices[0].step
-                        (indexes, values) = db.doDatasetQueryByUuid(self.reqUuid, query_selection, start=start, stop=stop, step=step, limit=limit)
-                    else:
+                    selection = self.getSelectionQueryParam(db, dims)
+                    slices = selection.getSlices()
+                    if slices is None and (query_selection or reduce_op):
+                        msg = "Bad Request: query selection and reduce are only supported "
+                        msg += "with a hyperslab selection"
+                        self.log.info(msg)
+                        raise HTTPError(400, reason=msg)
+                    if request_content_type == "arrow" and rank == 1 and not count_only and \
+                            slices is not None and reduce_op is None:
+                        # values are read in slabs below
+                        dset = db.getDatasetObjByUuid(self.reqUuid)
+                        dtype = dset.dtype
+                        if fields is not None:
+                            dtype = selectionUtil.getFieldsDtype(dtype, fields)
+                        schema = self.getArrowSchema(dtype, index=bool(query_selection))
+                        itemSize = dtype.itemsize
+                        chunks = dset.chunks
+                        response_content_type = "arrow"
+                    if query_selection and item_type['class'] != 'H5T_COMPOUND':
+                        result = self.runArrayQuery(db, query_selection, slices, limit=limit,
+                            count=count_only)
+                    elif query_selection:
+                        result = self.runQuery(db, query_selection, slices[0], limit=limit,
+                            count=count_only, fields=fields)
+                    if reduce_op is not None:
+                        values = self.runReduce(db, reduce_op, slices)
+                        item_type = h5json.getTypeItem(values.dtype)
+                        if request_content_type in ("binary", "npy"):
+                            response_content_type = request_content_type
+                    elif result is not None and not count_only and \
+                            request_content_type in ("binary", "npy"):
+                        # index and value records, written below
+                        response_content_type = request_content_type
+                    elif result is not None and not count_only and \
+                            response_content_type != "arrow":
+                        indexes = result.indexes.tolist()
+                        if item_type['class'] == 'H5T_COMPOUND':
+                            values = db.bytesArrayToList(result.values)
+                        else:
+                            values = result.values  # encoded directly by writeJson
+                    elif slices is None:
+                        # index lists, unions and masks are read in blocks
+                        dset = db.getDatasetObjByUuid(self.reqUuid)
+                        values = selection.read(dset, int(config.get('stream_buffer_size')),
+                            fields)
+                        if request_content_type in ("binary", "npy") and \
+                                h5json.getItemSize(item_type) != "H5T_VARIABLE":
+                            response_content_type = request_content_type
+                        elif item_type['class'] not in ('H5T_INTEGER', 'H5T_FLOAT'):
+                            values = db.bytesArrayToList(values)
+                    elif response_content_type != "arrow" and not query_selection:
+                        nelements = int(np.prod(selection.getShape()))
                         if request_content_type == "binary":
                             self.log.info("nelements:" + str(nelements))
                             itemSize = h5json.getItemSize(item_type)
                             self.log.info("itemSize: " + str(itemSize))
                             if itemSize != "H5T_VARIABLE" and nelements > 1:
                                 response_content_type = "binary"
+                        elif request_content_type == "npy":
+                            if h5json.getItemSize(item_type) != "H5T_VARIABLE":
+                                response_content_type = "npy"
                        
                         self.log.info("response_content_type: " + response_content_type)
-                        values = db.getDatasetValuesByUuid(
-                            self.reqUuid, tuple(slices), format=response_content_type)      
+                        if response_content_type in ("binary", "npy"):
+                            # values are read in slabs below
+                            chunks = db.getDatasetObjByUuid(self.reqUuid).chunks
+                        elif item_type['class'] in ('H5T_INTEGER', 'H5T_FLOAT'):
+                            # numeric array, encoded directly by writeJson
+                            dset = db.getDatasetObjByUuid(self.reqUuid)
+                            values = dset[tuple(slices)]
+                        elif fields is not None:
+                            dset = db.getDatasetObjByUuid(self.reqUuid)
+                            values = db.bytesArrayToList(
+                                selectionUtil.readValues(dset, tuple(slices), fields))
+                        else:
+                            values = db.getDatasetValuesByUuid(
+                                self.reqUuid, tuple(slices), format=response_content_type)      
                          
                 else:
                     msg = "Internal Server Error: unexpected shape class: " + shape['class']
                     self.log.error(msg)
                     raise HTTPError(500, reason=msg)
 
-                rootUUID = db.getUUIDByPath('/')
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
             status = errNoToHttpStatus(e.errno)
@@ -1735,14 +3413,40 @@ class ValueHandler(BaseHandler):
          
         # got everything we need, put together the response
         
+        if result is not None and response_content_type in ("binary", "npy"):
+            self.log.info("writing query records")
+            self.writeQueryRecords(result, npy=(response_content_type == "npy"))
+            return
+
+        if (reduce_op is not None or level or (selection is not None and slices is None)) \
+                and response_content_type in ("binary", "npy"):
+            self.writeArray(values, item_type, npy=(response_content_type == "npy"))
+            return
+
         if response_content_type == "binary":
             # binary transfer, just write the bytes and return
             self.log.info("writing binary stream")
             self.set_header('Content-Type', 'application/octet-stream')
-            self.write(values)
+            dtype = None
+            if fields is not None:
+                dtype = h5json.createDataType(item_type)
+            self.writeBinarySlabs(tuple(slices), itemSize, chunks, dtype=dtype, fields=fields)
+            return
+
+        if response_content_type == "npy":
+            self.log.info("writing npy stream")
+            self.set_header('Content-Type', npyUtil.CONTENT_TYPE)
+            self.writeNpy(tuple(slices), item_type, chunks, fields=fields)
+            return
+
+        if response_content_type == "arrow":
+            self.log.info("writing arrow stream")
+            self.set_header('Content-Type', arrowUtil.CONTENT_TYPE)
+            self.writeArrow(schema, slices[0], itemSize, chunks, fields=fields,
+                result=result)
             return
             
-        if request_content_type == "binary":
+        if request_content_type in ("binary", "npy", "arrow"):
             #unable to return binary data
             self.log.info("requested binary response, but returning JSON instead")
             
@@ -1750,17 +3454,27 @@ class ValueHandler(BaseHandler):
         selfQuery = []
         if self.get_query_argument("select", default=''):
             selfQuery.append('select=' + self.get_query_argument("select"))
+        if self.get_query_argument("mask", default=''):
+            selfQuery.append('mask=' + self.get_query_argument("mask"))
         if self.get_query_argument("query", default=''):     
-            selfQuery.append('query=' + self.get_query_argument(
-                "select", default=''))
-
-        if values is not None:
+            selfQuery.append('query=' + self.get_query_argument("query"))
+        if fields is not None:
+            selfQuery.append('fields=' + ','.join(fields))
+        for name in ('reduce', 'axis', 'skipfill', 'level'):
+            if self.get_query_argument(name, default=''):
+                selfQuery.append(name + '=' + self.get_query_argument(name))
+
+        if count_only:
+            response['count'] = result.count
+        elif values is not None:
             response['value'] = values
         else:
             response['value'] = None
             
         if indexes is not None:
             response['index'] = indexes
+        if result is not None and result.next is not None:
+            response['cursor'] = result.cursor
 
         hrefs.append({
             'rel': 'self',
@@ -1775,47 +3489,58 @@ class ValueHandler(BaseHandler):
         response['hrefs'] = hrefs
 
         self.set_header('Content-Type', 'application/json')
-        self.write(json_encode(response))
+        self.writeJson(response)
 
+    @executorUtil.runInExecutor
     def post(self):
         self.baseHandler()
-         
-        body = None
-        try:
-            body = json_decode(self.request.body)
-        except ValueError as e:
-            msg = "JSON Parser Error: " + e.message
-            self.log.info(msg)
-            raise HTTPError(400, reason=msg)
-        self.log.info("type body: {}".format(type(body)))
+        request_content_type = self.getAcceptType()
 
-        if "points" not in body:
-            msg = "Bad Request: value post request without points in body"
-            self.log.info(msg)
-            raise HTTPError(400, reason=msg)
-        
-        #self.log.info("points type: {}".format(type(points)))
-        self.log.info("body type: {}".format(type(body)))
-        self.log.info("body keys: {}".format(list(body.keys())))
-        points = body['points']
-        
-        if type(points) != list:
-            msg = "Bad Request: expecting list of points, got: {}".format(type(points))
-            self.log.info(msg)
-            raise HTTPError(400, reason=msg)
+        points = None
+        body = b''.join(self.bodyChunks)
+        binary_points = self.getRequestContentType() == 'application/octet-stream'
+        if not binary_points:
+            try:
+                body = json_decode(body)
+            except ValueError as e:
+                msg = "JSON Parser Error: " + str(e)
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+
+            if type(body) != dict or ("points" not in body and "select" not in body and
+                    "mask" not in body):
+                msg = "Bad Request: value post request without points or select in body"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+
+            if "points" in body:
+                points = body['points']
+                if type(points) != list:
+                    msg = "Bad Request: expecting list of points, got: {}".format(type(points))
+                    self.log.info(msg)
+                    raise HTTPError(400, reason=msg)
+                if "select" in body or "mask" in body:
+                    msg = "Bad Request: can't use points with select or mask"
+                    self.log.info(msg)
+                    raise HTTPError(400, reason=msg)
 
         response = {}
         hrefs = []
         rootUUID = None
         item = None
         values = None
+        binary = False
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
-                item = db.getDatasetItemByUuid(self.reqUuid)
+                item = self.getDatasetItem(db)
+                item_type = item['type']
+                fields = self.getFieldsQueryParam(item_type)
+                if fields is not None:
+                    item_type = self.getFieldsType(item_type, fields)
                 shape = item['shape']
                 if shape['class'] == 'H5S_SCALAR':
                     msg = "Bad Request: point selection is not supported on scalar datasets"
@@ -1825,24 +3550,31 @@ class ValueHandler(BaseHandler):
                     msg = "Bad Request: point selection is not supported on Null Space datasets"
                     self.log.info(msg)
                     raise HTTPError(400, reason=msg)
-                
-                rank = len(shape['dims'])
 
-                for point in points:
-                    if rank == 1 and type(point) != int:
-                        msg = "Bad Request: elements of points should be int type for datasets of rank 1"
-                        self.log.info(msg)
-                        raise HTTPError(400, reason=msg)
-                    elif rank > 1 and type(point) != list:
-                        msg = "Bad Request: elements of points should be list type for datasets of rank >1"
+                dset = db.getDatasetObjByUuid(self.reqUuid)
+                if points is None and not binary_points:
+                    # select string and/or mask dataset, as for GET
+                    selection = self.getSelection(db, shape['dims'], body.get('select'),
+                        body.get('mask'))
+                    values = selection.read(dset, int(config.get('stream_buffer_size')), fields)
+                else:
+                    try:
+                        if binary_points:
+                            points = selectionUtil.getBinaryPoints(body, shape['dims'])
+                        else:
+                            points = selectionUtil.getPoints(points, shape['dims'])
+                    except ValueError as ve:
+                        msg = "Bad Request: " + str(ve)
                         self.log.info(msg)
                         raise HTTPError(400, reason=msg)
-                        if len(point) != rank:
-                            msg = "Bad Request: one or more points have a missing coordinate value"
-                            self.log.info(msg)
-                            raise HTTPError(400, reason=msg)
+                    values = selectionUtil.readPoints(dset, points, fields)
 
-                values = db.getDatasetPointSelectionByUuid(self.reqUuid, points)
+                if request_content_type in ("binary", "npy") and \
+                        h5json.getItemSize(item_type) != "H5T_VARIABLE":
+                    binary = True
+                elif item_type['class'] not in ('H5T_INTEGER', 'H5T_FLOAT'):
+                    values = db.bytesArrayToList(values)
+                # numeric arrays are encoded directly by writeJson
 
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
@@ -1850,6 +3582,10 @@ class ValueHandler(BaseHandler):
             raise HTTPError(status, reason=e.strerror)
 
         # got everything we need, put together the response
+
+        if binary:
+            self.writeArray(values, item_type, npy=(request_content_type == "npy"))
+            return
         
         response['value'] = values
 
@@ -1864,9 +3600,15 @@ class ValueHandler(BaseHandler):
         hrefs.append({'rel': 'home',  'href': self.getHref('')})
 
         self.set_header('Content-Type', 'application/json')
-        self.write(json_encode(response))
+        self.writeJson(response)
 
+    @executorUtil.runInExecutor
     def put(self):
+        if self.upload is not None:
+            # binary body, already written by data_received
+            self.finishBinaryUpload()
+            return
+
         self.baseHandler()
          
         points = None
@@ -1878,7 +3620,7 @@ class ValueHandler(BaseHandler):
         data = None
         
         try:
-            body = json_decode(self.request.body)
+            body = json_decode(b''.join(self.bodyChunks))
         except ValueError as e:
             try:
                 msg = "JSON Parser Error: " + e.message
@@ -1901,7 +3643,14 @@ class ValueHandler(BaseHandler):
             self.log.info(msg)
             raise HTTPError(400, reason=msg)  # missing data     
 
-        if "points" in body:
+        select = body.get('select')
+        mask = body.get('mask')
+        if select is not None or mask is not None:
+            if 'points' in body or 'start' in body or 'stop' in body or 'step' in body:
+                msg = "Bad Request: can't use select or mask with start/stop/step or points"
+                self.log.info(msg)
+                raise HTTPError(400, reason=msg)
+        elif "points" in body:
             points = body['points']
             if type(points) != list:
                 msg = "Bad Request: expecting list of points"
@@ -1926,11 +3675,11 @@ class ValueHandler(BaseHandler):
          
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'update')  # throws exception is unauthorized
-                item = db.getDatasetItemByUuid(self.reqUuid)
+                item = self.getDatasetItem(db)
                 item_type = item['type']
                
                 dims = None
@@ -1962,10 +3711,25 @@ class ValueHandler(BaseHandler):
                         msg = "Bad Request: Point selection can't be used with scalar datasets"
                         self.log.info(msg)
                         raise HTTPError(400, reason=msg)  # missing data
-                  
-                if points is not None:
+                    elif select is not None or mask is not None:
+                        msg = "Bad Request: select and mask can't be used with scalar datasets"
+                        self.log.info(msg)
+                        raise HTTPError(400, reason=msg)
+
+                if select is not None or mask is not None:
+                    selection = self.getSelection(db, dims, select, mask)
+                    slices = selection.getSlices()
+                    if slices is None:
+                        # index lists, unions and masks
+                        self.writeSelectionValues(db, selection, data, format=format)
+                    else:
+                        db.setDatasetValuesByUuid(self.reqUuid, data, slices, format=format)
+                    self.valuesChanged(db, boxes=selection.getBoxes())
+
+                elif points is not None:
                     # write point selection
-                    db.setDatasetValuesByPointSelection(self.reqUuid, data, points, format=format)
+                    points = self.writePointValues(db, dims, points, data, format=format)
+                    self.valuesChanged(db, points=points)
                      
                 else:
                     slices = None
@@ -1974,6 +3738,7 @@ class ValueHandler(BaseHandler):
                             dims, start, stop, step)
                     # todo - check that the types are compatible
                     db.setDatasetValuesByUuid(self.reqUuid, data, slices, format=format)
+                    self.valuesChanged(db, boxes=None if slices is None else [slices])
                      
                     
         except IOError as e:
@@ -1986,16 +3751,6 @@ class ValueHandler(BaseHandler):
 
 class AttributeHandler(BaseHandler):
 
-    # convert embedded list (list of lists) to tuples
-    def convertToTuple(self, data):
-        if type(data) == list or type(data) == tuple:
-            sublist = []
-            for e in data:
-                sublist.append(self.convertToTuple(e))
-            return tuple(sublist)
-        else:
-            return data
-
     def getRequestName(self):
         # request is in the form /(datasets|groups|datatypes)/<id>/attributes(/<name>),
         # return <name>
@@ -2041,6 +3796,7 @@ class AttributeHandler(BaseHandler):
 
         return col_name
 
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
          
@@ -2062,10 +3818,12 @@ class AttributeHandler(BaseHandler):
         marker = self.get_query_argument("Marker", None)
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                if self.isNotModified():
+                    return
                 if attr_name is not None:
                     item = db.getAttributeItem(col_name, self.reqUuid, attr_name)
                     items.append(item)
@@ -2100,7 +3858,12 @@ class AttributeHandler(BaseHandler):
             if not attr_name or typeItem['class'] == 'H5T_OPAQUE':
                 pass  # TODO - send data for H5T_OPAQUE's
             elif 'value' in item:
-                responseItem['value'] = item['value']
+                value = item['value']
+                if typeItem['class'] in ('H5T_INTEGER', 'H5T_FLOAT') and \
+                        item['shape']['class'] == 'H5S_SIMPLE':
+                    # numeric array, encoded directly by writeJson
+                    value = np.asarray(value, dtype=h5json.createDataType(typeItem))
+                responseItem['value'] = value
             else:
                 responseItem['value'] = None
             if attr_name is None:
@@ -2129,8 +3892,9 @@ class AttributeHandler(BaseHandler):
         response['hrefs'] = hrefs
 
         self.set_header('Content-Type', 'application/json')
-        self.write(json_encode(response))
+        self.writeJson(response)
 
+    @executorUtil.runInExecutor
     def put(self):
         self.baseHandler()
          
@@ -2198,9 +3962,9 @@ class AttributeHandler(BaseHandler):
             data = self.convertToTuple(value)
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'create')  # throws exception is unauthorized
                 attribute_exist = True
                 try:
@@ -2212,7 +3976,7 @@ class AttributeHandler(BaseHandler):
                     raise HTTPError(409, "Attribute already exist")
                 db.createAttribute(
                     col_name, self.reqUuid, attr_name, dims, datatype, data)
-                rootUUID = db.getUUIDByPath('/')
+                metaCache.invalidate(self.filePath, self.reqUuid)  # attributeCount
 
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
@@ -2240,6 +4004,7 @@ class AttributeHandler(BaseHandler):
         self.write(json_encode(response))
         self.set_status(201)  # resource created
 
+    @executorUtil.runInExecutor
     def delete(self):
         self.baseHandler()
          
@@ -2257,11 +4022,12 @@ class AttributeHandler(BaseHandler):
         rootUUID = None
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'delete')  # throws exception is unauthorized
                 db.deleteAttribute(col_name, self.reqUuid, attr_name)
+                metaCache.invalidate(self.filePath, self.reqUuid)  # attributeCount
 
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
@@ -2289,6 +4055,7 @@ class AttributeHandler(BaseHandler):
 
 class GroupHandler(BaseHandler):
 
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
         
@@ -2301,10 +4068,12 @@ class GroupHandler(BaseHandler):
         include_links = self.get_query_argument("include_links", 0)
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                if self.isNotModified():
+                    return
                 item = db.getGroupItemByUuid(self.reqUuid)
                 if include_links:
                     # TBD: add marker & limit options for pagination
@@ -2370,14 +4139,15 @@ class GroupHandler(BaseHandler):
         self.set_header('Content-Type', 'application/json')
         self.write(json_encode(response))
 
+    @executorUtil.runInExecutor
     def delete(self):
         self.baseHandler()
          
         self.isWritable(self.filePath)
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(self.reqUuid, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, self.reqUuid)
                 self.verifyAcl(acl, 'delete')  # throws exception is unauthorized
                 db.deleteObjectByUuid('group', self.reqUuid)
         except IOError as e:
@@ -2402,6 +4172,7 @@ class GroupHandler(BaseHandler):
 
 class GroupCollectionHandler(BaseHandler):
 
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
          
@@ -2423,10 +4194,12 @@ class GroupCollectionHandler(BaseHandler):
         hrefs = []
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(rootUUID, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, rootUUID)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                if self.isNotModified():
+                    return
                 items = db.getCollection("groups", marker, limit)
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
@@ -2447,6 +4220,7 @@ class GroupCollectionHandler(BaseHandler):
         self.set_header('Content-Type', 'application/json')
         self.write(json_encode(response))
 
+    @executorUtil.runInExecutor
     def post(self):
         self.baseHandler()
          
@@ -2482,9 +4256,9 @@ class GroupCollectionHandler(BaseHandler):
         self.isWritable(self.filePath)
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                current_user_acl = db.getAcl(rootUUID, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                current_user_acl = self.getAcl(db, rootUUID)
 
                 self.verifyAcl(current_user_acl, 'create')  # throws exception is unauthorized
                 if parent_group_uuid:
@@ -2547,6 +4321,7 @@ class GroupCollectionHandler(BaseHandler):
 
 class DatasetCollectionHandler(BaseHandler):
 
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
 
@@ -2568,10 +4343,12 @@ class DatasetCollectionHandler(BaseHandler):
         items = None
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(rootUUID, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, rootUUID)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                if self.isNotModified():
+                    return
                 items = db.getCollection("datasets", marker, limit)
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
@@ -2590,6 +4367,7 @@ class DatasetCollectionHandler(BaseHandler):
         self.set_header('Content-Type', 'application/json')
         self.write(json_encode(response))
 
+    @executorUtil.runInExecutor
     def post(self):
         self.baseHandler()
 
@@ -2696,13 +4474,13 @@ class DatasetCollectionHandler(BaseHandler):
             creationProps = body["creationProperties"]
         item = None
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(rootUUID, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, rootUUID)
                 self.verifyAcl(acl, 'create')  # throws exception is unauthorized
                 # verify the link perm as well
                 if group_uuid and group_uuid != rootUUID:
-                    acl = db.getAcl(group_uuid, self.userid)
+                    acl = self.getAcl(db, group_uuid)
                     self.verifyAcl(acl, 'create')  # throws exception is unauthorized
                 # verify the link name doesn't already exists
                 if group_uuid:
@@ -2759,6 +4537,7 @@ class DatasetCollectionHandler(BaseHandler):
 
 
 class TypeCollectionHandler(BaseHandler):
+    @executorUtil.runInExecutor
     def get(self):
         self.baseHandler()
          
@@ -2779,10 +4558,12 @@ class TypeCollectionHandler(BaseHandler):
 
         items = None
         try:
-            with Hdf5db(self.filePath) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(rootUUID, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=False) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, rootUUID)
                 self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                if self.isNotModified():
+                    return
                 items = db.getCollection("datatypes", marker, limit)
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
@@ -2804,6 +4585,7 @@ class TypeCollectionHandler(BaseHandler):
         self.set_header('Content-Type', 'application/json')
         self.write(json_encode(response))
 
+    @executorUtil.runInExecutor
     def post(self):
         self.baseHandler()
 
@@ -2848,9 +4630,9 @@ class TypeCollectionHandler(BaseHandler):
         rootUUID = None
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(rootUUID, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, rootUUID)
                 self.verifyAcl(acl, 'create')  # throws exception is unauthorized
                 if parent_group_uuid:
                     # verify no link already exists before creating a new group
@@ -2904,21 +4686,25 @@ class TypeCollectionHandler(BaseHandler):
 class RootHandler(BaseHandler):
      
     def getRootResponse(self, filePath):
+        """ Return the response for GET / and PUT /, or None if the client's
+            copy is current (see isNotModified).
+        """
         acl = None
-        # used by GET / and PUT /
+        modify = self.request.method != 'GET'
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(rootUUID, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log, modify=modify) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, rootUUID)
+                self.verifyAcl(acl, 'read')  # throws exception is unauthorized
+                if self.isNotModified():
+                    return None
 
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
             status = errNoToHttpStatus(e.errno)
             raise HTTPError(status, reason=e.strerror)
 
-        self.verifyAcl(acl, 'read')  # throws exception is unauthorized
-
         # generate response
         hrefs = []
          
@@ -2940,6 +4726,7 @@ class RootHandler(BaseHandler):
 
         return response
 
+    @executorUtil.runInExecutor
     def get(self):
          
         self.baseHandler()  
@@ -2956,12 +4743,15 @@ class RootHandler(BaseHandler):
                 # no user provied, just return 401 response
                 return
             raise e  # re-throw the exception
+        if response is None:
+            return  # not modified
 
         root_uuid = response['root']
  
         self.set_header('Content-Type', 'application/json')
         self.write(json_encode(response))
 
+    @executorUtil.runInExecutor
     def put(self):
         self.baseHandler(checkExists=False)     
         new_domain_policy = config.get("new_domain_policy")    
@@ -3021,6 +4811,7 @@ class RootHandler(BaseHandler):
         self.write(json_encode(response))
         self.set_status(201)  # resource created
 
+    @executorUtil.runInExecutor
     def delete(self):
         self.baseHandler()
          
@@ -3045,9 +4836,9 @@ class RootHandler(BaseHandler):
             raise HTTPError(403, reason=msg)  # Forbidden - TOC file
 
         try:
-            with Hdf5db(self.filePath, app_logger=self.log) as db:
-                rootUUID = db.getUUIDByPath('/')
-                acl = db.getAcl(rootUUID, self.userid)
+            with dbPool.getDb(self.filePath, app_logger=self.log) as db:
+                rootUUID = self.getRootUUID(db)
+                acl = self.getAcl(db, rootUUID)
                 self.verifyAcl(acl, 'delete')  # throws exception is unauthorized
         except IOError as e:
             self.log.info("IOError: " + str(e.errno) + " " + e.strerror)
@@ -3061,13 +4852,18 @@ class RootHandler(BaseHandler):
             # after toc creation
             self.log.warn("IOError removing toc entry")
 
+        # close any pooled handle before the file goes away
+        dbPool.invalidate(self.filePath)
         try:
             os.remove(self.filePath)
+            sidecarUtil.remove(self.filePath)
         except IOError as ioe:
             self.log.info(
                 "IOError deleting HDF5 file: " + str(ioe.errno) + " " + ioe.strerror)
             raise HTTPError(
                 500, "Unexpected error: unable to delete collection")
+        finally:
+            domainCache.invalidate(self.filePath)
 
 
 class InfoHandler(RequestHandler):
@@ -3111,6 +4907,89 @@ class InfoHandler(RequestHandler):
             self.write(json_encode(response))
 
 
+class MetricsHandler(RequestHandler):
+
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.write(metricsUtil.render())
+
+
+def logRequest(handler):
+    """ Application log_function - record metrics for the request and write
+        the access log line (as tornado does by default).
+    """
+    status = handler.get_status()
+    request = handler.request
+    request_time = request.request_time()
+    bytes_in = request.headers.get('Content-Length')
+    try:
+        bytes_in = int(bytes_in) if bytes_in else len(request.body)
+    except ValueError:
+        bytes_in = 0
+    metricsUtil.recordRequest(handler.__class__.__name__, request.method,
+        status, request_time, bytes_in, getattr(handler, 'bytesOut', 0))
+
+    if status < 400:
+        log_method = tornado.log.access_log.info
+    elif status < 500:
+        log_method = tornado.log.access_log.warning
+    else:
+        log_method = tornado.log.access_log.error
+    log_method("%d %s %s (%s) %.2fms", status, request.method, request.uri,
+        request.remote_ip, 1000.0 * request_time)
+
+
+def setLogLevel(log, log_level):
+    # log levels: ERROR, WARNING, INFO, DEBUG, or NOTSET
+    if log_level == "ERROR":
+        print("Setting log level to: ERROR")
+        log.setLevel(logging.ERROR)
+    elif log_level == "WARNING":
+        print("Setting log level to: WARNING")
+        log.setLevel(logging.WARNING)
+    elif log_level == "INFO":
+        print("Setting log level to: INFO")
+        log.setLevel(logging.INFO)
+    elif log_level == "DEBUG":
+        print("Setting log level to: DEBUG")
+        log.setLevel(logging.DEBUG)
+    else:
+        print("No logging!")
+        log.setLevel(logging.NOTSET)
+
+
+def sighup_handler(sig, frame):
+    # re-read config_file, only the options that can be changed live are used
+    log = logging.getLogger("h5serv")
+    log.warning('Caught signal: %s, reloading config', sig)
+    changed = config.reload()
+    if "log_level" in changed:
+        setLogLevel(log, config.get("log_level"))
+
+
+def parent_sighup_handler(pid_read, sig, frame):
+    # the parent of the worker processes serves no requests, pass it on
+    log = logging.getLogger("h5serv")
+    log.warning('Caught signal: %s, forwarding to worker processes', sig)
+    try:
+        data = os.read(pid_read, 65536)
+    except OSError:
+        data = b''  # no workers started since the last signal
+    for line in data.decode('ascii').splitlines():
+        worker_task_id, pid = line.split()
+        worker_pids[worker_task_id] = int(pid)  # replaces a restarted worker
+    for pid in worker_pids.values():
+        try:
+            os.kill(pid, sig)
+        except OSError as e:
+            log.info("unable to signal worker process " + str(pid) + ": " + str(e))
+
+
+worker_pids = {}  # task id to pid of the worker processes, in the parent
+http_servers = []  # set up in main, stopped by shutdown
+shutting_down = False
+
+
 def sig_handler(sig, frame):
     log = logging.getLogger("h5serv")
     log.warning('Caught signal: %s', sig)
@@ -3118,40 +4997,59 @@ def sig_handler(sig, frame):
 
 
 def shutdown():
+    global shutting_down
     log = logging.getLogger("h5serv")
+    if shutting_down:
+        return
+    shutting_down = True
     MAX_WAIT_SECONDS_BEFORE_SHUTDOWN = 2
     log.info('Stopping http server')
+    for server in http_servers:
+        server.stop()  # stop accepting connections
 
-    log.info(
-        'Will shutdown in %s seconds ...', MAX_WAIT_SECONDS_BEFORE_SHUTDOWN)
-    io_loop = tornado.ioloop.IOLoop.instance()
-
-    deadline = time.time() + MAX_WAIT_SECONDS_BEFORE_SHUTDOWN
+    io_loop = tornado.ioloop.IOLoop.current()
 
-    def stop_loop():
+    def stop_loop(deadline):
         now = time.time()
         if now < deadline:
-            io_loop.add_timeout(now + 1, stop_loop)
+            io_loop.add_timeout(now + 1, stop_loop, deadline)
         else:
             io_loop.stop()
             log.info('Shutdown')
-    stop_loop()
 
-    log.info("closing db")
+    def close():
+        # in-flight requests may need the IOLoop to finish (e.g. to flush a
+        # streamed response), so wait for them on this thread
+        log.info("closing db")
+        executorUtil.shutdown()
+        reduceUtil.shutdown()
+        dbPool.closeAll()
+        log.info(
+            'Will shutdown in %s seconds ...', MAX_WAIT_SECONDS_BEFORE_SHUTDOWN)
+        for server in http_servers:
+            io_loop.add_callback(server.close_all_connections)
+        io_loop.add_callback(stop_loop, time.time() + MAX_WAIT_SECONDS_BEFORE_SHUTDOWN)
+
+    thread = threading.Thread(target=close, name="h5serv-shutdown")
+    thread.daemon = True
+    thread.start()
+
+
+def submitBackground(func):
+    # background work isn't started once the server is shutting down
+    if not shutting_down:
+        executorUtil.submit(func)
 
 
 def make_app():
     static_url = config.get('static_url')
     static_path = config.get('static_path')
     settings = {} 
-    config_debug = config.get('debug')
-    if type(config_debug) is str:
-        if config_debug[0] in ('T', 't'):
-            settings["debug"] = True
-        else:
-            settings["debug"] = False
-    else:
-        settings["debug"] = config_debug
+    settings["debug"] = config.get('debug')
+    settings["log_function"] = logRequest
+    if int(config.get('workers')) > 1:
+        # autoreload (enabled by debug) doesn't work with forked processes
+        settings["autoreload"] = False
      
     favicon_path = "favicon.ico"
     print("favicon_path:", favicon_path)
@@ -3165,6 +5063,10 @@ def make_app():
         url(r"/datasets/.*/attributes/.*", AttributeHandler),
         url(r"/datasets/.*/acls/.*", AclHandler),
         url(r"/datasets/.*/acls", AclHandler),
+        url(r"/datasets/.*/indexes/.*", IndexHandler),
+        url(r"/datasets/.*/indexes", IndexHandler),
+        url(r"/datasets/.*/stats", StatsHandler),
+        url(r"/datasets/.*/pyramid", PyramidHandler),
         url(r"/groups/.*/attributes/.*", AttributeHandler),
         url(r"/groups/.*/acls/.*", AclHandler),
         url(r"/groups/.*/acls", AclHandler),
@@ -3192,6 +5094,7 @@ def make_app():
         url(r"/groups\?.*", GroupCollectionHandler),
         url(r"/groups", GroupCollectionHandler),
         url(r"/info", InfoHandler),
+        url(r"/metrics", MetricsHandler),
         url(static_url, tornado.web.StaticFileHandler, {'path': static_path}),
         url(r"/(favicon\.ico)", tornado.web.StaticFileHandler, {'path': favicon_path}),
         url(r"/acls/.*", AclHandler),
@@ -3243,6 +5146,9 @@ def periodicCallback():
     while not event_queue.empty():
         item = event_queue.get()
         log.info("process_queue, got: %s", item)
+        # file was created or removed out of process, drop any pooled handle
+        dbPool.invalidate(item)
+        domainCache.invalidate(item)
         # just add file events for now
         updateToc(item)
     
@@ -3283,35 +5189,13 @@ def main():
     log.addHandler(handler)
     log.propagate = False  # otherwise, we'll get repeated lines
     
-    password_uri = "none"
-    x = "password_uri"
-    if x.upper() in os.environ:
-        password_uri = os.environ[x.upper()]
     password_uri = config.get("password_uri")
     print("password_uri config:", password_uri)   
     
-    # log levels: ERROR, WARNING, INFO, DEBUG, or NOTSET
-    if not log_level or log_level == "NOTSET":
-        log.setLevel(logging.NOTSET)
-    if log_level == "ERROR":
-        print("Setting log level to: ERROR")
-        log.setLevel(logging.ERROR)
-    elif log_level == "WARNING":
-        print("Setting log level to: WARNING")
-        log.setLevel(logging.WARNING)
-    elif log_level == "INFO":
-        print("Setting log level to: INFO")
-        log.setLevel(logging.INFO)
-    elif log_level == "DEBUG":
-        print("Setting log level to: DEBUG")
-        log.setLevel(logging.DEBUG)
-    else:
-        print("No logging!")
-        log.setLevel(logging.NOTSET)  
+    setLogLevel(log, log_level)
     
     log.info("log test")
     
-    app = make_app()
     domain = config.get("domain")
     print("domain:", domain)
     
@@ -3326,6 +5210,52 @@ def main():
     if ssl_port:
         print("ssl_port:", ssl_port)
     
+    #
+    # Fork worker processes if requested.  Each worker binds its own listening
+    # socket with SO_REUSEPORT and the kernel distributes connections.
+    # This must happen before any IOLoop or thread is created.
+    #
+    workers = int(config.get('workers'))
+    if workers > 1 and (os.name == 'nt' or not hasattr(socket, "SO_REUSEPORT")):
+        print("workers config not supported on this platform, using one process")
+        workers = 1
+    task_id = None
+    if workers > 1:
+        print("Starting", workers, "worker processes")
+        parent_pid = os.getpid()
+        # workers send "<task id> <pid>" to the parent, which forwards SIGHUP
+        pid_read, pid_write = os.pipe()
+        os.set_blocking(pid_read, False)
+        signal.signal(signal.SIGHUP,
+            lambda sig, frame: parent_sighup_handler(pid_read, sig, frame))
+        # the workers share their metrics and the file versions here
+        shared_dir = tempfile.mkdtemp(prefix='h5serv-workers-')
+        atexit.register(lambda: os.getpid() == parent_pid and
+            shutil.rmtree(shared_dir, ignore_errors=True))
+        # so the parent runs atexit, the workers stop when it has gone
+        signal.signal(signal.SIGTERM, lambda sig, frame: sys.exit(0))
+        task_id = tornado.process.fork_processes(workers)
+        metricsUtil.setWorker(task_id, shared_dir)
+        signal.signal(signal.SIGHUP, sighup_handler)
+        os.close(pid_read)
+        os.write(pid_write, to_bytes(str(task_id) + " " + str(os.getpid()) + "\n"))
+        os.close(pid_write)
+        log.info("worker process " + str(task_id) + " started, pid: " + str(os.getpid()))
+        # files may be updated by the other workers, so don't hold them open
+        dbPool.enableProcessLocking(shared_dir)
+        # stop if the parent process has gone away
+        def checkParent():
+            if os.getppid() != parent_pid:
+                log.warning("parent process exited, shutting down")
+                parent_check.stop()
+                shutdown()
+        parent_check = tornado.ioloop.PeriodicCallback(checkParent, 1000)
+        parent_check.start()
+    elif hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, sighup_handler)
+
+    app = make_app()
+    
     #
     # Setup listener for changes in the file system
     #
@@ -3334,10 +5264,21 @@ def main():
     event_queue = Queue()
     # implemented in h5watchdog.py
     background_timeout = int(config.get("background_timeout"))
+    if task_id:
+        # just the first worker process updates the TOC
+        background_timeout = 0
     if background_timeout:
         print("Setting watchdog on: ", data_path)
         h5observe(data_path, event_queue)
-        tornado.ioloop.PeriodicCallback(periodicCallback, 1000).start()
+        # TOC updates do HDF5 I/O, so run them on the executor
+        tornado.ioloop.PeriodicCallback(
+            lambda: submitBackground(periodicCallback), 1000).start()
+
+    # close pooled HDF5 handles that have been idle for a while
+    db_pool_idle_timeout = float(config.get("db_pool_idle_timeout"))
+    if db_pool_idle_timeout > 0:
+        tornado.ioloop.PeriodicCallback(
+            lambda: submitBackground(dbPool.closeIdle), db_pool_idle_timeout * 500).start()
         
     # 
     # Insantiate auth class
@@ -3349,16 +5290,25 @@ def main():
         ssl_cert_pwd = config.get('ssl_cert_pwd')
         ssl_ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
         ssl_ctx.load_cert_chain(ssl_cert, keyfile=ssl_key, password=ssl_cert_pwd)
-        ssl_server = tornado.httpserver.HTTPServer(app, ssl_options=ssl_ctx)
-        ssl_server.listen(ssl_port)
+        ssl_server = tornado.httpserver.HTTPServer(app, ssl_options=ssl_ctx,
+            decompress_request=True)
+        http_servers.append(ssl_server)
+        ssl_server.add_sockets(
+            tornado.netutil.bind_sockets(ssl_port, reuse_port=(workers > 1)))
         msg = "Running SSL on port: " + str(ssl_port) + " (SSL)"
     else:
-        server = tornado.httpserver.HTTPServer(app, xheaders=True)
+        server = tornado.httpserver.HTTPServer(app, xheaders=True,
+            decompress_request=True)
+        http_servers.append(server)
         port = int(config.get('port'))
-        server.listen(port)
+        server.add_sockets(
+            tornado.netutil.bind_sockets(port, reuse_port=(workers > 1)))
         msg = "Starting event loop on port: " + str(port)
         
 
+    metricsUtil.startLagMonitor()
+    metricsUtil.startSnapshots()
+
     signal.signal(signal.SIGTERM, sig_handler)
     signal.signal(signal.SIGINT, sig_handler)
     log.info("INITIALIZING...")
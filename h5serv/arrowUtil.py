@@ -0,0 +1,165 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Apache Arrow IPC stream (application/vnd.apache.arrow.stream) responses.
+
+ The rows of a one dimensional dataset are returned as a stream of record
+ batches with a column for each field of a compound type (or a single
+ 'value' column for other types), and for query results an 'index' column
+ with the index of each row.  The schema is derived from the dataset type,
+ so each batch can be encoded and sent as it is read.
+
+ Requires the pyarrow package (optional).
+"""
+
+import numpy as np
+import h5py
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None  # optional, pip install pyarrow
+
+CONTENT_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+def isAvailable():
+    return pa is not None
+
+
+def getArrowType(dtype):
+    """ Return the Arrow type for values of the numpy dtype.  Raises
+        TypeError if the type can't be represented (e.g. references).
+    """
+    if dtype.names is not None:
+        return pa.struct([(name, getArrowType(dtype.fields[name][0]))
+            for name in dtype.names])
+    if dtype.subdtype is not None:
+        # array type - nested fixed size lists
+        base, dims = dtype.subdtype
+        arrowType = getArrowType(base)
+        for dim in reversed(dims):
+            arrowType = pa.list_(arrowType, dim)
+        return arrowType
+    if dtype.kind in ('S', 'U'):
+        return pa.string()
+    if dtype.kind == 'O':
+        if h5py.check_string_dtype(dtype) is not None:
+            return pa.string()
+        base = h5py.check_vlen_dtype(dtype)
+        if base is not None:
+            return pa.list_(getArrowType(base))
+        raise TypeError("Arrow output is not supported for this type")
+    if dtype.kind == 'V':
+        return pa.binary(dtype.itemsize)  # opaque
+    if dtype.kind in 'biuf':
+        return pa.from_numpy_dtype(dtype.newbyteorder('='))
+    raise TypeError("Arrow output is not supported for this type")
+
+
+def getSchema(dtype, index=False):
+    """ Return the Arrow schema for rows of a dataset of the given dtype,
+        with an 'index' column first if index is True.
+    """
+    fields = []
+    if index:
+        fields.append(('index', pa.int64()))
+    if dtype.names is not None:
+        for name in dtype.names:
+            fields.append((name, getArrowType(dtype.fields[name][0])))
+    else:
+        fields.append(('value', getArrowType(dtype)))
+    return pa.schema(fields)
+
+
+def toArrowArray(values, arrowType):
+    """ Return the numpy array values as an Arrow array of arrowType (from
+        getArrowType).
+    """
+    if pa.types.is_struct(arrowType):
+        children = [toArrowArray(values[field.name], field.type) for field in arrowType]
+        return pa.StructArray.from_arrays(children, fields=list(arrowType))
+    if pa.types.is_fixed_size_list(arrowType):
+        flat = values.reshape((-1,) + values.shape[2:])
+        child = toArrowArray(flat, arrowType.value_type)
+        return pa.FixedSizeListArray.from_arrays(child, arrowType.list_size)
+    kind = values.dtype.kind
+    if kind == 'O':
+        if pa.types.is_string(arrowType):
+            items = [v.decode('utf-8') if isinstance(v, bytes) else v for v in values]
+        else:
+            items = [np.asarray(v, dtype=v.dtype.newbyteorder('=')) for v in values]
+        return pa.array(items, type=arrowType)
+    if kind == 'S':
+        return pa.array(values).cast(arrowType)
+    if kind == 'V':
+        return pa.array(values.tolist(), type=arrowType)
+    if not values.dtype.isnative:
+        values = values.astype(values.dtype.newbyteorder('='))
+    return pa.array(values, type=arrowType)
+
+
+def getRecordBatch(schema, rows, indexes=None):
+    """ Return the rows (numpy array) of a dataset as a record batch with
+        the given schema (from getSchema).
+    """
+    arrays = []
+    fields = list(schema)
+    if indexes is not None:
+        arrays.append(pa.array(np.asarray(indexes, dtype=np.int64)))
+        fields = fields[1:]
+    for field in fields:
+        if rows.dtype.names is not None:
+            arrays.append(toArrowArray(rows[field.name], field.type))
+        else:
+            arrays.append(toArrowArray(rows, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _Sink(object):
+    """ File object collecting the output of an Arrow stream writer """
+    def __init__(self):
+        self.pieces = []
+        self.closed = False
+
+    def write(self, data):
+        self.pieces.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def getvalue(self):
+        data = b''.join(self.pieces)
+        self.pieces = []
+        return data
+
+
+class StreamWriter(object):
+    """ Encodes record batches as an Arrow IPC stream.  write returns the
+        bytes for a batch (preceded by the schema for the first one), and
+        close the end of the stream.
+    """
+    def __init__(self, schema):
+        self.sink = _Sink()
+        self.writer = pa.ipc.new_stream(self.sink, schema)
+
+    def write(self, batch):
+        self.writer.write_batch(batch)
+        return self.sink.getvalue()
+
+    def close(self):
+        self.writer.close()
+        return self.sink.getvalue()
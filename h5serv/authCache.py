@@ -0,0 +1,91 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Bounded LRU cache with expiring entries used by the AuthClient classes for
+ user lookups and validated credentials.
+
+ Entries expire 'auth_cache_timeout' seconds after they were added, and at
+ most 'auth_cache_size' entries are kept (least recently used are dropped
+ first).  None can be cached (e.g. for an unknown user), so get() returns
+ NOT_FOUND rather than None on a miss.
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import h5serv.config as config
+from h5serv.passwordUtil import to_bytes
+
+NOT_FOUND = object()
+
+
+def getCredentialKey(user_name, password):
+    """ Return cache key for the credentials of a basic auth header, so
+        passwords are not kept in memory.
+    """
+    return hashlib.sha256(to_bytes(user_name) + b':' + to_bytes(password)).digest()
+
+
+class AuthCache(object):
+
+    def __init__(self, max_items=None, timeout=None):
+        self.max_items = max_items
+        self.timeout = timeout
+        self.items = OrderedDict()  # key -> (expire time, value), lru first
+        self.lock = threading.Lock()
+
+    def getMaxItems(self):
+        if self.max_items is not None:
+            return self.max_items
+        return int(config.get('auth_cache_size'))
+
+    def getTimeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        return float(config.get('auth_cache_timeout'))
+
+    def get(self, key):
+        """ Return cached value for key, or NOT_FOUND if the key is not in the
+            cache or has expired.
+        """
+        with self.lock:
+            item = self.items.pop(key, None)
+            if item is None:
+                return NOT_FOUND
+            if item[0] < time.time():
+                return NOT_FOUND  # expired
+            self.items[key] = item  # move to most recently used position
+            return item[1]
+
+    def put(self, key, value):
+        max_items = self.getMaxItems()
+        timeout = self.getTimeout()
+        if max_items <= 0 or timeout <= 0:
+            return
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = (time.time() + timeout, value)
+            while len(self.items) > max_items:
+                self.items.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def getCount(self):
+        return len(self.items)
@@ -15,16 +15,16 @@ import six
 if six.PY3:
     unicode = str
     
-import os.path as op
-import time
+import os
+import threading
 import logging
 import h5py
 
 from tornado.web import HTTPError
 
 from h5serv.passwordUtil import encrypt_pwd, to_string
+from h5serv.authCache import AuthCache, NOT_FOUND, getCredentialKey
 
-cache_expire_time = 10.0  # ten seconds
 
 class AuthClient(object):
 
@@ -32,8 +32,12 @@ class AuthClient(object):
         self.log = logging.getLogger("h5serv")
         self.log.info("AuthFile class init(" + filepath + ")")
         self.filepath = filepath
-        self.username_cache = {}
-        self.userid_cache = {}
+        self.user_cache = AuthCache()  # user name -> password file data (None for no such user)
+        self.credential_cache = AuthCache()  # credential key -> userid
+        self.user_names = {}  # userid -> user name
+        self.user_names_stamp = None  # file stamp user_names was built for
+        self.file_stamp = None
+        self.lock = threading.Lock()
          
 
     """
@@ -41,56 +45,55 @@ class AuthClient(object):
     """
 
 
+    def checkFile(self):
+        """
+        checkFile: verify the password file exists and clear the caches if it
+          has been modified since the last call.  Returns the file stamp.
+        """
+        try:
+            st = os.stat(self.filepath)
+        except OSError:
+            self.log.error("password file is missing")
+            raise HTTPError(500, message="bad configuration")
+        stamp = (st.st_ino, st.st_size, st.st_mtime)
+        if stamp != self.file_stamp:
+            with self.lock:
+                if stamp != self.file_stamp:
+                    if self.file_stamp is not None:
+                        self.log.info("Auth - password file modified, clearing cache")
+                    self.user_cache.clear()
+                    self.credential_cache.clear()
+                    self.file_stamp = stamp
+        return stamp
+
+    def openFile(self):
+        if not h5py.is_hdf5(self.filepath):
+            self.log.error("password file is invalid")
+            raise HTTPError(500, message="bad configuration")
+        return h5py.File(self.filepath, 'r')
+
+
     def getUserInfo(self, user_name):
         """
         getUserInfo: return user data
         """
-         
-        userid = None
 
         if not user_name:
             return None
             
-        self.log.info("Auth.getUserInfo: [" + to_string(user_name) + "]")
+        self.checkFile()
+        data = self.user_cache.get(user_name)
+        if data is not NOT_FOUND:
+            return data
         
-        if user_name in self.username_cache:
-            item = self.username_cache[user_name]
-            if item['timestamp'] - time.time() > cache_expire_time:
-                self.log.info("Auth-cache expired")
-                # delete the entry and re-fetch below
-                del self.username_cache[user_name]
-            else:
-                self.log.info("Auth-got cache value")
-                data = item['data']
-                return data
-                    
-       
-        # verify file exists and is writable
-        if not op.isfile(self.filepath):
-            self.log.error("password file is missing")
-            raise HTTPError(500, message="bad configuration")
-
-        if not h5py.is_hdf5(self.filepath):
-            self.log.error("password file is invalid")
-            raise HTTPError(500, message="bad configuration")
-
-        with h5py.File(self.filepath, 'r') as f:
-            if user_name not in f.attrs:
-                return None
-            data = f.attrs[user_name]
+        self.log.info("Auth.getUserInfo: [" + to_string(user_name) + "]")
+        with self.openFile() as f:
+            data = None
+            if user_name in f.attrs:
+                data = f.attrs[user_name]
             
-        # add to cache 
-        self.log.info("Auth - added to cache")
-        item = {}
-        timestamp = time.time()
-        item['timestamp'] = timestamp
-        item['data'] = data
-        self.username_cache[user_name] = item
-        item = {}
-        item['timestamp'] = timestamp
-        item['username'] = user_name
-        userid = data['userid']
-        self.userid_cache[userid] = item
+        # add to cache, unknown users as well
+        self.user_cache.put(user_name, data)
         
         return data
 
@@ -99,7 +102,6 @@ class AuthClient(object):
         """
         getUserId: get id for given user name
         """
-        self.log.info("Auth.getUserId: [" + user_name + "]")
         data = self.getUserInfo(user_name)
         userid = None
         if data is not None:
@@ -110,45 +112,22 @@ class AuthClient(object):
     def getUserName(self, userid):
         """
         getUserName: return user name for given user id
-        #todo: may need to be optimized to support large number of users
+          Uses a userid to user name index that is re-built when the password
+          file is modified.
         """
 
-        self.log.info("Auth.getUserName: [" + str(userid) + "]")
-        
-        if userid in self.userid_cache:
-            item = self.userid_cache[userid]
-            if item['timestamp'] - time.time() > cache_expire_time:
-                # delete the entry and re-fetch below
-                self.log.info("Auth-cache expired")
-                del self.userid_cache[userid]
-            else:
-                self.log.info("Auth-got cache value")
-                username = item['username']
-                return to_string(username)
-         
-        # verify file exists and is writable
-        if not op.isfile(self.filepath):
-            self.log.error("password file is missing")
-            raise HTTPError(500, message="bad configuration")
-
-        if not h5py.is_hdf5(self.filepath):
-            self.log.error("password file is invalid")
-            raise HTTPError(500, message="bad configuration")
+        stamp = self.checkFile()
+        if self.user_names_stamp != stamp:
+            self.log.info("Auth - building user name index")
+            user_names = {}
+            with self.openFile() as f:
+                for attr_name in f.attrs:
+                    attr = f.attrs[attr_name]
+                    user_names[int(attr['userid'])] = to_string(attr_name)
+            self.user_names = user_names
+            self.user_names_stamp = stamp
 
-        user_name = None
-        with h5py.File(self.filepath, 'r') as f:
-            for attr_name in f.attrs:
-                attr = f.attrs[attr_name]
-                if attr['userid'] == userid:
-                    user_name = to_string(attr_name)
-        
-        self.log.info("Auth-add to cachecache")
-        item = {}
-        item['timestamp'] = time.time()
-        item['username'] = user_name
-        self.userid_cache[userid] = item
-        
-        return user_name
+        return self.user_names.get(userid)
 
 
     def validateUserPassword(self, user_name, password):
@@ -163,6 +142,13 @@ class AuthClient(object):
         if not password:
             self.log.info('isPasswordValid - null password')
             raise HTTPError(401, message="provide  password")
+
+        self.checkFile()
+        credential_key = getCredentialKey(user_name, password)
+        userid = self.credential_cache.get(credential_key)
+        if userid is not NOT_FOUND:
+            return userid
+
         data = self.getUserInfo(user_name)
 
         if data is None:
@@ -173,6 +159,7 @@ class AuthClient(object):
         if data['pwd'] == encrypt_pwd(password):
             self.log.info("user  password validated")
             userid = data['userid']
+            self.credential_cache.put(credential_key, userid)
         else:
             self.log.info("user password is not valid")
             raise HTTPError(401, message="invalid user name/password")
@@ -15,9 +15,6 @@ import six
 if six.PY3:
     unicode = str
     
-import os.path as op
-import time
-import hashlib
 import logging
 from pymongo import MongoClient
 
@@ -25,8 +22,8 @@ from tornado.web import HTTPError
 
 import h5serv.config as config
 from h5serv.passwordUtil import encrypt_pwd, to_string, to_bytes
+from h5serv.authCache import AuthCache, NOT_FOUND, getCredentialKey
 
-cache_expire_time = 10.0  # ten seconds
 
 class AuthClient(object):
 
@@ -36,8 +33,9 @@ class AuthClient(object):
         self.client = MongoClient(mongouri)
         db_name = config.get('mongo_dbname')
         self.db = self.client[db_name]
-        self.username_cache = {}
-        self.userid_cache = {}
+        self.username_cache = AuthCache()  # user name -> user document (None for no such user)
+        self.userid_cache = AuthCache()  # userid -> user name
+        self.credential_cache = AuthCache()  # credential key -> userid
          
 
     """
@@ -49,45 +47,23 @@ class AuthClient(object):
         """
         getUserInfo: return user data
         """
-         
-        userid = None
 
         if not user_name:
             return None
             
-        self.log.info("Auth.getUserInfo: [" + to_string(user_name) + "]")
-        
-        if user_name in self.username_cache:
-            item = self.username_cache[user_name]
-            if item['timestamp'] - time.time() > cache_expire_time:
-                self.log.info("Auth-cache expired")
-                # delete the entry and re-fetch below
-                del self.username_cache[user_name]
-            else:
-                self.log.info("Auth-got cache value")
-                data = item['data']
-                return data
+        data = self.username_cache.get(user_name)
+        if data is not NOT_FOUND:
+            return data
                     
         # mongodb lookup
-        self.log.info("mongo query")
+        self.log.info("Auth.getUserInfo: [" + to_string(user_name) + "] mongo query")
         users = self.db["users"]
         data = users.find_one({"username": to_string(user_name)})
          
-        if data is None:
-            return None
-            
-        # add to cache 
-        self.log.info("Auth - added to cache")
-        item = {}
-        timestamp = time.time()
-        item['timestamp'] = timestamp
-        item['data'] = data
-        self.username_cache[user_name] = item
-        item = {}
-        item['timestamp'] = timestamp
-        item['username'] = user_name
-        userid = data['userid']
-        self.userid_cache[userid] = item
+        # add to cache, unknown users as well
+        self.username_cache.put(user_name, data)
+        if data is not None:
+            self.userid_cache.put(data['userid'], to_string(user_name))
         
         return data
 
@@ -96,7 +72,6 @@ class AuthClient(object):
         """
         getUserId: get id for given user name
         """
-        self.log.info("Auth.getUserId: [" + user_name + "]")
         data = self.getUserInfo(user_name)
         userid = None
         if data is not None:
@@ -107,35 +82,21 @@ class AuthClient(object):
     def getUserName(self, userid):
         """
         getUserName: return user name for given user id
-        #todo: may need to be optimized to support large number of users
         """
 
-        self.log.info("Auth.getUserName: [" + str(userid) + "]")
-        
-        if userid in self.userid_cache:
-            item = self.userid_cache[userid]
-            if item['timestamp'] - time.time() > cache_expire_time:
-                # delete the entry and re-fetch below
-                self.log.info("Auth-cache expired")
-                del self.userid_cache[userid]
-            else:
-                self.log.info("Auth-got cache value")
-                username = item['username']
-                return to_string(username)
-        
+        user_name = self.userid_cache.get(userid)
+        if user_name is not NOT_FOUND:
+            return user_name
         
         # mongodb lookup
+        self.log.info("Auth.getUserName: [" + str(userid) + "] mongo query")
         users = self.db["users"]
         data = users.find_one({"userid": userid})
-        if data is None:
-            return None
-        user_name = data["username"]
+        user_name = None
+        if data is not None:
+            user_name = to_string(data["username"])
              
-        self.log.info("Auth-add to cachecache")
-        item = {}
-        item['timestamp'] = time.time()
-        item['username'] = user_name
-        self.userid_cache[userid] = item
+        self.userid_cache.put(userid, user_name)
         
         return user_name
 
@@ -152,6 +113,12 @@ class AuthClient(object):
         if not password:
             self.log.info('isPasswordValid - null password')
             raise HTTPError(401, message="provide  password")
+
+        credential_key = getCredentialKey(user_name, password)
+        userid = self.credential_cache.get(credential_key)
+        if userid is not NOT_FOUND:
+            return userid
+
         data = self.getUserInfo(user_name)
 
         if data is None:
@@ -163,6 +130,7 @@ class AuthClient(object):
         if saved_password == encrypt_pwd(password):
             self.log.info("user  password validated")
             userid = data['userid']
+            self.credential_cache.put(credential_key, userid)
         else:
             self.log.info("user password is not valid")
             raise HTTPError(401, message="invalid user name/password")
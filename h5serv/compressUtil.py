@@ -0,0 +1,98 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Response compression (Content-Encoding gzip or deflate).
+
+ Responses are compressed by the request handler as they are written (rather
+ than by Tornado's compress_response output transform, which runs on the
+ IOLoop), so for handler methods run on the executor the compression is done
+ on the worker thread.  See BaseHandler.write in app.py.
+"""
+
+import zlib
+
+import h5serv.config as config
+
+ENCODINGS = ('gzip', 'deflate')  # in order of preference
+
+
+def getEncoding(accept_encoding):
+    """ Return the content encoding to use for a response given the
+        Accept-Encoding request header, or None if the response should not
+        be compressed.
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(','):
+        fields = item.strip().split(';')
+        name = fields[0].strip().lower()
+        q = 1.0
+        for param in fields[1:]:
+            key, _, val = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+def isCompressibleType(content_type):
+    """ Return True if responses of the given Content-Type are compressed,
+        per the compress_types config.  Entries ending with '/*' match any
+        subtype, e.g. 'text/*'.
+    """
+    if not content_type:
+        return False
+    mime_type = content_type.split(';')[0].strip().lower()
+    for compress_type in config.get('compress_types'):
+        compress_type = compress_type.lower()
+        if compress_type.endswith('/*'):
+            if mime_type.startswith(compress_type[:-1]):
+                return True
+        elif mime_type == compress_type:
+            return True
+    return False
+
+
+class Compressor(object):
+    """ Streaming compressor for a response body.  compress returns the
+        compressed bytes for each chunk written, sync the bytes needed for the
+        client to decode everything written so far (for partial flushes),
+        and finish the end of the stream.
+    """
+    def __init__(self, encoding, level=None):
+        if encoding not in ENCODINGS:
+            raise ValueError("unsupported encoding: " + str(encoding))
+        if level is None:
+            level = int(config.get('compress_level'))
+        if encoding == 'gzip':
+            wbits = 16 + zlib.MAX_WBITS  # gzip header and trailer
+        else:
+            wbits = zlib.MAX_WBITS  # zlib format (RFC 1950) as HTTP deflate
+        self.encoding = encoding
+        self.compressobj = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data):
+        return self.compressobj.compress(data)
+
+    def sync(self):
+        return self.compressobj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressobj.flush(zlib.Z_FINISH)
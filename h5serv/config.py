@@ -10,9 +10,13 @@
 # request a copy from help@hdfgroup.org.                                     #
 ##############################################################################
 import os
+import os.path as op
 import sys
+import json
+import logging
+import threading
 
-__all__ = ['get', 'update']
+__all__ = ['get', 'update', 'getConfig', 'reload']
 
 _cfgDefault = {
     'port':   5000,
@@ -37,32 +41,189 @@ _cfgDefault = {
     'log_level': 'INFO', # ERROR, WARNING, INFO, DEBUG, or NOTSET,
     'background_timeout': 1000,  # (ms) set to 0 to disable background processing
     'new_domain_policy': 'ANON',  # Ability to create domains (files) on serv: ANON - anonymous users ok, AUTH - only authenticated, NEVER - never allow 
-    'allow_noauth': True  # Allow anonymous requests (i.e. without auth header)
+    'allow_noauth': True,  # Allow anonymous requests (i.e. without auth header)
+    'db_pool_max_files': 64,  # max number of HDF5 files kept open between requests (0 to open per request)
+    'db_pool_idle_timeout': 60,  # (s) close pooled files not used for this long, 0 to keep open
+    'executor_workers': 8,  # number of threads for HDF5 requests, 0 to run on the IOLoop thread
+    'executor_queue_depth': 64,  # max requests waiting for a worker thread before returning 503
+    'workers': 1,  # number of server processes (Unix only), > 1 to fork workers sharing the port
+    'config_file': '',  # optional JSON file of config values, re-read on SIGHUP
+    'stream_buffer_size': 4*1024*1024,  # (bytes) binary dataset values are read and sent in slabs of this size
+    'meta_cache_size': 10000,  # max number of object metadata items cached in memory, 0 to disable
+    'auth_cache_size': 1000,  # max number of users and credentials cached by the password lookup
+    'auth_cache_timeout': 10,  # (s) time users and credentials are cached, 0 to disable
+    'domain_cache_size': 1000,  # max number of domain resolutions and HDF5 file checks cached, 0 to disable
+    'domain_cache_timeout': 5,  # (s) time a cached file check is used before the file is stat'ed again
+    'compress_response': True,  # gzip or deflate responses for clients that send Accept-Encoding
+    'compress_min_size': 1024,  # (bytes) responses smaller than this are sent uncompressed
+    'compress_level': 6,  # zlib compression level, 1 (fastest) to 9 (smallest)
+    'compress_types': ['application/json', 'application/octet-stream', 'text/*'],  # Content-Types that are compressed
+    'json_encoder': 'auto',  # 'auto' to use orjson (if installed) for values and request bodies, 'json' to not
+    'json_float_precision': 0,  # significant digits of float values in JSON responses, 0 for full precision
+    'sidecar_ext': '.sidecar',  # extension added to data file names for files of derived data (e.g. query summaries)
+    'query_evaluator': 'auto',  # 'auto' to use numexpr (if installed) for queries on numeric fields, 'numpy' to not
+    'query_block_size': 1024*1024,  # (bytes) compound datasets are queried in blocks of about this size
+    'query_summary': True,  # keep min/max values of each block in the sidecar to skip blocks that can't match
+    'index_build_size': 64*1024*1024,  # (bytes) values sorted in memory at a time when building a sorted index
+    'index_max_fraction': 0.1,  # use indexes for query conditions matching at most this fraction of the rows
+    'reduce_processes': 0,  # number of processes reductions (reduce=) of large selections are split between, 0 to reduce in the request thread
+    'reduce_process_size': 256*1024*1024,  # (bytes) selections at least this size are reduced in the reduce_processes pool
+    'pyramid_min_size': 256  # dataset pyramids have levels until the extents of the top level are at most this size
 }
 
-def get(x):
-    # see if there is a command-line override
-    option = '--'+x+'='
-    val = None
-    for i in range(1, len(sys.argv)):
-        #print i, sys.argv[i]
-        if sys.argv[i].startswith(option):
-            # found an override
-            arg = sys.argv[i]
-            val = arg[len(option):]  # return text after option string
-    # see if there are an environment variable override
-    if val is None and x.upper() in os.environ:
-        val = os.environ[x.upper()]
-    # if no command line or env override, just get the cfg value
-    if val is None and x in _cfgDefault:
-        val = _cfgDefault[x]
+# options that are file paths (~ is expanded)
+_pathKeys = ('datapath', 'static_path', 'log_file', 'ssl_cert', 'ssl_key',
+    'password_uri', 'config_file')
+
+# options that take effect if changed by reload() (SIGHUP), all others are
+# only read at startup
+_reloadKeys = ('log_level', 'cors_domain', 'allow_noauth', 'new_domain_policy',
+    'db_pool_max_files', 'executor_queue_depth')
+
+
+def toBool(val):
+    if isinstance(val, bool):
+        return val
+    if isinstance(val, (int, float)):
+        return val != 0
+    if val.upper() in ("T", "TRUE", "Y", "YES", "1"):
+        return True
+    if val.upper() in ("F", "FALSE", "N", "NO", "0", ""):
+        return False
+    raise ValueError("expected true or false")
+
+
+def convert(x, val, default):
+    """ Convert a command line, environment or config file value to the type
+        of the default value for option x.
+    """
+    if val is None:
+        return None
+    try:
+        if isinstance(default, bool):
+            return toBool(val)
+        if isinstance(default, int) and not isinstance(val, bool):
+            try:
+                return int(val)
+            except ValueError:
+                return float(val)  # e.g. "0.5" for a timeout
+        if isinstance(default, float):
+            return float(val)
+        if isinstance(default, list) and not isinstance(val, list):
+            return [item.strip() for item in str(val).split(',') if item.strip()]
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid value for config option " + x + ": " + str(val))
     if isinstance(val, str):
         # convert True/False strings to booleans
         if val.upper() in ("T", "TRUE"):
-            val = True 
+            return True
         elif val.upper() in ("F", "FALSE"):
-            val = False  
+            return False
+        if x in _pathKeys:
+            return op.expanduser(val)
     return val
 
+
+class Config(object):
+    """ Snapshot of the config options.  Values are looked up (in order) from
+        the command line (--name=value), environment (NAME=value), the
+        config_file (if given) and the defaults above, and converted to the
+        type of the default value.  Options can be read as attributes,
+        e.g. getConfig().port.
+    """
+    def __init__(self, argv=None, environ=None):
+        if argv is None:
+            argv = sys.argv
+        if environ is None:
+            environ = os.environ
+        self._args = {}
+        for arg in argv[1:]:
+            if arg.startswith('--') and '=' in arg:
+                name, _, val = arg[2:].partition('=')
+                self._args[name] = val  # last one wins
+        self._environ = environ
+
+        config_file = self._lookup('config_file', {})
+        if config_file is None:
+            config_file = _cfgDefault['config_file']
+        self._fileValues = self.readConfigFile(op.expanduser(config_file))
+
+        for x in _cfgDefault:
+            val = self._lookup(x, self._fileValues)
+            if val is None:
+                val = _cfgDefault[x]
+            self.__dict__[x] = convert(x, val, _cfgDefault[x])
+
+    def _lookup(self, x, fileValues):
+        if x in self._args:
+            return self._args[x]
+        if x.upper() in self._environ:
+            return self._environ[x.upper()]
+        return fileValues.get(x)
+
+    def readConfigFile(self, filePath):
+        if not filePath:
+            return {}
+        with open(filePath) as f:
+            values = json.load(f)
+        if not isinstance(values, dict):
+            raise ValueError("Invalid config_file: " + filePath)
+        return values
+
+    def get(self, x):
+        if x in self.__dict__:
+            return self.__dict__[x]
+        # option without a default
+        val = self._lookup(x, self._fileValues)
+        return convert(x, val, None)
+
+
+_config = None   # current snapshot, created on first use
+_lock = threading.Lock()
+
+
+def getConfig():
+    global _config
+    cfg = _config
+    if cfg is None:
+        with _lock:
+            if _config is None:
+                _config = Config()
+            cfg = _config
+    return cfg
+
+
+def get(x):
+    return getConfig().get(x)
+
+
 def update(d):
+    global _config
     _cfgDefault.update(d)
+    _config = None  # rebuild the snapshot with the new defaults
+
+
+def reload():
+    """ Re-read the config_file and apply any changes to the options listed
+        in _reloadKeys.  Returns a list of the options that were changed.
+    """
+    global _config
+    log = logging.getLogger("h5serv")
+    old = getConfig()
+    try:
+        new = Config()
+    except (IOError, ValueError) as e:
+        log.error("config reload failed: " + str(e))
+        return []
+    changed = []
+    for x in _cfgDefault:
+        if getattr(new, x) == getattr(old, x):
+            continue
+        if x in _reloadKeys:
+            changed.append(x)
+            log.info("config reload: " + x + " = " + str(getattr(new, x)))
+        else:
+            log.warning("config reload: restart needed to change " + x)
+            setattr(new, x, getattr(old, x))
+    _config = new
+    return changed
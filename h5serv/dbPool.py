@@ -0,0 +1,474 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Pool of open Hdf5db handles shared by all requests in the process.
+
+ Opening an Hdf5db instance means opening the HDF5 file and loading the
+ "__db__" index, so rather than opening and closing the file for each request
+ handles are kept open (keyed by file path) and re-used.  The number of open
+ files is bounded by the 'db_pool_max_files' config (least recently used
+ handles are closed first) and handles that have not been used for
+ 'db_pool_idle_timeout' seconds are closed.
+
+ A handle is re-opened if the file's inode, size or modification time differ
+ from the values seen when the handle was last released (i.e. the file was
+ modified or replaced by some other process).
+
+ Opening or closing a file for writing updates its modification time even if
+ nothing is written, so the file stamp can't be used to tell if the contents
+ have changed.  Instead the pool keeps a version for each file: the file
+ stamp when the current contents were first seen.  The version changes when
+ a request that may modify the file (modify=True) releases it, or when the
+ file stamp shows a change the pool didn't make (by some other process).
+ Requests that only read the file pass modify=False to getDb.  The version
+ is used to validate the metaCache entries for the file, and for the ETags
+ of responses (see getVersion).
+
+ When several server processes share the data directory (see the 'workers'
+ config), enableProcessLocking() turns off pooling and serializes access to
+ each file across processes with flock().  The file versions are then kept
+ in a directory shared by the processes, so they all give the same ETags.
+ HDF5's own file locking (which fails rather than waits, e.g. when another
+ process is just checking the file with h5py.is_hdf5) needs to be disabled
+ in this mode by setting HDF5_USE_FILE_LOCKING=FALSE before the HDF5 library
+ is loaded.
+
+ Usage:
+    with dbPool.getDb(filePath, app_logger=log) as db:
+        rootUUID = db.getUUIDByPath('/')
+"""
+
+import os
+import os.path as op
+import copy
+import errno
+import json
+import hashlib
+import time
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows
+
+from h5json import Hdf5db
+
+import h5serv.config as config
+import h5serv.metaCache as metaCache
+import h5serv.metricsUtil as metricsUtil
+
+
+def getFileStamp(filePath):
+    """ Return tuple that changes whenever the file is modified or replaced.
+        Returns None if the file does not exist.
+    """
+    try:
+        st = os.stat(filePath)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime)
+
+
+class TimedDb(object):
+    """ Proxy for an Hdf5db instance that adds the time spent in its methods
+        to the 'hdf5' metrics phase.
+    """
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        return metricsUtil.timed('hdf5')(attr)
+
+
+class PoolEntry(object):
+    """ Open Hdf5db handle (or placeholder for one) for a given file path.
+    """
+    def __init__(self, filePath):
+        self.filePath = filePath
+        self.db = None
+        self.timedDb = None  # TimedDb for db, returned by getDb
+        self.stamp = None
+        self.lastUsed = time.time()
+        self.refCount = 0   # number of requests using or waiting on the handle
+        self.stale = False  # set by invalidate while the handle is in use
+        self.lock = threading.RLock()  # one request (thread) at a time per file
+        self.lockFd = None  # fd holding the inter-process lock
+        self.acquireVersion = None  # file version when the current request got the handle
+        self.openedStamp = None  # file stamp just after the file was opened
+
+    def open(self, app_logger):
+        with metricsUtil.timer('hdf5'):
+            self.db = Hdf5db(self.filePath, app_logger=app_logger)
+        self.timedDb = TimedDb(self.db)
+        self.openedStamp = getFileStamp(self.filePath)
+        self.stale = False
+
+    def close(self):
+        if self.db is None:
+            return
+        db = self.db
+        self.db = None
+        self.timedDb = None
+        self.stamp = None
+        try:
+            db.__exit__(None, None, None)  # flush and close
+        except (IOError, ValueError, KeyError) as e:
+            log = logging.getLogger("h5serv")
+            log.warning("dbPool - error closing " + self.filePath + ": " + str(e))
+
+    def lockFile(self):
+        """ Take an exclusive lock on the file shared with other processes.
+            Blocks until any other process holding the lock releases it.
+        """
+        try:
+            self.lockFd = os.open(self.filePath, os.O_RDONLY)
+        except OSError:
+            # missing file, Hdf5db will report the error
+            return
+        fcntl.flock(self.lockFd, fcntl.LOCK_EX)
+
+    def unlockFile(self):
+        if self.lockFd is None:
+            return
+        fd = self.lockFd
+        self.lockFd = None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+class DbPool(object):
+
+    def __init__(self, max_files=None, idle_timeout=None):
+        self.log = logging.getLogger("h5serv")
+        self.max_files = max_files
+        self.idle_timeout = idle_timeout
+        self.entries = OrderedDict()   # least recently used first
+        self.versions = {}  # file key -> (version, file stamp after our last access)
+        self.version_dir = None  # keep the versions in files here instead
+        self.lock = threading.RLock()  # guards entries and versions
+        self.process_lock = False      # lock files against other processes
+
+    def getMaxFiles(self):
+        if self.max_files is not None:
+            return self.max_files
+        return int(config.get('db_pool_max_files'))
+
+    def getIdleTimeout(self):
+        if self.idle_timeout is not None:
+            return self.idle_timeout
+        return float(config.get('db_pool_idle_timeout'))
+
+    @contextmanager
+    def getDb(self, filePath, app_logger=None, modify=True):
+        """ Context manager returning an open Hdf5db instance (as a TimedDb)
+            for filePath.
+            Raises IOError if the file can't be opened (as Hdf5db does).
+            modify should be False if the request won't update the file.
+        """
+        if app_logger is None:
+            app_logger = self.log
+        key = op.normpath(filePath)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                entry = PoolEntry(filePath)
+            self.entries[key] = entry  # move to most recently used position
+            entry.refCount += 1
+
+        start = time.time()
+        stamp = None
+        entry.lock.acquire()
+        try:
+            if self.process_lock:
+                entry.lockFile()
+            metricsUtil.addTime('file_lock_wait', time.time() - start)
+            stamp = getFileStamp(filePath)
+            entry.acquireVersion = self.getCurrentVersion(key, stamp)
+            metaCache.validate(filePath, entry.acquireVersion)
+            if entry.db is not None and (entry.stale or entry.stamp != stamp):
+                self.log.info("dbPool - reopening modified file: " + filePath)
+                self.closeEntry(key, entry)
+            if entry.db is None:
+                self.log.info("dbPool - open: " + filePath)
+                entry.open(app_logger)
+                stamp = entry.openedStamp
+            yield entry.timedDb
+        finally:
+            try:
+                self.release(key, entry, stamp, modify)
+                metaCache.setStamp(filePath, self.getVersionItem(key)[0])
+            finally:
+                entry.acquireVersion = None
+                entry.unlockFile()
+                entry.lock.release()
+                with self.lock:
+                    entry.refCount -= 1
+                self.prune()
+
+    def getVersionPath(self, key):
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return op.join(self.version_dir, 'version-' + name + '.json')
+
+    def getVersionItem(self, key):
+        """ Return the (version, file stamp) recorded for the file, or None.
+        """
+        if self.version_dir is None:
+            with self.lock:
+                return self.versions.get(key)
+        try:
+            with open(self.getVersionPath(key)) as f:
+                item = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        return tuple(tuple(stamp) if stamp else None for stamp in item)
+
+    def setVersionItem(self, key, item):
+        """ Record the (version, file stamp) for the file (None to remove it).
+        """
+        if self.version_dir is None:
+            with self.lock:
+                if item is None:
+                    self.versions.pop(key, None)
+                else:
+                    self.versions[key] = item
+            return
+        filePath = self.getVersionPath(key)
+        try:
+            if item is None:
+                if op.exists(filePath):
+                    os.remove(filePath)
+                return
+            tmpPath = filePath + '.' + str(os.getpid())
+            with open(tmpPath, 'w') as f:
+                json.dump(item, f)
+            os.rename(tmpPath, filePath)  # so readers see the whole file
+        except (IOError, OSError) as e:
+            self.log.warning("dbPool - unable to save file version: " + str(e))
+
+    def getCurrentVersion(self, key, stamp):
+        """ Return the version of the file with the given stamp: a new version
+            unless the file is as the pool last left it.
+        """
+        with self.lock:
+            item = self.getVersionItem(key)
+            if item is None or item[1] != stamp:
+                item = (stamp, stamp)
+                self.setVersionItem(key, item)
+            return item[0]
+
+    def release(self, key, entry, stamp, modify):
+        """ Flush (or close) the handle and record the file version and state
+            after our updates.  stamp is the file stamp the request started
+            with.  Called with the entry lock held.
+        """
+        entry.lastUsed = time.time()
+        if entry.db is None:
+            return
+        version = entry.acquireVersion
+        if modify or getFileStamp(entry.filePath) != stamp:
+            version = None  # updated by the request or some other process
+        if entry.stale or self.getMaxFiles() <= 0:
+            entry.close()
+        else:
+            try:
+                entry.db.f.flush()
+                if entry.db.dbf:
+                    entry.db.dbf.flush()
+            except (IOError, ValueError) as e:
+                self.log.warning("dbPool - flush failed for " + entry.filePath + ": " + str(e))
+                entry.close()
+        stamp = getFileStamp(entry.filePath)
+        if entry.db is not None:
+            entry.stamp = stamp
+        self.setVersionItem(key, (version or stamp, stamp))
+
+    def closeEntry(self, key, entry):
+        """ Close the entry's handle.  Closing the file changes its stamp but
+            not the version.
+        """
+        with self.lock:
+            before = getFileStamp(entry.filePath)
+            entry.close()
+            item = self.getVersionItem(key)
+            if item is not None and item[1] == before:
+                self.setVersionItem(key, (item[0], getFileStamp(entry.filePath)))
+
+    def prune(self):
+        """ Close handles that are idle, beyond the max_files limit, or were
+            never opened successfully.
+        """
+        max_files = self.getMaxFiles()
+        idle_timeout = self.getIdleTimeout()
+        now = time.time()
+        # handles are closed with the pool lock held so that a new handle for
+        # the same file can't be opened while the old one is being closed
+        with self.lock:
+            num_open = 0
+            for entry in self.entries.values():
+                if entry.db is not None:
+                    num_open += 1
+            for key in list(self.entries.keys()):  # least recently used first
+                entry = self.entries[key]
+                if entry.refCount > 0:
+                    continue
+                if entry.db is not None:
+                    idle = idle_timeout > 0 and now - entry.lastUsed > idle_timeout
+                    if not idle and num_open <= max_files:
+                        continue
+                    num_open -= 1
+                    self.log.info("dbPool - close: " + entry.filePath)
+                del self.entries[key]
+                self.closeEntry(key, entry)
+
+    def invalidate(self, filePath):
+        """ Close the handle for filePath (e.g. when the file is deleted).
+            If the handle is in use, it will be closed when released.
+        """
+        metaCache.invalidate(filePath)
+        key = op.normpath(filePath)
+        self.setVersionItem(key, None)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            if entry.refCount > 0:
+                entry.stale = True
+                return
+            del self.entries[key]
+            self.log.info("dbPool - invalidate: " + filePath)
+            entry.close()
+
+    def enableProcessLocking(self, version_dir=None):
+        """ Called when other server processes may update the same files.
+            Handles are closed after each request (so changes are seen by the
+            other processes) and requests for a file are serialized across
+            processes.  The file versions are kept in version_dir (shared by
+            the processes) if given.
+        """
+        self.closeAll()
+        self.max_files = 0
+        self.version_dir = version_dir
+        # taking our own lock while HDF5's locking is on would fail the open
+        hdf5_locking = os.environ.get('HDF5_USE_FILE_LOCKING', '').upper()
+        self.process_lock = fcntl is not None and hdf5_locking == 'FALSE'
+
+    def closeAll(self):
+        """ Close all handles.  Handles in use are closed when released.
+        """
+        with self.lock:
+            for key in list(self.entries.keys()):
+                entry = self.entries[key]
+                if entry.refCount > 0:
+                    entry.stale = True
+                    continue
+                del self.entries[key]
+                self.closeEntry(key, entry)
+
+    def getVersion(self, filePath):
+        """ Return the version of filePath's contents (a file stamp) when the
+            current request got the handle, i.e. before the request modified
+            the file.  Call inside a getDb block for the file.
+        """
+        key = op.normpath(filePath)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.acquireVersion is not None:
+                return entry.acquireVersion
+        return self.getCurrentVersion(key, getFileStamp(filePath))
+
+    def getOpenCount(self):
+        count = 0
+        with self.lock:
+            for entry in self.entries.values():
+                if entry.db is not None:
+                    count += 1
+        return count
+
+
+_pool = DbPool()
+
+
+def getDb(filePath, app_logger=None, modify=True):
+    return _pool.getDb(filePath, app_logger=app_logger, modify=modify)
+
+
+def getVersion(filePath):
+    return _pool.getVersion(filePath)
+
+
+class DatasetReader(object):
+    """ Reads a dataset of filePath, getting the file from the pool for
+        each read, so a long scan of the dataset (e.g. to build an index)
+        doesn't hold up other requests for the file.  Has the shape, dtype
+        and chunks of the dataset, and is read as an h5py dataset:
+        reader[selection] or reader.fields(names)[selection].
+        Raises IOError if the dataset is removed.
+    """
+    def __init__(self, filePath, obj_uuid, app_logger=None, pool=None):
+        self.filePath = filePath
+        self.obj_uuid = obj_uuid
+        self.app_logger = app_logger
+        self.pool = pool if pool is not None else _pool
+        self.names = None  # fields to read
+        with self.pool.getDb(filePath, app_logger=app_logger, modify=False) as db:
+            dset = self.getDataset(db)
+            self.shape = dset.shape
+            self.dtype = dset.dtype
+            self.chunks = dset.chunks
+
+    def getDataset(self, db):
+        dset = db.getDatasetObjByUuid(self.obj_uuid)
+        if dset is None:
+            raise IOError(errno.ENXIO, "Dataset not found")
+        return dset
+
+    def fields(self, names):
+        reader = copy.copy(self)
+        reader.names = names
+        return reader
+
+    def __getitem__(self, selection):
+        with self.pool.getDb(self.filePath, app_logger=self.app_logger,
+                modify=False) as db:
+            dset = self.getDataset(db)
+            if self.names is not None:
+                return dset.fields(self.names)[selection]
+            return dset[selection]
+
+
+def invalidate(filePath):
+    _pool.invalidate(filePath)
+
+
+def closeIdle():
+    _pool.prune()
+
+
+def closeAll():
+    _pool.closeAll()
+
+
+def enableProcessLocking(version_dir=None):
+    _pool.enableProcessLocking(version_dir)
+
+
+def getOpenCount():
+    return _pool.getOpenCount()
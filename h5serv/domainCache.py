@@ -0,0 +1,185 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Cache of domain to file path resolutions and of HDF5 file checks, so that
+ requests for a domain that was resolved recently don't need to stat the
+ file and open it with h5py.is_hdf5.
+
+ Files that were found to be HDF5 files are recorded with their inode, size
+ and modification time.  Entries are trusted for 'domain_cache_timeout'
+ seconds, after which the file is stat'ed again - is_hdf5 is only re-run if
+ the file has changed.  Files that don't exist (or aren't HDF5) are not
+ cached, so new files are seen immediately.
+
+ Files removed or replaced by the server, or reported by the watchdog
+ observer, should be passed to invalidate() so they are re-checked on the
+ next request.
+
+ Usage:
+    key = (domain, checkExists)
+    resolved = domainCache.getResolution(key)
+    if resolved is None:
+        ... resolve tocFilePath and filePath ...
+        domainCache.putResolution(key, (tocFilePath, filePath))
+    if not domainCache.isFile(filePath):
+        raise HTTPError(404)
+"""
+
+import os
+import os.path as op
+import stat
+import time
+import threading
+from collections import OrderedDict
+
+from h5py import is_hdf5
+import h5serv.config as config
+
+
+def getStamp(filePath):
+    """ Return (ino, size, mtime) for the file or None if it doesn't exist
+        (or isn't a regular file).
+    """
+    try:
+        st = os.stat(filePath)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime)
+
+
+class DomainCache(object):
+
+    def __init__(self, max_items=None, timeout=None):
+        self.max_items = max_items
+        self.timeout = timeout
+        self.files = OrderedDict()  # filePath -> [check time, stamp], lru first
+        self.resolutions = OrderedDict()  # key -> [check time, file paths]
+        self.lock = threading.Lock()
+
+    def getMaxItems(self):
+        if self.max_items is not None:
+            return self.max_items
+        return int(config.get('domain_cache_size'))
+
+    def getTimeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        return float(config.get('domain_cache_timeout'))
+
+    def addItem(self, items, key, value):
+        """ Called with the lock held.
+        """
+        items.pop(key, None)
+        items[key] = value
+        while len(items) > self.getMaxItems():
+            items.popitem(last=False)
+
+    def isFile(self, filePath):
+        """ Return True if filePath is an HDF5 file (as fileUtil.isFile).
+        """
+        if self.getMaxItems() <= 0:
+            return getStamp(filePath) is not None and is_hdf5(filePath)
+        filePath = op.normpath(filePath)
+        now = time.time()
+        with self.lock:
+            item = self.files.get(filePath)
+            if item is not None and now - item[0] < self.getTimeout():
+                self.files.pop(filePath)
+                self.files[filePath] = item  # move to most recently used position
+                return True
+        stamp = getStamp(filePath)
+        if stamp is None or (
+                (item is None or item[1] != stamp) and not is_hdf5(filePath)):
+            with self.lock:
+                self.files.pop(filePath, None)
+            return False
+        with self.lock:
+            self.addItem(self.files, filePath, [now, stamp])
+        return True
+
+    def getResolution(self, key):
+        """ Return the cached file paths for key (the domain and any request
+            options the resolution depends on) or None.
+        """
+        with self.lock:
+            item = self.resolutions.get(key)
+            if item is None:
+                return None
+            if time.time() - item[0] >= self.getTimeout():
+                del self.resolutions[key]
+                return None
+            self.resolutions.pop(key)
+            self.resolutions[key] = item  # move to most recently used position
+            return item[1]
+
+    def putResolution(self, key, filePaths):
+        if self.getMaxItems() <= 0 or self.getTimeout() <= 0:
+            return
+        with self.lock:
+            self.addItem(self.resolutions, key, [time.time(), tuple(filePaths)])
+
+    def invalidate(self, path):
+        """ Drop the cached checks and resolutions for the given file, or for
+            anything below it if path is a directory.
+        """
+        path = op.normpath(path)
+        prefix = path + '/'
+
+        def matches(filePath):
+            return filePath == path or filePath.startswith(prefix)
+
+        with self.lock:
+            for filePath in list(self.files.keys()):
+                if matches(filePath):
+                    del self.files[filePath]
+            for key, item in list(self.resolutions.items()):
+                for filePath in item[1]:
+                    if filePath is not None and matches(op.normpath(filePath)):
+                        del self.resolutions[key]
+                        break
+
+    def clear(self):
+        with self.lock:
+            self.files.clear()
+            self.resolutions.clear()
+
+    def getCount(self):
+        return len(self.files) + len(self.resolutions)
+
+
+_cache = DomainCache()
+
+
+def isFile(filePath):
+    return _cache.isFile(filePath)
+
+
+def getResolution(key):
+    return _cache.getResolution(key)
+
+
+def putResolution(key, filePaths):
+    _cache.putResolution(key, filePaths)
+
+
+def invalidate(path):
+    _cache.invalidate(path)
+
+
+def clear():
+    _cache.clear()
+
+
+def getCount():
+    return _cache.getCount()
@@ -0,0 +1,187 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Bounded thread pool for running blocking HDF5 work off the IOLoop.
+
+ Request handler methods decorated with runInExecutor run on a worker thread
+ and the IOLoop is free to service other requests in the meantime.  The
+ number of workers is set by the 'executor_workers' config (0 to run
+ handlers on the IOLoop thread), and at most 'executor_queue_depth' requests
+ are queued waiting for a free worker - beyond that the request is rejected
+ with a 503.
+
+ Handler methods run this way must not call IOLoop functions (e.g. flush or
+ finish) directly; write/set_header/set_status only update the response
+ buffer and are safe to use.  The handler's ioLoop attribute is set to the
+ IOLoop to use with callOnIOLoop (None if the method runs on the IOLoop).
+
+ shutdown cancels the queued tasks and waits for the running ones.  Tasks
+ waiting in callOnIOLoop give up, so shutdown must not be called on the
+ IOLoop thread (the running tasks may need the IOLoop to finish).
+"""
+
+import functools
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.concurrent import is_future
+from tornado.iostream import StreamClosedError
+from tornado.web import HTTPError
+
+import h5serv.config as config
+
+CLOSE_POLL_SECONDS = 0.1  # how often callOnIOLoop checks for shutdown
+
+_executor = None
+_closing = threading.Event()  # set when the current executor is shut down
+_max_workers = 0
+_pending = 0  # number of tasks submitted but not yet complete
+_futures = set()  # futures of the current executor's tasks not yet complete
+_lock = threading.Lock()
+
+
+def getExecutor():
+    """ Return the shared executor, or None if executor_workers is 0.
+    """
+    global _executor, _closing, _futures, _max_workers
+    with _lock:
+        if _executor is None:
+            max_workers = int(config.get('executor_workers'))
+            if max_workers > 0:
+                _executor = ThreadPoolExecutor(max_workers=max_workers)
+                _closing = threading.Event()
+                _futures = set()
+                _max_workers = max_workers
+    return _executor
+
+
+def getPendingCount():
+    return _pending
+
+
+def _taskDone(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+        _futures.discard(future)
+
+
+def submit(func, *args, **kwargs):
+    """ Run func on the executor and return a concurrent.futures.Future.
+        If there is no executor, func is run inline.
+    """
+    return _submit(False, func, *args, **kwargs)
+
+
+def _submit(checkQueue, func, *args, **kwargs):
+    global _pending
+    executor = getExecutor()
+    if executor is None:
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    with _lock:
+        if checkQueue:
+            max_pending = _max_workers + int(config.get('executor_queue_depth'))
+            if _pending >= max_pending:
+                return None
+        _pending += 1
+    future = executor.submit(func, *args, **kwargs)
+    with _lock:
+        _futures.add(future)
+    future.add_done_callback(_taskDone)
+    return future
+
+
+def runInExecutor(method):
+    """ Decorator for RequestHandler methods that do blocking HDF5 work.
+        Runs the method on the executor.  Raises HTTPError 503 if the number of
+        queued requests exceeds executor_queue_depth.
+    """
+    @functools.wraps(method)
+    @gen.coroutine
+    def wrapper(self, *args, **kwargs):
+        if getExecutor() is not None:
+            self.ioLoop = IOLoop.current()
+        else:
+            self.ioLoop = None
+        future = _submit(True, method, self, *args, **kwargs)
+        if future is None:
+            log = logging.getLogger("h5serv")
+            msg = "Server busy, " + str(_pending) + " requests pending"
+            log.warning(msg)
+            raise HTTPError(503, reason=msg)
+        yield future
+    return wrapper
+
+
+def callOnIOLoop(io_loop, func, *args):
+    """ Call func on the IOLoop thread from an executor thread and wait for
+        it to complete.  If func returns a Future (e.g. RequestHandler.flush),
+        wait for that as well.  Returns the result or raises the exception.
+        Raises StreamClosedError if the executor is shut down while waiting.
+    """
+    closing = _closing
+    done = Future()
+
+    def setResult(future):
+        try:
+            done.set_result(future.result())
+        except Exception as e:
+            done.set_exception(e)
+
+    def run():
+        try:
+            result = func(*args)
+        except Exception as e:
+            done.set_exception(e)
+            return
+        if is_future(result):
+            io_loop.add_future(result, setResult)
+        else:
+            done.set_result(result)
+
+    io_loop.add_callback(run)
+    while True:
+        try:
+            return done.result(timeout=CLOSE_POLL_SECONDS)
+        except FutureTimeoutError:
+            if closing.is_set():
+                # e.g. a flush to a client that has stopped reading
+                raise StreamClosedError()
+
+
+def shutdown(wait=True):
+    """ Shut down the executor: queued tasks are cancelled, and if wait is
+        True, wait for the running tasks.  Don't call on the IOLoop thread
+        with wait=True.
+    """
+    global _executor
+    with _lock:
+        executor = _executor
+        closing = _closing
+        futures = list(_futures)
+        _executor = None
+    if executor is not None:
+        closing.set()
+        # (not shutdown's cancel_futures, that needs Python 3.9)
+        for future in futures:
+            future.cancel()  # no effect on the running tasks
+        executor.shutdown(wait=wait)
@@ -0,0 +1,415 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Secondary indexes on the fields of one dimensional compound type datasets,
+ used by queries (see queryUtil) to find the rows meeting a condition on a
+ field without scanning the dataset.
+
+ Indexes are kept in the sidecar of the data file (see sidecarUtil), in the
+ group /index/<dataset uuid>/<field position>.  Two types are supported:
+
+   sorted - the field values in sorted order ('values') with the row of
+      each value ('rows'), and every FENCE_SIZE'th value ('fence') so a
+      value can be found reading just the fence and one block of values.
+      Large datasets are sorted in runs of index_build_size bytes which
+      are then merged.
+   bitmap - the distinct field values ('keys', at most MAX_BITMAP_KEYS),
+      the number of rows with each ('counts'), and a compressed bitmap of
+      those rows for each ('bitmaps').  Best for fields with few values.
+
+ Indexes are not updated when the dataset is written, but marked as stale
+ (see sidecarUtil.invalidate) and no longer used until they are rebuilt.
+ Indexes stored for an earlier modified time of the dataset are stale too.
+ Indexes are built in the file of a sidecarUtil.Build, reading the dataset
+ with a dbPool.DatasetReader, so neither the sidecar nor the data file is
+ held for the whole build.
+"""
+
+import os
+import os.path as op
+import tempfile
+import time
+import logging
+
+import numpy as np
+import h5py
+
+import h5serv.config as config
+import h5serv.sidecarUtil as sidecarUtil
+import h5serv.selectionUtil as selectionUtil
+
+INDEX_KIND = 'index'  # sidecar group kind
+SORTED = 'sorted'
+BITMAP = 'bitmap'
+INDEX_TYPES = (SORTED, BITMAP)
+FENCE_SIZE = 4096  # values per fence entry of sorted indexes
+MAX_BITMAP_KEYS = 1024  # distinct values of bitmap indexes
+BITMAP_CHUNK_SIZE = 1024 * 1024  # bytes
+
+
+def isIndexable(dtype):
+    """ Return True if fields of the given type can be indexed - numbers and
+        fixed length strings.
+    """
+    return dtype.kind in 'biufS' and dtype.subdtype is None
+
+
+def getFieldType(dtype, field):
+    """ Return the (native byte order) type of the field, raising
+        ValueError if there's no such field or it can't be indexed.
+    """
+    if dtype.names is None:
+        raise ValueError("dataset type is not compound")
+    if field not in dtype.names:
+        raise ValueError("unknown field name: " + field)
+    fieldType = dtype.fields[field][0]
+    if not isIndexable(fieldType):
+        raise ValueError("field type can't be indexed: " + field)
+    return fieldType.newbyteorder('=')
+
+
+def getGroupName(dtype, field):
+    """ Return the name of the index group of the field (its position in
+        the compound type, as field names may include '/').
+    """
+    return str(dtype.names.index(field))
+
+
+def getKey(fieldType, value):
+    """ Return the query constant value for comparing with field values of
+        the given type, or None if they can't be compared.
+    """
+    if fieldType.kind == 'S':
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, str):
+            return value.encode('utf-8')
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def compare(values, op, value):
+    """ Return the boolean mask of the values meeting the comparison """
+    with np.errstate(all='ignore'):
+        if op == '==':
+            return values == value
+        if op == '!=':
+            return values != value
+        if op == '<':
+            return values < value
+        if op == '<=':
+            return values <= value
+        if op == '>':
+            return values > value
+        return values >= value
+
+
+def readField(dset, start, stop, field, fieldType):
+    values = selectionUtil.readValues(dset, slice(start, stop), [field])[field]
+    return values.astype(fieldType, copy=False)
+
+
+def getBuildRows(fieldType):
+    """ Return the number of rows sorted in memory at a time """
+    itemSize = fieldType.itemsize + 8  # value and row
+    return max(FENCE_SIZE, int(config.get('index_build_size')) // itemSize)
+
+
+def writeFence(grp):
+    values = grp['values']
+    if len(values) > 0:
+        fence = values[::FENCE_SIZE]
+    else:
+        fence = np.zeros((0,), dtype=values.dtype)
+    grp.create_dataset('fence', data=fence)
+    grp.attrs['fence_size'] = FENCE_SIZE
+
+
+def mergeRuns(src_values, src_rows, runs, values, rows, bufSize):
+    """ Merge the sorted runs ((start, stop) ranges of src_values and
+        src_rows) into values and rows, reading bufSize rows of each run at
+        a time.
+    """
+    nruns = len(runs)
+    pos = [start for start, stop in runs]
+    bufValues = [src_values[0:0]] * nruns
+    bufRows = [src_rows[0:0]] * nruns
+    bufRuns = [np.zeros((0,), dtype=np.int32)] * nruns
+    out = 0
+    while True:
+        # refill the empty buffers
+        for i in range(nruns):
+            stop = runs[i][1]
+            if len(bufValues[i]) == 0 and pos[i] < stop:
+                end = min(pos[i] + bufSize, stop)
+                bufValues[i] = src_values[pos[i]:end]
+                bufRows[i] = src_rows[pos[i]:end]
+                bufRuns[i] = np.full((end - pos[i],), i, dtype=np.int32)
+                pos[i] = end
+        allValues = np.concatenate(bufValues)
+        if len(allValues) == 0:
+            break
+        allRows = np.concatenate(bufRows)
+        allRuns = np.concatenate(bufRuns)
+        order = np.argsort(allValues, kind='stable')
+        allValues = allValues[order]
+        allRows = allRows[order]
+        allRuns = allRuns[order]
+        # values up to the smallest last buffered value of the runs with
+        # more values to read are in their final order
+        active = [i for i in range(nruns) if pos[i] < runs[i][1]]
+        if active:
+            lasts = np.sort(np.array([bufValues[i][-1] for i in active],
+                dtype=allValues.dtype))
+            n = int(np.searchsorted(allValues, lasts[0], side='right'))
+        else:
+            n = len(allValues)
+        values[out:out + n] = allValues[:n]
+        rows[out:out + n] = allRows[:n]
+        out += n
+        for i in range(nruns):
+            mask = allRuns[n:] == i
+            bufValues[i] = allValues[n:][mask]
+            bufRows[i] = allRows[n:][mask]
+            bufRuns[i] = allRuns[n:][mask]
+
+
+def buildSorted(grp, dset, field, fieldType):
+    log = logging.getLogger("h5serv")
+    nrows = dset.shape[0]
+    runRows = getBuildRows(fieldType)
+    values = grp.create_dataset('values', (nrows,), dtype=fieldType)
+    rows = grp.create_dataset('rows', (nrows,), dtype=np.int64)
+    if nrows == 0:
+        writeFence(grp)
+        return
+    if nrows <= runRows:
+        data = readField(dset, 0, nrows, field, fieldType)
+        order = np.argsort(data, kind='stable')
+        values[...] = data[order]
+        rows[...] = order.astype(np.int64)
+        writeFence(grp)
+        return
+
+    # sort runs of rows into a temporary file, then merge the runs
+    fd, tmpPath = tempfile.mkstemp(suffix='.h5', dir=op.dirname(grp.file.filename))
+    os.close(fd)
+    try:
+        with h5py.File(tmpPath, 'w') as tmp:
+            src_values = tmp.create_dataset('values', (nrows,), dtype=fieldType)
+            src_rows = tmp.create_dataset('rows', (nrows,), dtype=np.int64)
+            runs = []
+            for start in range(0, nrows, runRows):
+                stop = min(start + runRows, nrows)
+                data = readField(dset, start, stop, field, fieldType)
+                order = np.argsort(data, kind='stable')
+                src_values[start:stop] = data[order]
+                src_rows[start:stop] = order.astype(np.int64) + start
+                runs.append((start, stop))
+            log.info("index: merging {} runs of {}".format(len(runs), field))
+            bufSize = max(FENCE_SIZE, runRows // len(runs))
+            mergeRuns(src_values, src_rows, runs, values, rows, bufSize)
+    finally:
+        os.remove(tmpPath)
+    writeFence(grp)
+
+
+def buildBitmap(grp, dset, field, fieldType):
+    nrows = dset.shape[0]
+    blockRows = getBuildRows(fieldType)
+    blockRows -= blockRows % 8  # whole bytes of the bitmaps
+
+    # find the distinct values
+    keys = np.zeros((0,), dtype=fieldType)
+    for start in range(0, nrows, blockRows):
+        data = readField(dset, start, min(start + blockRows, nrows), field, fieldType)
+        keys = np.union1d(keys, np.unique(data))
+        if len(keys) > MAX_BITMAP_KEYS:
+            raise ValueError("field has more than " + str(MAX_BITMAP_KEYS) +
+                " distinct values, use a sorted index")
+
+    counts = np.zeros((len(keys),), dtype=np.int64)
+    grp.create_dataset('keys', data=keys)
+    if nrows == 0:
+        grp.create_dataset('bitmaps', (0, 0), dtype=np.uint8)  # can't be chunked
+        grp.create_dataset('counts', data=counts)
+        return
+    nbytes = (nrows + 7) // 8
+    chunks = (1, max(1, min(nbytes, BITMAP_CHUNK_SIZE)))
+    bitmaps = grp.create_dataset('bitmaps', (len(keys), nbytes), dtype=np.uint8,
+        chunks=chunks, compression='gzip', compression_opts=1)
+    for start in range(0, nrows, blockRows):
+        stop = min(start + blockRows, nrows)
+        data = readField(dset, start, stop, field, fieldType)
+        keyIndexes = np.searchsorted(keys, data)
+        for k in np.unique(keyIndexes):
+            mask = keyIndexes == k
+            counts[k] += int(np.count_nonzero(mask))
+            bitmaps[k, start // 8:(stop + 7) // 8] = np.packbits(mask)
+    grp.create_dataset('counts', data=counts)
+
+
+def buildIndex(f, obj_uuid, modified, dset, field, indexType=SORTED):
+    """ Build an index of the given type for the field of the (one
+        dimensional, compound type) dataset dset (h5py dataset or
+        dbPool.DatasetReader) in f (the sidecar, or the file of a
+        sidecarUtil.Build), replacing any existing index.  Returns the
+        index group.  Raises ValueError if the field can't be indexed.
+    """
+    log = logging.getLogger("h5serv")
+    if indexType not in INDEX_TYPES:
+        raise ValueError("unknown index type: " + str(indexType))
+    if len(dset.shape) != 1:
+        raise ValueError("only one dimensional datasets can be indexed")
+    fieldType = getFieldType(dset.dtype, field)
+    name = getGroupName(dset.dtype, field)
+    grp = sidecarUtil.createGroup(f, INDEX_KIND, obj_uuid, modified, name=name)
+    try:
+        grp.attrs['field'] = field
+        grp.attrs['type'] = indexType
+        grp.attrs['nrows'] = dset.shape[0]
+        grp.attrs['ctime'] = int(time.time())
+        if indexType == SORTED:
+            buildSorted(grp, dset, field, fieldType)
+        else:
+            buildBitmap(grp, dset, field, fieldType)
+    except Exception:
+        del f[grp.name]
+        raise
+    log.info("index: built {} index of {} for {} rows".format(indexType, field,
+        dset.shape[0]))
+    return grp
+
+
+def getIndexGroups(f, obj_uuid):
+    """ Return the index groups of the dataset in the sidecar f """
+    grp = sidecarUtil.getGroup(f, INDEX_KIND, obj_uuid)
+    if grp is None:
+        return []
+    return [grp[name] for name in sorted(grp, key=int)]
+
+
+def getIndexGroup(f, obj_uuid, dtype, field):
+    """ Return the index group for the field, or None if there is none """
+    if dtype.names is None or field not in dtype.names:
+        return None
+    return sidecarUtil.getGroup(f, INDEX_KIND, obj_uuid,
+        name=getGroupName(dtype, field))
+
+
+def isStale(grp, dset, modified):
+    """ Return True if the index is out of date with the dataset, last
+        modified at the given time.
+    """
+    return sidecarUtil.isStale(grp) or grp.attrs.get('modified') != modified or \
+        grp.attrs.get('nrows') != dset.shape[0]
+
+
+def getIndexItem(grp, dset, modified):
+    """ Return a description (dict) of the index """
+    item = {}
+    item['field'] = grp.attrs['field']
+    item['type'] = grp.attrs['type']
+    item['stale'] = bool(isStale(grp, dset, modified))
+    item['ctime'] = int(grp.attrs['ctime'])
+    item['nrows'] = int(grp.attrs['nrows'])
+    if item['type'] == BITMAP:
+        item['keyCount'] = len(grp['keys'])
+    return item
+
+
+class SortedIndex(object):
+    """ Lookups in a sorted index group """
+    def __init__(self, grp):
+        self.values = grp['values']
+        self.rows = grp['rows']
+        self.fence = grp['fence'][...]
+        self.fenceSize = int(grp.attrs['fence_size'])
+        self.nrows = len(self.values)
+
+    def searchsorted(self, value, side):
+        """ Return the position of value in the sorted values """
+        i = int(np.searchsorted(self.fence, value, side=side))
+        if i == 0:
+            return 0
+        start = (i - 1) * self.fenceSize
+        block = self.values[start:min(i * self.fenceSize, self.nrows)]
+        return start + int(np.searchsorted(block, value, side=side))
+
+    def lookup(self, op, value, maxRows):
+        """ Return the sorted rows (NumPy int64 array) including all rows
+            with field values meeting the comparison, or None if there are
+            more than maxRows of them or the index can't be used.
+        """
+        value = getKey(self.values.dtype, value)
+        if value is None or op == '!=':
+            return None
+        if op == '==':
+            lo = self.searchsorted(value, 'left')
+            hi = self.searchsorted(value, 'right')
+        elif op in ('<', '<='):
+            lo = 0
+            hi = self.searchsorted(value, 'left' if op == '<' else 'right')
+        else:
+            lo = self.searchsorted(value, 'right' if op == '>' else 'left')
+            hi = self.nrows  # including any NaN values at the end
+        if hi - lo > maxRows:
+            return None
+        if hi <= lo:
+            return np.zeros((0,), dtype=np.int64)
+        return np.sort(self.rows[lo:hi])
+
+
+class BitmapIndex(object):
+    """ Lookups in a bitmap index group """
+    def __init__(self, grp):
+        self.keys = grp['keys'][...]
+        self.counts = grp['counts'][...]
+        self.bitmaps = grp['bitmaps']
+        self.nrows = int(grp.attrs['nrows'])
+
+    def lookup(self, op, value, maxRows):
+        """ Return the sorted rows (NumPy int64 array) with field values
+            meeting the comparison, or None if there are more than maxRows
+            of them or the index can't be used.
+        """
+        value = getKey(self.keys.dtype, value)
+        if value is None:
+            return None
+        selected = np.nonzero(compare(self.keys, op, value))[0]
+        if int(self.counts[selected].sum()) > maxRows:
+            return None
+        if len(selected) == 0:
+            return np.zeros((0,), dtype=np.int64)
+        bits = self.bitmaps[int(selected[0]), :]
+        for k in selected[1:]:
+            bits |= self.bitmaps[int(k), :]
+        rows = np.nonzero(np.unpackbits(bits)[:self.nrows])[0]
+        return rows.astype(np.int64)
+
+
+def getIndexes(f, obj_uuid, dset, modified):
+    """ Return a dict of field name to index (SortedIndex or BitmapIndex)
+        for the indexes of the dataset (last modified at the given time) in
+        the sidecar f that are up to date.
+    """
+    indexes = {}
+    for grp in getIndexGroups(f, obj_uuid):
+        if isStale(grp, dset, modified):
+            continue
+        if grp.attrs['type'] == SORTED:
+            indexes[grp.attrs['field']] = SortedIndex(grp)
+        else:
+            indexes[grp.attrs['field']] = BitmapIndex(grp)
+    return indexes
@@ -0,0 +1,149 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ JSON encoding and decoding of request and response bodies.
+
+ Numeric NumPy arrays in a response (e.g. dataset values) are encoded
+ directly rather than converted to nested Python lists first, a block of
+ rows at a time (see iterEncode).  If the orjson package is installed it is
+ used for these blocks and for decoding request bodies (the json_encoder
+ config selects 'auto' or 'json').  Blocks with NaN or Infinity values, and
+ all other values, are encoded with tornado.escape.json_encode as before, so
+ the output is the same either way.
+
+ Float values of arrays are rounded to json_float_precision significant
+ digits (0 for full precision).
+"""
+
+import numpy as np
+import tornado.escape
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # optional, pip install orjson
+
+import h5serv.config as config
+import h5serv.metricsUtil as metricsUtil
+
+BLOCK_SIZE = 65536  # max number of array elements encoded at a time
+
+
+def useOrjson():
+    return orjson is not None and config.get('json_encoder') != 'json'
+
+
+@metricsUtil.timed('json')
+def encode(value):
+    """ JSON encode value (as tornado.escape.json_encode) """
+    return tornado.escape.json_encode(value)
+
+
+@metricsUtil.timed('json')
+def decode(value):
+    """ Decode a JSON string or bytes (as tornado.escape.json_decode) """
+    if useOrjson():
+        try:
+            return orjson.loads(value)
+        except ValueError:
+            pass  # e.g. NaN values, json_decode will report any error
+    return tornado.escape.json_decode(value)
+
+
+def roundFloats(arr, precision):
+    """ Return a copy of the float array arr with the values rounded to
+        precision significant digits.
+    """
+    values = arr.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        mag = np.abs(values)
+        exponent = precision - 1 - np.floor(np.log10(mag))
+        # zeros, NaN, Inf and values too small or large to scale are left as is
+        mask = np.isfinite(exponent) & (np.abs(exponent) <= 300)
+        exponent = np.where(mask, exponent, 0)
+        scale = 10.0 ** np.abs(exponent)
+        rounded = np.where(exponent >= 0, np.round(values * scale) / scale,
+            np.round(values / scale) * scale)
+        values = np.where(mask, rounded, values)
+    return values.astype(arr.dtype)
+
+
+@metricsUtil.timed('json')
+def encodeBlock(arr, precision=0):
+    """ Return the JSON encoding (bytes) of the numeric array arr """
+    finite = True
+    if arr.dtype.kind == 'f':
+        if precision > 0:
+            arr = roundFloats(arr, precision)
+        finite = bool(np.isfinite(arr).all())
+    if finite and useOrjson():
+        if not arr.dtype.isnative:
+            arr = arr.astype(arr.dtype.newbyteorder('='))
+        try:
+            return orjson.dumps(np.ascontiguousarray(arr),
+                option=orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass  # type not supported by orjson (e.g. float16)
+    return tornado.escape.utf8(tornado.escape.json_encode(arr.tolist()))
+
+
+def iterEncodeArray(arr):
+    """ Yield the JSON encoding of the numeric array arr in pieces of at
+        most BLOCK_SIZE elements along the first dimension.
+    """
+    precision = int(config.get('json_float_precision'))
+    if arr.ndim == 0:
+        yield encodeBlock(arr.reshape(1), precision)[1:-1]
+        return
+    if arr.size <= BLOCK_SIZE:
+        yield encodeBlock(arr, precision)
+        return
+    rowSize = max(arr.size // arr.shape[0], 1)
+    nrows = max(BLOCK_SIZE // rowSize, 1)
+    yield b'['
+    for start in range(0, arr.shape[0], nrows):
+        text = encodeBlock(arr[start:start + nrows], precision)
+        if start > 0:
+            yield b','
+        yield text[1:-1]  # without the brackets of the block
+    yield b']'
+
+
+def isNumericArray(value):
+    return isinstance(value, np.ndarray) and value.dtype.kind in 'biuf' \
+        and value.dtype.names is None
+
+
+def iterEncode(value):
+    """ Yield the JSON encoding (bytes) of value in pieces.  Numeric NumPy
+        arrays (at the top level or as dict values) are encoded with
+        iterEncodeArray.
+    """
+    if isinstance(value, np.generic):
+        value = np.asarray(value)  # NumPy scalar
+    if isNumericArray(value):
+        for piece in iterEncodeArray(value):
+            yield piece
+    elif isinstance(value, np.ndarray):
+        yield tornado.escape.utf8(encode(value.tolist()))
+    elif isinstance(value, dict):
+        sep = b'{'
+        for k in value:
+            yield sep + tornado.escape.utf8(encode(k)) + b':'
+            for piece in iterEncode(value[k]):
+                yield piece
+            sep = b','
+        if sep == b'{':
+            yield sep
+        yield b'}'
+    else:
+        yield tornado.escape.utf8(encode(value))
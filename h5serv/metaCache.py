@@ -0,0 +1,210 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ In-memory cache of object metadata (e.g. the dataset items returned by
+ Hdf5db.getDatasetItemByUuid) keyed by file path, object uuid and kind.
+
+ The cache is only consistent when used inside a dbPool.getDb block for the
+ file: dbPool calls validate() when a request acquires the file, which drops
+ everything cached for the file if it was modified since the last request
+ released it (e.g. by some other process), and setStamp() when the request
+ releases the file.  Updates made by request handlers are not detected this
+ way - handlers that modify an object must call invalidate() for it.
+
+ The number of items cached is bounded by the 'meta_cache_size' config
+ (least recently used items are dropped first, 0 to disable the cache).
+
+ Usage:
+    with dbPool.getDb(filePath, app_logger=log) as db:
+        item = metaCache.get(filePath, obj_uuid, 'dataset')
+        if item is None:
+            item = db.getDatasetItemByUuid(obj_uuid)
+            metaCache.put(filePath, obj_uuid, 'dataset', item)
+
+ kind is a string, or a (kind, qualifier) tuple for items that also depend
+ on something other than the object, e.g. ('acl', userid).  Cached items are
+ shared between requests and must not be modified.
+"""
+
+import os.path as op
+import threading
+import logging
+from collections import OrderedDict
+
+import h5serv.config as config
+
+
+def getKindName(kind):
+    if isinstance(kind, tuple):
+        return kind[0]
+    return kind
+
+
+class FileRecord(object):
+    """ Keys of the items cached for a file and the file stamp (see
+        dbPool.getFileStamp) they are valid for.
+    """
+    def __init__(self):
+        self.stamp = None
+        self.keys = set()
+
+
+class MetaCache(object):
+
+    def __init__(self, max_items=None):
+        self.log = logging.getLogger("h5serv")
+        self.max_items = max_items
+        self.items = OrderedDict()  # (file, uuid, kind) -> item, lru first
+        self.files = {}  # file -> FileRecord
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def getMaxItems(self):
+        if self.max_items is not None:
+            return self.max_items
+        return int(config.get('meta_cache_size'))
+
+    def get(self, filePath, obj_uuid, kind):
+        """ Return cached item or None.
+        """
+        key = (op.normpath(filePath), obj_uuid, kind)
+        with self.lock:
+            item = self.items.pop(key, None)
+            if item is None:
+                self.misses += 1
+                return None
+            self.items[key] = item  # move to most recently used position
+            self.hits += 1
+            return item
+
+    def put(self, filePath, obj_uuid, kind, item):
+        max_items = self.getMaxItems()
+        if max_items <= 0:
+            return
+        fileKey = op.normpath(filePath)
+        key = (fileKey, obj_uuid, kind)
+        with self.lock:
+            rec = self.files.get(fileKey)
+            if rec is None:
+                rec = FileRecord()
+                self.files[fileKey] = rec
+            rec.keys.add(key)
+            self.items.pop(key, None)
+            self.items[key] = item
+            while len(self.items) > max_items:
+                self.removeItem(next(iter(self.items)))
+
+    def removeItem(self, key):
+        """ Called with the lock held.
+        """
+        del self.items[key]
+        rec = self.files.get(key[0])
+        if rec is not None:
+            rec.keys.discard(key)
+            if not rec.keys:
+                del self.files[key[0]]
+
+    def dropFile(self, fileKey):
+        """ Called with the lock held.
+        """
+        rec = self.files.pop(fileKey, None)
+        if rec is None:
+            return
+        for key in rec.keys:
+            self.items.pop(key, None)
+
+    def invalidate(self, filePath, obj_uuid=None, kind=None):
+        """ Drop the cached items for the given object and/or kind, or for all
+            objects in the file if neither is given.
+        """
+        fileKey = op.normpath(filePath)
+        with self.lock:
+            if obj_uuid is None and kind is None:
+                self.dropFile(fileKey)
+                return
+            rec = self.files.get(fileKey)
+            if rec is None:
+                return
+            for key in list(rec.keys):
+                if obj_uuid is not None and key[1] != obj_uuid:
+                    continue
+                if kind is not None and getKindName(key[2]) != kind:
+                    continue
+                self.removeItem(key)
+
+    def validate(self, filePath, stamp):
+        """ Drop the items for filePath if the file stamp has changed since
+            setStamp was last called.
+        """
+        fileKey = op.normpath(filePath)
+        with self.lock:
+            rec = self.files.get(fileKey)
+            if rec is not None and rec.stamp != stamp:
+                self.log.info("metaCache - file modified: " + filePath)
+                self.dropFile(fileKey)
+
+    def setStamp(self, filePath, stamp):
+        """ Record the file stamp after the items were read (or updated).
+        """
+        fileKey = op.normpath(filePath)
+        with self.lock:
+            rec = self.files.get(fileKey)
+            if rec is not None:
+                rec.stamp = stamp
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.files.clear()
+
+    def getCount(self):
+        return len(self.items)
+
+
+_cache = MetaCache()
+
+
+def get(filePath, obj_uuid, kind):
+    return _cache.get(filePath, obj_uuid, kind)
+
+
+def put(filePath, obj_uuid, kind, item):
+    _cache.put(filePath, obj_uuid, kind, item)
+
+
+def invalidate(filePath, obj_uuid=None, kind=None):
+    _cache.invalidate(filePath, obj_uuid, kind)
+
+
+def validate(filePath, stamp):
+    _cache.validate(filePath, stamp)
+
+
+def setStamp(filePath, stamp):
+    _cache.setStamp(filePath, stamp)
+
+
+def clear():
+    _cache.clear()
+
+
+def getCount():
+    return _cache.getCount()
+
+
+def getHits():
+    return _cache.hits
+
+
+def getMisses():
+    return _cache.misses
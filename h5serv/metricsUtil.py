@@ -0,0 +1,345 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Server metrics in the Prometheus text exposition format (served at
+ /metrics).
+
+ Metrics are kept per server process.  With the 'workers' config each
+ worker saves a snapshot of its metrics in a directory shared by the
+ workers (see setWorker) every second, and /metrics reports the series of
+ every worker, labelled with worker="<task id>", whichever worker serves
+ the request.
+
+ Usage:
+    requests_total = Counter("h5serv_requests_total", "Requests served",
+        ('handler', 'code'))
+    requests_total.inc(('ValueHandler', '200'))
+
+    with timer('hdf5'):
+        ...  # time is added to h5serv_time_seconds_total{phase="hdf5"}
+"""
+
+import os
+import os.path as op
+import json
+import time
+import threading
+import functools
+import logging
+from contextlib import contextmanager
+
+from tornado.ioloop import IOLoop
+
+# seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0)
+
+_metrics = []  # all metrics, in order of registration
+_lock = threading.Lock()
+_worker = None  # (task id, snapshot directory) if set by setWorker
+
+
+def formatLabels(pairs):
+    """ Return the label set for a list of (name, value) pairs.
+    """
+    if not pairs:
+        return ''
+    fields = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        fields.append(name + '="' + value + '"')
+    return '{' + ','.join(fields) + '}'
+
+
+def formatValue(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def formatMetric(name, help_text, metric_type, samples):
+    """ Return exposition format lines for a metric and its list of
+        (sample name, label pairs, value) samples.
+    """
+    lines = []
+    lines.append('# HELP ' + name + ' ' + help_text)
+    lines.append('# TYPE ' + name + ' ' + metric_type)
+    for sample_name, pairs, value in samples:
+        lines.append(sample_name + formatLabels(pairs) + ' ' + formatValue(value))
+    return lines
+
+
+class Metric(object):
+    """ Base class - a metric with a value per tuple of label values.
+    """
+    metric_type = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # label values tuple -> value
+        with _lock:
+            _metrics.append(self)
+
+    def getSamples(self):
+        """ Return list of (sample name, label pairs, value).
+        """
+        with _lock:
+            items = sorted(self.values.items())
+        samples = []
+        for labels, value in items:
+            samples.append((self.name, list(zip(self.labelnames, labels)), value))
+        return samples
+
+    def collect(self):
+        """ Return list of exposition format lines.
+        """
+        return formatMetric(self.name, self.help_text, self.metric_type,
+            self.getSamples())
+
+    def reset(self):
+        with _lock:
+            self.values.clear()
+
+
+class Counter(Metric):
+    metric_type = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """ Gauge whose value is returned by func when the metrics are collected.
+        metric_type can be set to 'counter' for counts maintained elsewhere.
+    """
+    metric_type = 'gauge'
+
+    def __init__(self, name, help_text, func, metric_type=None):
+        super(Gauge, self).__init__(name, help_text)
+        self.func = func
+        if metric_type:
+            self.metric_type = metric_type
+
+    def getSamples(self):
+        self.values = {(): self.func()}
+        return super(Gauge, self).getSamples()
+
+
+class Histogram(Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        with _lock:
+            item = self.values.get(labels)
+            if item is None:
+                # bucket counts (not cumulative), sum, count
+                item = [[0] * len(self.buckets), 0.0, 0]
+                self.values[labels] = item
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    item[0][i] += 1
+                    break
+            item[1] += value
+            item[2] += 1
+
+    def getSamples(self):
+        with _lock:
+            items = []
+            for labels, item in sorted(self.values.items()):
+                items.append((labels, list(item[0]), item[1], item[2]))
+        samples = []
+        for labels, bucket_counts, total, count in items:
+            pairs = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                samples.append((self.name + '_bucket',
+                    pairs + [('le', formatValue(bound))], cumulative))
+            samples.append((self.name + '_bucket', pairs + [('le', '+Inf')], count))
+            samples.append((self.name + '_sum', pairs, total))
+            samples.append((self.name + '_count', pairs, count))
+        return samples
+
+
+requests_total = Counter("h5serv_requests_total",
+    "Number of requests by handler, method and status code",
+    ('handler', 'method', 'code'))
+request_duration = Histogram("h5serv_request_duration_seconds",
+    "Request latency by handler", ('handler',))
+request_bytes = Counter("h5serv_request_bytes_total",
+    "Bytes received in request bodies by handler", ('handler',))
+response_bytes = Counter("h5serv_response_bytes_total",
+    "Bytes sent in response bodies by handler", ('handler',))
+phase_time = Counter("h5serv_time_seconds_total",
+    "Time spent by phase: hdf5 (Hdf5db calls), file_lock_wait, json (encoding "
+    "and decoding), and auth", ('phase',))
+ioloop_lag = Histogram("h5serv_ioloop_lag_seconds",
+    "Delay of IOLoop callbacks beyond their scheduled time")
+
+
+def addTime(phase, seconds):
+    phase_time.inc((phase,), seconds)
+
+
+@contextmanager
+def timer(phase):
+    """ Context manager adding the time spent in the block to the given phase.
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        addTime(phase, time.time() - start)
+
+
+def timed(phase):
+    """ Decorator adding the time spent in the function to the given phase.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def recordRequest(handler_name, method, status, duration, bytes_in, bytes_out):
+    requests_total.inc((handler_name, method, str(status)))
+    request_duration.observe(duration, (handler_name,))
+    if bytes_in:
+        request_bytes.inc((handler_name,), bytes_in)
+    if bytes_out:
+        response_bytes.inc((handler_name,), bytes_out)
+
+
+def startLagMonitor(interval=1.0):
+    """ Measure IOLoop lag by scheduling a callback every interval seconds
+        and recording how late it runs.
+    """
+    io_loop = IOLoop.current()
+
+    def check(expected):
+        now = io_loop.time()
+        ioloop_lag.observe(max(0.0, now - expected))
+        io_loop.call_later(interval, check, now + interval)
+
+    io_loop.call_later(interval, check, io_loop.time() + interval)
+
+
+def setWorker(task_id, snapshot_dir):
+    """ Called in each worker process with the workers config.  The metrics
+        of the worker are labelled with its task id, and saved in
+        snapshot_dir for the other workers to report.  A task_id of None
+        turns this off.
+    """
+    global _worker
+    if task_id is None:
+        _worker = None
+    else:
+        _worker = (str(task_id), snapshot_dir)
+
+
+def getSnapshot():
+    """ Return the metrics of this process as a list of JSON-serializable
+        dicts.
+    """
+    with _lock:
+        metrics = list(_metrics)
+    snapshot = []
+    for metric in metrics:
+        snapshot.append({'name': metric.name, 'help': metric.help_text,
+            'type': metric.metric_type, 'samples': metric.getSamples()})
+    return snapshot
+
+
+def getSnapshotPath(task_id):
+    return op.join(_worker[1], 'worker-' + task_id + '.json')
+
+
+def saveSnapshot():
+    """ Save the metrics of this worker to the snapshot directory.
+    """
+    if _worker is None:
+        return
+    filePath = getSnapshotPath(_worker[0])
+    try:
+        with open(filePath + '.tmp', 'w') as f:
+            json.dump(getSnapshot(), f)
+        os.rename(filePath + '.tmp', filePath)  # so readers see the whole file
+    except (IOError, OSError) as e:
+        log = logging.getLogger("h5serv")
+        log.warning("metrics - unable to save snapshot: " + str(e))
+
+
+def loadSnapshots():
+    """ Return dict of task id to metrics snapshot for all the workers.
+    """
+    snapshots = {}
+    for name in os.listdir(_worker[1]):
+        if not name.startswith('worker-') or not name.endswith('.json'):
+            continue
+        task_id = name[len('worker-'):-len('.json')]
+        try:
+            with open(getSnapshotPath(task_id)) as f:
+                snapshots[task_id] = json.load(f)
+        except (IOError, OSError, ValueError):
+            continue
+    snapshots[_worker[0]] = getSnapshot()  # the current values for this worker
+    return snapshots
+
+
+def startSnapshots(interval=1.0):
+    """ Save a snapshot of the metrics of this worker every interval seconds.
+    """
+    if _worker is None:
+        return
+    io_loop = IOLoop.current()
+
+    def save():
+        saveSnapshot()
+        io_loop.call_later(interval, save)
+
+    save()
+
+
+def render():
+    """ Return all metrics in the Prometheus text format.
+    """
+    if _worker is None:
+        lines = []
+        for metric in getSnapshot():
+            lines.extend(formatMetric(metric['name'], metric['help'],
+                metric['type'], metric['samples']))
+        return '\n'.join(lines) + '\n'
+
+    saveSnapshot()
+    snapshots = loadSnapshots()
+    # merge the samples of each metric, with the worker label added
+    samples = {}
+    for task_id in sorted(snapshots, key=lambda x: (len(x), x)):
+        for metric in snapshots[task_id]:
+            for sample_name, pairs, value in metric['samples']:
+                samples.setdefault(metric['name'], []).append(
+                    (sample_name, [('worker', task_id)] + list(pairs), value))
+    lines = []
+    for metric in snapshots[_worker[0]]:
+        lines.extend(formatMetric(metric['name'], metric['help'],
+            metric['type'], samples.get(metric['name'], [])))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,69 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ NumPy .npy format (application/x-npy) responses.
+
+ A .npy response is a header giving the dtype and shape of the values,
+ followed by the values in C order - i.e. the same bytes as an
+ application/octet-stream response, so the values can be sent in slabs
+ the same way.  Clients can read the response with numpy.load.
+"""
+
+import io
+
+import numpy as np
+from numpy.lib import format as npformat
+
+CONTENT_TYPE = 'application/x-npy'
+
+
+def getArrayType(dtype):
+    """ Return the dtype and extra dimensions of the values of an array of
+        the given dtype, e.g. ('<i4', (3,)) for an array type.
+    """
+    if dtype.subdtype is not None:
+        return dtype.subdtype
+    return dtype, ()
+
+
+def getDescr(dtype):
+    """ Return the .npy descr of dtype, without any h5py metadata (e.g. the
+        enum mapping) which can't be stored in the file.
+    """
+    if dtype.names is not None:
+        return dtype.descr
+    return dtype.str
+
+
+def getHeader(dtype, shape):
+    """ Return the .npy header (bytes) for an array of the given dtype (e.g.
+        from h5json.createDataType) and shape.
+    """
+    dtype, dims = getArrayType(dtype)
+    header = {'descr': getDescr(dtype), 'fortran_order': False,
+        'shape': tuple(shape) + tuple(dims)}
+    fp = io.BytesIO()
+    try:
+        npformat.write_array_header_1_0(fp, header)
+    except ValueError:
+        # header too big for version 1.0 (e.g. a compound type with many fields)
+        fp = io.BytesIO()
+        npformat.write_array_header_2_0(fp, header)
+    return fp.getvalue()
+
+
+def getValues(arr, dtype):
+    """ Return the array values read from the dataset as the dtype given in
+        the header (no copy if the types are the same).
+    """
+    dtype = getArrayType(dtype)[0]
+    return np.asarray(arr, dtype=dtype)
@@ -0,0 +1,296 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Multi-resolution pyramids of integer and float datasets (e.g. large
+ images), so zoomed out views can be read without reading the dataset.
+
+ Level 1 of a pyramid is the dataset downsampled by a factor of 2 along the
+ pyramid axes (by default the last two dimensions), level 2 is level 1
+ downsampled, and so on until the extents along the axes are at most
+ pyramid_min_size.  Each element of a level is the mean (NaN values are
+ skipped, and means of integer types are rounded), max or first
+ ('nearest') of the 2x2 (or 2, 2x2x2...) block of elements of the level
+ below.  Levels have the type of the dataset.
+
+ Pyramids are kept in the sidecar of the data file (see sidecarUtil), in
+ the group /pyramid/<dataset uuid>, with a chunked dataset for each level
+ ('level1', 'level2'...).  When values of the dataset are written,
+ updatePyramid recomputes just the elements of each level above the
+ region written.  If the pyramid can't be updated (e.g. the dataset was
+ resized) it is marked as stale and not used until it is rebuilt.  A
+ pyramid stored for an earlier modified time of the dataset is stale too.
+ Pyramids are built in the file of a sidecarUtil.Build, reading the dataset
+ with a dbPool.DatasetReader, so neither the sidecar nor the data file is
+ held for the whole build.
+"""
+
+import itertools
+import os.path as op
+import time
+import logging
+
+import numpy as np
+
+import h5serv.config as config
+import h5serv.sidecarUtil as sidecarUtil
+import h5serv.selectionUtil as selectionUtil
+
+PYRAMID_KIND = 'pyramid'  # sidecar group kind
+MEAN = 'mean'
+MAX = 'max'
+NEAREST = 'nearest'
+METHODS = (MEAN, MAX, NEAREST)
+MAX_POINT_BOXES = 256  # points written are updated one at a time up to this many
+
+
+def getAxes(axes, rank):
+    """ Return the sorted tuple of pyramid axes for the list axes (negative
+        values count back from rank), the last two dimensions if None.
+        Raises ValueError if invalid.
+    """
+    if axes is None:
+        return tuple(range(max(0, rank - 2), rank))
+    if not isinstance(axes, list) or not axes:
+        raise ValueError("axes should be a list of dimensions")
+    result = []
+    for axis in axes:
+        if not isinstance(axis, int) or isinstance(axis, bool):
+            raise ValueError("axes should be integers")
+        if axis < 0:
+            axis += rank
+        if axis < 0 or axis >= rank or axis in result:
+            raise ValueError("invalid axis: " + str(axis))
+        result.append(axis)
+    return tuple(sorted(result))
+
+
+def getLevelShape(shape, axes):
+    """ Return the shape of the level above one of the given shape """
+    return tuple((n + 1) // 2 if dim in axes else n for dim, n in enumerate(shape))
+
+
+def getLevelShapes(shape, axes, minSize):
+    """ Return the shapes of levels 1, 2, ... for a dataset of the given
+        shape, until the extents along axes are at most minSize.
+    """
+    shapes = []
+    while max(shape[dim] for dim in axes) > minSize:
+        shape = getLevelShape(shape, axes)
+        shapes.append(shape)
+    return shapes
+
+
+def downsample(values, method, axes):
+    """ Return the array values downsampled by a factor of 2 along axes.
+    """
+    if method == NEAREST:
+        return values[tuple(slice(None, None, 2) if dim in axes else slice(None)
+            for dim in range(values.ndim))]
+    dtype = values.dtype
+    isFloat = dtype.kind == 'f'
+    if method == MEAN or isFloat:
+        values = values.astype(np.float64)
+        fill = np.nan
+    else:
+        fill = np.iinfo(dtype).min
+    pad = [(0, n % 2 if dim in axes else 0) for dim, n in enumerate(values.shape)]
+    if any(p[1] for p in pad):
+        values = np.pad(values, pad, mode='constant', constant_values=fill)
+    # each axis is split into (n // 2, 2), and the 2's reduced
+    shape = []
+    reduceAxes = []
+    for dim, n in enumerate(values.shape):
+        if dim in axes:
+            shape.extend((n // 2, 2))
+            reduceAxes.append(len(shape) - 1)
+        else:
+            shape.append(n)
+    values = values.reshape(shape)
+    reduceAxes = tuple(reduceAxes)
+    if method == MAX:
+        result = np.fmax.reduce(values, axis=reduceAxes)  # skips NaN
+    else:
+        valid = ~np.isnan(values)
+        total = np.where(valid, values, 0.0).sum(axis=reduceAxes)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = total / valid.sum(axis=reduceAxes)
+        if not isFloat:
+            result = np.rint(result)
+    return result.astype(dtype)
+
+
+def downsampleRegion(src, dst, box, method, axes):
+    """ Set the region box (a tuple of slices) of the level dst from the
+        level below, src, reading src in blocks of about stream_buffer_size
+        bytes.
+    """
+    blockShape = selectionUtil.getBlockShape(dst,
+        int(config.get('stream_buffer_size')) // (2 ** len(axes)))
+    ranges = selectionUtil.getBlockSelections(
+        [slice(s.start, s.stop, 1) for s in box], blockShape)
+    for blockRanges in itertools.product(*ranges):
+        dstBox = tuple(slice(first, end) for first, end in blockRanges)
+        srcBox = tuple(slice(s.start * 2, min(s.stop * 2, n)) if dim in axes else s
+            for dim, (s, n) in enumerate(zip(dstBox, src.shape)))
+        dst[dstBox] = downsample(src[srcBox], method, axes)
+
+
+def getLevelBox(box, axes, shape):
+    """ Return the region of a level (of the given shape) computed from the
+        region box of the level below.
+    """
+    return tuple(slice(s.start // 2, min((s.stop + 1) // 2, n)) if dim in axes else s
+        for dim, (s, n) in enumerate(zip(box, shape)))
+
+
+def getLevel(grp, level):
+    """ Return the dataset for level (1 or more) of the pyramid group, or None
+        if there is no such level.
+    """
+    name = 'level' + str(level)
+    if name not in grp:
+        return None
+    return grp[name]
+
+
+def getLevelCount(grp):
+    return int(grp.attrs['levels'])
+
+
+def buildPyramid(f, obj_uuid, modified, dset, method=MEAN, axes=None):
+    """ Build a pyramid of the dataset dset (h5py dataset or
+        dbPool.DatasetReader) in f (the sidecar, or the file of a
+        sidecarUtil.Build), replacing any existing pyramid.  Returns the
+        pyramid group.  Raises ValueError for invalid options, or if the
+        dataset doesn't need a pyramid.
+    """
+    log = logging.getLogger("h5serv")
+    if method not in METHODS:
+        raise ValueError("unknown pyramid method: " + str(method))
+    if dset.dtype.kind not in 'iuf' or dset.dtype.subdtype is not None:
+        raise ValueError("pyramids are only supported for integer and float types")
+    if len(dset.shape) == 0:
+        raise ValueError("pyramids are not supported for scalar datasets")
+    axes = getAxes(axes, len(dset.shape))
+    shapes = getLevelShapes(dset.shape, axes, int(config.get('pyramid_min_size')))
+    if not shapes:
+        raise ValueError("dataset is no larger than pyramid_min_size along the axes")
+    grp = sidecarUtil.createGroup(f, PYRAMID_KIND, obj_uuid, modified)
+    try:
+        grp.attrs['method'] = method
+        grp.attrs['axes'] = axes
+        grp.attrs['shape'] = dset.shape
+        grp.attrs['levels'] = len(shapes)
+        grp.attrs['ctime'] = int(time.time())
+        src = dset
+        for level, shape in enumerate(shapes, 1):
+            dst = grp.create_dataset('level' + str(level), shape,
+                dtype=dset.dtype.newbyteorder('='), chunks=True)
+            downsampleRegion(src, dst, tuple(slice(0, n) for n in shape), method, axes)
+            src = dst
+    except Exception:
+        del f[grp.name]
+        raise
+    log.info("pyramid: built {} levels of {} for {}".format(len(shapes), method,
+        obj_uuid))
+    return grp
+
+
+def getPyramidGroup(f, obj_uuid):
+    """ Return the pyramid group of the dataset, or None if there is none """
+    return sidecarUtil.getGroup(f, PYRAMID_KIND, obj_uuid)
+
+
+def isResized(grp, dset):
+    return tuple(grp.attrs['shape']) != tuple(dset.shape)
+
+
+def isStale(grp, dset, modified):
+    """ Return True if the pyramid is out of date with the dataset, last
+        modified at the given time.
+    """
+    return sidecarUtil.isStale(grp) or grp.attrs.get('modified') != modified or \
+        isResized(grp, dset)
+
+
+def getPyramidItem(grp, dset, modified):
+    """ Return a description (dict) of the pyramid """
+    item = {}
+    item['method'] = str(grp.attrs['method'])
+    item['axes'] = [int(axis) for axis in grp.attrs['axes']]
+    item['stale'] = bool(isStale(grp, dset, modified))
+    item['ctime'] = int(grp.attrs['ctime'])
+    item['levels'] = []
+    for level in range(1, getLevelCount(grp) + 1):
+        item['levels'].append([int(n) for n in getLevel(grp, level).shape])
+    return item
+
+
+def getPreviewLevel(filePath, obj_uuid, dset, modified):
+    """ Return the (level, axes) of the top level of the dataset's pyramid,
+        or None if there is no pyramid (or it is stale).
+    """
+    if not op.exists(sidecarUtil.getSidecarPath(filePath)):
+        return None
+    with sidecarUtil.openSidecar(filePath) as f:
+        grp = getPyramidGroup(f, obj_uuid)
+        if grp is None or isStale(grp, dset, modified):
+            return None
+        return getLevelCount(grp), tuple(int(axis) for axis in grp.attrs['axes'])
+
+
+def getPointBoxes(points):
+    """ Return boxes (tuples of slices) covering the points (an array of
+        coordinates): one for each point, or their bounding box if there are
+        more than MAX_POINT_BOXES.
+    """
+    points = np.unique(np.asarray(points), axis=0)
+    if len(points) > MAX_POINT_BOXES:
+        return [tuple(slice(int(lo), int(hi) + 1) for lo, hi in
+            zip(points.min(axis=0), points.max(axis=0)))]
+    return [tuple(slice(int(i), int(i) + 1) for i in point) for point in points]
+
+
+def updatePyramid(filePath, obj_uuid, dset, modified, boxes=None, points=None):
+    """ Recompute the elements of each level of the dataset's pyramid above
+        the regions written: boxes (tuples of slices) or points (an array
+        of coordinates), the whole dataset if neither is given.  The pyramid
+        is marked as stale if it can't be updated.
+    """
+    if not op.exists(sidecarUtil.getSidecarPath(filePath)):
+        return
+    with sidecarUtil.openSidecar(filePath, modify=True) as f:
+        grp = getPyramidGroup(f, obj_uuid)
+        if grp is None or sidecarUtil.isStale(grp):
+            return
+        if isResized(grp, dset):
+            grp.attrs['modified'] = sidecarUtil.STALE
+            return
+        if boxes is None and points is None:
+            boxes = [tuple(slice(0, n) for n in dset.shape)]
+        elif boxes is None:
+            boxes = []
+        if points is not None and len(points):
+            boxes = list(boxes) + getPointBoxes(points)
+        method = str(grp.attrs['method'])
+        axes = tuple(int(axis) for axis in grp.attrs['axes'])
+        for box in boxes:
+            box = tuple(slice(s.start, s.stop) for s in box)
+            if any(s.stop <= s.start for s in box):
+                continue
+            src = dset
+            for level in range(1, getLevelCount(grp) + 1):
+                dst = getLevel(grp, level)
+                box = getLevelBox(box, axes, dst.shape)
+                downsampleRegion(src, dst, box, method, axes)
+                src = dst
+        grp.attrs['modified'] = modified
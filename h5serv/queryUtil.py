@@ -0,0 +1,771 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Queries (the query param of GET value) on one dimensional compound type
+ datasets, and on numeric datasets of any rank.
+
+ A query such as "(temp > 32.0) & (dir == 'N')" is parsed once into a
+ Query, which evaluates the condition on a block of rows as a NumPy boolean
+ mask.  For datasets without fields the element value is named "value",
+ e.g. "value > 310".  If the numexpr package is installed it is used for conditions on
+ numeric fields (the query_evaluator config selects 'auto' or 'numpy').
+ Only the fields used by the condition and the fields to be returned are
+ read.
+
+ The dataset is scanned in blocks of about query_block_size bytes (a whole
+ number of chunks).  A Summary holds the min and max values of the numeric
+ fields for each block, filled in as blocks are scanned, and blocks that
+ can't match the condition are skipped.  Summaries are kept in the sidecar
+ of the data file (see sidecarUtil) until the dataset is modified.
+
+ If the dataset has indexes on fields of the condition (see indexUtil),
+ they are used to find the candidate rows, and just the blocks with
+ candidates are read.
+
+ Datasets without fields are queried with runArrayQuery, one block of
+ whole chunks (of about query_block_size bytes) at a time, returning the
+ coordinates and values of the matching elements block by block.
+
+ A scan stopped by the limit returns a cursor, which a later request can
+ pass to continue the scan from that row (or block) rather than from the
+ start.
+"""
+
+import ast
+import base64
+import itertools
+import json
+import logging
+
+import numpy as np
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None  # optional, pip install numexpr
+
+import h5serv.config as config
+import h5serv.sidecarUtil as sidecarUtil
+import h5serv.selectionUtil as selectionUtil
+
+SUMMARY_KIND = 'summary'  # sidecar group kind
+VALUE_NAME = 'value'  # name of the element value for datasets without fields
+
+_compareOps = {ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=',
+    ast.Gt: '>', ast.GtE: '>='}
+# no '**': a constant power (e.g. 9**9**9**9) could take forever to evaluate
+_binOps = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/',
+    ast.Mod: '%', ast.BitAnd: '&', ast.BitOr: '|', ast.BitXor: '^'}
+_reversedOps = {'==': '==', '!=': '!=', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+
+def useNumexpr():
+    return numexpr is not None and config.get('query_evaluator') != 'numpy'
+
+
+def isNumericType(dtype):
+    return dtype.kind in 'biuf' and dtype.subdtype is None
+
+
+class Query(object):
+    """ Parsed query condition for a dataset of the given dtype (compound,
+        or without fields for VALUE_NAME).  Raises ValueError if the query
+        is not valid.
+    """
+    def __init__(self, query, dtype):
+        self.query = query
+        self.dtype = dtype
+        self.names = dtype.names if dtype.names is not None else (VALUE_NAME,)
+        self.fields = []  # fields used by the condition, in dataset order
+        try:
+            tree = ast.parse(query.strip(), mode='eval')
+        except SyntaxError:
+            raise ValueError("invalid query syntax")
+        self.node = self.check(tree.body)
+        self.fields = [name for name in self.names if name in self.fields]
+        if not self.fields:
+            raise ValueError("no field name in query")
+        self.numexprStr = None
+        if all(isNumericType(self.getFieldType(name)) for name in self.fields):
+            try:
+                self.numexprStr = self.getNumexprStr(self.node)
+            except ValueError:
+                pass  # string constant, evaluate with numpy
+
+    def getFieldType(self, name):
+        if self.dtype.names is None:
+            return self.dtype
+        return self.dtype.fields[name][0]
+
+    def getColumn(self, rows, name):
+        """ Return the values of the field of the rows """
+        if self.dtype.names is None:
+            return rows
+        return rows[name]
+
+    def check(self, node):
+        """ Validate the parse tree, returning it with 'and', 'or' and 'not'
+            replaced by the equivalent '&', '|' and '~' elementwise operators.
+        """
+        if isinstance(node, ast.Expression):
+            return self.check(node.body)
+        if isinstance(node, ast.BoolOp):
+            op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+            out = self.check(node.values[0])
+            for value in node.values[1:]:
+                out = ast.BinOp(left=out, op=op, right=self.check(value))
+            return out
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not):
+                return ast.UnaryOp(op=ast.Invert(), operand=self.check(node.operand))
+            if isinstance(node.op, (ast.Invert, ast.USub, ast.UAdd)):
+                return ast.UnaryOp(op=node.op, operand=self.check(node.operand))
+        elif isinstance(node, ast.BinOp):
+            if type(node.op) in _binOps:
+                left = self.check(node.left)
+                right = self.check(node.right)
+                # no string arithmetic: e.g. 'x'*300000000 would be built in memory
+                for operand in (left, right):
+                    if isinstance(operand, ast.Constant) and \
+                            isinstance(operand.value, (str, bytes)):
+                        raise ValueError("unsupported string arithmetic in query")
+                return ast.BinOp(left=left, op=node.op, right=right)
+        elif isinstance(node, ast.Compare):
+            for op in node.ops:
+                if type(op) not in _compareOps:
+                    raise ValueError("unsupported comparison operator")
+            operands = [self.check(node.left)] + [self.check(c) for c in node.comparators]
+            # a < b < c -> (a < b) & (b < c)
+            out = None
+            for i, op in enumerate(node.ops):
+                cmp = ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+                out = cmp if out is None else ast.BinOp(left=out, op=ast.BitAnd(), right=cmp)
+            return out
+        elif isinstance(node, ast.Name):
+            if node.id not in self.names:
+                raise ValueError("unknown field name: " + node.id)
+            if node.id not in self.fields:
+                self.fields.append(node.id)
+            return node
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, (int, float, str, bytes)) and \
+                    not isinstance(node.value, bool):
+                return node
+        raise ValueError("unsupported expression in query")
+
+    def getNumexprStr(self, node):
+        """ Return the numexpr expression for the (checked) parse tree """
+        if isinstance(node, ast.UnaryOp):
+            op = {ast.Invert: '~', ast.USub: '-', ast.UAdd: '+'}[type(node.op)]
+            return '(' + op + self.getNumexprStr(node.operand) + ')'
+        if isinstance(node, ast.BinOp):
+            return '(' + self.getNumexprStr(node.left) + ' ' + _binOps[type(node.op)] + \
+                ' ' + self.getNumexprStr(node.right) + ')'
+        if isinstance(node, ast.Compare):
+            return '(' + self.getNumexprStr(node.left) + ' ' + \
+                _compareOps[type(node.ops[0])] + ' ' + \
+                self.getNumexprStr(node.comparators[0]) + ')'
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node.value, (str, bytes)):
+            raise ValueError("string constant")
+        return repr(node.value)
+
+    def evaluate(self, rows):
+        """ Return the boolean mask of the rows (with at least the query
+            fields) that meet the condition.
+        """
+        mask = None
+        if self.numexprStr is not None and useNumexpr():
+            columns = {}
+            for name in self.fields:
+                column = self.getColumn(rows, name)
+                if not column.dtype.isnative:
+                    column = column.astype(column.dtype.newbyteorder('='))
+                columns[name] = column
+            try:
+                mask = numexpr.evaluate(self.numexprStr, local_dict=columns,
+                    global_dict={})
+            except (KeyError, TypeError, ValueError, NotImplementedError,
+                    OverflowError):
+                mask = None  # e.g. bitwise operators on floats, use numpy
+        if mask is None:
+            try:
+                with np.errstate(all='ignore'):
+                    mask = self.evalNode(self.node, rows)
+            except OverflowError:
+                # e.g. an integer constant too large for the field type
+                raise ValueError("number out of range in query")
+        mask = np.asarray(mask)
+        if mask.dtype != np.bool_:
+            raise ValueError("query condition is not a boolean expression")
+        if mask.shape != (len(rows),):
+            mask = np.broadcast_to(mask, (len(rows),))
+        return mask
+
+    def evalNode(self, node, rows):
+        if isinstance(node, ast.UnaryOp):
+            value = self.evalNode(node.operand, rows)
+            if isinstance(node.op, ast.Invert):
+                return ~value
+            if isinstance(node.op, ast.USub):
+                return -value
+            return value
+        if isinstance(node, ast.BinOp):
+            left = self.evalNode(node.left, rows)
+            right = self.evalNode(node.right, rows)
+            op = type(node.op)
+            if op is ast.BitAnd:
+                return left & right
+            if op is ast.BitOr:
+                return left | right
+            if op is ast.BitXor:
+                return left ^ right
+            if op is ast.Add:
+                return left + right
+            if op is ast.Sub:
+                return left - right
+            if op is ast.Mult:
+                return left * right
+            if op is ast.Div:
+                return left / right
+            return left % right
+        if isinstance(node, ast.Compare):
+            left = self.evalNode(node.left, rows)
+            right = self.evalNode(node.comparators[0], rows)
+            left, right = matchStrings(left, right)
+            op = _compareOps[type(node.ops[0])]
+            if op == '==':
+                return left == right
+            if op == '!=':
+                return left != right
+            if op == '<':
+                return left < right
+            if op == '<=':
+                return left <= right
+            if op == '>':
+                return left > right
+            return left >= right
+        if isinstance(node, ast.Name):
+            return self.getColumn(rows, node.id)
+        return node.value
+
+    def mayMatch(self, ranges):
+        """ Return False if no row with field values in the given ranges
+            (dict of field name to (min, max) for some of the numeric fields)
+            can meet the condition.
+        """
+        return self.mayMatchNode(self.node, ranges)
+
+    def mayMatchNode(self, node, ranges):
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.BitAnd):
+                return self.mayMatchNode(node.left, ranges) and \
+                    self.mayMatchNode(node.right, ranges)
+            if isinstance(node.op, ast.BitOr):
+                return self.mayMatchNode(node.left, ranges) or \
+                    self.mayMatchNode(node.right, ranges)
+            return True
+        compare = getFieldCompare(node)
+        if compare is None:
+            return True
+        name, op, value = compare
+        if name not in ranges or not isinstance(value, (int, float)):
+            return True
+        lo, hi = ranges[name]
+        # NaN values don't meet any of these conditions
+        if op == '==':
+            return bool(lo <= value <= hi)
+        if op == '<':
+            return bool(lo < value)
+        if op == '<=':
+            return bool(lo <= value)
+        if op == '>':
+            return bool(hi > value)
+        if op == '>=':
+            return bool(hi >= value)
+        return True  # '!='
+
+    def getCandidates(self, indexes, maxRows):
+        """ Return the sorted row indexes (NumPy int64 array) of the rows
+            that may meet the condition, found with indexes (dict of field
+            name to indexUtil index), or None if the indexes can't narrow
+            them down to at most maxRows rows.
+        """
+        return self.getCandidatesNode(self.node, indexes, maxRows)
+
+    def getCandidatesNode(self, node, indexes, maxRows):
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.BitAnd):
+                left = self.getCandidatesNode(node.left, indexes, maxRows)
+                right = self.getCandidatesNode(node.right, indexes, maxRows)
+                if left is None:
+                    return right
+                if right is None:
+                    return left
+                return np.intersect1d(left, right, assume_unique=True)
+            if isinstance(node.op, ast.BitOr):
+                left = self.getCandidatesNode(node.left, indexes, maxRows)
+                if left is None:
+                    return None
+                right = self.getCandidatesNode(node.right, indexes, maxRows)
+                if right is None or len(left) + len(right) > maxRows:
+                    return None
+                return np.union1d(left, right)
+            return None
+        compare = getFieldCompare(node)
+        if compare is None or compare[0] not in indexes:
+            return None
+        name, op, value = compare
+        return indexes[name].lookup(op, value, maxRows)
+
+
+def getFieldCompare(node):
+    """ Return (field name, operator, constant) for a comparison of a field
+        with a constant, None for other nodes.
+    """
+    if not isinstance(node, ast.Compare):
+        return None
+    op = _compareOps[type(node.ops[0])]
+    left = node.left
+    right = node.comparators[0]
+    if isinstance(right, ast.Name) and isinstance(left, ast.Constant):
+        left, right = right, left
+        op = _reversedOps[op]
+    if not isinstance(left, ast.Name) or not isinstance(right, ast.Constant):
+        return None
+    return left.id, op, right.value
+
+
+def matchStrings(left, right):
+    """ Convert a str constant compared with a fixed length (bytes) string
+        field to bytes, and a bytes constant compared with a variable length
+        (str) field to str.
+    """
+    for a, b in ((left, right), (right, left)):
+        if isinstance(a, np.ndarray) and a.dtype.kind == 'S' and isinstance(b, str):
+            b = b.encode('utf-8')
+        elif isinstance(a, np.ndarray) and a.dtype.kind == 'O' and isinstance(b, bytes):
+            b = b.decode('utf-8')
+        else:
+            continue
+        if a is left:
+            return a, b
+        return b, a
+    return left, right
+
+
+def getBlockSize(dset):
+    """ Return the number of rows of the blocks a dataset is scanned in """
+    itemSize = max(dset.dtype.itemsize, 1)
+    rows = max(1, int(config.get('query_block_size')) // itemSize)
+    if dset.chunks:
+        chunk_rows = dset.chunks[0]
+        rows = max(chunk_rows, rows - rows % chunk_rows)
+    return rows
+
+
+class Summary(object):
+    """ Min and max values of each numeric field of a dataset for each block
+        of rows.  valid[name][i] is True if the values for block i of field
+        name have been set.
+    """
+    def __init__(self, dtype, nrows, blockSize, modified=None):
+        self.blockSize = blockSize
+        self.nrows = nrows
+        self.modified = modified
+        self.nblocks = (nrows + blockSize - 1) // blockSize
+        self.names = [name for name in dtype.names if
+            isNumericType(dtype.fields[name][0])]
+        self.minmax = {}
+        self.valid = {}
+        for name in self.names:
+            fieldType = dtype.fields[name][0].newbyteorder('=')
+            self.minmax[name] = np.zeros((self.nblocks, 2), dtype=fieldType)
+            self.valid[name] = np.zeros((self.nblocks,), dtype=bool)
+        self.changed = False
+
+    def getRanges(self, block):
+        ranges = {}
+        for name in self.names:
+            if self.valid[name][block]:
+                lo, hi = self.minmax[name][block]
+                ranges[name] = (lo, hi)
+        return ranges
+
+    def update(self, block, rows):
+        """ Set the values for block from the rows (all rows of the block,
+            with some of the fields).
+        """
+        for name in rows.dtype.names:
+            if name not in self.valid or self.valid[name][block]:
+                continue
+            column = rows[name]
+            if len(column) == 0:
+                continue
+            if column.dtype.kind == 'f':
+                if np.isnan(column).all():
+                    lo = hi = np.nan
+                else:
+                    lo = np.nanmin(column)
+                    hi = np.nanmax(column)
+            else:
+                lo = column.min()
+                hi = column.max()
+            self.minmax[name][block] = (lo, hi)
+            self.valid[name][block] = True
+            self.changed = True
+
+    def load(self, grp):
+        """ Read the values stored in the sidecar group, if they are for the
+            same dataset shape and block size.
+        """
+        if grp.attrs.get('nrows') != self.nrows or \
+                grp.attrs.get('block_size') != self.blockSize:
+            return
+        for name in self.names:
+            if name in grp and (name + '.valid') in grp:
+                minmax = grp[name][...]
+                if minmax.shape == self.minmax[name].shape:
+                    self.minmax[name][...] = minmax
+                    self.valid[name][...] = grp[name + '.valid'][...]
+
+    def save(self, grp):
+        grp.attrs['nrows'] = self.nrows
+        grp.attrs['block_size'] = self.blockSize
+        for name in self.names:
+            if self.valid[name].any():
+                grp.create_dataset(name, data=self.minmax[name])
+                grp.create_dataset(name + '.valid', data=self.valid[name])
+
+
+def getSummary(filePath, obj_uuid, dset, modified):
+    """ Return the Summary for the dataset, with the values stored in the
+        sidecar if any.
+    """
+    summary = Summary(dset.dtype, dset.shape[0], getBlockSize(dset), modified)
+    if not config.get('query_summary') or not summary.names:
+        return summary
+    with sidecarUtil.openSidecar(filePath) as f:
+        grp = sidecarUtil.getGroup(f, SUMMARY_KIND, obj_uuid, modified)
+        if grp is not None:
+            summary.load(grp)
+    return summary
+
+
+def saveSummary(filePath, obj_uuid, summary):
+    """ Store the summary in the sidecar if it has new values """
+    if not config.get('query_summary') or not summary.changed:
+        return
+    with sidecarUtil.openSidecar(filePath, modify=True) as f:
+        if f is None:
+            return
+        grp = sidecarUtil.createGroup(f, SUMMARY_KIND, obj_uuid, summary.modified)
+        summary.save(grp)
+    summary.changed = False
+
+
+def encodeState(state):
+    text = json.dumps(state, sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(text).decode('ascii')
+
+
+def decodeState(cursor, query):
+    """ Return the state (dict) of the cursor for the query.  Raises
+        ValueError if the cursor is invalid or is for a different query.
+    """
+    try:
+        text = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        state = json.loads(text.decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(state, dict):
+        raise ValueError("invalid cursor")
+    if state.get('query') != query:
+        raise ValueError("cursor is not for this query")
+    return state
+
+
+def encodeCursor(query, start, stop, step):
+    """ Return the cursor to continue a query from row start """
+    return encodeState({'query': query, 'start': start, 'stop': stop, 'step': step})
+
+
+def decodeCursor(cursor, query):
+    """ Return the (start, stop, step) of the cursor.  Raises ValueError if
+        the cursor is invalid or is for a different query.
+    """
+    state = decodeState(cursor, query)
+    try:
+        start, stop, step = int(state['start']), int(state['stop']), int(state['step'])
+    except (TypeError, ValueError, KeyError):
+        raise ValueError("invalid cursor")
+    if start < 0 or step < 1:
+        raise ValueError("invalid cursor")
+    return start, stop, step
+
+
+def encodeArrayCursor(query, slices, position):
+    """ Return the cursor to continue an array query (see runArrayQuery) of
+        the selection slices from position.
+    """
+    state = {'query': query, 'position': list(position)}
+    state['start'] = [s.start for s in slices]
+    state['stop'] = [s.stop for s in slices]
+    state['step'] = [s.step or 1 for s in slices]
+    return encodeState(state)
+
+
+def decodeArrayCursor(cursor, query):
+    """ Return the (slices, position) of an array query cursor.  Raises
+        ValueError if the cursor is invalid or is for a different query.
+    """
+    state = decodeState(cursor, query)
+    try:
+        starts = [int(x) for x in state['start']]
+        stops = [int(x) for x in state['stop']]
+        steps = [int(x) for x in state['step']]
+        block, offset = [int(x) for x in state['position']]
+    except (TypeError, ValueError, KeyError):
+        raise ValueError("invalid cursor")
+    if not len(starts) == len(stops) == len(steps) or block < 0 or offset < 0 or \
+            min(starts + [0]) < 0 or min(steps + [1]) < 1:
+        raise ValueError("invalid cursor")
+    slices = [slice(start, stop, step) for start, stop, step in zip(starts, stops, steps)]
+    return slices, (block, offset)
+
+
+class QueryResult(object):
+    """ Result of runQuery - the indexes (NumPy int64 array) and values (a
+        NumPy array of the output fields, None for count) of the matching
+        rows, the count of matching rows, and the row to continue the scan
+        from (None if the scan reached stop).  For runArrayQuery indexes are
+        the coordinates of the matching elements (with a column for each
+        dimension if the rank is more than one), and next is the (block,
+        offset) position to continue from.
+    """
+    def __init__(self):
+        self.indexes = []
+        self.values = []
+        self.count = 0
+        self.next = None
+        self.cursor = None  # set by the request handler from next
+        self.blocksRead = 0
+        self.blocksSkipped = 0
+        self.indexed = False  # candidate rows found with indexes
+
+
+def scanBlocks(dset, query, start, stop, step, blockSize, readFields, summary, result):
+    """ Generate the (row indexes, rows) of each block of the selection that
+        may have matches.
+    """
+    while start < stop:
+        block = start // blockSize
+        blockStart = block * blockSize
+        blockEnd = min(blockStart + blockSize, stop)
+        if summary is not None and not query.mayMatch(summary.getRanges(block)):
+            result.blocksSkipped += 1
+        else:
+            rows = selectionUtil.readValues(dset, slice(start, blockEnd, step), readFields)
+            result.blocksRead += 1
+            if summary is not None and step == 1 and start == blockStart and \
+                    blockEnd == min(blockStart + blockSize, dset.shape[0]):
+                summary.update(block, rows)
+            yield np.arange(start, blockEnd, step, dtype=np.int64), rows
+        # next selected row at or after the end of the block
+        start += selectionUtil.getSliceCount(slice(start, blockEnd, step)) * step
+
+
+def candidateBlocks(dset, candidates, start, stop, step, blockSize, readFields, result):
+    """ Generate the (row indexes, rows) of the candidate rows in the
+        selection, for each block with candidates.
+    """
+    candidates = candidates[(candidates >= start) & (candidates < stop)]
+    if step > 1:
+        candidates = candidates[(candidates - start) % step == 0]
+    prevBlock = start // blockSize - 1
+    i = 0
+    while i < len(candidates):
+        block = int(candidates[i]) // blockSize
+        j = int(np.searchsorted(candidates, (block + 1) * blockSize))
+        points = candidates[i:j]
+        first = int(points[0])
+        span = int(points[-1]) + 1 - first
+        if span <= len(points) * 16:
+            # read the span of the candidates rather than each one
+            rows = selectionUtil.readValues(dset, slice(first, first + span), readFields)
+            rows = rows[points - first]
+        else:
+            rows = selectionUtil.readValues(dset, points, readFields)
+        result.blocksRead += 1
+        result.blocksSkipped += block - prevBlock - 1
+        prevBlock = block
+        yield points, rows
+        i = j
+    if start < stop:
+        result.blocksSkipped += (stop - 1) // blockSize - prevBlock
+
+
+def runQuery(dset, query, s, limit=None, count=False, fields=None, summary=None,
+        candidates=None):
+    """ Scan the rows of dataset dset selected by slice s for rows meeting
+        the condition of query (a Query), returning a QueryResult.  If count
+        is True just the matches are counted.  If fields is given just these
+        fields are returned (otherwise all fields).  Blocks that can't match
+        are skipped using summary (a Summary), which is updated with the
+        blocks that are read in full.  If candidates (sorted row indexes,
+        see Query.getCandidates) is given, just those rows are read.
+    """
+    log = logging.getLogger("h5serv")
+    step = s.step or 1
+    stop = min(s.stop, dset.shape[0])
+    result = QueryResult()
+    if count:
+        outFields = []
+    elif fields is None:
+        outFields = list(dset.dtype.names)
+    else:
+        outFields = list(fields)
+    readFields = [name for name in dset.dtype.names
+        if name in query.fields or name in outFields]
+    if readFields == list(dset.dtype.names):
+        readFields = None  # read whole rows
+    blockSize = summary.blockSize if summary is not None else getBlockSize(dset)
+
+    if candidates is not None:
+        result.indexed = True
+        blocks = candidateBlocks(dset, candidates, s.start, stop, step, blockSize,
+            readFields, result)
+    else:
+        blocks = scanBlocks(dset, query, s.start, stop, step, blockSize, readFields,
+            summary, result)
+    for rowIndexes, rows in blocks:
+        matches = np.nonzero(query.evaluate(rows))[0]
+        if limit and result.count + len(matches) >= limit:
+            matches = matches[:limit - result.count]
+            if len(matches) > 0:
+                result.next = int(rowIndexes[matches[-1]]) + step
+        result.count += len(matches)
+        if not count and len(matches) > 0:
+            result.indexes.append(rowIndexes[matches])
+            values = rows[matches]
+            if list(values.dtype.names) != outFields:
+                values = selectionUtil.getFields(values, outFields)
+            result.values.append(values)
+        if result.next is not None:
+            break
+
+    if result.next is not None and result.next >= stop:
+        result.next = None
+    if result.indexes:
+        result.indexes = np.concatenate(result.indexes)
+    else:
+        result.indexes = np.zeros((0,), dtype=np.int64)
+    if count:
+        result.values = None
+    elif result.values:
+        result.values = np.concatenate(result.values)
+    else:
+        result.values = np.zeros((0,),
+            dtype=selectionUtil.getFieldsDtype(dset.dtype, outFields))
+    log.info("query: {} matches, {} blocks read, {} skipped{}".format(
+        result.count, result.blocksRead, result.blocksSkipped,
+        " (indexed)" if result.indexed else ""))
+    return result
+
+
+def getArrayBlockShape(dset):
+    """ Return the shape of the blocks a dataset is queried in by
+        runArrayQuery - a whole number of chunks (or rows, for contiguous
+        datasets) of about query_block_size bytes.
+    """
+    return selectionUtil.getBlockShape(dset, int(config.get('query_block_size')))
+
+
+def runArrayQuery(dset, query, slices, limit=None, count=False, position=None):
+    """ Find the elements of the N-dimensional dataset dset (without fields)
+        selected by slices that meet the condition of query (a Query),
+        returning a QueryResult.  The selection is read one block (see
+        getArrayBlockShape) at a time, and matches are returned in block
+        order, in C order within each block.  If count is True just the
+        matches are counted.  position (the next value of an earlier
+        result) continues from that block and offset.
+    """
+    log = logging.getLogger("h5serv")
+    rank = len(dset.shape)
+    steps = [s.step or 1 for s in slices]
+    slices = [slice(s.start, min(s.stop, extent), step)
+        for s, extent, step in zip(slices, dset.shape, steps)]
+    blockShape = getArrayBlockShape(dset)
+    ranges = selectionUtil.getBlockSelections(slices, blockShape)
+    nblocks = int(np.prod([len(dimRanges) for dimRanges in ranges]))
+    startBlock, skip = position if position is not None else (0, 0)
+    result = QueryResult()
+
+    blocks = itertools.product(*ranges)
+    for block, blockRanges in enumerate(itertools.islice(blocks, startBlock, None), startBlock):
+        selection = tuple(slice(first, end, step)
+            for (first, end), step in zip(blockRanges, steps))
+        values = dset[selection]
+        result.blocksRead += 1
+        flat = values.reshape(-1)
+        matches = np.nonzero(query.evaluate(flat))[0]
+        offset = 0
+        if block == startBlock and skip:
+            offset = skip
+            matches = matches[skip:]
+        nmatches = len(matches)
+        if limit and result.count + nmatches >= limit:
+            matches = matches[:limit - result.count]
+            if len(matches) < nmatches or block < nblocks - 1:
+                result.next = (block, offset + len(matches))
+        result.count += len(matches)
+        if not count and len(matches) > 0:
+            coords = np.unravel_index(matches, values.shape)
+            indexes = np.zeros((len(matches), rank), dtype=np.int64)
+            for dim in range(rank):
+                indexes[:, dim] = selection[dim].start + coords[dim] * steps[dim]
+            result.indexes.append(indexes)
+            result.values.append(flat[matches])
+        if result.next is not None:
+            break
+
+    if result.indexes:
+        result.indexes = np.concatenate(result.indexes)
+    else:
+        result.indexes = np.zeros((0, rank), dtype=np.int64)
+    if rank == 1:
+        result.indexes = result.indexes[:, 0]
+    if count:
+        result.values = None
+    elif result.values:
+        result.values = np.concatenate(result.values)
+    else:
+        result.values = np.zeros((0,), dtype=dset.dtype)
+    log.info("query: {} matches, {} of {} blocks read".format(result.count,
+        result.blocksRead, nblocks))
+    return result
+
+
+def getRecords(result):
+    """ Return the matches of the (not count) query result as a NumPy array
+        with an 'index' field (the index, or coordinates, of each match) and
+        a 'value' field.
+    """
+    indexType = ('index', '<i8')
+    if len(result.indexes.shape) > 1:
+        indexType = ('index', '<i8', (result.indexes.shape[1],))
+    records = np.zeros((len(result.indexes),),
+        dtype=[indexType, ('value', result.values.dtype)])
+    records['index'] = result.indexes
+    records['value'] = result.values
+    return records
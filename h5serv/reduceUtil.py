@@ -0,0 +1,317 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Reductions (min, max, sum, mean and std) of a hyperslab selection of a
+ numeric dataset, over all of its dimensions or just the given axes.
+
+ The selection is read in one pass, in blocks of whole chunks (see
+ selectionUtil.getBlockShape), and each block is reduced with NumPy into
+ running counts, totals, means and sums of squared differences (combined
+ as in Chan et al.'s parallel variance algorithm), so only the result is
+ kept in memory.  The 'nan' variants (e.g. nanmean) skip NaN values, and
+ if skipFill is set elements equal to the dataset's fill value (e.g.
+ chunks never written) are skipped too.
+
+ Selections of at least reduce_process_size bytes are split between the
+ processes of a pool (reduce_processes), each of which opens the file
+ read-only and returns its Reduction to be merged.
+"""
+
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import threading
+
+import numpy as np
+import h5py
+
+import h5serv.selectionUtil as selectionUtil
+
+OPS = ('min', 'max', 'sum', 'mean', 'std')
+NAN_OPS = tuple('nan' + op for op in OPS)
+
+_pool = None
+_poolSize = 0
+_poolLock = threading.Lock()
+
+
+def getAxes(text, rank):
+    """ Return the sorted tuple of axes given by text (comma separated,
+        negative values count back from rank), all of them if text is None.
+        Raises ValueError if invalid.
+    """
+    if text is None or not text.strip():
+        return tuple(range(rank))
+    axes = []
+    for item in text.strip().strip('[]').split(','):
+        try:
+            axis = int(item)
+        except ValueError:
+            raise ValueError("invalid axis: " + item)
+        if axis < 0:
+            axis += rank
+        if axis < 0 or axis >= rank:
+            raise ValueError("axis out of range: " + item)
+        if axis in axes:
+            raise ValueError("repeated axis: " + item)
+        axes.append(axis)
+    return tuple(sorted(axes))
+
+
+def getFillValue(dset):
+    """ Return the fill value set for the dataset, or None if there is none.
+    """
+    plist = dset.id.get_create_plist()
+    if plist.fill_value_defined() != h5py.h5d.FILL_VALUE_USER_DEFINED:
+        return None
+    return dset.fillvalue
+
+
+class Reduction(object):
+    """ Running reduction op of blocks of a selection of the given shape
+        over axes (see add).  Reductions of other blocks of the same
+        selection (e.g. from another process) are combined with merge.
+    """
+    def __init__(self, op, shape, axes, dtype, fillValue=None):
+        if op not in OPS and op not in NAN_OPS:
+            raise ValueError("unknown reduce operation: " + op)
+        if dtype.kind not in ('i', 'u', 'f'):
+            raise ValueError("reduce is only supported for integer and float types")
+        self.op = op
+        self.skipNan = op in NAN_OPS and dtype.kind == 'f'
+        self.base = op[3:] if op in NAN_OPS else op
+        self.shape = tuple(shape)
+        self.axes = tuple(axes)
+        self.dtype = dtype
+        self.fillValue = fillValue
+        outShape = tuple(n for dim, n in enumerate(self.shape) if dim not in self.axes)
+        self.count = np.zeros(outShape, dtype=np.int64)
+        self.total = None
+        self.mean = None
+        self.m2 = None
+        self.value = None
+        if self.base == 'sum':
+            self.total = np.zeros(outShape, dtype=self.getSumType())
+        elif self.base in ('mean', 'std'):
+            self.mean = np.zeros(outShape, dtype=np.float64)
+            self.m2 = np.zeros(outShape, dtype=np.float64)
+        else:
+            self.value = np.full(outShape, self.getIdentity(), dtype=dtype)
+
+    def getSumType(self):
+        if self.dtype.kind == 'i':
+            return np.int64
+        if self.dtype.kind == 'u':
+            return np.uint64
+        return np.float64
+
+    def getIdentity(self):
+        if self.dtype.kind == 'f':
+            return np.inf if self.base == 'min' else -np.inf
+        info = np.iinfo(self.dtype)
+        return info.max if self.base == 'min' else info.min
+
+    def getValid(self, values):
+        """ Return the boolean array of values to include, or None for all.
+        """
+        valid = None
+        if self.skipNan:
+            valid = ~np.isnan(values)
+        if self.fillValue is not None:
+            if values.dtype.kind == 'f' and np.isnan(self.fillValue):
+                notFill = ~np.isnan(values)
+            else:
+                notFill = values != self.fillValue
+            valid = notFill if valid is None else valid & notFill
+        return valid
+
+    def add(self, values, position):
+        """ Add the values of a block of the selection, where position is
+            the index in the selection of its first element.
+        """
+        region = tuple(slice(p, p + n) for dim, (p, n) in
+            enumerate(zip(position, values.shape)) if dim not in self.axes)
+        valid = self.getValid(values)
+        if valid is None:
+            count = np.full(self.count[region].shape,
+                int(np.prod([values.shape[dim] for dim in self.axes])), dtype=np.int64)
+        else:
+            count = valid.sum(axis=self.axes, dtype=np.int64)
+
+        if self.base == 'sum':
+            if valid is not None:
+                values = np.where(valid, values, 0)
+            total = values.sum(axis=self.axes, dtype=self.getSumType())
+            self.combine(region, count, total=total)
+        elif self.base in ('mean', 'std'):
+            values = values.astype(np.float64)
+            if valid is not None:
+                values = np.where(valid, values, 0.0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = values.sum(axis=self.axes) / count
+            m2 = None
+            if self.base == 'std':
+                diff = values - np.expand_dims(mean, self.axes)
+                if valid is not None:
+                    diff = np.where(valid, diff, 0.0)
+                m2 = (diff * diff).sum(axis=self.axes)
+            self.combine(region, count, mean=mean, m2=m2)
+        else:
+            if valid is not None:
+                values = np.where(valid, values, self.getIdentity()).astype(self.dtype)
+            if self.base == 'min':
+                value = values.min(axis=self.axes)
+            else:
+                value = values.max(axis=self.axes)
+            self.combine(region, count, value=value)
+
+    def combine(self, region, count, total=None, mean=None, m2=None, value=None):
+        """ Combine the partial results for the output region.
+        """
+        countA = self.count[region]
+        countAB = countA + count
+        if total is not None:
+            self.total[region] += total
+        elif mean is not None:
+            meanA = self.mean[region]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                weight = np.where(countAB > 0, count / np.maximum(countAB, 1), 0.0)
+                delta = np.where(count > 0, mean - meanA, 0.0)
+                self.mean[region] = meanA + delta * weight
+                if m2 is not None:
+                    m2 = np.where(count > 0, m2, 0.0)
+                    self.m2[region] += m2 + delta * delta * countA * weight
+        elif self.base == 'min':
+            self.value[region] = np.minimum(self.value[region], value)
+        else:
+            self.value[region] = np.maximum(self.value[region], value)
+        self.count[region] = countAB
+
+    def merge(self, other):
+        """ Combine the Reduction of other blocks of the selection.
+        """
+        region = tuple(slice(0, n) for n in self.count.shape)
+        self.combine(region, other.count, total=other.total, mean=other.mean,
+            m2=other.m2, value=other.value)
+
+    def getResult(self):
+        """ Return the result (a NumPy array, 0-d if all axes are reduced).
+            Results with no values to reduce are NaN (0 for sums).
+        """
+        empty = self.count == 0
+        if self.base == 'sum':
+            return self.total
+        if self.base == 'mean':
+            result = self.mean.copy()
+        elif self.base == 'std':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = np.sqrt(self.m2 / self.count)
+        else:
+            result = self.value
+            if empty.any() and result.dtype.kind != 'f':
+                result = result.astype(np.float64)
+        if empty.any():
+            result = result.copy()
+            result[empty] = np.nan
+        return result
+
+
+def getBlocks(dset, slices, blockSize):
+    """ Return a list of (selection, position) for the blocks of whole
+        chunks (of about blockSize bytes) the dataset selection slices is
+        read in, where position is the index in the selection of the first
+        element of the block.
+    """
+    steps = [s.step or 1 for s in slices]
+    ranges = selectionUtil.getBlockSelections(slices,
+        selectionUtil.getBlockShape(dset, blockSize))
+    blocks = []
+    for blockRanges in itertools.product(*ranges):
+        selection = tuple(slice(first, end, step)
+            for (first, end), step in zip(blockRanges, steps))
+        position = tuple((first - s.start) // step
+            for (first, end), s, step in zip(blockRanges, slices, steps))
+        blocks.append((selection, position))
+    return blocks
+
+
+def reduceBlocks(dset, reduction, blocks):
+    for selection, position in blocks:
+        reduction.add(dset[selection], position)
+    return reduction
+
+
+def reduceFileBlocks(filePath, name, reduction, blocks):
+    """ Reduce the blocks of the dataset name in the file (run in a pool
+        process).
+    """
+    try:
+        f = h5py.File(filePath, 'r', locking=False)
+    except TypeError:
+        f = h5py.File(filePath, 'r')  # h5py < 3.5
+    try:
+        return reduceBlocks(f[name], reduction, blocks)
+    finally:
+        f.close()
+
+
+def getPool(processes):
+    """ Return the shared process pool (started with spawn, as the server
+        has threads and open HDF5 files that shouldn't be forked).
+    """
+    global _pool, _poolSize
+    with _poolLock:
+        if _pool is None or _poolSize != processes:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'))
+            _poolSize = processes
+        return _pool
+
+
+def shutdown(wait=True):
+    global _pool
+    with _poolLock:
+        pool = _pool
+        _pool = None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+def reduceSelection(dset, slices, op, axes, blockSize, skipFill=False, processes=0,
+        processSize=0):
+    """ Return the Reduction op of the h5py dataset selection slices over
+        axes.  If processes is set and the selection is at least processSize
+        bytes, blocks are reduced in that many pool processes.
+    """
+    shape = tuple(selectionUtil.getSliceCount(s) for s in slices)
+    fillValue = getFillValue(dset) if skipFill else None
+    reduction = Reduction(op, shape, axes, dset.dtype, fillValue=fillValue)
+    blocks = getBlocks(dset, slices, blockSize)
+    nbytes = int(np.prod(shape)) * dset.dtype.itemsize
+    if processes < 2 or nbytes < processSize or len(blocks) < 2:
+        return reduceBlocks(dset, reduction, blocks)
+
+    # pool processes read the file, so write out any cached changes
+    dset.file.flush()
+    pool = getPool(processes)
+    count = min(processes, len(blocks))
+    futures = []
+    for i in range(count):
+        part = blocks[i * len(blocks) // count:(i + 1) * len(blocks) // count]
+        partReduction = Reduction(op, shape, axes, dset.dtype, fillValue=fillValue)
+        futures.append(pool.submit(reduceFileBlocks, dset.file.filename, dset.name,
+            partReduction, part))
+    for future in futures:
+        reduction.merge(future.result())
+    return reduction
@@ -0,0 +1,671 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Helper functions for dataset selections
+
+ The select parameter of value requests is compiled by parseSelection to a
+ Selection, e.g. for a two dimensional dataset:
+
+    [0:10,:]             rows 0-9 (start:stop:step, each optional)
+    [-5:,3]              last five rows of column 3
+    [[7,2,9],0:100:10]   rows 7, 2, and 9 of every tenth column
+    [0:2,:]|[:,0:2]      the union of the first two rows and columns
+"""
+
+import itertools
+
+import numpy as np
+import h5py
+
+
+def getSliceCount(s):
+    """ Return number of elements selected by slice s (start/stop/step set).
+    """
+    step = s.step or 1
+    if s.stop <= s.start:
+        return 0
+    return (s.stop - s.start + step - 1) // step
+
+
+def getSlabs(s, rowSize, bufferSize, chunks=None):
+    """ Split the first dimension slice s into a list of slices each
+        selecting at most bufferSize bytes (but at least one row), where
+        rowSize is the number of bytes selected by one index of the first
+        dimension.  If chunks (the dataset chunk shape) is given, slab
+        boundaries are placed on chunk boundaries where possible so no chunk
+        is read by more than one slab.
+    """
+    step = s.step or 1
+    rows = max(1, bufferSize // max(rowSize, 1))  # selected rows per slab
+    span = rows * step  # extent of a slab in dataset coordinates
+    chunk_rows = None
+    if chunks:
+        chunk_rows = chunks[0]
+        if span > chunk_rows:
+            span -= span % chunk_rows  # whole number of chunks
+
+    slabs = []
+    start = s.start
+    while start < s.stop:
+        stop = start + span
+        if chunk_rows:
+            aligned = stop - stop % chunk_rows
+            if aligned > start:
+                stop = aligned
+        stop = min(stop, s.stop)
+        slabs.append(slice(start, stop, step))
+        # next selected index at or after stop
+        start += getSliceCount(slice(start, stop, step)) * step
+    return slabs
+
+
+def getBlockShape(dset, blockSize):
+    """ Return the shape of the blocks to read the dataset in - a whole
+        number of chunks (or rows, for contiguous datasets) of about
+        blockSize bytes.
+    """
+    shape = dset.shape
+    budget = max(1, blockSize // max(dset.dtype.itemsize, 1))
+    if dset.chunks:
+        block = list(dset.chunks)
+    else:
+        block = [1] * len(shape)
+    # grow the block from the last dimension
+    for dim in reversed(range(len(shape))):
+        other = int(np.prod(block)) // block[dim]
+        extent = max(block[dim], (budget // other) // block[dim] * block[dim])
+        block[dim] = max(1, min(extent, shape[dim]))
+        if extent < shape[dim]:
+            break
+    return tuple(block)
+
+
+def getBlockSelections(slices, blockShape):
+    """ Return, for each dimension, the list of (start, stop) ranges of the
+        selection in each block along that dimension.
+    """
+    ranges = []
+    for s, size in zip(slices, blockShape):
+        step = s.step or 1
+        dimRanges = []
+        if s.start < s.stop:
+            for block in range(s.start // size, (s.stop - 1) // size + 1):
+                blockStart = block * size
+                first = s.start
+                if blockStart > first:
+                    # first selected index in the block
+                    first += -(-(blockStart - first) // step) * step
+                end = min(blockStart + size, s.stop)
+                if first < end:
+                    dimRanges.append((first, end))
+        ranges.append(dimRanges)
+    return ranges
+
+
+def getFieldsDtype(dtype, fields):
+    """ Return the dtype of compound dtype with just the given fields (in
+        that order).
+    """
+    return np.dtype([(name, dtype.fields[name][0]) for name in fields])
+
+
+def getFields(values, fields):
+    """ Return a copy of the compound array values with just the given
+        fields.
+    """
+    out = np.zeros(values.shape, dtype=getFieldsDtype(values.dtype, fields))
+    for name in fields:
+        out[name] = values[name]
+    return out
+
+
+def readValues(dset, selection, fields=None):
+    """ Return the values of the h5py dataset for the given selection.  If
+        fields is given only those fields of the compound type are read (as a
+        compound type with just those fields).
+    """
+    if fields is None:
+        return dset[selection]
+    if hasattr(dset, 'fields'):
+        return dset.fields(fields)[selection]
+    # h5py 2.x - field names given with the selection
+    if not isinstance(selection, tuple):
+        selection = (selection,)
+    values = dset[selection + tuple(fields)]
+    if len(fields) == 1:
+        # single field is returned as an array of that field type
+        out = np.zeros(values.shape, dtype=getFieldsDtype(dset.dtype, fields))
+        out[fields[0]] = values
+        values = out
+    return values
+
+
+def getPoints(points, shape):
+    """ Return the point selection points (a list of ints for a rank 1
+        dataset or a list of coordinate lists, or a NumPy array) as an
+        (n, rank) int64 array.  Raises ValueError if points are not valid
+        or out of range for the dataset shape.
+    """
+    rank = len(shape)
+    try:
+        arr = np.asarray(points)
+    except ValueError:
+        raise ValueError("points should all have " + str(rank) + " coordinates")
+    if arr.size == 0:
+        return np.zeros((0, rank), dtype=np.int64)
+    if arr.dtype.kind not in ('i', 'u'):
+        raise ValueError("point coordinates should be integers")
+    if rank == 1 and arr.ndim == 1:
+        arr = arr.reshape((-1, 1))
+    if arr.ndim != 2 or arr.shape[1] != rank:
+        raise ValueError("points should all have " + str(rank) + " coordinates")
+    if arr.dtype.kind == 'u' and arr.dtype.itemsize == 8:
+        if np.any(arr > np.iinfo(np.int64).max):
+            raise ValueError("point selection out of range")
+    arr = arr.astype(np.int64)
+    if np.any(arr < 0) or np.any(arr >= np.array(shape, dtype=np.int64)):
+        raise ValueError("point selection out of range")
+    return arr
+
+
+def getBinaryPoints(data, shape):
+    """ Return the points of a binary point selection (rank little-endian
+        uint64 coordinates per point) as an (n, rank) int64 array.
+    """
+    rank = len(shape)
+    pointSize = 8 * rank
+    if len(data) % pointSize != 0:
+        raise ValueError("binary points should be a multiple of " + str(pointSize) + " bytes")
+    arr = np.frombuffer(data, dtype='<u8').reshape((-1, rank))
+    return getPoints(arr, shape)
+
+
+def sortPoints(points, shape, chunks=None):
+    """ Return (order, offsets, chunkIds) where order is the (stable) order
+        of the points by chunk (of the chunk shape chunks, if given), then by
+        element, and offsets and chunkIds are the element offsets and chunk
+        numbers of the points in that order.  Duplicate points are adjacent.
+    """
+    offsets = np.ravel_multi_index(tuple(points.T), shape)
+    if chunks:
+        chunks = np.array(chunks, dtype=np.int64)
+        nchunks = (np.array(shape, dtype=np.int64) + chunks - 1) // chunks
+        chunkIds = np.ravel_multi_index(tuple((points // chunks).T), tuple(nchunks))
+    else:
+        chunkIds = np.zeros(len(points), dtype=np.int64)
+    order = np.lexsort((offsets, chunkIds))
+    return order, offsets[order], chunkIds[order]
+
+
+def getChunkRuns(chunkIds):
+    """ Return the (start, stop) index pairs of each run of equal (sorted)
+        chunkIds.
+    """
+    edges = np.flatnonzero(chunkIds[1:] != chunkIds[:-1]) + 1
+    bounds = [0] + edges.tolist() + [len(chunkIds)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def getBox(points):
+    """ Return the bounding box (tuple of slices) of the points.
+    """
+    low = points.min(axis=0)
+    high = points.max(axis=0) + 1
+    return tuple(slice(int(low[i]), int(high[i])) for i in range(len(low)))
+
+
+def readElements(dset, points):
+    """ Read the elements of the dataset at points (an (n, rank) array) with
+        one HDF5 point selection.
+    """
+    values = np.zeros((len(points),), dtype=dset.dtype)
+    fspace = dset.id.get_space()
+    fspace.select_elements(points.astype(np.uint64))
+    mspace = h5py.h5s.create_simple((len(points),))
+    dset.id.read(mspace, fspace, values, mtype=h5py.h5t.py_create(dset.dtype))
+    return values
+
+
+def writeElements(dset, points, values):
+    """ Write values to the elements of the dataset at points (an (n, rank)
+        array) with one HDF5 point selection.
+    """
+    values = np.ascontiguousarray(values)
+    fspace = dset.id.get_space()
+    fspace.select_elements(points.astype(np.uint64))
+    mspace = h5py.h5s.create_simple((len(points),))
+    dset.id.write(mspace, fspace, values, mtype=h5py.h5t.py_create(dset.dtype))
+
+
+def readPoints(dset, points, fields=None):
+    """ Return the values of the h5py dataset at points (an (n, rank) array
+        from getPoints), in the same order.  Points are sorted by chunk and
+        duplicates read once: each chunk is read with one selection (the
+        bounding box of its points), so is only read (and decompressed)
+        once.  Points of a contiguous dataset are read with one HDF5 point
+        selection.  If fields is given only those fields of the compound type
+        are read.
+    """
+    dtype = dset.dtype
+    if fields is not None:
+        dtype = getFieldsDtype(dtype, fields)
+    count = len(points)
+    if count == 0:
+        return np.zeros((0,), dtype=dtype)
+
+    order, offsets, chunkIds = sortPoints(points, dset.shape, dset.chunks)
+    first = np.ones(count, dtype=bool)
+    first[1:] = offsets[1:] != offsets[:-1]
+    unique = points[order[first]]
+    if dset.chunks:
+        values = np.zeros((len(unique),), dtype=dtype)
+        for start, stop in getChunkRuns(chunkIds[first]):
+            chunkPoints = unique[start:stop]
+            box = getBox(chunkPoints)
+            low = np.array([s.start for s in box], dtype=np.int64)
+            arr = readValues(dset, box, fields)
+            values[start:stop] = arr[tuple((chunkPoints - low).T)]
+    elif dtype.hasobject:
+        # variable length types, read each element
+        values = np.zeros((len(unique),), dtype=dtype)
+        for i in range(len(unique)):
+            values[i] = readValues(dset, tuple(unique[i]), fields)
+    else:
+        values = readElements(dset, unique)
+        if fields is not None:
+            values = getFields(values, fields)
+
+    # index in unique of each point, in request order
+    inverse = np.empty(count, dtype=np.int64)
+    inverse[order] = np.cumsum(first) - 1
+    return values[inverse]
+
+
+def writePoints(dset, points, values):
+    """ Write values (an array of the dataset type, one value per point) to
+        the h5py dataset at points (an (n, rank) array from getPoints).  If a
+        point is given more than once the last value is written.  Like
+        readPoints, each chunk is read and written once (with the bounding
+        box of its points).
+    """
+    count = len(points)
+    if count == 0:
+        return
+    order, offsets, chunkIds = sortPoints(points, dset.shape, dset.chunks)
+    # lexsort is stable, so the last of duplicate points is the last value
+    last = np.ones(count, dtype=bool)
+    last[:-1] = offsets[1:] != offsets[:-1]
+    unique = points[order[last]]
+    values = values[order[last]]
+    if dset.chunks:
+        for start, stop in getChunkRuns(chunkIds[last]):
+            chunkPoints = unique[start:stop]
+            box = getBox(chunkPoints)
+            low = np.array([s.start for s in box], dtype=np.int64)
+            arr = dset[box]
+            arr[tuple((chunkPoints - low).T)] = values[start:stop]
+            dset[box] = arr
+    elif dset.dtype.hasobject:
+        for i in range(len(unique)):
+            dset[tuple(unique[i])] = values[i]
+    else:
+        writeElements(dset, unique, values)
+
+
+def splitSelection(text, sep):
+    """ Split text at each sep that is not inside brackets.
+    """
+    parts = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(text):
+        if c == '[':
+            depth += 1
+        elif c == ']':
+            depth -= 1
+        elif c == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def parseIndex(text, extent, dim):
+    """ Return the index given by text for a dimension of extent (negative
+        indexes count back from the extent).
+    """
+    try:
+        index = int(text)
+    except ValueError:
+        raise ValueError("invalid selection parameter (can't convert to int) for dimension: " +
+            str(dim))
+    if index < 0:
+        index += extent
+    return index
+
+
+def parseDim(text, extent, dim):
+    """ Return the selection of one dimension: a slice (with start, stop and
+        step set) or an int64 array of indexes.
+    """
+    text = text.strip()
+    if text.startswith('['):
+        if not text.endswith(']') or not text[1:-1].strip():
+            raise ValueError("invalid index list for dimension: " + str(dim))
+        indexes = [parseIndex(item.strip(), extent, dim) for item in text[1:-1].split(',')]
+        indexes = np.array(indexes, dtype=np.int64)
+        if np.any(indexes < 0) or np.any(indexes >= extent):
+            raise ValueError("index out of range for dimension: " + str(dim))
+        return indexes
+    if ':' not in text:
+        index = parseIndex(text, extent, dim)
+        if index < 0 or index >= extent:
+            raise ValueError("index out of range for dimension: " + str(dim))
+        return slice(index, index + 1, 1)
+    parts = text.split(':')
+    if len(parts) > 3:
+        raise ValueError("Too many ':' seperators for dimension: " + str(dim))
+    start = 0
+    stop = extent
+    step = 1
+    if parts[0].strip():
+        start = parseIndex(parts[0], extent, dim)
+    if parts[1].strip():
+        stop = parseIndex(parts[1], extent, dim)
+    if len(parts) > 2 and parts[2].strip():
+        step = parseIndex(parts[2], 0, dim)
+    if start < 0 or start > extent:
+        raise ValueError("Invalid selection start parameter for dimension: " + str(dim))
+    if stop < start or stop > extent:
+        raise ValueError("Invalid selection stop parameter for dimension: " + str(dim))
+    if step <= 0:
+        raise ValueError("invalid selection step parameter for dimension: " + str(dim))
+    return slice(start, stop, step)
+
+
+def parseSelection(text, shape, mask=None):
+    """ Return the Selection given by the select string text for a dataset
+        of the given shape: one or more hyperslabs separated by '|', each
+        with a selection for every dimension in brackets.  Raises ValueError
+        if text is not valid.
+    """
+    hyperslabs = []
+    for part in splitSelection(text.strip(), '|'):
+        part = part.strip()
+        if not part.startswith('['):
+            raise ValueError("selection query missing start bracket")
+        if not part.endswith(']'):
+            raise ValueError("selection query missing end bracket")
+        dims = splitSelection(part[1:-1], ',')
+        if len(dims) != len(shape):
+            raise ValueError("selection should have " + str(len(shape)) + " dimensions")
+        hyperslabs.append(tuple(parseDim(dims[dim], shape[dim], dim)
+            for dim in range(len(shape))))
+    return Selection(shape, hyperslabs, mask=mask)
+
+
+def getDimCount(sel):
+    """ Return the number of indexes of a dimension selection.
+    """
+    if isinstance(sel, slice):
+        return getSliceCount(sel)
+    return len(sel)
+
+
+def getDimGroups(sel, size):
+    """ Return the groups of the dimension selection sel (a slice, or sorted
+        unique indexes) in each block of size along the dimension: a list
+        of (start, stop, read, local) where start:stop are the positions in
+        the selection, read is the slice to read, and local the positions in
+        read of the selected indexes (None for all of them).
+    """
+    groups = []
+    if isinstance(sel, slice):
+        for first, end in getBlockSelections([sel], [size])[0]:
+            read = slice(first, end, sel.step)
+            start = (first - sel.start) // sel.step
+            groups.append((start, start + getSliceCount(read), read, None))
+    elif len(sel) > 0:
+        for start, stop in getChunkRuns(sel // size):
+            low = int(sel[start])
+            read = slice(low, int(sel[stop - 1]) + 1, 1)
+            groups.append((start, stop, read, sel[start:stop] - low))
+    return groups
+
+
+def getSelectedBox(box, selected):
+    """ Return the (box, selected) of the bounding box of the selected
+        elements in box.
+    """
+    local = []
+    for axis in range(selected.ndim):
+        other = tuple(a for a in range(selected.ndim) if a != axis)
+        hits = np.flatnonzero(selected.any(axis=other))
+        local.append(slice(int(hits[0]), int(hits[-1]) + 1))
+    box = tuple(slice(b.start + l.start, b.start + l.stop) for b, l in zip(box, local))
+    return box, selected[tuple(local)]
+
+
+class Selection(object):
+    """ A compiled dataset selection: the union of one or more hyperslabs,
+        each a tuple with a slice or an array of indexes for each dimension,
+        optionally restricted to the nonzero elements of mask (an h5py
+        dataset of the same shape).
+
+        A single hyperslab without a mask is simple: it selects the outer
+        product of its dimensions (as with np.ix_), so values have a
+        dimension for each dataset dimension, with indexes in the order
+        given.  Otherwise values are one dimensional, in the row-major order
+        of the dataset with each element once (as with a NumPy boolean mask).
+
+        Values are read and written in blocks of whole chunks of about
+        blockSize bytes (see getBlockShape), so each chunk is read once.
+    """
+    def __init__(self, shape, hyperslabs=None, mask=None):
+        self.shape = tuple(shape)
+        if hyperslabs is None:
+            hyperslabs = [tuple(slice(0, extent, 1) for extent in self.shape)]
+        self.hyperslabs = hyperslabs
+        self.mask = mask
+        if mask is not None:
+            if tuple(mask.shape) != self.shape:
+                raise ValueError("mask dataset should have the shape of the dataset")
+            if mask.dtype.kind not in ('b', 'i', 'u', 'f'):
+                raise ValueError("mask dataset should have a numeric type")
+
+    def isSimple(self):
+        return len(self.hyperslabs) == 1 and self.mask is None
+
+    def getSlices(self):
+        """ Return the tuple of slices of a simple selection without index
+            lists, otherwise None.
+        """
+        if not self.isSimple():
+            return None
+        for sel in self.hyperslabs[0]:
+            if not isinstance(sel, slice):
+                return None
+        return self.hyperslabs[0]
+
+    def getShape(self):
+        """ Return the shape of the values of a simple selection (None if the
+            selection is not simple).
+        """
+        if not self.isSimple():
+            return None
+        return tuple(getDimCount(sel) for sel in self.hyperslabs[0])
+
+    def getCount(self, dset, blockSize):
+        """ Return the number of elements selected.
+        """
+        if self.isSimple():
+            return int(np.prod(self.getShape()))
+        count = 0
+        for box, selected, offsets in self.getBlocks(getBlockShape(dset, blockSize)):
+            count += len(offsets)
+        return count
+
+    def getBlocks(self, blockShape):
+        """ Generator of (box, selected, offsets) for each block with selected
+            elements of a selection that is not simple: box is the slices
+            to read, selected a boolean array of the elements selected in box
+            and offsets the (row-major) element offsets of those elements.
+        """
+        keys = set()
+        slabGroups = []
+        for hyperslab in self.hyperslabs:
+            dimGroups = []
+            for sel, size in zip(hyperslab, blockShape):
+                if not isinstance(sel, slice):
+                    sel = np.unique(sel)
+                groups = {}
+                for start, stop, read, local in getDimGroups(sel, size):
+                    groups[read.start // size] = (read, local)
+                dimGroups.append(groups)
+            slabGroups.append(dimGroups)
+            keys.update(itertools.product(*[sorted(groups) for groups in dimGroups]))
+
+        for key in sorted(keys):
+            box = tuple(slice(k * size, min((k + 1) * size, extent))
+                for k, size, extent in zip(key, blockShape, self.shape))
+            selected = np.zeros([b.stop - b.start for b in box], dtype=bool)
+            for dimGroups in slabGroups:
+                if not all(k in groups for k, groups in zip(key, dimGroups)):
+                    continue
+                local = []
+                for k, groups, b in zip(key, dimGroups, box):
+                    read, indexes = groups[k]
+                    if indexes is None:
+                        indexes = np.arange(0, read.stop - read.start, read.step)
+                    local.append(indexes + (read.start - b.start))
+                selected[np.ix_(*local)] = True
+            box, selected = getSelectedBox(box, selected)
+            if self.mask is not None:
+                selected &= readValues(self.mask, box) != 0
+                if not selected.any():
+                    continue
+            coords = np.nonzero(selected)
+            offsets = np.ravel_multi_index(
+                tuple(c + b.start for c, b in zip(coords, box)), self.shape)
+            yield box, selected, offsets
+
+    def getBoxes(self):
+        """ Return the bounding box (a tuple of slices) of each hyperslab.
+        """
+        boxes = []
+        for hyperslab in self.hyperslabs:
+            box = []
+            for sel in hyperslab:
+                if isinstance(sel, slice):
+                    box.append(slice(sel.start, sel.stop))
+                elif len(sel) > 0:
+                    box.append(slice(int(sel.min()), int(sel.max()) + 1))
+                else:
+                    box.append(slice(0, 0))
+            boxes.append(tuple(box))
+        return boxes
+
+    def getSimpleDims(self):
+        """ Return (sel, order) for each dimension of a simple selection:
+            sel is the slice or sorted unique indexes, and order the index
+            in sel of each index given (None if they are the same).
+        """
+        dims = []
+        for sel in self.hyperslabs[0]:
+            if isinstance(sel, slice) or np.all(sel[1:] > sel[:-1]):
+                dims.append((sel, None))
+            else:
+                unique, order = np.unique(sel, return_inverse=True)
+                dims.append((unique, order.reshape(-1)))
+        return dims
+
+    def read(self, dset, blockSize, fields=None):
+        """ Return the selected values of the h5py dataset.  If fields is
+            given only those fields of the compound type are read.
+        """
+        dtype = dset.dtype
+        if fields is not None:
+            dtype = getFieldsDtype(dtype, fields)
+        blockShape = getBlockShape(dset, blockSize)
+
+        if not self.isSimple():
+            pieces = []
+            offsets = []
+            for box, selected, blockOffsets in self.getBlocks(blockShape):
+                pieces.append(readValues(dset, box, fields)[selected])
+                offsets.append(blockOffsets)
+            if not pieces:
+                return np.zeros((0,), dtype=dtype)
+            values = np.concatenate(pieces)
+            return values[np.argsort(np.concatenate(offsets), kind='stable')]
+
+        dims = self.getSimpleDims()
+        values = np.zeros([getDimCount(sel) for sel, order in dims], dtype=dtype)
+        groups = [getDimGroups(sel, size) for (sel, order), size in zip(dims, blockShape)]
+        for block in itertools.product(*groups):
+            arr = readValues(dset, tuple(group[2] for group in block), fields)
+            for dim, group in enumerate(block):
+                if group[3] is not None:
+                    arr = np.take(arr, group[3], axis=dim)
+            values[tuple(slice(group[0], group[1]) for group in block)] = arr
+        for dim, (sel, order) in enumerate(dims):
+            if order is not None:
+                values = np.take(values, order, axis=dim)
+        return values
+
+    def write(self, dset, values, blockSize):
+        """ Write values (an array of the dataset type, with the shape read
+            returns) to the selected elements of the h5py dataset.  If an
+            index is given more than once the last value for it is written.
+        """
+        blockShape = getBlockShape(dset, blockSize)
+        rank = len(self.shape)
+
+        if not self.isSimple():
+            blocks = list(self.getBlocks(blockShape))
+            offsets = np.zeros((0,), dtype=np.int64)
+            if blocks:
+                offsets = np.sort(np.concatenate([block[2] for block in blocks]))
+            if values.ndim < 1 or values.shape[0] != len(offsets):
+                raise ValueError("expected " + str(len(offsets)) + " values")
+            for box, selected, blockOffsets in blocks:
+                arr = dset[box]
+                arr[selected] = values[np.searchsorted(offsets, blockOffsets)]
+                dset[box] = arr
+            return
+
+        shape = self.getShape()
+        if tuple(values.shape[:rank]) != shape:
+            raise ValueError("values should have shape " + str(shape))
+        dims = []
+        for dim, sel in enumerate(self.hyperslabs[0]):
+            if not isinstance(sel, slice):
+                # sorted unique indexes, with the last value given for each
+                order = np.argsort(sel, kind='stable')
+                ordered = sel[order]
+                last = np.ones(len(sel), dtype=bool)
+                last[:-1] = ordered[1:] != ordered[:-1]
+                sel = ordered[last]
+                values = np.take(values, order[last], axis=dim)
+            dims.append(sel)
+        groups = [getDimGroups(sel, size) for sel, size in zip(dims, blockShape)]
+        for block in itertools.product(*groups):
+            read = tuple(group[2] for group in block)
+            arr = values[tuple(slice(group[0], group[1]) for group in block)]
+            if any(group[3] is not None for group in block):
+                # read the block and update the selected elements
+                local = [group[3] if group[3] is not None else
+                    np.arange(group[1] - group[0]) for group in block]
+                update = arr
+                arr = dset[read]
+                arr[np.ix_(*local)] = update
+            dset[read] = arr
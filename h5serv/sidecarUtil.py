@@ -0,0 +1,282 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Sidecar files for data derived from a domain's datasets (e.g. the query
+ summaries of queryUtil and the indexes of indexUtil).
+
+ The sidecar of a data file is an HDF5 file next to it, with the
+ 'sidecar_ext' config appended to the file name (e.g. tall.h5.sidecar), so
+ it is not listed as a domain and the data file itself is not modified.
+ Data for a dataset is kept in a group /<kind>/<dataset uuid> (or a named
+ subgroup of it), with a 'modified' attribute holding the dataset's
+ modified time (from the "__db__" index) when it was stored.  getGroup
+ returns None for data stored before the dataset was last changed.  As the
+ modified time only has a resolution of one second, request handlers that
+ write to a dataset also call invalidate() for it, which sets the modified
+ attribute of its groups to STALE.  Sidecar data should be read and stored
+ inside a dbPool.getDb block for the data file, so it is consistent with
+ the dataset.
+
+ Data that takes a while to build from a dataset's values (e.g. an index)
+ is built in a temporary file and then copied to the sidecar (see Build), so
+ the sidecar is not locked meanwhile.
+
+ Access is serialized between threads, and with lockf() between server
+ processes (rather than flock(), which HDF5 uses to lock files itself).
+ Sidecars are a cache: errors reading or writing them are logged and
+ otherwise ignored (e.g. for a read-only data directory).
+
+ Usage:
+    with sidecarUtil.openSidecar(filePath, modify=True) as f:
+        if f is not None:
+            grp = sidecarUtil.createGroup(f, 'summary', dset_uuid, modified)
+"""
+
+import os
+import os.path as op
+import errno
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows
+
+import h5py
+
+import h5serv.config as config
+
+STALE = 0  # modified time of invalidated groups
+BUILD_KIND = 'build'  # markers of the builds in progress (see Build)
+
+_locks = {}  # sidecar path to threading.Lock
+_locksLock = threading.Lock()
+
+
+def getSidecarPath(filePath):
+    return filePath + config.get('sidecar_ext')
+
+
+def getLock(path):
+    with _locksLock:
+        if path not in _locks:
+            _locks[path] = threading.Lock()
+        return _locks[path]
+
+
+@contextmanager
+def openSidecar(filePath, modify=False):
+    """ Context manager returning the open sidecar (h5py.File) of the data
+        file filePath.  If modify is True the file is opened for writing
+        (and created if needed), otherwise None is returned if there is no
+        sidecar.  None is also returned if the file can't be opened.
+        The sidecar should not be opened again by the same thread before
+        the block exits.
+    """
+    log = logging.getLogger("h5serv")
+    path = getSidecarPath(filePath)
+    with getLock(path):
+        fd = None
+        f = None
+        try:
+            if modify:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            else:
+                fd = os.open(path, os.O_RDONLY)
+            if fcntl is not None:
+                fcntl.lockf(fd, fcntl.LOCK_EX if modify else fcntl.LOCK_SH)
+            if os.fstat(fd).st_size == 0:
+                # new (or unused) file
+                if modify:
+                    f = h5py.File(path, 'w')
+            else:
+                f = h5py.File(path, 'r+' if modify else 'r')
+        except (IOError, OSError) as e:
+            if modify or op.exists(path):
+                log.warning("sidecar - unable to open " + path + ": " + str(e))
+        try:
+            yield f
+        finally:
+            if f is not None:
+                f.close()
+            if fd is not None:
+                os.close(fd)  # releases the lock
+
+
+def getGroupName(kind, obj_uuid, name=None):
+    path = kind + '/' + obj_uuid
+    if name is not None:
+        path += '/' + name
+    return path
+
+
+def getGroup(f, kind, obj_uuid, modified=None, name=None):
+    """ Return the sidecar group for the dataset (or its subgroup name), or
+        None if there is none or it was stored for an earlier modified time.
+        If modified is None, a stored group is returned even if stale.
+    """
+    if f is None:
+        return None
+    path = getGroupName(kind, obj_uuid, name)
+    if path not in f:
+        return None
+    grp = f[path]
+    if modified is not None and grp.attrs.get('modified') != modified:
+        return None
+    return grp
+
+
+def isStale(grp):
+    return grp.attrs.get('modified') == STALE
+
+
+def createGroup(f, kind, obj_uuid, modified, name=None):
+    """ Return a new (empty) sidecar group for the dataset (or its subgroup
+        name), replacing any existing group.
+    """
+    path = getGroupName(kind, obj_uuid, name)
+    if path in f:
+        del f[path]
+    grp = f.require_group(path)
+    grp.attrs['modified'] = modified
+    return grp
+
+
+def invalidate(filePath, obj_uuid, remove=False, keep=()):
+    """ Mark any sidecar data for the dataset as stale (e.g. after its
+        values are written), or remove it if remove is True (e.g. when the
+        dataset is deleted).  Data of the kinds in keep is left as it is
+        (e.g. data the caller has updated for the write).
+    """
+    if not op.exists(getSidecarPath(filePath)):
+        return
+    with openSidecar(filePath, modify=True) as f:
+        if f is None:
+            return
+        for kind in f:
+            if kind in keep or obj_uuid not in f[kind]:
+                continue
+            grp = f[kind][obj_uuid]
+            if remove:
+                del f[kind][obj_uuid]
+                continue
+            if 'modified' in grp.attrs:
+                grp.attrs['modified'] = STALE
+            for name in grp:
+                if isinstance(grp[name], h5py.Group) and 'modified' in grp[name].attrs:
+                    grp[name].attrs['modified'] = STALE
+
+
+def remove(filePath):
+    """ Remove the sidecar of the data file (e.g. when the domain is
+        deleted).
+    """
+    path = getSidecarPath(filePath)
+    with getLock(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # no sidecar
+
+
+class Build(object):
+    """ Data of the given kind for a dataset built in a temporary file (f),
+        e.g. from a dbPool.DatasetReader, without holding the sidecar or the
+        data file meanwhile.  finish() then moves the data to the sidecar,
+        unless the dataset was written in the meantime: a marker group for
+        the build in the sidecar is invalidated along with the dataset's
+        other groups (see invalidate).
+
+        Usage:
+            with dbPool.getDb(filePath) as db:
+                modified = db.getModifiedTime(dset_uuid)
+                build = sidecarUtil.Build(filePath, 'index', dset_uuid, modified)
+            try:
+                ...  # build the group 'index/<dset_uuid>' in build.f
+                with dbPool.getDb(filePath) as db:
+                    with sidecarUtil.openSidecar(filePath, modify=True) as f:
+                        grp = build.finish(f)
+            finally:
+                build.close()
+    """
+    def __init__(self, filePath, kind, obj_uuid, modified, name=None):
+        """ Call inside a dbPool.getDb block for the data file, with the
+            dataset's modified time.  Raises IOError if the sidecar can't
+            be written.
+        """
+        self.filePath = filePath
+        self.kind = kind
+        self.obj_uuid = obj_uuid
+        self.name = name
+        self.f = None
+        try:
+            # a hidden file, so it's not listed as a domain
+            fd, self.tmpPath = tempfile.mkstemp(prefix='.', suffix='.tmp',
+                dir=op.dirname(getSidecarPath(filePath)))
+        except OSError as e:
+            raise IOError(errno.EIO, "unable to write sidecar: " + str(e))
+        os.close(fd)
+        self.marker = op.basename(self.tmpPath)
+        try:
+            with openSidecar(filePath, modify=True) as f:
+                if f is None:
+                    raise IOError(errno.EIO, "unable to write sidecar")
+                createGroup(f, BUILD_KIND, obj_uuid, modified, name=self.marker)
+            self.f = h5py.File(self.tmpPath, 'w')
+        except Exception:
+            self.marker = None  # no marker, or close will remove it
+            self.close()
+            raise
+
+    def finish(self, f):
+        """ Move the built group to the sidecar f (open for writing),
+            replacing any existing group, and return it.  Returns None, and
+            leaves the sidecar as it was, if the dataset was written (or
+            removed) during the build.
+        """
+        marker = getGroup(f, BUILD_KIND, self.obj_uuid, name=self.marker)
+        stale = marker is None or isStale(marker)
+        self.removeMarker(f)
+        if stale:
+            return None
+        path = getGroupName(self.kind, self.obj_uuid, self.name)
+        if path in f:
+            del f[path]
+        parent, name = path.rsplit('/', 1)
+        self.f.copy(self.f[path], f.require_group(parent), name=name)
+        return f[path]
+
+    def close(self):
+        """ Remove the temporary file, and the marker if the build wasn't
+            finished.  Call outside any openSidecar block for the file.
+        """
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        if op.exists(self.tmpPath):
+            os.remove(self.tmpPath)
+        if self.marker is not None:
+            with openSidecar(self.filePath, modify=True) as f:
+                if f is not None:
+                    self.removeMarker(f)
+
+    def removeMarker(self, f):
+        path = getGroupName(BUILD_KIND, self.obj_uuid)
+        if path in f:
+            if self.marker in f[path]:
+                del f[path][self.marker]
+            if len(f[path]) == 0:
+                del f[path]
+        self.marker = None
@@ -0,0 +1,272 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+"""
+ Statistics (count, NaN count, min, max, mean and standard deviation) of
+ the values of integer and float datasets, e.g. for colour scaling in
+ dataset browsers.
+
+ The statistics of each chunk of the dataset (or block of rows, for
+ contiguous datasets) are kept in the sidecar of the data file (see
+ sidecarUtil), in the group /stats/<dataset uuid>, and combined for the
+ whole dataset.  They are computed the first time they are requested.
+ When values of the dataset are written, updateStats recomputes just the
+ chunks that were written, and rewrites just their entries in the sidecar
+ (rather than the sidecar group being marked as stale, as for other
+ sidecar data).
+"""
+
+import itertools
+import os.path as op
+
+import numpy as np
+
+import h5serv.config as config
+import h5serv.sidecarUtil as sidecarUtil
+import h5serv.selectionUtil as selectionUtil
+
+STATS_KIND = 'stats'  # sidecar group kind
+FIELDS = ('count', 'nans', 'min', 'max', 'mean', 'm2', 'valid')
+
+
+def hasStats(dtype):
+    """ Return True if statistics can be kept for datasets of the type.
+    """
+    return dtype.kind in 'iuf' and dtype.subdtype is None
+
+
+def getChunkShape(dset):
+    """ Return the shape of the chunks statistics are kept for.
+    """
+    if dset.chunks:
+        return tuple(dset.chunks)
+    return selectionUtil.getBlockShape(dset, int(config.get('stream_buffer_size')))
+
+
+class ChunkStats(object):
+    """ Statistics of each chunk of a dataset.  valid[i] is True if the
+        values for chunk i (an index into the grid of chunks) have been set.
+    """
+    def __init__(self, dset, modified=None):
+        self.shape = tuple(dset.shape)
+        self.chunkShape = getChunkShape(dset)
+        self.modified = modified
+        self.isFloat = dset.dtype.kind == 'f'
+        self.grid = tuple(-(-n // c) for n, c in zip(self.shape, self.chunkShape))
+        valueType = dset.dtype.newbyteorder('=')
+        self.count = np.zeros(self.grid, dtype=np.int64)
+        self.nans = np.zeros(self.grid, dtype=np.int64)
+        self.min = np.zeros(self.grid, dtype=valueType)
+        self.max = np.zeros(self.grid, dtype=valueType)
+        self.mean = np.zeros(self.grid, dtype=np.float64)
+        self.m2 = np.zeros(self.grid, dtype=np.float64)
+        self.valid = np.zeros(self.grid, dtype=bool)
+
+    def getChunkSlices(self, index):
+        return tuple(slice(i * c, min((i + 1) * c, n))
+            for i, c, n in zip(index, self.chunkShape, self.shape))
+
+    def setChunk(self, index, values):
+        """ Set the statistics of chunk index from its values.
+        """
+        values = np.asarray(values)
+        if self.isFloat:
+            isnan = np.isnan(values)
+            self.nans[index] = int(isnan.sum())
+            if self.nans[index]:
+                values = values[~isnan]
+        else:
+            self.nans[index] = 0
+        self.count[index] = values.size
+        if values.size:
+            self.min[index] = values.min()
+            self.max[index] = values.max()
+            mean = values.mean(dtype=np.float64)
+            diff = values.astype(np.float64) - mean
+            self.mean[index] = mean
+            self.m2[index] = np.dot(diff.ravel(), diff.ravel())
+        else:
+            self.min[index] = self.max[index] = 0
+            self.mean[index] = self.m2[index] = 0.0
+        self.valid[index] = True
+
+    def getPointChunks(self, points):
+        """ Return the indexes of the chunks of the points (an array of
+            coordinates) as an array.
+        """
+        return np.asarray(points) // np.array(self.chunkShape, dtype=np.int64)
+
+    def getRegions(self, boxes=None, points=None):
+        """ Return the regions (tuples of slices) of the grid of chunks
+            touched by boxes (tuples of slices) or points (an array of
+            coordinates): one for each box, and one around the points.
+            With neither, the whole grid.
+        """
+        if boxes is None and points is None:
+            return [tuple(slice(0, n) for n in self.grid)]
+        regions = []
+        for box in boxes or ():
+            region = []
+            for s, c in zip(box, self.chunkShape):
+                if s.stop <= s.start:
+                    break
+                region.append(slice(s.start // c, (s.stop - 1) // c + 1))
+            else:
+                regions.append(tuple(region))
+        if points is not None and len(points):
+            ids = self.getPointChunks(points)
+            regions.append(tuple(slice(int(lo), int(hi) + 1)
+                for lo, hi in zip(ids.min(axis=0), ids.max(axis=0))))
+        return regions
+
+    def invalidate(self, boxes=None, points=None):
+        """ Mark the chunks touched by boxes (tuples of slices) or points
+            (an array of coordinates) as needing to be recomputed.  With
+            neither, all chunks are.
+        """
+        if boxes is None and points is None:
+            self.valid[...] = False
+            return
+        for region in self.getRegions(boxes=boxes or []):
+            self.valid[region] = False
+        if points is not None and len(points):
+            self.valid[tuple(self.getPointChunks(points).T)] = False
+
+    def update(self, dset):
+        """ Compute the statistics of chunks that aren't valid, reading the
+            dataset in blocks of whole chunks.  Returns True if any were.
+        """
+        if self.valid.all():
+            return False
+        blockShape = selectionUtil.getBlockShape(dset, int(config.get('stream_buffer_size')))
+        perBlock = [max(1, -(-b // c)) for b, c in zip(blockShape, self.chunkShape)]
+        blockGrid = [-(-g // p) for g, p in zip(self.grid, perBlock)]
+        for block in itertools.product(*[range(n) for n in blockGrid]):
+            region = tuple(slice(b * p, min((b + 1) * p, g))
+                for b, p, g in zip(block, perBlock, self.grid))
+            if self.valid[region].all():
+                continue
+            start = [r.start * c for r, c in zip(region, self.chunkShape)]
+            stop = [min(r.stop * c, n) for r, c, n in zip(region, self.chunkShape, self.shape)]
+            values = dset[tuple(slice(a, b) for a, b in zip(start, stop))]
+            for index in itertools.product(*[range(r.start, r.stop) for r in region]):
+                if self.valid[index]:
+                    continue
+                local = tuple(slice(s.start - a, s.stop - a)
+                    for s, a in zip(self.getChunkSlices(index), start))
+                self.setChunk(index, values[local])
+        return True
+
+    def getSummary(self):
+        """ Return a dict of the statistics of the whole dataset (of the
+            valid chunks).  min, max, mean and std are None if there are no
+            values (other than NaN).
+        """
+        count = self.count[self.valid]
+        total = int(count.sum())
+        summary = {'count': total, 'nanCount': int(self.nans[self.valid].sum())}
+        if total == 0:
+            for name in ('min', 'max', 'mean', 'std'):
+                summary[name] = None
+            return summary
+        has = self.valid & (self.count > 0)
+        count = self.count[has]
+        means = self.mean[has]
+        mean = float(np.dot(count, means) / total)
+        m2 = float(self.m2[has].sum() + np.dot(count, (means - mean) ** 2))
+        summary['min'] = self.min[has].min().item()
+        summary['max'] = self.max[has].max().item()
+        summary['mean'] = mean
+        summary['std'] = float(np.sqrt(m2 / total))
+        return summary
+
+    def matches(self, grp):
+        """ Return True if the sidecar group has statistics for the
+            dataset shape and chunk shape.
+        """
+        if tuple(grp.attrs.get('shape', ())) != self.shape or \
+                tuple(grp.attrs.get('chunk_shape', ())) != self.chunkShape:
+            return False
+        for name in FIELDS:
+            if name not in grp or grp[name].shape != self.grid:
+                return False
+        return True
+
+    def load(self, grp, region=None):
+        """ Read the values stored in the sidecar group, for just the region
+            (a tuple of slices) of the grid of chunks if given.  Returns
+            False if they are for a different dataset shape or chunk shape.
+        """
+        if not self.matches(grp):
+            return False
+        if region is None:
+            region = Ellipsis
+        for name in FIELDS:
+            getattr(self, name)[region] = grp[name][region]
+        return True
+
+    def save(self, grp, region=None):
+        """ Store the values in the new sidecar group grp, or if region (a
+            tuple of slices of the grid of chunks) is given, just the values
+            of the region in the group they were loaded from.
+        """
+        if region is not None:
+            for name in FIELDS:
+                grp[name][region] = getattr(self, name)[region]
+            return
+        grp.attrs['shape'] = self.shape
+        grp.attrs['chunk_shape'] = self.chunkShape
+        for name in FIELDS:
+            grp.create_dataset(name, data=getattr(self, name))
+
+
+def getStats(filePath, obj_uuid, dset, modified):
+    """ Return the ChunkStats of the dataset, computing (and storing in the
+        sidecar) the statistics of any chunks not already stored.
+    """
+    stats = ChunkStats(dset, modified)
+    with sidecarUtil.openSidecar(filePath) as f:
+        grp = sidecarUtil.getGroup(f, STATS_KIND, obj_uuid, modified)
+        if grp is not None:
+            stats.load(grp)
+    if stats.update(dset):
+        with sidecarUtil.openSidecar(filePath, modify=True) as f:
+            if f is not None:
+                grp = sidecarUtil.createGroup(f, STATS_KIND, obj_uuid, modified)
+                stats.save(grp)
+    return stats
+
+
+def updateStats(filePath, obj_uuid, dset, modified, boxes=None, points=None):
+    """ Recompute the stored statistics of the chunks of the dataset touched
+        by a write (see ChunkStats.invalidate) and set their modified time.
+        The statistics are marked as stale if they can't be updated.
+    """
+    if not op.exists(sidecarUtil.getSidecarPath(filePath)):
+        return
+    with sidecarUtil.openSidecar(filePath, modify=True) as f:
+        grp = sidecarUtil.getGroup(f, STATS_KIND, obj_uuid)
+        if grp is None or sidecarUtil.isStale(grp):
+            return
+        stats = ChunkStats(dset, modified)
+        if not hasStats(dset.dtype) or not stats.matches(grp):
+            grp.attrs['modified'] = sidecarUtil.STALE
+            return
+        # just the regions written are loaded, updated and saved
+        regions = stats.getRegions(boxes=boxes, points=points)
+        stats.valid[...] = True
+        for region in regions:
+            stats.load(grp, region)
+        stats.invalidate(boxes=boxes, points=points)
+        stats.update(dset)
+        for region in regions:
+            stats.save(grp, region)
+        grp.attrs['modified'] = modified
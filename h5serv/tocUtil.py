@@ -18,7 +18,7 @@ import logging
 import h5py
 import h5serv.config as config
 import h5serv.fileUtil as fileUtil
-from h5json import Hdf5db
+import h5serv.dbPool as dbPool
 
 """
  TOC (Table of contents) util helper functions
@@ -91,7 +91,7 @@ def addTocEntry(domain, filePath,  userid=None):
     acl = None
 
     try:         
-        with Hdf5db(tocFile, app_logger=log) as db:
+        with dbPool.getDb(tocFile, app_logger=log) as db:
             group_uuid = db.getUUIDByPath('/')
             pathNames = filePath.split('/')
             for linkName in pathNames:
@@ -144,7 +144,7 @@ def removeTocEntry(domain, filePath, userid=None):
     log.info("pathNames: " + str(pathNames))
 
     try:
-        with Hdf5db(tocFile, app_logger=log) as db:
+        with dbPool.getDb(tocFile, app_logger=log) as db:
             group_uuid = db.getUUIDByPath('/')
             log.info("group_uuid:" + group_uuid)
                            
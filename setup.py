@@ -62,9 +62,12 @@ setup(
 
         # Specify the Python versions you support here. In particular, ensure
         # that you indicate whether you support Python 2, Python 3 or both.
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
 
     # What does your project relate to?
@@ -74,6 +77,9 @@ setup(
     # simple. Or you can use find_packages().
     packages=('h5serv',),
 
+    # queryUtil uses ast.Constant (Python 3.8)
+    python_requires='>=3.8',
+
     # Alternatively, if you want to distribute just a my_module.py, uncomment
     # this:
     #   py_modules=["my_module"],
@@ -83,7 +89,7 @@ setup(
     # requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
     install_requires=['numpy>=1.10.4', 'h5py>=2.5', 'h5json>=1.1', 
-        'watchdog>=0.8.3', 'tornado>=4.2.1', 'requests>=2.10.0', 
+        'watchdog>=0.8.3', 'tornado>=5.0', 'requests>=2.10.0', 
         'pyzmq>=14.7.0', 'pytz'],
 
     # List additional groups of dependencies here (e.g. development
@@ -93,6 +99,9 @@ setup(
     extras_require={
         'dev': ['check-manifest'],
         'test': ['coverage'],
+        'json': ['orjson'],
+        'arrow': ['pyarrow'],
+        'query': ['numexpr'],
     },
 
     # If there are data files included in your packages that need to be
@@ -778,6 +778,18 @@ class DatasetTest(unittest.TestCase):
         # verify type class is float
         rsp_type = rspJson['type']
         self.assertEqual(rsp_type['class'], 'H5T_FLOAT')
+        self.assertEqual(rspJson['attributeCount'], 0)
+        
+        # add an attribute, attributeCount should be updated
+        req = self.endpoint + "/datasets/" + dset_uuid + "/attributes/attr1"
+        payload = {'type': 'H5T_STD_I32LE', 'value': 42}
+        rsp = requests.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        req = self.endpoint + "/datasets/" + dset_uuid
+        rsp = requests.get(req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['attributeCount'], 1)
         
     def testPostScalar(self):
         domain = 'newscalar.datasettest.' + config.get('domain')
@@ -73,6 +73,22 @@ class DatasetTypeTest(unittest.TestCase):
         self.assertEqual(timeFieldType['charSet'], 'H5T_CSET_ASCII')
         self.assertEqual(timeFieldType['length'], 6)
         self.assertEqual(timeFieldType['strPad'], 'H5T_STR_NULLPAD')
+
+    def testGetCommitted(self):
+        domain = 'committed_type.' + config.get('domain')
+        root_uuid = helper.getRootUUID(domain)
+        self.assertTrue(helper.validateId(root_uuid))
+        dset_uuid = helper.getUUID(domain, root_uuid, 'DS1')
+        req = helper.getEndpoint() + "/datasets/" + dset_uuid + '/type'
+        headers = {'host': domain}
+        rsp = requests.get(req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(sorted(rspJson.keys()), ['hrefs', 'type'])
+        typeItem = rspJson['type']
+        # same keys as for a dataset without a committed type
+        self.assertEqual(sorted(typeItem.keys()), ['class', 'fields'])
+        self.assertEqual(typeItem['class'], 'H5T_COMPOUND')
     
         
 if __name__ == '__main__':
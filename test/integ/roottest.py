@@ -15,6 +15,8 @@ import helper
 import unittest
 import json
 import base64
+import re
+import time
 
 class RootTest(unittest.TestCase):
     def __init__(self, *args, **kwargs):
@@ -29,7 +31,28 @@ class RootTest(unittest.TestCase):
         self.assertEqual(rsp.headers['content-type'], 'application/json')
         rspJson = json.loads(rsp.text)
         self.assertTrue('h5serv_version' in rspJson)
-            
+
+    def testGetMetrics(self):
+        req = self.endpoint + "/info"
+        rsp = requests.get(req)
+        self.assertEqual(rsp.status_code, 200)
+        # with multiple workers, /info may be served by another worker, whose
+        # metrics are saved every second
+        pattern = re.compile(r'^h5serv_request_duration_seconds_bucket\{(worker="\d+",)?'
+            r'handler="InfoHandler",le="\+Inf"\} [1-9]', re.MULTILINE)
+        for i in range(30):
+            req = self.endpoint + "/metrics"
+            rsp = requests.get(req)
+            self.assertEqual(rsp.status_code, 200)
+            if pattern.search(rsp.text):
+                break
+            time.sleep(0.1)
+        self.assertTrue(rsp.headers['content-type'].startswith('text/plain'))
+        self.assertTrue('# TYPE h5serv_requests_total counter' in rsp.text)
+        self.assertTrue(pattern.search(rsp.text))
+        self.assertTrue(re.search(r'^h5serv_open_files(\{worker="\d+"\})? ', rsp.text,
+            re.MULTILINE))
+
     def testGetDomain(self):
         domain = 'tall.' + config.get('domain')   
         req = self.endpoint + "/"
@@ -16,7 +16,17 @@ import config
 import helper
 import unittest
 import json
+import uuid
 import base64
+import struct
+import gzip
+import io
+
+import numpy as np
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
  
 
 class ValueTest(unittest.TestCase):
@@ -342,6 +352,321 @@ class ValueTest(unittest.TestCase):
                 row_offset += col_offset
             
                 
+    def testGetLargeBinary(self):
+        # values bigger than the server stream_buffer_size are sent in slabs
+        domain = 'valuegetlarge_binary.datasettest.' + config.get('domain')
+        req = self.endpoint + "/"
+        headers = {'host': domain}
+        # uncompressed, so the Content-Length is given
+        headers_binary = {'host': domain, 'accept': "application/octet-stream",
+            'accept-encoding': 'identity'}
+        rsp = requests.put(req, headers=headers)
+        self.assertEqual(rsp.status_code, 201) # creates domain
+
+        # create 2d chunked dataset (4.8MB)
+        nrows = 2000
+        ncols = 600
+        creation_props = {'layout': {'class': 'H5D_CHUNKED', 'dims': [100, ncols] }}
+        payload = {'type': 'H5T_STD_I32LE', 'shape': (nrows, ncols),
+            'creationProperties': creation_props }
+        req = self.endpoint + "/datasets"
+        rsp = requests.post(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)  # create dataset
+        rspJson = json.loads(rsp.text)
+        dsetUUID = rspJson['id']
+        self.assertTrue(helper.validateId(dsetUUID))
+
+        # write element (i, j) = i*ncols + j
+        req = self.endpoint + "/datasets/" + dsetUUID + "/value"
+        value = []
+        for i in range(nrows):
+            value.append(list(range(i*ncols, (i+1)*ncols)))
+        payload = { 'value': value }
+        rsp = requests.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+
+        # read back everything
+        data = struct.pack('<' + str(nrows*ncols) + 'i', *range(nrows*ncols))
+        rsp = requests.get(req, headers=headers_binary)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], "application/octet-stream")
+        self.assertEqual(int(rsp.headers['Content-Length']), len(data))
+        self.assertTrue(rsp.content == data)
+
+        # read strided selection
+        rsp = requests.get(req + "?select=[10:1990:3,5:600:7]", headers=headers_binary)
+        self.assertEqual(rsp.status_code, 200)
+        rows = range(10, 1990, 3)
+        cols = range(5, 600, 7)
+        self.assertEqual(len(rsp.content), len(rows)*len(cols)*4)
+        values = struct.unpack('<' + str(len(rows)*len(cols)) + 'i', rsp.content)
+        index = 0
+        for i in rows:
+            for j in cols:
+                self.assertEqual(values[index], i*ncols + j)
+                index += 1
+
+    def testGetCompressed(self):
+        domain = 'valueget_compressed.datasettest.' + config.get('domain')
+        req = self.endpoint + "/"
+        headers = {'host': domain}
+        rsp = requests.put(req, headers=headers)
+        self.assertEqual(rsp.status_code, 201) # creates domain
+
+        # create 1d dataset (40KB)
+        nitems = 10000
+        payload = {'type': 'H5T_STD_I32LE', 'shape': nitems}
+        req = self.endpoint + "/datasets"
+        rsp = requests.post(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)  # create dataset
+        rspJson = json.loads(rsp.text)
+        dsetUUID = rspJson['id']
+        self.assertTrue(helper.validateId(dsetUUID))
+
+        req = self.endpoint + "/datasets/" + dsetUUID + "/value"
+        value = list(range(nitems))
+        payload = { 'value': value }
+        rsp = requests.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        data = struct.pack('<' + str(nitems) + 'i', *value)
+
+        # json (requests decodes the response)
+        for encoding in ('gzip', 'deflate'):
+            headers_enc = {'host': domain, 'accept-encoding': encoding}
+            rsp = requests.get(req, headers=headers_enc)
+            self.assertEqual(rsp.status_code, 200)
+            self.assertEqual(rsp.headers['Content-Encoding'], encoding)
+            self.assertTrue('Accept-Encoding' in rsp.headers['Vary'])
+            rspJson = json.loads(rsp.text)
+            self.assertEqual(rspJson['value'], value)
+
+        # binary, sent in slabs
+        headers_binary = {'host': domain, 'accept': "application/octet-stream",
+            'accept-encoding': 'gzip'}
+        rsp = requests.get(req, headers=headers_binary)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], "application/octet-stream")
+        self.assertEqual(rsp.headers['Content-Encoding'], 'gzip')
+        self.assertTrue(rsp.content == data)
+
+        # not compressed if not accepted
+        headers_binary['accept-encoding'] = 'gzip;q=0, identity'
+        rsp = requests.get(req, headers=headers_binary)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertTrue('Content-Encoding' not in rsp.headers)
+        self.assertEqual(int(rsp.headers['Content-Length']), len(data))
+        self.assertTrue(rsp.content == data)
+
+        # or too small
+        headers_binary['accept-encoding'] = 'gzip'
+        rsp = requests.get(req + "?select=[0:10]", headers=headers_binary)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertTrue('Content-Encoding' not in rsp.headers)
+        self.assertTrue(rsp.content == data[:40])
+
+    def testGetNpy(self):
+        domain = 'tall.' + config.get('domain')
+        rootUUID = helper.getRootUUID(domain)
+        g1UUID = helper.getUUID(domain, rootUUID, 'g1')
+        g11UUID = helper.getUUID(domain, g1UUID, 'g1.1')
+        dset111UUID = helper.getUUID(domain, g11UUID, 'dset1.1.1')
+        req = helper.getEndpoint() + "/datasets/" + dset111UUID + "/value"
+        headers_npy = {'host': domain, 'accept': "application/x-npy"}
+        rsp = requests.get(req, headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], "application/x-npy")
+        arr = np.load(io.BytesIO(rsp.content))
+        self.assertEqual(arr.dtype, np.dtype('>i4'))
+        self.assertEqual(arr.shape, (10, 10))
+        for i in range(10):
+            for j in range(10):
+                self.assertEqual(arr[i, j], i*j)
+
+        # selection (including a single element)
+        rsp = requests.get(req + "?select=[2:4,1:9:2]", headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        arr = np.load(io.BytesIO(rsp.content))
+        self.assertEqual(arr.shape, (2, 4))
+        self.assertEqual(arr[1, 3], 3*7)
+        rsp = requests.get(req + "?select=[5:6,5:6]", headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(np.load(io.BytesIO(rsp.content)).tolist(), [[25]])
+
+        # point selection
+        dset112UUID = helper.getUUID(domain, g11UUID, 'dset1.1.2')
+        req = helper.getEndpoint() + "/datasets/" + dset112UUID + "/value"
+        points = [19, 17, 13, 11, 7, 5, 3, 2]
+        rsp = requests.post(req, data=json.dumps({'points': points}), headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], "application/x-npy")
+        arr = np.load(io.BytesIO(rsp.content))
+        self.assertEqual(arr.tolist(), points)
+        points = [[9, 9], [2, 3]]
+        req = helper.getEndpoint() + "/datasets/" + dset111UUID + "/value"
+        rsp = requests.post(req, data=json.dumps({'points': points}), headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(np.load(io.BytesIO(rsp.content)).tolist(), [81, 6])
+        rsp = requests.post(req, data=json.dumps({'points': [[10, 0]]}), headers=headers_npy)
+        self.assertEqual(rsp.status_code, 400)
+
+        # scalar
+        domain = 'scalar.' + config.get('domain')
+        headers_npy['host'] = domain
+        root_uuid = helper.getRootUUID(domain)
+        dset_uuid = helper.getUUID(domain, root_uuid, '0d')
+        req = helper.getEndpoint() + "/datasets/" + dset_uuid + "/value"
+        rsp = requests.get(req, headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        arr = np.load(io.BytesIO(rsp.content))
+        self.assertEqual(arr.shape, ())
+        self.assertEqual(arr[()], 42)
+
+        # variable length string, json is returned
+        dset_uuid = helper.getUUID(domain, root_uuid, '0ds')
+        req = helper.getEndpoint() + "/datasets/" + dset_uuid + "/value"
+        rsp = requests.get(req, headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], "application/json")
+
+        # compound
+        domain = 'compound.' + config.get('domain')
+        headers_npy['host'] = domain
+        root_uuid = helper.getRootUUID(domain)
+        dset_uuid = helper.getUUID(domain, root_uuid, 'dset')
+        req = helper.getEndpoint() + "/datasets/" + dset_uuid + "/value"
+        rsp = requests.get(req, headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        arr = np.load(io.BytesIO(rsp.content))
+        self.assertEqual(arr.shape, (72,))
+        self.assertEqual(len(arr.dtype.names), 5)
+        self.assertEqual(arr[0][0], 24)
+        self.assertEqual(arr[0][1], b"13:53")
+
+    def testGetFields(self):
+        domain = 'compound.' + config.get('domain')
+        root_uuid = helper.getRootUUID(domain)
+        dset_uuid = helper.getUUID(domain, root_uuid, 'dset')
+        req = helper.getEndpoint() + "/datasets/" + dset_uuid + "/value"
+        headers = {'host': domain}
+        rsp = requests.get(req + "?fields=pressure,date&select=[0:4]", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['value'][0], [29.88, 24])
+        self.assertEqual(len(rspJson['value']), 4)
+
+        # query results
+        rsp = requests.get(req + "?query=date == 23&fields=time", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['index'][0], 14)
+        self.assertEqual(len(rspJson['value']), 24)
+        for item in rspJson['value']:
+            self.assertEqual(len(item), 1)
+
+        # binary - packed values of the fields in the order given
+        headers_bin = {'host': domain, 'accept': 'application/octet-stream'}
+        rsp = requests.get(req + "?fields=temp,wind&select=[0:3]", headers=headers_bin)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], "application/octet-stream")
+        arr = np.frombuffer(rsp.content, dtype=[('temp', '<i8'), ('wind', 'S6')])
+        self.assertEqual(arr.shape, (3,))
+        self.assertEqual(arr[0]['temp'], 63)
+        self.assertEqual(arr[0]['wind'], b'SE 10')
+
+        # npy
+        headers_npy = {'host': domain, 'accept': 'application/x-npy'}
+        rsp = requests.get(req + "?fields=time", headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        arr = np.load(io.BytesIO(rsp.content))
+        self.assertEqual(arr.dtype.names, ('time',))
+        self.assertEqual(arr.shape, (72,))
+        self.assertEqual(arr[1]['time'], b'12:53')
+
+        # point selection
+        payload = {'points': [0, 2, 71]}
+        rsp = requests.post(req + "?fields=date,temp", data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['value'][0], [24, 63])
+        self.assertEqual(len(rspJson['value']), 3)
+        rsp = requests.post(req + "?fields=date,temp", data=json.dumps(payload), headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        arr = np.load(io.BytesIO(rsp.content))
+        self.assertEqual(arr.dtype.names, ('date', 'temp'))
+        self.assertEqual(arr[0]['temp'], 63)
+
+        # bad field names
+        rsp = requests.get(req + "?fields=date,nosuchfield", headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+        rsp = requests.get(req + "?fields=date,date", headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+
+        # not a compound type
+        domain = 'tall.' + config.get('domain')
+        root_uuid = helper.getRootUUID(domain)
+        g1_uuid = helper.getUUID(domain, root_uuid, 'g1')
+        g11_uuid = helper.getUUID(domain, g1_uuid, 'g1.1')
+        dset_uuid = helper.getUUID(domain, g11_uuid, 'dset1.1.2')
+        req = helper.getEndpoint() + "/datasets/" + dset_uuid + "/value"
+        rsp = requests.get(req + "?fields=a", headers={'host': domain})
+        self.assertEqual(rsp.status_code, 400)
+
+    @unittest.skipIf(pa is None, "pyarrow not installed")
+    def testGetArrow(self):
+        domain = 'compound.' + config.get('domain')
+        root_uuid = helper.getRootUUID(domain)
+        dset_uuid = helper.getUUID(domain, root_uuid, 'dset')
+        req = helper.getEndpoint() + "/datasets/" + dset_uuid + "/value"
+        headers_arrow = {'host': domain, 'accept': "application/vnd.apache.arrow.stream"}
+        rsp = requests.get(req, headers=headers_arrow)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], "application/vnd.apache.arrow.stream")
+        table = pa.ipc.open_stream(rsp.content).read_all()
+        self.assertEqual(table.num_rows, 72)
+        self.assertEqual(table.num_columns, 5)
+        first = table.slice(0, 1).to_pylist()[0]
+        self.assertEqual(first[table.column_names[0]], 24)
+        self.assertEqual(first[table.column_names[1]], "13:53")
+
+        # query results, with the index column
+        rsp = requests.get(req + "?query=date == 23", headers=headers_arrow)
+        self.assertEqual(rsp.status_code, 200)
+        table = pa.ipc.open_stream(rsp.content).read_all()
+        self.assertEqual(table.column_names[0], 'index')
+        self.assertEqual(table.num_rows, 24)
+        self.assertEqual(table.column('index')[0].as_py(), 14)
+        self.assertEqual(table.column('date').to_pylist(), [23] * 24)
+        rsp = requests.get(req + "?query=date == 99", headers=headers_arrow)
+        self.assertEqual(rsp.status_code, 200)
+        table = pa.ipc.open_stream(rsp.content).read_all()
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.num_columns, 6)
+        rsp = requests.get(req + "?query=date == 23&fields=temp", headers=headers_arrow)
+        self.assertEqual(rsp.status_code, 200)
+        table = pa.ipc.open_stream(rsp.content).read_all()
+        self.assertEqual(table.column_names, ['index', 'temp'])
+        self.assertEqual(table.num_rows, 24)
+
+        # non-compound type - one 'value' column
+        domain = 'tall.' + config.get('domain')
+        headers_arrow['host'] = domain
+        rootUUID = helper.getRootUUID(domain)
+        g1UUID = helper.getUUID(domain, rootUUID, 'g1')
+        g11UUID = helper.getUUID(domain, g1UUID, 'g1.1')
+        dset112UUID = helper.getUUID(domain, g11UUID, 'dset1.1.2')
+        req = helper.getEndpoint() + "/datasets/" + dset112UUID + "/value"
+        rsp = requests.get(req + "?select=[2:20:3]", headers=headers_arrow)
+        self.assertEqual(rsp.status_code, 200)
+        table = pa.ipc.open_stream(rsp.content).read_all()
+        self.assertEqual(table.column('value').to_pylist(), list(range(2, 20, 3)))
+
+        # only for one dimensional datasets, json is returned otherwise
+        dset111UUID = helper.getUUID(domain, g11UUID, 'dset1.1.1')
+        req = helper.getEndpoint() + "/datasets/" + dset111UUID + "/value"
+        rsp = requests.get(req, headers=headers_arrow)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], "application/json")
+
     def testGetSelectionBadQuery(self):
         domain = 'tall.' + config.get('domain')  
         headers = {'host': domain}
@@ -382,6 +707,284 @@ class ValueTest(unittest.TestCase):
         rsp = requests.get(req, headers=headers)
         self.assertEqual(rsp.status_code, 400)  
         
+    def testGetIndexSelection(self):
+        domain = 'tall.' + config.get('domain')
+        headers = {'host': domain}
+        rootUUID = helper.getRootUUID(domain)
+        g1UUID = helper.getUUID(domain, rootUUID, 'g1')
+        g11UUID = helper.getUUID(domain, g1UUID, 'g1.1')
+        dset111UUID = helper.getUUID(domain, g11UUID, 'dset1.1.1')  # 10x10, i*j
+        req = helper.getEndpoint() + "/datasets/" + dset111UUID + "/value"
+
+        # negative and open ended bounds
+        rsp = requests.get(req + "?select=[-2:,:-8]", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['value'], [[0, 8], [0, 9]])
+
+        # index lists, in the order given
+        rsp = requests.get(req + "?select=[[9,2,9],3:10:3]", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        data = json.loads(rsp.text)['value']
+        self.assertEqual(data, [[27, 54, 81], [6, 12, 18], [27, 54, 81]])
+        headers_npy = {'host': domain, 'accept': 'application/x-npy'}
+        rsp = requests.get(req + "?select=[[9,2,9],3:10:3]", headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(np.load(io.BytesIO(rsp.content)).tolist(), data)
+
+        # union of hyperslabs, in row-major order
+        rsp = requests.get(req + "?select=[9,:]|[:,9]", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        data = json.loads(rsp.text)['value']
+        self.assertEqual(len(data), 19)
+        self.assertEqual(data[:2], [0, 9])
+        self.assertEqual(data[-3:], [63, 72, 81])
+
+        # same selection in a POST body
+        payload = {'select': '[[9,2,9],3:10:3]'}
+        rsp = requests.post(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['value'][1], [6, 12, 18])
+
+        for bad in ("[[10],0]", "[0:2,0]|[0:2]", "[[1,2],0]&query=value>0"):
+            rsp = requests.get(req + "?select=" + bad, headers=headers)
+            self.assertEqual(rsp.status_code, 400)
+
+        # mask dataset
+        domain = 'valueselectmask.datasettest.' + config.get('domain')
+        headers = {'host': domain}
+        rsp = requests.put(helper.getEndpoint() + "/", headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        dsetUUIDs = []
+        for name in ('dset', 'mask'):
+            payload = {'type': 'H5T_STD_I32LE', 'shape': [4, 5]}
+            rsp = requests.post(helper.getEndpoint() + "/datasets", data=json.dumps(payload),
+                headers=headers)
+            self.assertEqual(rsp.status_code, 201)
+            dsetUUIDs.append(json.loads(rsp.text)['id'])
+            self.assertTrue(helper.linkObject(domain, dsetUUIDs[-1], name))
+        dsetUUID, maskUUID = dsetUUIDs
+        req = helper.getEndpoint() + "/datasets/" + dsetUUID + "/value"
+        value = [list(range(i * 5, i * 5 + 5)) for i in range(4)]
+        rsp = requests.put(req, data=json.dumps({'value': value}), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        mask = [[int(x % 3 == 0) for x in row] for row in value]
+        rsp = requests.put(helper.getEndpoint() + "/datasets/" + maskUUID + "/value",
+            data=json.dumps({'value': mask}), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+
+        rsp = requests.get(req + "?mask=" + maskUUID, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['value'], [0, 3, 6, 9, 12, 15, 18])
+        rsp = requests.get(req + "?mask=" + maskUUID + "&select=[1:3,:]", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['value'], [6, 9, 12])
+
+        # write through the mask and an index list
+        payload = {'mask': maskUUID, 'select': '[1:3,:]', 'value': [-1, -2, -3]}
+        rsp = requests.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        headers_bin = {'host': domain, 'Content-Type': 'application/octet-stream'}
+        data = np.array([[100, 101], [102, 103]], dtype='<i4')
+        rsp = requests.put(req + "?select=[[3,0],[4,0]]", data=data.tobytes(),
+            headers=headers_bin)
+        self.assertEqual(rsp.status_code, 200)
+        readData = helper.readDataset(domain, dsetUUID)
+        self.assertEqual(readData[1], [5, -1, 7, 8, -2])
+        self.assertEqual(readData[2], [10, 11, -3, 13, 14])
+        self.assertEqual(readData[0][0], 103)
+        self.assertEqual(readData[3][4], 100)
+        self.assertEqual(readData[0][4], 102)
+        self.assertEqual(readData[3][0], 101)
+        rsp = requests.put(req + "?select=[[3,0],[4,0]]", data=data.tobytes()[:8],
+            headers=headers_bin)
+        self.assertEqual(rsp.status_code, 400)
+
+    def testGetReduce(self):
+        domain = 'tall.' + config.get('domain')
+        headers = {'host': domain}
+        rootUUID = helper.getRootUUID(domain)
+        g1UUID = helper.getUUID(domain, rootUUID, 'g1')
+        g11UUID = helper.getUUID(domain, g1UUID, 'g1.1')
+        dset111UUID = helper.getUUID(domain, g11UUID, 'dset1.1.1')  # 10x10, i*j
+        req = helper.getEndpoint() + "/datasets/" + dset111UUID + "/value"
+
+        rsp = requests.get(req + "?reduce=sum", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['value'], 2025)
+        rsp = requests.get(req + "?reduce=max&axis=1", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['value'], [i * 9 for i in range(10)])
+        rsp = requests.get(req + "?select=[1:3,:]&reduce=mean&axis=-1", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['value'], [4.5, 9.0])
+        self.assertTrue('reduce=mean' in rspJson['hrefs'][0]['href'])
+        headers_npy = {'host': domain, 'accept': 'application/x-npy'}
+        rsp = requests.get(req + "?reduce=sum&axis=0", headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(np.load(io.BytesIO(rsp.content)).tolist(),
+            [i * 45 for i in range(10)])
+
+        for bad in ("reduce=median", "reduce=sum&axis=2", "reduce=sum&select=[[1,2],0]",
+                "reduce=sum&query=value>0"):
+            rsp = requests.get(req + "?" + bad, headers=headers)
+            self.assertEqual(rsp.status_code, 400)
+
+        # skip the fill value
+        domain = 'fillvalue.' + config.get('domain')
+        headers = {'host': domain}
+        rootUUID = helper.getRootUUID(domain)
+        dsetUUID = helper.getUUID(domain, rootUUID, 'dset')  # 10x10, 24 on the diagonal
+        req = helper.getEndpoint() + "/datasets/" + dsetUUID + "/value"
+        rsp = requests.get(req + "?reduce=mean&skipfill=true", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['value'], 24.0)
+        rsp = requests.get(req + "?reduce=mean", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['value'], 40.2)
+
+    def testGetStats(self):
+        domain = 'tall.' + config.get('domain')
+        headers = {'host': domain}
+        rootUUID = helper.getRootUUID(domain)
+        g1UUID = helper.getUUID(domain, rootUUID, 'g1')
+        g11UUID = helper.getUUID(domain, g1UUID, 'g1.1')
+        dset111UUID = helper.getUUID(domain, g11UUID, 'dset1.1.1')  # 10x10, i*j
+        rsp = requests.get(helper.getEndpoint() + "/datasets/" + dset111UUID + "/stats",
+            headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['count'], 100)
+        self.assertEqual(rspJson['nanCount'], 0)
+        self.assertEqual(rspJson['min'], 0)
+        self.assertEqual(rspJson['max'], 81)
+        self.assertEqual(rspJson['mean'], 20.25)
+        self.assertTrue('chunkShape' in rspJson)
+        self.assertTrue('hrefs' in rspJson)
+
+        # statistics are updated when values are written
+        domain = 'valuestats.datasettest.' + config.get('domain')
+        headers = {'host': domain}
+        rsp = requests.put(helper.getEndpoint() + "/", headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        payload = {'type': 'H5T_IEEE_F64LE', 'shape': [4, 5]}
+        rsp = requests.post(helper.getEndpoint() + "/datasets", data=json.dumps(payload),
+            headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        dsetUUID = json.loads(rsp.text)['id']
+        self.assertTrue(helper.linkObject(domain, dsetUUID, 'dset'))
+        req = helper.getEndpoint() + "/datasets/" + dsetUUID
+        value = [[float(i * 5 + j) for j in range(5)] for i in range(4)]
+        value[0][0] = float('nan')
+        rsp = requests.put(req + "/value", data=json.dumps({'value': value}),
+            headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rsp = requests.get(req + "/stats", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['count'], 19)
+        self.assertEqual(rspJson['nanCount'], 1)
+        self.assertEqual(rspJson['min'], 1.0)
+        self.assertEqual(rspJson['mean'], 10.0)
+
+        payload = {'select': '[3,4]', 'value': [[100.0]]}
+        rsp = requests.put(req + "/value", data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        payload = {'points': [[0, 0]], 'value': [-1.0]}
+        rsp = requests.put(req + "/value", data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rsp = requests.get(req + "/stats", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['count'], 20)
+        self.assertEqual(rspJson['nanCount'], 0)
+        self.assertEqual(rspJson['min'], -1.0)
+        self.assertEqual(rspJson['max'], 100.0)
+        self.assertEqual(rspJson['mean'], 270.0 / 20)
+
+        # only for numeric types
+        payload = {'type': {'class': 'H5T_STRING', 'charSet': 'H5T_CSET_ASCII',
+            'strPad': 'H5T_STR_NULLPAD', 'length': 5}, 'shape': [3]}
+        rsp = requests.post(helper.getEndpoint() + "/datasets", data=json.dumps(payload),
+            headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        strUUID = json.loads(rsp.text)['id']
+        rsp = requests.get(helper.getEndpoint() + "/datasets/" + strUUID + "/stats",
+            headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+
+    def testPyramid(self):
+        domain = 'valuepyramid.datasettest.' + config.get('domain')
+        headers = {'host': domain}
+        rsp = requests.put(helper.getEndpoint() + "/", headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        payload = {'type': 'H5T_STD_I32LE', 'shape': [600, 600]}
+        rsp = requests.post(helper.getEndpoint() + "/datasets", data=json.dumps(payload),
+            headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        dsetUUID = json.loads(rsp.text)['id']
+        self.assertTrue(helper.linkObject(domain, dsetUUID, 'dset'))
+        req = helper.getEndpoint() + "/datasets/" + dsetUUID
+        data = np.arange(600 * 600, dtype='<i4')  # i*600 + j
+        headers_bin = {'host': domain, 'Content-Type': 'application/octet-stream'}
+        rsp = requests.put(req + "/value", data=data.tobytes(), headers=headers_bin)
+        self.assertEqual(rsp.status_code, 200)
+
+        rsp = requests.put(req + "/pyramid", data=json.dumps({'method': 'max'}),
+            headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['method'], 'max')
+        self.assertEqual(rspJson['axes'], [0, 1])
+        self.assertEqual([level['shape'] for level in rspJson['levels']],
+            [[300, 300], [150, 150]])
+        rsp = requests.get(req + "/pyramid", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertFalse(json.loads(rsp.text)['stale'])
+        rsp = requests.put(req + "/pyramid", data=json.dumps({'method': 'median'}),
+            headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+
+        # each element is the max of 2x2 elements of the level below
+        rsp = requests.get(req + "/value?level=1&select=[0:2,0:3]", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['value'], [[601, 603, 605], [1801, 1803, 1805]])
+        self.assertTrue('level=1' in rspJson['hrefs'][0]['href'])
+        headers_npy = {'host': domain, 'accept': 'application/x-npy'}
+        rsp = requests.get(req + "/value?level=2", headers=headers_npy)
+        self.assertEqual(rsp.status_code, 200)
+        values = np.load(io.BytesIO(rsp.content))
+        self.assertEqual(values.shape, (150, 150))
+        self.assertEqual(values[0, 0], 1803)
+
+        # levels are updated when values are written
+        payload = {'select': '[0:1,0:1]', 'value': [[1000000]]}
+        rsp = requests.put(req + "/value", data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rsp = requests.get(req + "/value?level=2&select=[0:2,0]", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['value'], [[1000000], [4203]])
+
+        # the preview is the top level
+        rsp = requests.get(req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        previews = [href['href'] for href in json.loads(rsp.text)['hrefs']
+            if href['rel'] == 'preview']
+        self.assertEqual(len(previews), 1)
+        self.assertTrue('level=2' in previews[0])
+
+        for bad in ("level=3", "level=-1", "level=x", "level=1&reduce=sum"):
+            rsp = requests.get(req + "/value?" + bad, headers=headers)
+            self.assertEqual(rsp.status_code, 400)
+
+        rsp = requests.delete(req + "/pyramid", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rsp = requests.get(req + "/value?level=1", headers=headers)
+        self.assertEqual(rsp.status_code, 404)
+        rsp = requests.get(req + "/pyramid", headers=headers)
+        self.assertEqual(rsp.status_code, 404)
+
     def testGetScalar(self):
         domain = 'scalar.' + config.get('domain')
         headers = {'host': domain}  
@@ -885,9 +1488,206 @@ class ValueTest(unittest.TestCase):
             start = index[-1] + 1  # start at next index
         self.assertEqual(count, 24)
         self.assertEqual(req_count, 3)
+
+    def testQueryCursor(self):
+        domain = 'compound.' + config.get('domain')
+        headers = {'host': domain}
+        root_uuid = helper.getRootUUID(domain)
+        dset_uuid = helper.getUUID(domain, root_uuid, 'dset')
+        req = helper.getEndpoint() + "/datasets/" + dset_uuid + "/value"
+        req += "?query=date == 23"
+
+        # count only
+        rsp = requests.get(req + "&count=true", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['count'], 24)
+        self.assertFalse('value' in rspJson)
+        self.assertFalse('cursor' in rspJson)
+        rsp = requests.get(req + " and temp > 60&count=1", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)["count"], 18)
+
+        # continue with the cursor of each response
+        indexes = []
+        req_count = 0
+        sreq = req + "&Limit=10"
+        while True:
+            rsp = requests.get(sreq, headers=headers)
+            self.assertEqual(rsp.status_code, 200)
+            req_count += 1
+            rspJson = json.loads(rsp.text)
+            self.assertTrue(len(rspJson['index']) <= 10)
+            indexes.extend(rspJson['index'])
+            if 'cursor' not in rspJson:
+                break
+            sreq = req + "&Limit=10&cursor=" + rspJson['cursor']
+        self.assertEqual(len(indexes), 24)
+        self.assertEqual(indexes[0], 14)
+        self.assertEqual(len(set(indexes)), 24)
+        self.assertEqual(req_count, 3)
+
+        # cursor for another query
+        rsp = requests.get(req + "&Limit=10", headers=headers)
+        cursor = json.loads(rsp.text)['cursor']
+        rsp = requests.get(req + "1&cursor=" + cursor, headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+        rsp = requests.get(req + "&cursor=notacursor", headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+        # count and cursor need a query
+        rsp = requests.get(helper.getEndpoint() + "/datasets/" + dset_uuid + "/value?count=1",
+            headers=headers)
+        self.assertEqual(rsp.status_code, 400)
             
          
         
+    def testQueryIndex(self):
+        domain = 'valueindex.datasettest.' + config.get('domain')
+        req = self.endpoint + "/"
+        headers = {'host': domain}
+        rsp = requests.put(req, headers=headers)
+        self.assertEqual(rsp.status_code, 201) # creates domain
+
+        fields = ({'name': 'temp', 'type': 'H5T_STD_I32LE'},
+                    {'name': 'pressure', 'type': 'H5T_IEEE_F32LE'})
+        datatype = {'class': 'H5T_COMPOUND', 'fields': fields }
+        payload = {'type': datatype, 'shape': 100}
+        req = self.endpoint + "/datasets"
+        rsp = requests.post(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)  # create dataset
+        dset_uuid = json.loads(rsp.text)['id']
+        value = [(i % 10, i / 4.0) for i in range(100)]
+        req = self.endpoint + "/datasets/" + dset_uuid + "/value"
+        rsp = requests.put(req, data=json.dumps({'value': value}), headers=headers)
+        self.assertEqual(rsp.status_code, 200)  # write value
+
+        # build indexes
+        index_req = self.endpoint + "/datasets/" + dset_uuid + "/indexes"
+        rsp = requests.put(index_req + "/temp", data=json.dumps({'type': 'bitmap'}),
+            headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['field'], 'temp')
+        self.assertEqual(rspJson['type'], 'bitmap')
+        self.assertEqual(rspJson['keyCount'], 10)
+        self.assertFalse(rspJson['stale'])
+        rsp = requests.put(index_req + "/pressure", headers=headers)  # sorted
+        self.assertEqual(rsp.status_code, 201)
+        rsp = requests.get(index_req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        indexes = rspJson['indexes']
+        self.assertEqual([item['field'] for item in indexes], ['temp', 'pressure'])
+        self.assertEqual(indexes[1]['type'], 'sorted')
+        self.assertEqual(indexes[1]['rows'], 100)
+        self.assertTrue(indexes[1]['href'].endswith('/indexes/pressure'))
+
+        # queries use the indexes
+        rsp = requests.get(req + "?query=temp == 3", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['index'], list(range(3, 100, 10)))
+        rsp = requests.get(req + "?query=pressure < 2 and temp > 4", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['index'], [5, 6, 7])
+        self.assertEqual(rspJson['value'], [[5, 1.25], [6, 1.5], [7, 1.75]])
+
+        # writing values makes the indexes stale
+        payload = {'start': 0, 'stop': 1, 'value': (3, 0.0)}
+        rsp = requests.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rsp = requests.get(index_req + "/temp", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertTrue(json.loads(rsp.text)['stale'])
+        rsp = requests.get(req + "?query=temp == 3", headers=headers)
+        self.assertEqual(json.loads(rsp.text)['index'], [0] + list(range(3, 100, 10)))
+        rsp = requests.put(index_req + "/temp", headers=headers)  # rebuild
+        self.assertEqual(rsp.status_code, 201)
+        self.assertFalse(json.loads(rsp.text)['stale'])
+        rsp = requests.get(req + "?query=temp == 3&count=1", headers=headers)
+        self.assertEqual(json.loads(rsp.text)['count'], 11)
+
+        # remove an index
+        rsp = requests.delete(index_req + "/temp", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rsp = requests.get(index_req + "/temp", headers=headers)
+        self.assertEqual(rsp.status_code, 404)
+        rsp = requests.delete(index_req + "/temp", headers=headers)
+        self.assertEqual(rsp.status_code, 404)
+
+        # invalid requests
+        rsp = requests.put(index_req + "/nosuchfield", headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+        rsp = requests.put(index_req + "/temp", data=json.dumps({'type': 'hash'}),
+            headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+        rsp = requests.put(index_req, headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+
+        # unknown dataset
+        index_req = self.endpoint + "/datasets/" + str(uuid.uuid1()) + "/indexes"
+        rsp = requests.get(index_req, headers=headers)
+        self.assertEqual(rsp.status_code, 404)
+        rsp = requests.get(index_req + "/temp", headers=headers)
+        self.assertEqual(rsp.status_code, 404)
+        rsp = requests.put(index_req + "/temp", headers=headers)
+        self.assertEqual(rsp.status_code, 404)
+        rsp = requests.delete(index_req + "/temp", headers=headers)
+        self.assertEqual(rsp.status_code, 404)
+
+    def testArrayQuery(self):
+        domain = 'tall.' + config.get('domain')
+        headers = {'host': domain}
+        rootUUID = helper.getRootUUID(domain)
+        g1UUID = helper.getUUID(domain, rootUUID, 'g1')
+        g11UUID = helper.getUUID(domain, g1UUID, 'g1.1')
+        dset111UUID = helper.getUUID(domain, g11UUID, 'dset1.1.1')  # 10x10, i*j
+        req = helper.getEndpoint() + "/datasets/" + dset111UUID + "/value"
+        req += "?query=value > 60"
+        expected = [[7, 9], [8, 8], [8, 9], [9, 7], [9, 8], [9, 9]]
+        rsp = requests.get(req, headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['index'], expected)
+        self.assertEqual(rspJson['value'], [63, 64, 72, 63, 72, 81])
+        rsp = requests.get(req + "&select=[5:10,8:10]", headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(json.loads(rsp.text)['index'], [[7, 9], [8, 8], [8, 9], [9, 8], [9, 9]])
+        rsp = requests.get(req + "&count=1", headers=headers)
+        self.assertEqual(json.loads(rsp.text)['count'], 6)
+
+        # npy and binary records of the coordinates and value
+        rsp = requests.get(req, headers={'host': domain, 'accept': 'application/x-npy'})
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], 'application/x-npy')
+        records = np.load(io.BytesIO(rsp.content))
+        self.assertEqual(records['index'].tolist(), expected)
+        self.assertEqual(records['value'].tolist(), [63, 64, 72, 63, 72, 81])
+        rsp = requests.get(req, headers={'host': domain, 'accept': 'application/octet-stream'})
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], 'application/octet-stream')
+        records = np.frombuffer(rsp.content, dtype=[('index', '<i8', (2,)), ('value', '>i4')])
+        self.assertEqual(records['index'].tolist(), expected)
+
+        # continue with the cursor of each response
+        indexes = []
+        sreq = req + "&Limit=4"
+        while True:
+            rsp = requests.get(sreq, headers=headers)
+            self.assertEqual(rsp.status_code, 200)
+            rspJson = json.loads(rsp.text)
+            indexes.extend(rspJson['index'])
+            if 'cursor' not in rspJson:
+                break
+            sreq = req + "&Limit=4&cursor=" + rspJson['cursor']
+        self.assertEqual(indexes, expected)
+        rsp = requests.get(req + "&Limit=4", headers={'host': domain,
+            'accept': 'application/x-npy'})
+        self.assertTrue('X-Query-Cursor' in rsp.headers)
+
+        rsp = requests.get(req.replace('value >', 'temp >'), headers=headers)
+        self.assertEqual(rsp.status_code, 400)
+
     def testBadQuery(self):
         domain = 'compound.' + config.get('domain')  
         root_uuid = helper.getRootUUID(domain)
@@ -1303,7 +2103,122 @@ class ValueTest(unittest.TestCase):
         rsp = requests.put(req, data=json.dumps(payload), headers=headers)
         self.assertEqual(rsp.status_code, 200)  # just right!
          
-    
+    def testPutOctetStream(self):
+        # write values using a raw binary request body
+        domain = 'valueput_octet.datasettest.' + config.get('domain')
+        req = self.endpoint + "/"
+        headers = {'host': domain}
+        rsp = requests.put(req, headers=headers)
+        self.assertEqual(rsp.status_code, 201) # creates domain
+        
+        #create scalar dataset
+        payload = {'type': 'H5T_STD_I32LE'}
+        req = self.endpoint + "/datasets"
+        rsp = requests.post(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)  # create dataset
+        rspJson = json.loads(rsp.text)
+        dset0UUID = rspJson['id']
+        
+        binary_headers = {'host': domain, 'Content-Type': 'application/octet-stream'}
+        req = self.endpoint + "/datasets/" + dset0UUID + "/value" 
+        rsp = requests.put(req, data=struct.pack('<i', 42), headers=binary_headers)
+        self.assertEqual(rsp.status_code, 200)
+        readData = helper.readDataset(domain, dset0UUID)
+        self.assertEqual(readData, 42)
+        
+        #create 2d dataset
+        payload = {'type': 'H5T_STD_I32LE', 'shape': (10,10)}
+        req = self.endpoint + "/datasets"
+        rsp = requests.post(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)  # create dataset
+        rspJson = json.loads(rsp.text)
+        dset2UUID = rspJson['id']
+        
+        req = self.endpoint + "/datasets/" + dset2UUID + "/value" 
+        values = []
+        for i in range(10):
+            for j in range(10):
+                values.append(i*j)
+        data = struct.pack('<100i', *values)
+        rsp = requests.put(req, data=data, headers=binary_headers)
+        self.assertEqual(rsp.status_code, 200)
+        read_data = helper.readDataset(domain, dset2UUID)
+        for i in range(10):
+            self.assertEqual(read_data[i], values[i*10:(i+1)*10])
+        
+        # write rows 2 and 4, columns 5-9 with start/stop/step query params
+        params = {'start': '2,5', 'stop': '[6,10]', 'step': '2,1'}
+        data = struct.pack('<10i', *range(100, 110))
+        rsp = requests.put(req, data=data, headers=binary_headers, params=params)
+        self.assertEqual(rsp.status_code, 200)
+        read_data = helper.readDataset(domain, dset2UUID)
+        self.assertEqual(read_data[2][5:], [100, 101, 102, 103, 104])
+        self.assertEqual(read_data[3][5:], [15, 18, 21, 24, 27])
+        self.assertEqual(read_data[4][5:], [105, 106, 107, 108, 109])
+        
+        # wrong number of bytes for the selection
+        rsp = requests.put(req, data=data[:-4], headers=binary_headers, params=params)
+        self.assertEqual(rsp.status_code, 400)
+        
+        # bad query param
+        params = {'start': 'a,b'}
+        rsp = requests.put(req, data=data, headers=binary_headers, params=params)
+        self.assertEqual(rsp.status_code, 400)
+
+    def testGetConditional(self):
+        domain = 'valueget_conditional.datasettest.' + config.get('domain')
+        req = self.endpoint + "/"
+        headers = {'host': domain}
+        rsp = requests.put(req, headers=headers)
+        self.assertEqual(rsp.status_code, 201) # creates domain
+
+        payload = {'type': 'H5T_STD_I32LE', 'shape': 10}
+        req = self.endpoint + "/datasets"
+        rsp = requests.post(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)  # create dataset
+        rspJson = json.loads(rsp.text)
+        dset1UUID = rspJson['id']
+
+        req = self.endpoint + "/datasets/" + dset1UUID + "/value"
+        params = {'select': '[2:5]'}
+        rsp = requests.get(req, headers=headers, params=params)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertTrue('Etag' in rsp.headers)
+        self.assertTrue('Last-Modified' in rsp.headers)
+        etag = rsp.headers['Etag']
+
+        # same selection - not modified
+        conditional_headers = {'host': domain, 'If-None-Match': etag}
+        rsp = requests.get(req, headers=conditional_headers, params=params)
+        self.assertEqual(rsp.status_code, 304)
+        self.assertEqual(rsp.text, '')
+        since_headers = {'host': domain,
+            'If-Modified-Since': rsp.headers['Last-Modified']}
+        rsp = requests.get(req, headers=since_headers, params=params)
+        self.assertEqual(rsp.status_code, 304)
+
+        # different selection
+        rsp = requests.get(req, headers=conditional_headers, params={'select': '[0:5]'})
+        self.assertEqual(rsp.status_code, 200)
+
+        # metadata requests have their own etag
+        req_dset = self.endpoint + "/datasets/" + dset1UUID
+        rsp = requests.get(req_dset, headers=conditional_headers)
+        self.assertEqual(rsp.status_code, 200)
+        rsp = requests.get(req_dset, headers={'host': domain,
+            'If-None-Match': rsp.headers['Etag']})
+        self.assertEqual(rsp.status_code, 304)
+
+        # updated value
+        payload = {'value': list(range(10))}
+        rsp = requests.put(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 200)
+        rsp = requests.get(req, headers=conditional_headers, params=params)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['value'], [2, 3, 4])
+        self.assertTrue(rsp.headers['Etag'] != etag)
+
     def testPutSelectionBinary(self):
         # create domain
         domain = 'valueputsel_binary.datasettest.' + config.get('domain')
@@ -1350,6 +2265,48 @@ class ValueTest(unittest.TestCase):
         readData = helper.readDataset(domain, dset1UUID)
         self.assertEqual(readData, primes)  # verify we got back what we started with
         
+    def testPutBinaryGzip(self):
+        domain = 'valueput_binarygzip.datasettest.' + config.get('domain')
+        req = self.endpoint + "/"
+        headers = {'host': domain}
+        rsp = requests.put(req, headers=headers)
+        self.assertEqual(rsp.status_code, 201) # creates domain
+
+        # create 1d dataset
+        nitems = 10000
+        payload = {'type': 'H5T_STD_I32LE', 'shape': nitems}
+        req = self.endpoint + "/datasets"
+        rsp = requests.post(req, data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)  # create dataset
+        rspJson = json.loads(rsp.text)
+        dsetUUID = rspJson['id']
+        self.assertTrue(helper.validateId(dsetUUID))
+
+        # write gzip'd values
+        req = self.endpoint + "/datasets/" + dsetUUID + "/value"
+        headers_gzip = {'host': domain, 'Content-Type': "application/octet-stream",
+            'Content-Encoding': 'gzip'}
+        value = list(range(nitems))
+        data = struct.pack('<' + str(nitems) + 'i', *value)
+        rsp = requests.put(req, data=gzip.compress(data), headers=headers_gzip)
+        self.assertEqual(rsp.status_code, 200)
+        readData = helper.readDataset(domain, dsetUUID)
+        self.assertEqual(readData, value)
+
+        # wrong number of bytes once decompressed
+        rsp = requests.put(req + "?start=0&stop=10", data=gzip.compress(data),
+            headers=headers_gzip)
+        self.assertEqual(rsp.status_code, 400)
+
+        # json body
+        headers_gzip['Content-Type'] = 'application/json'
+        payload = { 'start': 0, 'stop': 3, 'value': [7, 8, 9] }
+        rsp = requests.put(req, data=gzip.compress(json.dumps(payload).encode('utf-8')),
+            headers=headers_gzip)
+        self.assertEqual(rsp.status_code, 200)
+        readData = helper.readDataset(domain, dsetUUID)
+        self.assertEqual(readData[:4], [7, 8, 9, 3])
+
     def testPutPointSelection(self):
         # create domain
         domain = 'valueputpointsel.datasettest.' + config.get('domain')
@@ -1425,6 +2382,71 @@ class ValueTest(unittest.TestCase):
         self.assertEqual(readData[37], 1)  # prime
         self.assertEqual(readData[38], 0)  # not prime
         
+
+    def testBinaryPoints(self):
+        domain = 'tall.' + config.get('domain')
+        headers = {'host': domain}
+        rootUUID = helper.getRootUUID(domain)
+        g1UUID = helper.getUUID(domain, rootUUID, 'g1')
+        g11UUID = helper.getUUID(domain, g1UUID, 'g1.1')
+        dset111UUID = helper.getUUID(domain, g11UUID, 'dset1.1.1')
+        req = self.endpoint + "/datasets/" + dset111UUID + "/value"
+
+        # rank 2 points (including a repeated point) as N x 2 uint64
+        points = np.array([[9, 9], [2, 3], [0, 5], [9, 9]], dtype='<u8')
+        headers_bin = {'host': domain, 'Content-Type': 'application/octet-stream'}
+        rsp = requests.post(req, data=points.tobytes(), headers=headers_bin)
+        self.assertEqual(rsp.status_code, 200)
+        rspJson = json.loads(rsp.text)
+        self.assertEqual(rspJson['value'], [81, 6, 0, 81])
+
+        headers_bin['accept'] = 'application/octet-stream'
+        rsp = requests.post(req, data=points.tobytes(), headers=headers_bin)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp.headers['Content-Type'], "application/octet-stream")
+        self.assertEqual(np.frombuffer(rsp.content, dtype='>i4').tolist(), [81, 6, 0, 81])
+
+        headers_bin['accept'] = 'application/x-npy'
+        rsp = requests.post(req, data=points.tobytes(), headers=headers_bin)
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(np.load(io.BytesIO(rsp.content)).tolist(), [81, 6, 0, 81])
+
+        # out of range and partial points
+        rsp = requests.post(req, data=np.array([[10, 0]], dtype='<u8').tobytes(),
+            headers=headers_bin)
+        self.assertEqual(rsp.status_code, 400)
+        rsp = requests.post(req, data=points.tobytes()[:-8], headers=headers_bin)
+        self.assertEqual(rsp.status_code, 400)
+
+        # write a point selection with a binary body
+        domain = 'valueputpointsel_body.datasettest.' + config.get('domain')
+        headers = {'host': domain}
+        rsp = requests.put(self.endpoint + "/", headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        payload = {'type': 'H5T_STD_I32LE', 'shape': [10, 10], 'maxdims': [10, 10]}
+        rsp = requests.post(self.endpoint + "/datasets", data=json.dumps(payload), headers=headers)
+        self.assertEqual(rsp.status_code, 201)
+        dsetUUID = json.loads(rsp.text)['id']
+        self.assertTrue(helper.linkObject(domain, dsetUUID, 'dset'))
+        req = self.endpoint + "/datasets/" + dsetUUID + "/value"
+
+        points = np.array([[1, 2], [9, 0], [1, 2]], dtype='<u8')
+        values = np.array([5, 6, 7], dtype='<i4')
+        headers_bin = {'host': domain, 'Content-Type': 'application/octet-stream'}
+        rsp = requests.put(req + "?points=3", data=points.tobytes() + values.tobytes(),
+            headers=headers_bin)
+        self.assertEqual(rsp.status_code, 200)
+        readData = helper.readDataset(domain, dsetUUID)
+        self.assertEqual(readData[1][2], 7)  # last value for repeated point
+        self.assertEqual(readData[9][0], 6)
+        self.assertEqual(readData[0][0], 0)
+
+        # wrong body size and points with a hyperslab selection
+        rsp = requests.put(req + "?points=3", data=points.tobytes(), headers=headers_bin)
+        self.assertEqual(rsp.status_code, 400)
+        rsp = requests.put(req + "?points=3&start=0", data=points.tobytes() + values.tobytes(),
+            headers=headers_bin)
+        self.assertEqual(rsp.status_code, 400)
         
     def testPutCompound(self):
         domain = 'valueputcompound.datasettest.' + config.get('domain')
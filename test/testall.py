@@ -17,7 +17,10 @@ import os
 import sys
 
 
-unit_tests = ('timeUtilTest', 'fileUtilTest')
+unit_tests = ('timeUtilTest', 'fileUtilTest', 'dbPoolTest', 'executorUtilTest', 'configTest', 'selectionUtilTest',
+    'metaCacheTest', 'authFileTest', 'metricsUtilTest', 'domainCacheTest', 'compressUtilTest',
+    'jsonUtilTest', 'npyUtilTest', 'arrowUtilTest', 'sidecarUtilTest', 'queryUtilTest', 'indexUtilTest',
+    'reduceUtilTest', 'statsUtilTest', 'pyramidUtilTest')
 integ_tests = ('roottest', 'grouptest', 'dirtest', 'linktest', 'datasettest', 'valuetest',
     'attributetest', 'datatypetest', 'shapetest', 'datasettypetest', 'acltest')
 
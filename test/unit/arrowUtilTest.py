@@ -0,0 +1,101 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+
+import numpy as np
+import h5json
+
+from h5serv import arrowUtil
+from h5serv.arrowUtil import getSchema, getRecordBatch, StreamWriter
+
+import config
+
+if arrowUtil.isAvailable():
+    import pyarrow as pa
+
+
+@unittest.skipUnless(arrowUtil.isAvailable(), "pyarrow not installed")
+class ArrowUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(ArrowUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def roundTrip(self, schema, batches):
+        writer = StreamWriter(schema)
+        data = b''
+        for batch in batches:
+            data += writer.write(batch)
+        data += writer.close()
+        return pa.ipc.open_stream(data).read_all()
+
+    def testNumeric(self):
+        typeItem = {'class': 'H5T_FLOAT', 'base': 'H5T_IEEE_F64BE'}
+        dtype = h5json.createDataType(typeItem)
+        schema = getSchema(dtype)
+        self.assertEqual(schema.names, ['value'])
+        self.assertEqual(schema.field('value').type, pa.float64())
+        arr = np.arange(10, dtype='>f8')
+        table = self.roundTrip(schema, [getRecordBatch(schema, arr[:4]),
+            getRecordBatch(schema, arr[4:])])
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(table.column('value').to_pylist(), arr.tolist())
+
+    def testCompound(self):
+        typeItem = {'class': 'H5T_COMPOUND', 'fields': [
+            {'name': 'date', 'type': {'class': 'H5T_INTEGER', 'base': 'H5T_STD_I32BE'}},
+            {'name': 'time', 'type': {'class': 'H5T_STRING', 'charSet': 'H5T_CSET_ASCII',
+                'strPad': 'H5T_STR_NULLPAD', 'length': 6}},
+            {'name': 'wind', 'type': {'class': 'H5T_ARRAY', 'dims': [2],
+                'base': {'class': 'H5T_FLOAT', 'base': 'H5T_IEEE_F32LE'}}},
+            {'name': 'tags', 'type': {'class': 'H5T_VLEN',
+                'base': {'class': 'H5T_INTEGER', 'base': 'H5T_STD_I16LE'}}}]}
+        dtype = h5json.createDataType(typeItem)
+        schema = getSchema(dtype, index=True)
+        self.assertEqual(schema.names, ['index', 'date', 'time', 'wind', 'tags'])
+        self.assertEqual(schema.field('date').type, pa.int32())
+        self.assertEqual(schema.field('time').type, pa.string())
+        self.assertEqual(schema.field('wind').type, pa.list_(pa.float32(), 2))
+        self.assertEqual(schema.field('tags').type, pa.list_(pa.int16()))
+
+        rows = np.zeros((3,), dtype=dtype)
+        for i in range(3):
+            rows[i] = (20 + i, ("13:5" + str(i)).encode('ascii'), (i, i + 0.5),
+                np.arange(i, dtype='<i2'))
+        table = self.roundTrip(schema, [getRecordBatch(schema, rows, indexes=[4, 7, 9])])
+        self.assertEqual(table.column('index').to_pylist(), [4, 7, 9])
+        self.assertEqual(table.column('date').to_pylist(), [20, 21, 22])
+        self.assertEqual(table.column('time').to_pylist(), ["13:50", "13:51", "13:52"])
+        self.assertEqual(table.column('wind').to_pylist()[2], [2.0, 2.5])
+        self.assertEqual(table.column('tags').to_pylist(), [[], [0], [0, 1]])
+
+    def testEmpty(self):
+        typeItem = {'class': 'H5T_INTEGER', 'base': 'H5T_STD_U8LE'}
+        dtype = h5json.createDataType(typeItem)
+        schema = getSchema(dtype, index=True)
+        table = self.roundTrip(schema, [])
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.names, ['index', 'value'])
+
+    def testUnsupported(self):
+        typeItem = {'class': 'H5T_REFERENCE', 'base': 'H5T_STD_REF_OBJ'}
+        dtype = h5json.createDataType(typeItem)
+        try:
+            getSchema(dtype)
+            self.assertTrue(False)  # expected exception
+        except TypeError:
+            pass  # expected
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
@@ -0,0 +1,110 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os
+import os.path as op
+import hashlib
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import h5py
+from tornado.web import HTTPError
+
+from h5serv.authFile import AuthClient
+from h5serv.authCache import AuthCache, NOT_FOUND
+
+import config
+
+class AuthFileTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(AuthFileTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filePath = op.join(self.tmpdir, "passwd.h5")
+        fields = []
+        fields.append(('pwd', np.dtype('S56')))
+        fields.append(('state', np.dtype('S1')))
+        fields.append(('userid', np.int32))
+        with h5py.File(self.filePath, 'w') as f:
+            f['user_type'] = np.dtype(fields)
+        self.addUser('alice', 'secret', 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def addUser(self, user_name, password, userid):
+        with h5py.File(self.filePath, 'r+') as f:
+            user_type = f['user_type']
+            data = np.empty((), dtype=user_type)
+            data['pwd'] = hashlib.sha224(password.encode('utf-8')).hexdigest()
+            data['state'] = 'A'
+            data['userid'] = userid
+            f.attrs.create(user_name, data, dtype=user_type)
+        # make sure the change is seen even with coarse mtime resolution
+        mtime = time.time() + userid
+        os.utime(self.filePath, (mtime, mtime))
+
+    def testAuthCache(self):
+        cache = AuthCache(max_items=2, timeout=0.1)
+        self.assertTrue(cache.get('a') is NOT_FOUND)
+        cache.put('a', None)
+        self.assertEqual(cache.get('a'), None)
+        cache.put('b', 2)
+        cache.put('c', 3)
+        self.assertEqual(cache.getCount(), 2)
+        self.assertTrue(cache.get('a') is NOT_FOUND)
+        self.assertEqual(cache.get('c'), 3)
+        time.sleep(0.2)
+        self.assertTrue(cache.get('c') is NOT_FOUND)
+
+    def testValidate(self):
+        auth = AuthClient(self.filePath)
+        self.assertEqual(auth.validateUserPassword(b'alice', b'secret'), 1)
+        self.assertEqual(auth.credential_cache.getCount(), 1)
+        # served from cache
+        self.assertEqual(auth.validateUserPassword(b'alice', b'secret'), 1)
+        try:
+            auth.validateUserPassword(b'alice', b'wrong')
+            self.assertTrue(False)  # expected exception
+        except HTTPError as e:
+            self.assertEqual(e.status_code, 401)
+        try:
+            auth.validateUserPassword(b'bob', b'secret')
+            self.assertTrue(False)  # expected exception
+        except HTTPError as e:
+            self.assertEqual(e.status_code, 401)
+
+    def testUnknownUser(self):
+        auth = AuthClient(self.filePath)
+        self.assertEqual(auth.getUserInfo('bob'), None)
+        self.assertEqual(auth.user_cache.get('bob'), None)  # negative entry
+        # adding the user to the password file clears the cache
+        self.addUser('bob', 'pass', 2)
+        self.assertEqual(auth.getUserId('bob'), 2)
+        self.assertEqual(auth.validateUserPassword(b'bob', b'pass'), 2)
+
+    def testUserName(self):
+        auth = AuthClient(self.filePath)
+        self.assertEqual(auth.getUserName(1), 'alice')
+        self.assertEqual(auth.getUserName(2), None)
+        self.addUser('bob', 'pass', 2)
+        self.assertEqual(auth.getUserName(2), 'bob')
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
@@ -0,0 +1,66 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import gzip
+import zlib
+
+from h5serv.compressUtil import getEncoding, isCompressibleType, Compressor
+
+import config
+
+class CompressUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(CompressUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testGetEncoding(self):
+        self.assertEqual(getEncoding(None), None)
+        self.assertEqual(getEncoding(''), None)
+        self.assertEqual(getEncoding('identity'), None)
+        self.assertEqual(getEncoding('gzip, deflate'), 'gzip')
+        self.assertEqual(getEncoding('deflate'), 'deflate')
+        self.assertEqual(getEncoding('GZIP;q=0.5'), 'gzip')
+        self.assertEqual(getEncoding('gzip;q=0, deflate'), 'deflate')
+        self.assertEqual(getEncoding('*'), 'gzip')
+        self.assertEqual(getEncoding('*;q=0'), None)
+        self.assertEqual(getEncoding('br'), None)
+
+    def testIsCompressibleType(self):
+        self.assertTrue(isCompressibleType('application/json'))
+        self.assertTrue(isCompressibleType('application/json; charset=UTF-8'))
+        self.assertTrue(isCompressibleType('application/octet-stream'))
+        self.assertTrue(isCompressibleType('text/html'))
+        self.assertFalse(isCompressibleType('image/png'))
+        self.assertFalse(isCompressibleType(None))
+
+    def testCompressor(self):
+        data = b'0123456789' * 1000
+        compressor = Compressor('gzip', level=6)
+        out = compressor.compress(data[:5000]) + compressor.sync()
+        # everything written so far can be decoded
+        decompressobj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(decompressobj.decompress(out), data[:5000])
+        out += compressor.compress(data[5000:]) + compressor.finish()
+        self.assertEqual(gzip.decompress(out), data)
+        self.assertTrue(len(out) < len(data))
+
+        compressor = Compressor('deflate', level=1)
+        out = compressor.compress(data) + compressor.finish()
+        self.assertEqual(zlib.decompress(out), data)
+
+        self.assertRaises(ValueError, Compressor, 'br')
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
@@ -0,0 +1,97 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os.path as op
+import json
+import shutil
+import tempfile
+
+import h5serv.config as h5config
+from h5serv.config import Config
+
+import config
+
+class ConfigTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(ConfigTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.configFile = op.join(self.tmpdir, "h5serv.json")
+
+    def tearDown(self):
+        h5config.update({'config_file': ''})
+        shutil.rmtree(self.tmpdir)
+
+    def writeConfigFile(self, values):
+        with open(self.configFile, 'w') as f:
+            json.dump(values, f)
+
+    def testDefaults(self):
+        cfg = Config(argv=['h5serv'], environ={})
+        self.assertEqual(cfg.port, 5000)
+        self.assertEqual(cfg.get('port'), 5000)
+        self.assertEqual(cfg.toc_name, '.toc.h5')
+        self.assertEqual(cfg.allow_noauth, True)
+        self.assertEqual(cfg.get('nosuchoption'), None)
+
+    def testTypes(self):
+        argv = ['h5serv', '--port=7253', '--debug=false', '--db_pool_idle_timeout=0.5',
+            '--public_dir=public,shared', '--datapath=~/h5data']
+        cfg = Config(argv=argv, environ={'ALLOW_NOAUTH': '0', 'SSL_PORT': '6051'})
+        self.assertEqual(cfg.port, 7253)
+        self.assertEqual(cfg.ssl_port, 6051)
+        self.assertTrue(cfg.debug is False)
+        self.assertTrue(cfg.allow_noauth is False)
+        self.assertEqual(cfg.db_pool_idle_timeout, 0.5)
+        self.assertEqual(cfg.public_dir, ['public', 'shared'])
+        self.assertEqual(cfg.datapath, op.expanduser('~/h5data'))
+        try:
+            Config(argv=['h5serv', '--port=abc'], environ={})
+            self.assertTrue(False)  # expected exception
+        except ValueError:
+            pass  # expected
+
+    def testPrecedence(self):
+        self.writeConfigFile({'port': 6000, 'domain': 'example.org', 'log_level': 'DEBUG'})
+        argv = ['h5serv', '--config_file=' + self.configFile, '--port=7000']
+        environ = {'PORT': '8000', 'DOMAIN': 'env.example.org'}
+        cfg = Config(argv=argv, environ=environ)
+        self.assertEqual(cfg.port, 7000)
+        self.assertEqual(cfg.domain, 'env.example.org')
+        self.assertEqual(cfg.log_level, 'DEBUG')
+
+    def testReload(self):
+        self.writeConfigFile({'log_level': 'ERROR', 'port': 6000})
+        h5config.update({'config_file': self.configFile})
+        self.assertEqual(h5config.get('log_level'), 'ERROR')
+        self.assertEqual(h5config.get('port'), 6000)
+        self.writeConfigFile({'log_level': 'DEBUG', 'port': 6001})
+        # snapshot doesn't change until reload
+        self.assertEqual(h5config.get('log_level'), 'ERROR')
+        changed = h5config.reload()
+        self.assertEqual(changed, ['log_level'])
+        self.assertEqual(h5config.get('log_level'), 'DEBUG')
+        # port can only be changed with a restart
+        self.assertEqual(h5config.get('port'), 6000)
+        # a bad config file leaves the config as is
+        with open(self.configFile, 'w') as f:
+            f.write("{not json")
+        self.assertEqual(h5config.reload(), [])
+        self.assertEqual(h5config.get('log_level'), 'DEBUG')
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
@@ -0,0 +1,240 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os
+import os.path as op
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+# as when running with multiple workers, see testProcessLocking
+os.environ['HDF5_USE_FILE_LOCKING'] = 'FALSE'
+import h5py
+
+from h5serv.dbPool import DbPool, DatasetReader, getFileStamp
+import h5serv.metricsUtil as metricsUtil
+
+import config
+
+class DbPoolTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(DbPoolTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def makeFile(self, name):
+        filePath = op.join(self.tmpdir, name)
+        f = h5py.File(filePath, 'w')
+        f.close()
+        return filePath
+
+    def testReuse(self):
+        filePath = self.makeFile("reuse.h5")
+        pool = DbPool(max_files=4, idle_timeout=0)
+        hdf5_time = metricsUtil.phase_time.values.get(('hdf5',), 0)
+        with pool.getDb(filePath) as db:
+            rootUUID = db.getUUIDByPath('/')
+            db1 = db
+        self.assertTrue(metricsUtil.phase_time.values[('hdf5',)] > hdf5_time)
+        self.assertEqual(pool.getOpenCount(), 1)
+        with pool.getDb(filePath) as db:
+            self.assertTrue(db is db1)
+            self.assertEqual(db.getUUIDByPath('/'), rootUUID)
+        pool.closeAll()
+        self.assertEqual(pool.getOpenCount(), 0)
+
+    def testCloseAllInUse(self):
+        filePath = self.makeFile("inuse.h5")
+        pool = DbPool(max_files=4, idle_timeout=0)
+        with pool.getDb(filePath) as db:
+            pool.closeAll()
+            # the handle is closed when released, not while in use
+            self.assertEqual(pool.getOpenCount(), 1)
+            db.getUUIDByPath('/')
+        self.assertEqual(pool.getOpenCount(), 0)
+
+    def testMaxFiles(self):
+        pool = DbPool(max_files=2, idle_timeout=0)
+        filePaths = []
+        for name in ("a.h5", "b.h5", "c.h5"):
+            filePath = self.makeFile(name)
+            filePaths.append(filePath)
+            with pool.getDb(filePath) as db:
+                db.getUUIDByPath('/')
+        self.assertEqual(pool.getOpenCount(), 2)
+        # "a.h5" was least recently used, so should have been closed
+        with pool.getDb(filePaths[2]) as db:
+            db3 = db
+        with pool.getDb(filePaths[0]) as db:
+            self.assertTrue(db is not None)
+        self.assertEqual(pool.getOpenCount(), 2)
+        with pool.getDb(filePaths[2]) as db:
+            self.assertTrue(db is db3)
+        pool.closeAll()
+
+    def testNoPooling(self):
+        filePath = self.makeFile("nopool.h5")
+        pool = DbPool(max_files=0, idle_timeout=0)
+        with pool.getDb(filePath) as db:
+            db.getUUIDByPath('/')
+        self.assertEqual(pool.getOpenCount(), 0)
+
+    def testProcessLocking(self):
+        filePath = self.makeFile("locked.h5")
+        pool = DbPool(max_files=4, idle_timeout=0)
+        with pool.getDb(filePath) as db:
+            db.getUUIDByPath('/')
+        versionDir = op.join(self.tmpdir, "versions")
+        os.mkdir(versionDir)
+        pool.enableProcessLocking(versionDir)
+        self.assertEqual(pool.getOpenCount(), 0)
+        self.assertTrue(pool.process_lock)
+        with pool.getDb(filePath, modify=False) as db:
+            db.getUUIDByPath('/')
+        self.assertEqual(pool.getOpenCount(), 0)
+        version = pool.getVersion(filePath)
+        # another process sees the same version
+        other = DbPool(max_files=4, idle_timeout=0)
+        other.enableProcessLocking(versionDir)
+        self.assertEqual(other.getVersion(filePath), version)
+        with other.getDb(filePath, modify=False) as db:
+            db.getUUIDByPath('/')
+        self.assertEqual(pool.getVersion(filePath), version)
+        with other.getDb(filePath) as db:
+            db.getUUIDByPath('/')
+        self.assertNotEqual(pool.getVersion(filePath), version)
+
+    def testDatasetReader(self):
+        filePath = self.makeFile("reader.h5")
+        pool = DbPool(max_files=4, idle_timeout=0)
+        with pool.getDb(filePath) as db:
+            datatype = {'class': 'H5T_COMPOUND', 'fields': [
+                {'name': 'a', 'type': 'H5T_STD_I32LE'},
+                {'name': 'b', 'type': 'H5T_IEEE_F64LE'}]}
+            dset_uuid = db.createDataset(datatype, (10,))['id']
+            dset = db.getDatasetObjByUuid(dset_uuid)
+            values = np.zeros((10,), dtype=dset.dtype)
+            values['a'] = np.arange(10)
+            dset[...] = values
+        reader = DatasetReader(filePath, dset_uuid, pool=pool)
+        self.assertEqual(reader.shape, (10,))
+        self.assertEqual(reader.dtype, values.dtype)
+        self.assertEqual(reader[2:5]['a'].tolist(), [2, 3, 4])
+        self.assertEqual(reader.fields(['a'])[8:]['a'].tolist(), [8, 9])
+        # the file isn't held between reads
+        self.assertEqual(pool.entries[op.normpath(filePath)].refCount, 0)
+        with pool.getDb(filePath) as db:
+            db.deleteObjectByUuid('dataset', dset_uuid)
+        try:
+            reader[0:1]
+            self.assertTrue(False)  # expected exception
+        except IOError:
+            pass  # expected
+
+    def testIdleTimeout(self):
+        filePath = self.makeFile("idle.h5")
+        pool = DbPool(max_files=4, idle_timeout=0.1)
+        with pool.getDb(filePath) as db:
+            db.getUUIDByPath('/')
+        self.assertEqual(pool.getOpenCount(), 1)
+        time.sleep(0.2)
+        pool.prune()
+        self.assertEqual(pool.getOpenCount(), 0)
+
+    def testInvalidate(self):
+        filePath = self.makeFile("invalidate.h5")
+        pool = DbPool(max_files=4, idle_timeout=0)
+        with pool.getDb(filePath) as db:
+            db1 = db
+            # invalidate while in use - closed on release
+            pool.invalidate(filePath)
+            db.getUUIDByPath('/')
+        self.assertEqual(pool.getOpenCount(), 0)
+        with pool.getDb(filePath) as db:
+            self.assertTrue(db is not db1)
+        pool.invalidate(filePath)
+        self.assertEqual(pool.getOpenCount(), 0)
+        os.remove(filePath)
+        self.assertRaises(IOError, pool.getDb(filePath).__enter__)
+        self.assertEqual(pool.getOpenCount(), 0)
+
+    def testModifiedFile(self):
+        filePath = self.makeFile("modified.h5")
+        pool = DbPool(max_files=4, idle_timeout=0)
+        with pool.getDb(filePath) as db:
+            db.getUUIDByPath('/')
+            db1 = db
+        # simulate an update by some other process
+        mtime = op.getmtime(filePath)
+        os.utime(filePath, (mtime + 10, mtime + 10))
+        with pool.getDb(filePath) as db:
+            self.assertTrue(db is not db1)
+        pool.closeAll()
+
+    def testReadOnlyRequests(self):
+        filePath = self.makeFile("readonly.h5")
+        pool = DbPool(max_files=0, idle_timeout=0)
+        with pool.getDb(filePath) as db:
+            db.getUUIDByPath('/')  # initializes the file
+        version = pool.getVersion(filePath)
+        # opening and closing the file for reads leaves the version unchanged
+        for i in range(3):
+            time.sleep(0.01)
+            with pool.getDb(filePath, modify=False) as db:
+                db.getUUIDByPath('/')
+                self.assertEqual(pool.getVersion(filePath), version)
+            self.assertEqual(pool.getVersion(filePath), version)
+        # but not for updates
+        with pool.getDb(filePath) as db:
+            db.createGroup()
+        self.assertNotEqual(pool.getVersion(filePath), version)
+
+        # pooled handle
+        pool = DbPool(max_files=4, idle_timeout=0)
+        version = pool.getVersion(filePath)
+        with pool.getDb(filePath, modify=False) as db:
+            db.getUUIDByPath('/')
+        with pool.getDb(filePath, modify=False) as db:
+            self.assertEqual(pool.getVersion(filePath), version)
+        pool.closeAll()
+        self.assertEqual(pool.getVersion(filePath), version)
+
+    def testOutsideUpdate(self):
+        filePath = self.makeFile("outside.h5")
+        for max_files in (0, 4):
+            pool = DbPool(max_files=max_files, idle_timeout=0)
+            with pool.getDb(filePath, modify=False) as db:
+                db.getUUIDByPath('/')
+            version = pool.getVersion(filePath)
+            with pool.getDb(filePath, modify=False) as db:
+                # an in-place update (same size) by some other process
+                mtime = op.getmtime(filePath)
+                os.utime(filePath, (mtime + 10, mtime + 10))
+            self.assertNotEqual(pool.getVersion(filePath), version)
+            self.assertNotEqual(op.getmtime(filePath), mtime)  # not set back
+            version = pool.getVersion(filePath)
+            mtime = op.getmtime(filePath)
+            os.utime(filePath, (mtime + 10, mtime + 10))
+            self.assertNotEqual(pool.getVersion(filePath), version)
+            pool.closeAll()
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
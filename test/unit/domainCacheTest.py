@@ -0,0 +1,111 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os
+import os.path as op
+import shutil
+import tempfile
+import time
+
+import h5py
+
+import h5serv.domainCache as domainCache
+from h5serv.domainCache import DomainCache
+
+import config
+
+class DomainCacheTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(DomainCacheTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.is_hdf5_calls = 0
+        self.is_hdf5 = domainCache.is_hdf5
+
+        def countingIsHdf5(filePath):
+            self.is_hdf5_calls += 1
+            return self.is_hdf5(filePath)
+        domainCache.is_hdf5 = countingIsHdf5
+
+    def tearDown(self):
+        domainCache.is_hdf5 = self.is_hdf5
+        shutil.rmtree(self.tmpdir)
+
+    def makeFile(self, name):
+        filePath = op.join(self.tmpdir, name)
+        f = h5py.File(filePath, 'w')
+        f.close()
+        return filePath
+
+    def testIsFile(self):
+        cache = DomainCache(max_items=10, timeout=60)
+        filePath = self.makeFile("a.h5")
+        self.assertTrue(cache.isFile(filePath))
+        self.assertTrue(cache.isFile(filePath))
+        self.assertEqual(self.is_hdf5_calls, 1)
+        # missing and non-HDF5 files aren't cached
+        missingPath = op.join(self.tmpdir, "missing.h5")
+        self.assertFalse(cache.isFile(missingPath))
+        self.assertFalse(cache.isFile(self.tmpdir))
+        textPath = op.join(self.tmpdir, "b.h5")
+        with open(textPath, 'w') as f:
+            f.write("not hdf5")
+        self.assertFalse(cache.isFile(textPath))
+        self.assertFalse(cache.isFile(textPath))
+        self.assertEqual(cache.getCount(), 1)
+        # removed files are seen after invalidate
+        os.remove(filePath)
+        self.assertTrue(cache.isFile(filePath))
+        cache.invalidate(filePath)
+        self.assertFalse(cache.isFile(filePath))
+
+    def testTimeout(self):
+        cache = DomainCache(max_items=10, timeout=0.1)
+        filePath = self.makeFile("a.h5")
+        self.assertTrue(cache.isFile(filePath))
+        time.sleep(0.2)
+        # unchanged file is stat'ed but not re-opened
+        self.assertTrue(cache.isFile(filePath))
+        self.assertEqual(self.is_hdf5_calls, 1)
+        os.remove(filePath)
+        time.sleep(0.2)
+        self.assertFalse(cache.isFile(filePath))
+        self.assertEqual(cache.getCount(), 0)
+
+    def testResolution(self):
+        cache = DomainCache(max_items=2, timeout=60)
+        tocPath = op.join(self.tmpdir, ".toc.h5")
+        filePath = op.join(self.tmpdir, "sub", "a.h5")
+        key = ("a.sub.test.hdfgroup.org", False, True)
+        self.assertEqual(cache.getResolution(key), None)
+        cache.putResolution(key, (tocPath, filePath))
+        self.assertEqual(cache.getResolution(key), (tocPath, filePath))
+        # invalidating a directory drops resolutions to files below it
+        cache.invalidate(op.join(self.tmpdir, "sub"))
+        self.assertEqual(cache.getResolution(key), None)
+
+        cache.putResolution(key, (tocPath, filePath))
+        cache.putResolution(("b", False, True), (tocPath, filePath))
+        cache.putResolution(("c", False, True), (tocPath, filePath))
+        self.assertEqual(cache.getResolution(key), None)
+
+        cache = DomainCache(max_items=0, timeout=60)
+        cache.putResolution(key, (tocPath, filePath))
+        self.assertEqual(cache.getResolution(key), None)
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
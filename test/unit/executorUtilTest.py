@@ -0,0 +1,140 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import threading
+
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.iostream import StreamClosedError
+from tornado.web import Application, RequestHandler
+from tornado.testing import AsyncHTTPTestCase
+
+import h5serv.config as h5config
+import h5serv.executorUtil as executorUtil
+
+import config
+
+release = threading.Event()
+waiting = threading.Event()
+
+class SlowHandler(RequestHandler):
+    @executorUtil.runInExecutor
+    def get(self):
+        release.wait(10)
+        self.write(threading.current_thread().name)
+
+class WaitHandler(RequestHandler):
+    @executorUtil.runInExecutor
+    def get(self):
+        waiting.set()
+        try:
+            # like a flush to a client that has stopped reading
+            executorUtil.callOnIOLoop(self.ioLoop, Future)
+            self.write("done")
+        except StreamClosedError:
+            self.write("closed")
+
+class FastHandler(RequestHandler):
+    @executorUtil.runInExecutor
+    def get(self):
+        self.write("ok")
+
+
+class ExecutorUtilTest(AsyncHTTPTestCase):
+
+    def setUp(self):
+        h5config.update({'executor_workers': 2, 'executor_queue_depth': 0})
+        executorUtil.shutdown()
+        release.clear()
+        waiting.clear()
+        super(ExecutorUtilTest, self).setUp()
+
+    def tearDown(self):
+        release.set()
+        super(ExecutorUtilTest, self).tearDown()
+        executorUtil.shutdown()
+
+    def get_app(self):
+        return Application([("/slow", SlowHandler), ("/fast", FastHandler),
+            ("/wait", WaitHandler)])
+
+    def testSubmit(self):
+        future = executorUtil.submit(sum, [1, 2, 3])
+        self.assertEqual(future.result(), 6)
+        future = executorUtil.submit(int, "x")
+        self.assertRaises(ValueError, future.result)
+
+    def testInline(self):
+        h5config.update({'executor_workers': 0})
+        self.assertTrue(executorUtil.getExecutor() is None)
+        future = executorUtil.submit(sum, [1, 2, 3])
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), 6)
+        rsp = self.fetch("/fast")
+        self.assertEqual(rsp.code, 200)
+
+    def testNotBlocked(self):
+        slow = self.http_client.fetch(self.get_url("/slow"), raise_error=False)
+        # worker is busy with the slow request, IOLoop still serves others
+        rsp = self.fetch("/fast")
+        self.assertEqual(rsp.code, 200)
+        self.assertEqual(rsp.body, b"ok")
+        release.set()
+        rsp = self.io_loop.run_sync(lambda: slow)
+        self.assertEqual(rsp.code, 200)
+        self.assertNotEqual(rsp.body, b"MainThread")
+
+    def testQueueFull(self):
+        slow1 = self.http_client.fetch(self.get_url("/slow"), raise_error=False)
+        slow2 = self.http_client.fetch(self.get_url("/slow"), raise_error=False)
+        # wait for both workers to be in use
+        while executorUtil.getPendingCount() < 2:
+            self.io_loop.run_sync(lambda: gen.sleep(0.01))
+        rsp = self.fetch("/fast")
+        self.assertEqual(rsp.code, 503)
+        release.set()
+        for slow in (slow1, slow2):
+            rsp = self.io_loop.run_sync(lambda: slow)
+            self.assertEqual(rsp.code, 200)
+        rsp = self.fetch("/fast")
+        self.assertEqual(rsp.code, 200)
+
+    def testShutdownQueued(self):
+        h5config.update({'executor_workers': 1})
+        running = executorUtil.submit(release.wait, 10)
+        queued = executorUtil.submit(sum, [1, 2, 3])
+        # the queued task is cancelled, the running one completes
+        executorUtil.shutdown(wait=False)
+        self.assertTrue(queued.cancelled())
+        self.assertFalse(running.cancelled())
+        release.set()
+        self.assertTrue(running.result(5))
+        self.assertEqual(executorUtil.getPendingCount(), 0)
+
+    def testShutdownWaiting(self):
+        wait = self.http_client.fetch(self.get_url("/wait"), raise_error=False)
+        while not waiting.is_set():
+            self.io_loop.run_sync(lambda: gen.sleep(0.01))
+        # the task waits on the IOLoop, so shutdown is run on another thread
+        thread = threading.Thread(target=executorUtil.shutdown)
+        thread.start()
+        rsp = self.io_loop.run_sync(lambda: wait)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(rsp.code, 200)
+        self.assertEqual(rsp.body, b"closed")
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
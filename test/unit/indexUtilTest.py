@@ -0,0 +1,211 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os
+import os.path as op
+import shutil
+import tempfile
+
+import numpy as np
+import h5py
+
+import h5serv.config
+import h5serv.sidecarUtil as sidecarUtil
+import h5serv.indexUtil as indexUtil
+from h5serv.queryUtil import Query, runQuery
+
+import config
+
+DTYPE = np.dtype([('date', '>i4'), ('time', 'S6'), ('temp', '<f8'), ('wind', 'u2')])
+OPS = ('==', '!=', '<', '<=', '>', '>=')
+
+
+class IndexUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(IndexUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filePath = op.join(self.tmpdir, 'index.h5')
+        self.f = h5py.File(self.filePath, 'w')
+        rows = np.zeros((1000,), dtype=DTYPE)
+        rng = np.random.RandomState(42)
+        rows['date'] = rng.randint(0, 50, size=1000)
+        rows['time'] = [("%02d:00" % h).encode('ascii') for h in rng.randint(0, 24, size=1000)]
+        rows['temp'] = rng.uniform(-10.0, 40.0, size=1000).round(1)
+        rows['temp'][[3, 500, 999]] = np.nan
+        rows['wind'] = np.arange(1000) % 7
+        self.rows = rows
+        self.dset = self.f.create_dataset('dset', data=rows, chunks=(50,))
+
+    def tearDown(self):
+        self.f.close()
+        shutil.rmtree(self.tmpdir)
+        indexUtil.FENCE_SIZE = 4096
+        indexUtil.MAX_BITMAP_KEYS = 1024
+        h5serv.config.update({'index_build_size': 64 * 1024 * 1024})
+
+    def buildIndexes(self, indexType):
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            for field in ('date', 'time', 'temp'):
+                indexUtil.buildIndex(f, 'dset-uuid', 1234, self.dset, field, indexType)
+
+    def checkLookups(self, indexType):
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            indexes = indexUtil.getIndexes(f, 'dset-uuid', self.dset, 1234)
+            self.assertEqual(sorted(indexes), ['date', 'temp', 'time'])
+            for field, values in (('date', (-1, 0, 17, 17.5, 49, 60)),
+                    ('temp', (-10.0, 0.0, 12.3, 40.0, np.nan)),
+                    ('time', ('00:00', b'13:00', '13:30', '23:00', '99'))):
+                column = self.rows[field]
+                for value in values:
+                    key = value.encode('ascii') if isinstance(value, str) else value
+                    for op in OPS:
+                        expected = np.nonzero(indexUtil.compare(column, op, key))[0]
+                        rows = indexes[field].lookup(op, value, 1000)
+                        if rows is None:
+                            self.assertTrue(op == '!=' and indexType == indexUtil.SORTED)
+                            continue
+                        # superset of the matching rows, sorted
+                        self.assertTrue(np.all(np.diff(rows) > 0))
+                        self.assertTrue(np.all(np.isin(expected, rows)), (field, op, value))
+                        # NaN values are sorted last
+                        if field != 'temp' or not (op in ('>', '>=') or np.isnan(value)):
+                            self.assertEqual(rows.tolist(), expected.tolist())
+                # too many rows, or a constant of the wrong type
+                self.assertEqual(indexes[field].lookup('!=', values[1], 10), None)
+            self.assertEqual(indexes['date'].lookup('==', 'x', 1000), None)
+            self.assertEqual(indexes['time'].lookup('==', 3, 1000), None)
+
+    def testSorted(self):
+        self.buildIndexes(indexUtil.SORTED)
+        self.checkLookups(indexUtil.SORTED)
+
+    def testSortedRuns(self):
+        # sort runs of 64 rows and merge them, with a fence entry every 8 rows
+        indexUtil.FENCE_SIZE = 8
+        h5serv.config.update({'index_build_size': 64 * 16})
+        self.buildIndexes(indexUtil.SORTED)
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            grp = indexUtil.getIndexGroup(f, 'dset-uuid', DTYPE, 'temp')
+            self.assertEqual(grp.attrs['fence_size'], 8)
+            values = grp['values'][...]
+            rows = grp['rows'][...]
+            expected = np.sort(self.rows['temp'])
+            self.assertTrue(np.array_equal(values, expected, equal_nan=True))
+            self.assertEqual(sorted(rows.tolist()), list(range(1000)))
+            self.assertTrue(np.array_equal(self.rows['temp'][rows], values, equal_nan=True))
+        self.assertEqual(os.listdir(self.tmpdir), ['index.h5', 'index.h5.sidecar'])
+        self.checkLookups(indexUtil.SORTED)
+
+    def testBitmap(self):
+        self.buildIndexes(indexUtil.BITMAP)
+        self.checkLookups(indexUtil.BITMAP)
+        indexUtil.MAX_BITMAP_KEYS = 100
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            try:
+                indexUtil.buildIndex(f, 'dset-uuid', 1234, self.dset, 'temp', 'bitmap')
+            except ValueError:
+                pass  # expected - too many keys
+            else:
+                self.assertTrue(False)  # expected exception
+
+    def testEmpty(self):
+        dset = self.f.create_dataset('empty', (0,), dtype=DTYPE)
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            indexUtil.buildIndex(f, 'empty-uuid', 1234, dset, 'date', 'sorted')
+            indexUtil.buildIndex(f, 'empty-uuid', 1234, dset, 'time', 'bitmap')
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            items = [indexUtil.getIndexItem(grp, dset, 1234) for grp in
+                indexUtil.getIndexGroups(f, 'empty-uuid')]
+            self.assertEqual([item['field'] for item in items], ['date', 'time'])
+            self.assertEqual(items[1]['keyCount'], 0)
+            self.assertEqual([item['nrows'] for item in items], [0, 0])
+            indexes = indexUtil.getIndexes(f, 'empty-uuid', dset, 1234)
+            self.assertEqual(indexes['date'].lookup('>', 3, 10).tolist(), [])
+            self.assertEqual(indexes['time'].lookup('==', '13:00', 10).tolist(), [])
+
+    def testIndexItems(self):
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            indexUtil.buildIndex(f, 'dset-uuid', 1234, self.dset, 'wind', 'bitmap')
+            indexUtil.buildIndex(f, 'dset-uuid', 1234, self.dset, 'date')
+            for field, indexType in (('nosuchfield', 'sorted'), ('date', 'hash')):
+                try:
+                    indexUtil.buildIndex(f, 'dset-uuid', 1234, self.dset, field, indexType)
+                    self.assertTrue(False)  # expected exception
+                except ValueError:
+                    pass  # expected
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            items = [indexUtil.getIndexItem(grp, self.dset, 1234) for grp in
+                indexUtil.getIndexGroups(f, 'dset-uuid')]
+        self.assertEqual([item['field'] for item in items], ['date', 'wind'])
+        self.assertEqual(items[1]['type'], 'bitmap')
+        self.assertEqual(items[1]['keyCount'], 7)
+        self.assertEqual(items[0]['nrows'], 1000)
+        self.assertFalse(items[0]['stale'])
+
+        # indexes built before the dataset was last modified are stale
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            grp = indexUtil.getIndexGroup(f, 'dset-uuid', DTYPE, 'date')
+            self.assertTrue(indexUtil.getIndexItem(grp, self.dset, 1235)['stale'])
+            self.assertEqual(indexUtil.getIndexes(f, 'dset-uuid', self.dset, 1235), {})
+
+        # writes to the dataset make the indexes stale
+        sidecarUtil.invalidate(self.filePath, 'dset-uuid')
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            grp = indexUtil.getIndexGroup(f, 'dset-uuid', DTYPE, 'date')
+            self.assertTrue(indexUtil.getIndexItem(grp, self.dset, 1234)['stale'])
+            self.assertEqual(indexUtil.getIndexes(f, 'dset-uuid', self.dset, 1234), {})
+
+    def testQuery(self):
+        self.buildIndexes(indexUtil.SORTED)
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            indexUtil.buildIndex(f, 'dset-uuid', 1234, self.dset, 'wind', 'bitmap')
+        h5serv.config.update({'query_block_size': 100 * DTYPE.itemsize})
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            indexes = indexUtil.getIndexes(f, 'dset-uuid', self.dset, 1234)
+            for text, indexed in (("date == 17", True),
+                    ("(date == 17) & (wind > 2)", True),
+                    ("(date == 17) | (time == '13:00')", True),
+                    ("(date == 17) | (temp > 20)", False),  # temp not selective
+                    ("(temp > 20) & (wind == 3)", True),
+                    ("17 == date and temp < 0", True),
+                    ("~(date == 17)", False)):
+                query = Query(text, DTYPE)
+                candidates = query.getCandidates(indexes, 200)
+                self.assertEqual(candidates is not None, indexed, text)
+                for s in (slice(0, 1000, 1), slice(3, 900, 3)):
+                    result = runQuery(self.dset, query, s, candidates=candidates)
+                    expected = runQuery(self.dset, query, s)
+                    self.assertEqual(result.indexes.tolist(), expected.indexes.tolist())
+                    self.assertEqual(result.values.tobytes(), expected.values.tobytes())
+
+            # with a limit
+            query = Query("wind == 3", DTYPE)
+            candidates = query.getCandidates(indexes, 1000)
+            result = runQuery(self.dset, query, slice(0, 1000, 1), limit=5,
+                candidates=candidates)
+            self.assertEqual(result.indexes.tolist(), [3, 10, 17, 24, 31])
+            self.assertEqual(result.next, 32)
+            self.assertEqual(result.blocksRead, 1)
+            result = runQuery(self.dset, query, slice(0, 1000, 1), count=True,
+                candidates=np.array([10, 11, 500], dtype=np.int64))
+            self.assertEqual(result.count, 2)  # 10 and 500
+            self.assertEqual(result.blocksRead, 2)
+            self.assertEqual(result.blocksSkipped, 8)
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
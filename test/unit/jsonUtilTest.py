@@ -0,0 +1,82 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import json
+import math
+
+import numpy as np
+
+import h5serv.config
+import h5serv.jsonUtil as jsonUtil
+from h5serv.jsonUtil import iterEncode, roundFloats
+
+import config
+
+class JsonUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(JsonUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def tearDown(self):
+        h5serv.config.update({'json_encoder': 'auto', 'json_float_precision': 0})
+        jsonUtil.BLOCK_SIZE = 65536
+
+    def encode(self, value):
+        return json.loads(b''.join(iterEncode(value)).decode('utf-8'))
+
+    def testEncodeArrays(self):
+        jsonUtil.BLOCK_SIZE = 10  # encode in several blocks
+        for encoder in ('auto', 'json'):
+            h5serv.config.update({'json_encoder': encoder})
+            for dtype in ('<i4', '>i2', 'u8', '<f8', '>f4', '?'):
+                arr = np.arange(60).reshape(20, 3).astype(dtype)
+                self.assertEqual(self.encode(arr), arr.tolist())
+                self.assertEqual(self.encode(arr[:, :0]), arr[:, :0].tolist())
+                self.assertEqual(self.encode(arr[1:1]), [])
+                self.assertEqual(self.encode(arr[0, 0]), arr[0, 0].tolist())
+            arr = np.arange(24, dtype='f4').reshape(2, 3, 4) / 10
+            # float32 values are the same as float32 once decoded
+            self.assertTrue(np.array_equal(np.asarray(self.encode(arr), dtype='f4'), arr))
+
+            response = {'value': np.arange(30), 'hrefs': [{'rel': 'self'}], 'empty': {}}
+            self.assertEqual(self.encode(response),
+                {'value': list(range(30)), 'hrefs': [{'rel': 'self'}], 'empty': {}})
+
+    def testNonFinite(self):
+        # encoded as before (NaN, Infinity), rather than null
+        arr = np.array([1.0, float('nan'), float('inf'), -float('inf')])
+        text = b''.join(iterEncode(arr)).decode('utf-8')
+        self.assertEqual(text, '[1.0, NaN, Infinity, -Infinity]')
+        value = jsonUtil.decode(text)
+        self.assertTrue(math.isnan(value[1]))
+        self.assertEqual(value[2], float('inf'))
+        self.assertEqual(jsonUtil.decode(b'{"a": [1, 2.5]}'), {'a': [1, 2.5]})
+        self.assertRaises(ValueError, jsonUtil.decode, '{"a": ')
+
+    def testPrecision(self):
+        arr = np.array([3.14159265, -0.000123456, 123456.789, 0.0, float('nan'), 5e-320])
+        rounded = roundFloats(arr, 3)
+        self.assertEqual(rounded[:4].tolist(), [3.14, -0.000123, 123000.0, 0.0])
+        self.assertTrue(math.isnan(rounded[4]))
+        self.assertEqual(rounded[5], arr[5])
+        h5serv.config.update({'json_float_precision': 4})
+        value = self.encode(np.array([[2.0/3, 1.0/7]], dtype='f4'))
+        self.assertEqual(value, [[0.6667, 0.1429]])
+        # integers aren't changed
+        value = self.encode(np.array([123456789]))
+        self.assertEqual(value, [123456789])
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
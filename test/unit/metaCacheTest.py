@@ -0,0 +1,142 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os
+import os.path as op
+import shutil
+import tempfile
+
+os.environ['HDF5_USE_FILE_LOCKING'] = 'FALSE'
+import h5py
+
+import h5serv.metaCache as metaCache
+from h5serv.metaCache import MetaCache
+from h5serv.dbPool import DbPool
+
+import config
+
+class MetaCacheTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(MetaCacheTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        metaCache.clear()
+
+    def tearDown(self):
+        metaCache.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def makeFile(self, name):
+        filePath = op.join(self.tmpdir, name)
+        f = h5py.File(filePath, 'w')
+        f.close()
+        return filePath
+
+    def testGetPut(self):
+        cache = MetaCache(max_items=10)
+        self.assertEqual(cache.get('a.h5', 'uuid1', 'dataset'), None)
+        item = {'id': 'uuid1'}
+        cache.put('a.h5', 'uuid1', 'dataset', item)
+        self.assertTrue(cache.get('a.h5', 'uuid1', 'dataset') is item)
+        self.assertTrue(cache.get('./a.h5', 'uuid1', 'dataset') is item)
+        self.assertEqual(cache.get('a.h5', 'uuid1', 'type'), None)
+        self.assertEqual(cache.get('b.h5', 'uuid1', 'dataset'), None)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 3)
+
+    def testMaxItems(self):
+        cache = MetaCache(max_items=2)
+        cache.put('a.h5', 'uuid1', 'dataset', 1)
+        cache.put('a.h5', 'uuid2', 'dataset', 2)
+        cache.get('a.h5', 'uuid1', 'dataset')
+        cache.put('b.h5', 'uuid3', 'dataset', 3)
+        self.assertEqual(cache.getCount(), 2)
+        # uuid2 was least recently used
+        self.assertEqual(cache.get('a.h5', 'uuid2', 'dataset'), None)
+        self.assertEqual(cache.get('a.h5', 'uuid1', 'dataset'), 1)
+        self.assertEqual(cache.get('b.h5', 'uuid3', 'dataset'), 3)
+
+        cache = MetaCache(max_items=0)
+        cache.put('a.h5', 'uuid1', 'dataset', 1)
+        self.assertEqual(cache.get('a.h5', 'uuid1', 'dataset'), None)
+
+    def testInvalidate(self):
+        cache = MetaCache(max_items=10)
+        cache.put('a.h5', 'uuid1', 'dataset', 1)
+        cache.put('a.h5', 'uuid1', 'type', 2)
+        cache.put('a.h5', 'uuid2', 'dataset', 3)
+        cache.put('b.h5', 'uuid1', 'dataset', 4)
+        cache.invalidate('a.h5', 'uuid1')
+        self.assertEqual(cache.get('a.h5', 'uuid1', 'dataset'), None)
+        self.assertEqual(cache.get('a.h5', 'uuid1', 'type'), None)
+        self.assertEqual(cache.get('a.h5', 'uuid2', 'dataset'), 3)
+        self.assertEqual(cache.get('b.h5', 'uuid1', 'dataset'), 4)
+        cache.invalidate('a.h5')
+        self.assertEqual(cache.get('a.h5', 'uuid2', 'dataset'), None)
+        self.assertEqual(cache.getCount(), 1)
+
+    def testInvalidateKind(self):
+        cache = MetaCache(max_items=10)
+        cache.put('a.h5', 'uuid1', ('acl', 1), 'acl1')
+        cache.put('a.h5', 'uuid1', ('acl', 2), 'acl2')
+        cache.put('a.h5', 'uuid2', ('acl', 1), 'acl3')
+        cache.put('a.h5', 'uuid1', 'dataset', 'dset1')
+        cache.put('b.h5', 'uuid3', ('acl', 1), 'acl4')
+        cache.invalidate('a.h5', kind='acl')
+        self.assertEqual(cache.get('a.h5', 'uuid1', ('acl', 1)), None)
+        self.assertEqual(cache.get('a.h5', 'uuid2', ('acl', 1)), None)
+        self.assertEqual(cache.get('a.h5', 'uuid1', 'dataset'), 'dset1')
+        self.assertEqual(cache.get('b.h5', 'uuid3', ('acl', 1)), 'acl4')
+        cache.put('a.h5', 'uuid1', ('acl', 1), 'acl1')
+        cache.invalidate('a.h5', 'uuid1', 'dataset')
+        self.assertEqual(cache.get('a.h5', 'uuid1', 'dataset'), None)
+        self.assertEqual(cache.get('a.h5', 'uuid1', ('acl', 1)), 'acl1')
+
+    def testValidate(self):
+        cache = MetaCache(max_items=10)
+        cache.put('a.h5', 'uuid1', 'dataset', 1)
+        cache.setStamp('a.h5', (1, 100, 1.0))
+        cache.validate('a.h5', (1, 100, 1.0))
+        self.assertEqual(cache.get('a.h5', 'uuid1', 'dataset'), 1)
+        cache.validate('a.h5', (1, 100, 2.0))
+        self.assertEqual(cache.get('a.h5', 'uuid1', 'dataset'), None)
+        self.assertEqual(cache.getCount(), 0)
+
+    def testDbPool(self):
+        filePath = self.makeFile("meta.h5")
+        pool = DbPool(max_files=4, idle_timeout=0)
+        with pool.getDb(filePath) as db:
+            rootUUID = db.getUUIDByPath('/')
+            metaCache.put(filePath, rootUUID, 'group', 'root')
+        # updates by this process keep the cache
+        with pool.getDb(filePath) as db:
+            self.assertEqual(metaCache.get(filePath, rootUUID, 'group'), 'root')
+            db.createGroup()
+        with pool.getDb(filePath) as db:
+            self.assertEqual(metaCache.get(filePath, rootUUID, 'group'), 'root')
+        # simulate an update by some other process
+        mtime = op.getmtime(filePath)
+        os.utime(filePath, (mtime + 10, mtime + 10))
+        with pool.getDb(filePath) as db:
+            self.assertEqual(metaCache.get(filePath, rootUUID, 'group'), None)
+            metaCache.put(filePath, rootUUID, 'group', 'root')
+        pool.invalidate(filePath)
+        self.assertEqual(metaCache.get(filePath, rootUUID, 'group'), None)
+        pool.closeAll()
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
@@ -0,0 +1,104 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os.path as op
+import json
+import shutil
+import tempfile
+import time
+
+import h5serv.metricsUtil as metricsUtil
+from h5serv.metricsUtil import Counter, Gauge, Histogram
+
+import config
+
+class MetricsUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(MetricsUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def testCounter(self):
+        counter = Counter("test_counter_total", "A counter", ('handler', 'code'))
+        counter.inc(('ValueHandler', '200'))
+        counter.inc(('ValueHandler', '200'), 2)
+        counter.inc(('InfoHandler', '404'))
+        lines = counter.collect()
+        self.assertEqual(lines[0], '# HELP test_counter_total A counter')
+        self.assertEqual(lines[1], '# TYPE test_counter_total counter')
+        self.assertTrue('test_counter_total{handler="ValueHandler",code="200"} 3' in lines)
+        self.assertTrue('test_counter_total{handler="InfoHandler",code="404"} 1' in lines)
+
+    def testGauge(self):
+        values = [5]
+        gauge = Gauge("test_gauge", "A gauge", lambda: values[0])
+        self.assertEqual(gauge.collect()[-1], 'test_gauge 5')
+        values[0] = 7
+        self.assertEqual(gauge.collect()[-1], 'test_gauge 7')
+
+    def testHistogram(self):
+        hist = Histogram("test_seconds", "A histogram", ('handler',), buckets=(0.1, 1.0))
+        hist.observe(0.05, ('h',))
+        hist.observe(0.5, ('h',))
+        hist.observe(5.0, ('h',))
+        lines = hist.collect()
+        self.assertTrue('test_seconds_bucket{handler="h",le="0.1"} 1' in lines)
+        self.assertTrue('test_seconds_bucket{handler="h",le="1.0"} 2' in lines)
+        self.assertTrue('test_seconds_bucket{handler="h",le="+Inf"} 3' in lines)
+        self.assertTrue('test_seconds_count{handler="h"} 3' in lines)
+        self.assertTrue('test_seconds_sum{handler="h"} 5.55' in lines)
+
+    def testTimed(self):
+        @metricsUtil.timed('test_phase')
+        def work():
+            time.sleep(0.01)
+            return 42
+        self.assertEqual(work(), 42)
+        self.assertTrue(metricsUtil.phase_time.values[('test_phase',)] >= 0.01)
+
+    def testRender(self):
+        metricsUtil.recordRequest('TestHandler', 'GET', 200, 0.02, 10, 100)
+        text = metricsUtil.render()
+        self.assertTrue(text.endswith('\n'))
+        self.assertTrue('h5serv_requests_total{handler="TestHandler",method="GET",code="200"}' in text)
+        self.assertTrue('h5serv_request_duration_seconds_count{handler="TestHandler"}' in text)
+        self.assertTrue('h5serv_response_bytes_total{handler="TestHandler"}' in text)
+
+    def testWorkers(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            metricsUtil.setWorker(0, tmpdir)
+            metricsUtil.recordRequest('WorkerHandler', 'GET', 200, 0.02, 10, 100)
+            # snapshot saved by another worker
+            snapshot = [{'name': 'h5serv_requests_total', 'help': 'Requests',
+                'type': 'counter', 'samples': [['h5serv_requests_total',
+                [['handler', 'InfoHandler'], ['method', 'GET'], ['code', '200']], 3]]}]
+            with open(op.join(tmpdir, 'worker-1.json'), 'w') as f:
+                json.dump(snapshot, f)
+            text = metricsUtil.render()
+            self.assertTrue(op.isfile(op.join(tmpdir, 'worker-0.json')))
+        finally:
+            metricsUtil.setWorker(None, None)
+            shutil.rmtree(tmpdir)
+        lines = text.split('\n')
+        self.assertEqual(lines.count('# TYPE h5serv_requests_total counter'), 1)
+        self.assertTrue('h5serv_requests_total{worker="0",handler="WorkerHandler",'
+            'method="GET",code="200"} 1' in lines)
+        self.assertTrue('h5serv_requests_total{worker="1",handler="InfoHandler",'
+            'method="GET",code="200"} 3' in lines)
+        self.assertTrue('h5serv_request_duration_seconds_count{worker="0",'
+            'handler="WorkerHandler"} 1' in lines)
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
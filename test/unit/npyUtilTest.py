@@ -0,0 +1,86 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import io
+import warnings
+
+import numpy as np
+import h5json
+
+from h5serv.npyUtil import getHeader, getValues
+
+import config
+
+class NpyUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(NpyUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def load(self, dtype, shape, arr, **kwargs):
+        header = getHeader(dtype, shape)
+        self.assertEqual(len(header) % 64, 0)  # values are aligned
+        data = getValues(arr, dtype).tobytes()
+        return np.load(io.BytesIO(header + data), **kwargs)
+
+    def testTypes(self):
+        typeItem = {'class': 'H5T_FLOAT', 'base': 'H5T_IEEE_F32BE'}
+        dtype = h5json.createDataType(typeItem)
+        arr = np.arange(12, dtype='>f4').reshape(3, 4)
+        out = self.load(dtype, (3, 4), arr)
+        self.assertEqual(out.dtype, np.dtype('>f4'))
+        self.assertTrue(np.array_equal(out, arr))
+
+        # no warning for the h5py enum metadata
+        typeItem = {'class': 'H5T_ENUM', 'mapping': {'A': 0, 'B': 1},
+            'base': {'class': 'H5T_INTEGER', 'base': 'H5T_STD_I16LE'}}
+        dtype = h5json.createDataType(typeItem)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            out = self.load(dtype, (2,), np.array([1, 0], dtype=dtype))
+        self.assertEqual(out.tolist(), [1, 0])
+
+        # array type - dimensions are added to the shape
+        typeItem = {'class': 'H5T_ARRAY', 'dims': [3],
+            'base': {'class': 'H5T_INTEGER', 'base': 'H5T_STD_I32LE'}}
+        dtype = h5json.createDataType(typeItem)
+        arr = np.arange(6, dtype='<i4').reshape(2, 3)
+        out = self.load(dtype, (2,), arr)
+        self.assertEqual(out.shape, (2, 3))
+        self.assertTrue(np.array_equal(out, arr))
+
+        typeItem = {'class': 'H5T_COMPOUND', 'fields': [
+            {'name': 'a', 'type': {'class': 'H5T_INTEGER', 'base': 'H5T_STD_I8LE'}},
+            {'name': 'b', 'type': {'class': 'H5T_STRING', 'charSet': 'H5T_CSET_ASCII',
+                'length': 5, 'strPad': 'H5T_STR_NULLPAD'}}]}
+        dtype = h5json.createDataType(typeItem)
+        arr = np.array([(1, b'one'), (2, b'two')], dtype=dtype)
+        out = self.load(dtype, (2,), arr)
+        self.assertEqual(out.dtype.names, ('a', 'b'))
+        self.assertEqual(out[1]['b'], b'two')
+
+        # scalar
+        out = self.load(np.dtype('<i8'), (), np.array(42, dtype='<i8'))
+        self.assertEqual(out.shape, ())
+        self.assertEqual(out[()], 42)
+
+    def testLargeHeader(self):
+        # too many fields for a version 1.0 header
+        dtype = np.dtype([('field_with_a_long_name_' + str(i), '<i4') for i in range(3000)])
+        arr = np.zeros(2, dtype=dtype)
+        out = self.load(dtype, (2,), arr, max_header_size=200000)
+        self.assertEqual(len(out.dtype.names), 3000)
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
@@ -0,0 +1,151 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os.path as op
+import shutil
+import tempfile
+
+import numpy as np
+import h5py
+
+import h5serv.config
+import h5serv.sidecarUtil as sidecarUtil
+import h5serv.pyramidUtil as pyramidUtil
+from h5serv.pyramidUtil import getAxes, getLevelShapes, downsample, buildPyramid
+from h5serv.pyramidUtil import getPyramidGroup, getPyramidItem, getLevel, updatePyramid
+
+import config
+
+
+class PyramidUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(PyramidUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filePath = op.join(self.tmpdir, 'pyramid.h5')
+        self.f = h5py.File(self.filePath, 'w')
+        data = (np.arange(37 * 50, dtype='<f4') % 31).reshape((37, 50))
+        data[4, 4:6] = np.nan
+        data[5, 4:6] = np.nan
+        self.data = data
+        self.dset = self.f.create_dataset('dset', data=data, chunks=(8, 8))
+        h5serv.config.update({'pyramid_min_size': 8})
+
+    def tearDown(self):
+        self.f.close()
+        shutil.rmtree(self.tmpdir)
+        h5serv.config.update({'pyramid_min_size': 256,
+            'stream_buffer_size': 4 * 1024 * 1024})
+
+    def checkLevels(self, grp, dset, method, axes):
+        src = dset[...]
+        for level in range(1, pyramidUtil.getLevelCount(grp) + 1):
+            src = downsample(src, method, axes)
+            np.testing.assert_array_equal(getLevel(grp, level)[...], src)
+
+    def testAxes(self):
+        self.assertEqual(getAxes(None, 3), (1, 2))
+        self.assertEqual(getAxes(None, 1), (0,))
+        self.assertEqual(getAxes([2, 0], 3), (0, 2))
+        self.assertEqual(getAxes([-1], 3), (2,))
+        for axes in ([], [3], [0, 0], ['x'], 1):
+            try:
+                getAxes(axes, 3)
+                self.assertTrue(False)  # expected exception
+            except ValueError:
+                pass
+        self.assertEqual(getLevelShapes((37, 50), (0, 1), 8),
+            [(19, 25), (10, 13), (5, 7)])
+        self.assertEqual(getLevelShapes((3, 37, 50), (1, 2), 20),
+            [(3, 19, 25), (3, 10, 13)])
+        self.assertEqual(getLevelShapes((5, 5), (0, 1), 8), [])
+
+    def testDownsample(self):
+        values = np.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]], dtype='>i2')
+        result = downsample(values, 'mean', (0, 1))
+        self.assertEqual(result.dtype, values.dtype)
+        self.assertEqual(result.tolist(), [[3, 4], [8, 9]])  # rounded
+        self.assertEqual(downsample(values, 'max', (0, 1)).tolist(), [[5, 6], [8, 9]])
+        self.assertEqual(downsample(values, 'nearest', (0, 1)).tolist(), [[1, 3], [7, 9]])
+        self.assertEqual(downsample(values, 'max', (1,)).tolist(),
+            [[2, 3], [5, 6], [8, 9]])
+
+        values = np.array([[np.nan, 1.0], [np.nan, 3.0], [np.nan, np.nan]])
+        self.assertEqual(downsample(values, 'mean', (0, 1)).tolist()[0], [2.0])
+        self.assertTrue(np.isnan(downsample(values, 'max', (0, 1))[1, 0]))
+
+    def testBuild(self):
+        for method in pyramidUtil.METHODS:
+            h5serv.config.update({'stream_buffer_size': 256})  # several blocks
+            with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+                grp = buildPyramid(f, 'dset_uuid', 100, self.dset, method=method)
+                item = getPyramidItem(grp, self.dset, 100)
+                self.assertEqual(item['method'], method)
+                self.assertEqual(item['axes'], [0, 1])
+                self.assertEqual(item['levels'], [[19, 25], [10, 13], [5, 7]])
+                self.assertFalse(item['stale'])
+                # stale if the dataset has been modified since
+                self.assertTrue(getPyramidItem(grp, self.dset, 101)['stale'])
+                self.checkLevels(grp, self.dset, method, (0, 1))
+
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            for method, axes in (('median', None), ('mean', [2])):
+                try:
+                    buildPyramid(f, 'dset_uuid', 100, self.dset, method=method, axes=axes)
+                    self.assertTrue(False)  # expected exception
+                except ValueError:
+                    pass
+            small = self.f.create_dataset('small', data=np.zeros((4, 4)))
+            try:
+                buildPyramid(f, 'small_uuid', 100, small)
+                self.assertTrue(False)  # expected exception
+            except ValueError:
+                pass
+            self.assertTrue(getPyramidGroup(f, 'small_uuid') is None)
+
+    def testUpdate(self):
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            buildPyramid(f, 'dset_uuid', 100, self.dset, method='max')
+
+        self.dset[30:33, 40:49] = 1000
+        updatePyramid(self.filePath, 'dset_uuid', self.dset, 101,
+            boxes=[(slice(30, 33), slice(40, 49))])
+        self.dset[0, 0] = 2000
+        self.dset[36, 49] = 3000
+        updatePyramid(self.filePath, 'dset_uuid', self.dset, 102,
+            points=np.array([[0, 0], [36, 49]]))
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            grp = getPyramidGroup(f, 'dset_uuid')
+            self.assertEqual(grp.attrs['modified'], 102)
+            self.assertFalse(getPyramidItem(grp, self.dset, 102)['stale'])
+            self.checkLevels(grp, self.dset, 'max', (0, 1))
+            self.assertEqual(getLevel(grp, 3)[0, 0], 2000)
+
+        # resized datasets can't be updated
+        dset = self.f.create_dataset('resizable', data=self.data, maxshape=(None, 50),
+            chunks=(8, 8))
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            buildPyramid(f, 'resizable_uuid', 100, dset)
+        dset.resize((40, 50))
+        updatePyramid(self.filePath, 'resizable_uuid', dset, 101)
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            grp = getPyramidGroup(f, 'resizable_uuid')
+            self.assertTrue(getPyramidItem(grp, dset, 101)['stale'])
+            self.assertTrue(sidecarUtil.isStale(grp))
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
@@ -0,0 +1,290 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os.path as op
+import shutil
+import tempfile
+
+import numpy as np
+import h5py
+
+import h5serv.config
+import h5serv.queryUtil as queryUtil
+from h5serv.queryUtil import Query, Summary, runQuery, runArrayQuery
+
+import config
+
+DTYPE = np.dtype([('date', '>i4'), ('time', 'S6'), ('temp', '<f8'), ('wind', 'u2')])
+
+
+class QueryUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(QueryUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filePath = op.join(self.tmpdir, 'query.h5')
+        self.f = h5py.File(self.filePath, 'w')
+        rows = np.zeros((100,), dtype=DTYPE)
+        rows['date'] = np.arange(100) // 10  # 10 rows per date
+        rows['time'] = [("%02d:00" % (i % 24)).encode('ascii') for i in range(100)]
+        rows['temp'] = np.arange(100) * 0.5
+        rows['temp'][7] = np.nan
+        rows['wind'] = np.arange(100) % 7
+        self.rows = rows
+        self.dset = self.f.create_dataset('dset', data=rows, chunks=(10,))
+
+    def tearDown(self):
+        self.f.close()
+        shutil.rmtree(self.tmpdir)
+        h5serv.config.update({'query_evaluator': 'auto', 'query_block_size': 1024 * 1024,
+            'query_summary': True})
+
+    def testParse(self):
+        query = Query("(temp > 32.0) & (time == '13:00')", DTYPE)
+        self.assertEqual(query.fields, ['time', 'temp'])
+        self.assertEqual(query.numexprStr, None)  # string field
+        query = Query("date == 3 and not wind < 2", DTYPE)
+        self.assertEqual(query.fields, ['date', 'wind'])
+        self.assertTrue(query.numexprStr is not None)
+        for bad in ("", "date ==", "nosuchfield > 3", "__import__('os').getcwd()",
+                "date.real > 1", "[date]", "date in (1, 2)", "3 > 2", "date == True"):
+            try:
+                Query(bad, DTYPE)
+                self.assertTrue(False, bad)  # expected exception
+            except ValueError:
+                pass  # expected
+
+    def testEvaluate(self):
+        rows = self.rows
+        for evaluator in ('auto', 'numpy'):
+            h5serv.config.update({'query_evaluator': evaluator})
+            mask = Query("(date == 3) & (wind > 2)", DTYPE).evaluate(rows)
+            expected = (rows['date'] == 3) & (rows['wind'] > 2)
+            self.assertEqual(mask.tolist(), expected.tolist())
+            mask = Query("1 < date <= 2 or temp * 2 >= 99", DTYPE).evaluate(rows)
+            self.assertEqual(np.nonzero(mask)[0].tolist(), list(range(20, 30)) + [99])
+            mask = Query("~(temp < 10)", DTYPE).evaluate(rows)
+            self.assertTrue(mask[7])  # NaN
+            self.assertEqual(int(mask.sum()), 81)
+        mask = Query("time == '13:00'", DTYPE).evaluate(rows)
+        self.assertEqual(np.nonzero(mask)[0].tolist(), [13, 37, 61, 85])
+        mask = Query("time == b'13:00'", DTYPE).evaluate(rows)
+        self.assertEqual(int(mask.sum()), 4)
+        try:
+            Query("date + 1", DTYPE).evaluate(rows)
+            self.assertTrue(False)  # expected exception
+        except ValueError:
+            pass  # expected - not a condition
+
+    def testPower(self):
+        # '**' is not supported, a constant power could take forever
+        for bad in ("value > 9**9**9**9", "value ** 2 > 4"):
+            try:
+                Query(bad, np.dtype('f8')).evaluate(np.arange(10, dtype='f8'))
+                self.assertTrue(False, bad)  # expected exception
+            except ValueError:
+                pass  # expected
+
+    def testStringArithmetic(self):
+        # string constants would be built in memory: 'x'*300000000
+        for bad in ("time == 'x' * 300000000", "time == b'x' + b'y'",
+                "300000000 * 'x' == time"):
+            try:
+                Query(bad, DTYPE)
+                self.assertTrue(False, bad)  # expected exception
+            except ValueError:
+                pass  # expected
+
+    def testOverflow(self):
+        rows = self.rows
+        for evaluator in ('auto', 'numpy'):
+            h5serv.config.update({'query_evaluator': evaluator})
+            mask = Query("date == 99999999999999999999999", DTYPE).evaluate(rows)
+            self.assertEqual(int(mask.sum()), 0)
+            try:
+                Query("date + 99999999999999999999999 > 0", DTYPE).evaluate(rows)
+                self.assertTrue(False)  # expected exception
+            except ValueError:
+                pass  # expected
+
+    def testMayMatch(self):
+        query = Query("(date == 3) | (temp > 40)", DTYPE)
+        self.assertTrue(query.mayMatch({}))
+        self.assertTrue(query.mayMatch({'date': (0, 5)}))
+        self.assertTrue(query.mayMatch({'date': (0, 2)}))  # temp unknown
+        self.assertFalse(query.mayMatch({'date': (0, 2), 'temp': (0.0, 40.0)}))
+        query = Query("(3 < date) & (temp != 1)", DTYPE)
+        self.assertFalse(query.mayMatch({'date': (0, 3), 'temp': (1.0, 1.0)}))
+        self.assertTrue(query.mayMatch({'date': (0, 4), 'temp': (1.0, 1.0)}))
+        query = Query("~(date == 3)", DTYPE)
+        self.assertTrue(query.mayMatch({'date': (3, 3)}))
+        query = Query("temp < 1", DTYPE)
+        self.assertFalse(query.mayMatch({'temp': (np.nan, np.nan)}))  # all NaN
+
+    def testRunQuery(self):
+        query = Query("(wind == 0) & (temp >= 10)", DTYPE)
+        expected = [i for i in range(100) if i % 7 == 0 and i * 0.5 >= 10]
+        result = runQuery(self.dset, query, slice(0, 100, 1))
+        self.assertEqual(result.indexes.tolist(), expected)
+        self.assertEqual(result.values.dtype.names, DTYPE.names)
+        self.assertEqual(result.values['date'].tolist(), [i // 10 for i in expected])
+        self.assertEqual(result.next, None)
+
+        # selection with a step
+        result = runQuery(self.dset, query, slice(1, 100, 2))
+        self.assertEqual(result.indexes.tolist(), [i for i in expected if i % 2 == 1])
+
+        # just some of the fields, and count
+        result = runQuery(self.dset, query, slice(0, 100, 1), fields=['time'])
+        self.assertEqual(result.values.dtype.names, ('time',))
+        self.assertEqual(result.values['time'][0], b'21:00')
+        result = runQuery(self.dset, query, slice(0, 100, 1), count=True)
+        self.assertEqual(result.count, len(expected))
+        self.assertEqual(result.values, None)
+
+        # continue from the next row until done
+        h5serv.config.update({'query_block_size': 20 * DTYPE.itemsize})
+        start = 0
+        indexes = []
+        while True:
+            result = runQuery(self.dset, query, slice(start, 100, 1), limit=3)
+            self.assertTrue(result.count <= 3)
+            indexes.extend(result.indexes.tolist())
+            if result.next is None:
+                break
+            start = result.next
+        self.assertEqual(indexes, expected)
+
+    def testSummary(self):
+        h5serv.config.update({'query_block_size': 20 * DTYPE.itemsize})
+        summary = queryUtil.getSummary(self.filePath, 'dset-uuid', self.dset, 1234)
+        self.assertEqual(summary.blockSize, 20)
+        self.assertEqual(summary.nblocks, 5)
+        self.assertEqual(summary.names, ['date', 'temp', 'wind'])
+        query = Query("temp < 20", DTYPE)
+        result = runQuery(self.dset, query, slice(0, 100, 1), summary=summary)
+        self.assertEqual(result.blocksRead, 5)
+        self.assertEqual(result.count, 39)  # row 7 is NaN
+        self.assertEqual(summary.getRanges(1)['date'], (2, 3))
+        self.assertTrue(summary.changed)
+        queryUtil.saveSummary(self.filePath, 'dset-uuid', summary)
+        self.assertFalse(summary.changed)
+
+        # stored in the sidecar for the same modified time
+        summary = queryUtil.getSummary(self.filePath, 'dset-uuid', self.dset, 1234)
+        self.assertEqual(summary.getRanges(0)['temp'], (0.0, 9.5))
+        result = runQuery(self.dset, query, slice(0, 100, 1), summary=summary)
+        self.assertEqual(result.blocksRead, 2)
+        self.assertEqual(result.blocksSkipped, 3)
+        self.assertEqual(result.count, 39)
+        summary = queryUtil.getSummary(self.filePath, 'dset-uuid', self.dset, 1235)
+        self.assertEqual(summary.getRanges(0), {})
+
+        # partial blocks are not summarized
+        summary = Summary(DTYPE, 100, 20)
+        runQuery(self.dset, query, slice(5, 100, 1), summary=summary)
+        self.assertFalse(summary.valid['temp'][0])
+        self.assertTrue(summary.valid['temp'][1])
+
+    def testCursor(self):
+        cursor = queryUtil.encodeCursor("date == 3", 42, 100, 2)
+        self.assertEqual(queryUtil.decodeCursor(cursor, "date == 3"), (42, 100, 2))
+        for bad, query in ((cursor, "date == 4"), ("xyz", "date == 3"), ("", "date == 3")):
+            try:
+                queryUtil.decodeCursor(bad, query)
+                self.assertTrue(False)  # expected exception
+            except ValueError:
+                pass  # expected
+
+    def testArrayQuery(self):
+        data = np.arange(6 * 7 * 8, dtype='<f4').reshape((6, 7, 8)) % 11
+        grid = self.f.create_dataset('grid', data=data, chunks=(2, 3, 4))
+        flat = self.f.create_dataset('flat', data=data)  # contiguous
+        query = Query("value > 8", grid.dtype)
+        self.assertEqual(query.fields, ['value'])
+        for bad in ("temp > 8", "value.real > 1"):
+            try:
+                Query(bad, grid.dtype)
+                self.assertTrue(False, bad)  # expected exception
+            except ValueError:
+                pass  # expected
+        h5serv.config.update({'query_block_size': 2 * 3 * 4 * 4})  # one chunk
+        self.assertEqual(queryUtil.getArrayBlockShape(grid), (2, 3, 4))
+        self.assertEqual(queryUtil.getArrayBlockShape(flat), (1, 3, 8))
+        h5serv.config.update({'query_block_size': 1024 * 1024})
+        self.assertEqual(queryUtil.getArrayBlockShape(flat), (6, 7, 8))
+
+        for blockSize in (2 * 3 * 4 * 4, 1024 * 1024):
+            h5serv.config.update({'query_block_size': blockSize})
+            for dset in (grid, flat):
+                for slices in ([slice(0, 6), slice(0, 7), slice(0, 8)],
+                        [slice(1, 6, 2), slice(2, 7, 3), slice(0, 8, 1)]):
+                    selection = tuple(slices)
+                    expected = {}
+                    sub = data[selection]
+                    for coord in zip(*np.nonzero(sub > 8)):
+                        point = tuple(s.start + c * (s.step or 1) for s, c in zip(slices, coord))
+                        expected[point] = data[point]
+                    result = runArrayQuery(dset, query, slices)
+                    self.assertEqual(result.indexes.shape, (len(expected), 3))
+                    found = dict((tuple(index), value) for index, value in
+                        zip(result.indexes.tolist(), result.values.tolist()))
+                    self.assertEqual(found, expected)
+                    self.assertEqual(result.next, None)
+                    count = runArrayQuery(dset, query, slices, count=True)
+                    self.assertEqual(count.count, len(expected))
+                    self.assertEqual(count.values, None)
+
+                    # page through the matches
+                    position = None
+                    indexes = []
+                    while True:
+                        page = runArrayQuery(dset, query, slices, limit=5, position=position)
+                        self.assertTrue(page.count <= 5)
+                        indexes.extend(tuple(index) for index in page.indexes.tolist())
+                        if page.next is None:
+                            break
+                        position = page.next
+                    self.assertEqual(indexes, [tuple(index) for index in result.indexes.tolist()])
+
+        # one dimensional, and records of the results
+        dset = self.f.create_dataset('line', data=np.arange(20, dtype='>i2'), chunks=(4,))
+        result = runArrayQuery(dset, Query("value % 5 == 0", dset.dtype), [slice(0, 20)])
+        self.assertEqual(result.indexes.tolist(), [0, 5, 10, 15])
+        records = queryUtil.getRecords(result)
+        self.assertEqual(records['index'].tolist(), [0, 5, 10, 15])
+        self.assertEqual(records['value'].tolist(), [0, 5, 10, 15])
+        records = queryUtil.getRecords(runArrayQuery(grid, query, [slice(0, 1), slice(0, 2),
+            slice(0, 8)]))
+        self.assertEqual(records['index'].tolist(), [[0, 1, 1], [0, 1, 2]])
+        self.assertEqual(records['value'].tolist(), [9.0, 10.0])
+
+    def testArrayCursor(self):
+        slices = [slice(0, 10, 1), slice(2, 8, 3)]
+        cursor = queryUtil.encodeArrayCursor("value > 3", slices, (4, 17))
+        self.assertEqual(queryUtil.decodeArrayCursor(cursor, "value > 3"), (slices, (4, 17)))
+        for bad, query in ((cursor, "value > 4"),
+                (queryUtil.encodeCursor("value > 3", 0, 10, 1), "value > 3"),
+                ("xyz", "value > 3")):
+            try:
+                queryUtil.decodeArrayCursor(bad, query)
+                self.assertTrue(False)  # expected exception
+            except ValueError:
+                pass  # expected
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
@@ -0,0 +1,135 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os.path as op
+import shutil
+import tempfile
+
+import numpy as np
+import h5py
+
+import h5serv.reduceUtil as reduceUtil
+from h5serv.reduceUtil import getAxes, Reduction, reduceSelection
+
+import config
+
+
+class ReduceUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(ReduceUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filePath = op.join(self.tmpdir, 'reduce.h5')
+        self.f = h5py.File(self.filePath, 'w')
+        data = np.arange(30 * 40, dtype='f8').reshape((30, 40)) % 17
+        data[3, 5] = np.nan
+        self.data = data
+        self.dset = self.f.create_dataset('dset', data=data, chunks=(7, 9))
+        self.ints = self.f.create_dataset('ints', data=np.arange(100, dtype='>i2') - 50,
+            chunks=(8,))
+        self.fill = self.f.create_dataset('fill', (20,), dtype='i4', chunks=(4,),
+            fillvalue=-1)
+        self.fill[4:12] = np.arange(8)
+
+    def tearDown(self):
+        self.f.close()
+        shutil.rmtree(self.tmpdir)
+        reduceUtil.shutdown()
+
+    def testGetAxes(self):
+        self.assertEqual(getAxes(None, 3), (0, 1, 2))
+        self.assertEqual(getAxes('0', 3), (0,))
+        self.assertEqual(getAxes('2,-3', 3), (0, 2))
+        self.assertEqual(getAxes('[1]', 2), (1,))
+        for text in ('3', '-4', 'x', '1,1'):
+            try:
+                getAxes(text, 3)
+                self.assertTrue(False)  # expected exception
+            except ValueError:
+                pass
+
+    def testReduce(self):
+        slices = (slice(2, 29, 2), slice(1, 40, 3))
+        values = self.data[slices]
+        for op in reduceUtil.OPS + reduceUtil.NAN_OPS:
+            for axes in ((0, 1), (0,), (1,)):
+                result = reduceSelection(self.dset, slices, op, axes, 7 * 9 * 8).getResult()
+                expected = getattr(np, op)(values, axis=axes)
+                self.assertEqual(result.shape, expected.shape)
+                np.testing.assert_allclose(result, expected)
+
+        # a block of just the first chunk
+        result = reduceSelection(self.dset, (slice(0, 30, 1), slice(0, 40, 1)), 'nanmean',
+            (1,), 1).getResult()
+        np.testing.assert_allclose(result, np.nanmean(self.data, axis=1))
+
+        # integers
+        slices = (slice(0, 100, 1),)
+        self.assertEqual(reduceSelection(self.ints, slices, 'sum', (0,), 16).getResult(),
+            -50)
+        self.assertEqual(reduceSelection(self.ints, slices, 'min', (0,), 16).getResult(),
+            -50)
+        self.assertEqual(reduceSelection(self.ints, slices, 'nanmax', (0,), 16).getResult(),
+            49)
+        self.assertEqual(reduceSelection(self.ints, slices, 'mean', (0,), 16).getResult(),
+            -0.5)
+
+        try:
+            reduceSelection(self.ints, slices, 'median', (0,), 16)
+            self.assertTrue(False)  # expected exception
+        except ValueError:
+            pass
+
+    def testFillValue(self):
+        slices = (slice(0, 20, 1),)
+        result = reduceSelection(self.fill, slices, 'min', (0,), 16).getResult()
+        self.assertEqual(result, -1)
+        result = reduceSelection(self.fill, slices, 'min', (0,), 16, skipFill=True).getResult()
+        self.assertEqual(result, 0)
+        result = reduceSelection(self.fill, slices, 'mean', (0,), 16, skipFill=True).getResult()
+        self.assertEqual(result, 3.5)
+        # no values left
+        result = reduceSelection(self.fill, (slice(12, 20, 1),), 'max', (0,), 16,
+            skipFill=True).getResult()
+        self.assertTrue(np.isnan(result))
+        # the dataset has no fill value set
+        result = reduceSelection(self.ints, (slice(0, 100, 1),), 'sum', (0,), 16,
+            skipFill=True).getResult()
+        self.assertEqual(result, -50)
+
+    def testMerge(self):
+        values = self.data[:, :20]
+        first = Reduction('nanstd', (30, 20), (0,), values.dtype)
+        first.add(values[:10, :], (0, 0))
+        second = Reduction('nanstd', (30, 20), (0,), values.dtype)
+        second.add(values[10:, :10], (10, 0))
+        second.add(values[10:, 10:], (10, 10))
+        first.merge(second)
+        np.testing.assert_allclose(first.getResult(), np.nanstd(values, axis=0))
+
+    def testProcesses(self):
+        self.f.flush()
+        slices = (slice(0, 30, 1), slice(0, 40, 1))
+        reduction = reduceSelection(self.dset, slices, 'nanstd', (0,), 7 * 9 * 8,
+            processes=2, processSize=1)
+        np.testing.assert_allclose(reduction.getResult(), np.nanstd(self.data, axis=0))
+        reduction = reduceSelection(self.dset, slices, 'max', (0, 1), 7 * 9 * 8,
+            processes=2, processSize=1)
+        self.assertTrue(np.isnan(reduction.getResult()))
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
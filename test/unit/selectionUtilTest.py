@@ -0,0 +1,263 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+
+import numpy as np
+import h5py
+
+from h5serv.selectionUtil import getSliceCount, getSlabs, getFields, getFieldsDtype, readValues
+from h5serv.selectionUtil import getPoints, getBinaryPoints, sortPoints, readPoints, writePoints
+from h5serv.selectionUtil import getBlockShape, parseSelection, Selection
+
+import config
+
+class SelectionUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(SelectionUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def checkSlabs(self, s, slabs):
+        # slabs should select exactly the indexes of s, in order
+        indexes = []
+        for slab in slabs:
+            indexes.extend(range(slab.start, slab.stop, slab.step))
+        self.assertEqual(indexes, list(range(s.start, s.stop, s.step)))
+
+    def testSliceCount(self):
+        self.assertEqual(getSliceCount(slice(0, 10, 1)), 10)
+        self.assertEqual(getSliceCount(slice(0, 10, 3)), 4)
+        self.assertEqual(getSliceCount(slice(5, 5, 1)), 0)
+        self.assertEqual(getSliceCount(slice(2, 3, 4)), 1)
+
+    def testSlabs(self):
+        s = slice(0, 100, 1)
+        slabs = getSlabs(s, 8, 1024)
+        self.assertEqual(slabs, [s])   # fits in one slab
+        slabs = getSlabs(s, 8, 80)
+        self.assertEqual(len(slabs), 10)
+        self.checkSlabs(s, slabs)
+        # row bigger than the buffer, one row per slab
+        slabs = getSlabs(s, 1000, 80)
+        self.assertEqual(len(slabs), 100)
+        self.checkSlabs(s, slabs)
+
+    def testChunkAligned(self):
+        s = slice(5, 95, 1)
+        # 25 rows fit in the buffer, slabs are two chunks of 10 rows
+        slabs = getSlabs(s, 4, 100, chunks=(10, 4))
+        self.checkSlabs(s, slabs)
+        self.assertEqual(slabs[0], slice(5, 20, 1))
+        for slab in slabs[1:-1]:
+            self.assertEqual(slab.start % 10, 0)
+            self.assertEqual(slab.stop - slab.start, 20)
+        self.assertEqual(slabs[-1].stop, 95)
+        # slab smaller than a chunk, still ends on chunk boundaries
+        slabs = getSlabs(s, 4, 16, chunks=(10, 4))
+        self.checkSlabs(s, slabs)
+        self.assertEqual(slabs[1], slice(9, 10, 1))
+
+    def testStep(self):
+        s = slice(3, 100, 7)
+        for bufferSize in (8, 24, 100, 10000):
+            for chunks in (None, (5,), (16,)):
+                slabs = getSlabs(s, 8, bufferSize, chunks=chunks)
+                self.checkSlabs(s, slabs)
+                for slab in slabs:
+                    self.assertTrue(getSliceCount(slab) * 8 <= max(bufferSize, 8))
+
+    def testFields(self):
+        dtype = np.dtype([('a', '>i4'), ('b', 'S3'), ('c', '<f8')])
+        values = np.zeros((4,), dtype=dtype)
+        values['a'] = range(4)
+        values['c'] = 0.5
+        out = getFields(values, ['c', 'a'])
+        self.assertEqual(out.dtype, np.dtype([('c', '<f8'), ('a', '>i4')]))
+        self.assertEqual(out.dtype.itemsize, 12)  # packed
+        self.assertEqual(out['a'].tolist(), [0, 1, 2, 3])
+
+        f = h5py.File('selectionutiltest.h5', 'w', driver='core', backing_store=False)
+        dset = f.create_dataset('dset', data=values)
+        out = readValues(dset, slice(1, 3, 1), ['c', 'a'])
+        self.assertEqual(out.dtype, getFieldsDtype(dtype, ['c', 'a']))
+        self.assertEqual(out['a'].tolist(), [1, 2])
+        out = readValues(dset, slice(0, 4, 2), ['b'])
+        self.assertEqual(out.dtype.names, ('b',))
+        self.assertEqual(out.shape, (2,))
+        self.assertEqual(readValues(dset, 3)['a'], 3)
+        f.close()
+
+    def testGetPoints(self):
+        points = getPoints([3, 1, 3], (10,))
+        self.assertEqual(points.shape, (3, 1))
+        self.assertEqual(points.dtype, np.int64)
+        points = getPoints([[1, 2], [0, 0]], (10, 10))
+        self.assertEqual(points.tolist(), [[1, 2], [0, 0]])
+        self.assertEqual(getPoints([], (10, 10)).shape, (0, 2))
+        for bad in ([[1, 2, 3]], [[10, 0]], [[-1, 0]], [[1.5, 2]], [[1], [1, 2]], [1, 2]):
+            try:
+                getPoints(bad, (10, 10))
+                self.assertTrue(False)  # expected exception
+            except ValueError:
+                pass  # expected
+
+        data = np.array([[1, 2], [9, 9]], dtype='<u8').tobytes()
+        self.assertEqual(getBinaryPoints(data, (10, 10)).tolist(), [[1, 2], [9, 9]])
+        for bad in (data[:-1], np.array([[10, 0]], dtype='<u8').tobytes(),
+                np.array([[2**64 - 1, 0]], dtype='<u8').tobytes()):
+            try:
+                getBinaryPoints(bad, (10, 10))
+                self.assertTrue(False)  # expected exception
+            except ValueError:
+                pass  # expected
+
+    def testSortPoints(self):
+        points = getPoints([[5, 0], [0, 5], [0, 0], [5, 0]], (10, 10))
+        order, offsets, chunkIds = sortPoints(points, (10, 10), (4, 4))
+        # chunk (0, 0), then (0, 1), then (1, 0) - duplicates in request order
+        self.assertEqual(order.tolist(), [2, 1, 0, 3])
+        self.assertEqual(offsets.tolist(), [0, 5, 50, 50])
+        self.assertEqual(chunkIds.tolist(), [0, 1, 3, 3])
+
+    def testPoints(self):
+        f = h5py.File('selectionutiltest.h5', 'w', driver='core', backing_store=False)
+        arr = np.arange(200, dtype='i4').reshape((10, 20))
+        rng = np.random.RandomState(0)
+        points = getPoints(np.stack([rng.randint(0, 10, 500), rng.randint(0, 20, 500)], 1), (10, 20))
+        for chunks in ((3, 7), None):
+            dset = f.create_dataset('dset' + str(chunks is None), data=arr, chunks=chunks)
+            values = readPoints(dset, points)
+            self.assertEqual(values.tolist(), arr[points[:, 0], points[:, 1]].tolist())
+            self.assertEqual(readPoints(dset, points[:0]).shape, (0,))
+            # last value written for repeated points
+            writePoints(dset, getPoints([[0, 0], [9, 19], [0, 0]], (10, 20)),
+                np.array([1, 2, 3], dtype='i4'))
+            self.assertEqual(dset[0, 0], 3)
+            self.assertEqual(dset[9, 19], 2)
+            self.assertEqual(dset[0, 1], 1)
+
+        dtype = np.dtype([('a', '<i4'), ('b', '<f8')])
+        values = np.zeros((10,), dtype=dtype)
+        values['a'] = range(10)
+        for chunks in ((4,), None):
+            dset = f.create_dataset('cmpd' + str(chunks is None), data=values, chunks=chunks)
+            out = readPoints(dset, getPoints([7, 1, 7], (10,)), ['a'])
+            self.assertEqual(out.dtype.names, ('a',))
+            self.assertEqual(out['a'].tolist(), [7, 1, 7])
+
+        dset = f.create_dataset('vlen', (5,), dtype=h5py.special_dtype(vlen=str))
+        dset[...] = ['a', 'b', 'c', 'd', 'e']
+        writePoints(dset, getPoints([1], (5,)), np.array(['x'], dtype=object))
+        out = readPoints(dset, getPoints([4, 1], (5,)))
+        self.assertEqual([v.decode() if isinstance(v, bytes) else v for v in out], ['e', 'x'])
+        f.close()
+
+    def testBlockShape(self):
+        f = h5py.File('selectionutiltest.h5', 'w', driver='core', backing_store=False)
+        grid = f.create_dataset('grid', (6, 7, 8), dtype='<f4', chunks=(2, 3, 4))
+        flat = f.create_dataset('flat', (6, 7, 8), dtype='<f4')
+        self.assertEqual(getBlockShape(grid, 2 * 3 * 4 * 4), (2, 3, 4))
+        self.assertEqual(getBlockShape(grid, 2 * 3 * 8 * 4), (2, 3, 8))
+        self.assertEqual(getBlockShape(flat, 2 * 3 * 4 * 4), (1, 3, 8))
+        self.assertEqual(getBlockShape(flat, 1024 * 1024), (6, 7, 8))
+        f.close()
+
+    def testParseSelection(self):
+        shape = (10, 20)
+        sel = parseSelection("[2:4, ::5]", shape)
+        self.assertTrue(sel.isSimple())
+        self.assertEqual(sel.getSlices(), (slice(2, 4, 1), slice(0, 20, 5)))
+        self.assertEqual(sel.getShape(), (2, 4))
+        sel = parseSelection("[-3:,-1]", shape)
+        self.assertEqual(sel.getSlices(), (slice(7, 10, 1), slice(19, 20, 1)))
+        sel = parseSelection("[[3,-1,3],:]", shape)
+        self.assertEqual(sel.getSlices(), None)
+        self.assertEqual(sel.getShape(), (3, 20))
+        self.assertEqual(sel.hyperslabs[0][0].tolist(), [3, 9, 3])
+        sel = parseSelection("[0,:]|[:,0]", shape)
+        self.assertFalse(sel.isSimple())
+        self.assertEqual(len(sel.hyperslabs), 2)
+        self.assertEqual(sel.getShape(), None)
+        for bad in ("abc", "[1:2", "[1:2]", "[a:b,0]", "[-11:3,0]", "[0:21,0]", "[5:3,0]",
+                "[0:2:0,0]", "[[],0]", "[[10],0]", "[0,0]|0", "[0:1:2:3,0]"):
+            try:
+                parseSelection(bad, shape)
+                self.assertTrue(False, bad)  # expected exception
+            except ValueError:
+                pass  # expected
+
+    def testSelection(self):
+        f = h5py.File('selectionutiltest.h5', 'w', driver='core', backing_store=False)
+        arr = np.arange(30 * 40, dtype='<i4').reshape((30, 40))
+        rng = np.random.RandomState(0)
+        mask = f.create_dataset('mask', data=(rng.rand(30, 40) > 0.7).astype('u1'))
+        cases = ("[0:10,:]", "[-5:,3]", "[[7,2,9,2],0:40:10]", "[::3,[-1,0]]", "[0:0,:]",
+            "[0:2,:]|[:,0:2]", "[[29,0],[39,0]]|[3:5,3:5]")
+        for chunks in ((4, 7), None):
+            for blockSize in (64, 1024 * 1024):
+                name = 'dset' + str(chunks) + str(blockSize)
+                dset = f.create_dataset(name, data=arr, chunks=chunks)
+                for text in cases:
+                    sel = parseSelection(text, arr.shape)
+                    selected = np.zeros(arr.shape, dtype=bool)
+                    for hyperslab in sel.hyperslabs:
+                        indexes = [np.arange(s.start, s.stop, s.step) if isinstance(s, slice)
+                            else s for s in hyperslab]
+                        selected[np.ix_(*indexes)] = True
+                    values = sel.read(dset, blockSize)
+                    if sel.isSimple():
+                        expected = arr[np.ix_(*indexes)]
+                    else:
+                        expected = arr[selected]
+                    self.assertEqual(values.tolist(), expected.tolist())
+                    self.assertEqual(sel.getCount(dset, blockSize), expected.size)
+                    inBoxes = np.zeros(arr.shape, dtype=bool)
+                    for box in sel.getBoxes():
+                        inBoxes[box] = True
+                    self.assertFalse((selected & ~inBoxes).any())
+
+                    # mask restricts the selection
+                    sel = parseSelection(text, arr.shape, mask=mask)
+                    expected = arr[selected & (mask[...] != 0)]
+                    self.assertEqual(sel.read(dset, blockSize).tolist(), expected.tolist())
+
+                # writes, with the last value for a repeated index
+                expected = arr.copy()
+                sel = parseSelection("[[7,2,7],0:40:10]", arr.shape)
+                values = np.arange(12, dtype='<i4').reshape((3, 4))
+                sel.write(dset, values, blockSize)
+                expected[np.ix_([7, 2, 7], range(0, 40, 10))] = values
+                self.assertEqual(dset[...].tolist(), expected.tolist())
+                sel = Selection(arr.shape, mask=mask)
+                values = -np.arange(sel.getCount(dset, blockSize), dtype='<i4')
+                sel.write(dset, values, blockSize)
+                expected[mask[...] != 0] = values
+                self.assertEqual(dset[...].tolist(), expected.tolist())
+                try:
+                    sel.write(dset, values[1:], blockSize)
+                    self.assertTrue(False)  # expected exception
+                except ValueError:
+                    pass  # expected
+
+        dtype = np.dtype([('a', '<i4'), ('b', '<f8')])
+        values = np.zeros((10,), dtype=dtype)
+        values['a'] = range(10)
+        dset = f.create_dataset('cmpd', data=values, chunks=(4,))
+        out = parseSelection("[[9,0,5]]", (10,)).read(dset, 1024, ['a'])
+        self.assertEqual(out.dtype.names, ('a',))
+        self.assertEqual(out['a'].tolist(), [9, 0, 5])
+        f.close()
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
@@ -0,0 +1,113 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os
+import os.path as op
+import shutil
+import tempfile
+
+import h5serv.sidecarUtil as sidecarUtil
+
+import config
+
+class SidecarUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(SidecarUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filePath = op.join(self.tmpdir, 'tall.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def testGroups(self):
+        path = sidecarUtil.getSidecarPath(self.filePath)
+        self.assertEqual(path, self.filePath + '.sidecar')
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            self.assertEqual(f, None)  # no sidecar yet
+        self.assertFalse(op.exists(path))
+
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            grp = sidecarUtil.createGroup(f, 'summary', 'uuid-1', 100)
+            grp.attrs['x'] = 1
+            sidecarUtil.createGroup(f, 'summary', 'uuid-2', 100)
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            grp = sidecarUtil.getGroup(f, 'summary', 'uuid-1', 100)
+            self.assertEqual(grp.attrs['x'], 1)
+            self.assertEqual(sidecarUtil.getGroup(f, 'summary', 'uuid-1', 101), None)
+            self.assertEqual(sidecarUtil.getGroup(f, 'other', 'uuid-1', 100), None)
+
+        # named subgroups
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            sidecarUtil.createGroup(f, 'index', 'uuid-1', 100, name='0')
+            sidecarUtil.createGroup(f, 'index', 'uuid-1', 100, name='2')
+            self.assertEqual(sorted(f['index/uuid-1']), ['0', '2'])
+            grp = sidecarUtil.getGroup(f, 'index', 'uuid-1', name='2')
+            self.assertFalse(sidecarUtil.isStale(grp))
+
+        sidecarUtil.invalidate(self.filePath, 'uuid-1')
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            self.assertEqual(sidecarUtil.getGroup(f, 'summary', 'uuid-1', 100), None)
+            self.assertTrue(sidecarUtil.getGroup(f, 'summary', 'uuid-2', 100) is not None)
+            grp = sidecarUtil.getGroup(f, 'index', 'uuid-1', name='2')
+            self.assertTrue(sidecarUtil.isStale(grp))  # kept, but stale
+
+        sidecarUtil.invalidate(self.filePath, 'uuid-1', remove=True)
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            self.assertEqual(sidecarUtil.getGroup(f, 'index', 'uuid-1', name='2'), None)
+            self.assertEqual(sidecarUtil.getGroup(f, 'summary', 'uuid-1'), None)
+
+        sidecarUtil.remove(self.filePath)
+        self.assertFalse(op.exists(path))
+        sidecarUtil.remove(self.filePath)  # no error if missing
+
+    def testBuild(self):
+        build = sidecarUtil.Build(self.filePath, 'index', 'uuid-1', 100, name='0')
+        try:
+            grp = sidecarUtil.createGroup(build.f, 'index', 'uuid-1', 100, name='0')
+            grp.create_dataset('values', data=[1, 2, 3])
+            with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+                grp = build.finish(f)
+                self.assertEqual(grp.name, '/index/uuid-1/0')
+                self.assertEqual(grp['values'][...].tolist(), [1, 2, 3])
+                self.assertFalse('build/uuid-1' in f)  # marker removed
+        finally:
+            build.close()
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['tall.h5.sidecar'])
+
+        # the dataset is written during the build
+        build = sidecarUtil.Build(self.filePath, 'index', 'uuid-1', 100, name='0')
+        try:
+            grp = sidecarUtil.createGroup(build.f, 'index', 'uuid-1', 100, name='0')
+            grp.create_dataset('values', data=[4, 5, 6])
+            sidecarUtil.invalidate(self.filePath, 'uuid-1', keep=('index',))
+            with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+                self.assertEqual(build.finish(f), None)
+                grp = sidecarUtil.getGroup(f, 'index', 'uuid-1', name='0')
+                self.assertEqual(grp['values'][...].tolist(), [1, 2, 3])
+        finally:
+            build.close()
+
+        # not finished
+        build = sidecarUtil.Build(self.filePath, 'index', 'uuid-1', 100, name='0')
+        build.close()
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            self.assertFalse('build/uuid-1' in f)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['tall.h5.sidecar'])
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()
@@ -0,0 +1,144 @@
+##############################################################################
+# Copyright by The HDF Group.                                                #
+# All rights reserved.                                                       #
+#                                                                            #
+# This file is part of H5Serv (HDF5 REST Server) Service, Libraries and      #
+# Utilities.  The full HDF5 REST Server copyright notice, including          #
+# terms governing use, modification, and redistribution, is contained in     #
+# the file COPYING, which can be found at the root of the source code        #
+# distribution tree.  If you do not have access to this file, you may        #
+# request a copy from help@hdfgroup.org.                                     #
+##############################################################################
+import unittest
+import os.path as op
+import shutil
+import tempfile
+
+import numpy as np
+import h5py
+
+import h5serv.sidecarUtil as sidecarUtil
+from h5serv.statsUtil import STATS_KIND, ChunkStats, getStats, updateStats
+
+import config
+
+
+class StatsUtilTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(StatsUtilTest, self).__init__(*args, **kwargs)
+        # main
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filePath = op.join(self.tmpdir, 'stats.h5')
+        self.f = h5py.File(self.filePath, 'w')
+        data = np.arange(30 * 40, dtype='<f4').reshape((30, 40)) % 23
+        data[3, 5] = np.nan
+        data[29, 39] = np.nan
+        self.data = data
+        self.dset = self.f.create_dataset('dset', data=data, chunks=(7, 9))
+        self.ints = self.f.create_dataset('ints', data=np.arange(100, dtype='>i2') - 60)
+        self.scalar = self.f.create_dataset('scalar', data=np.float64(2.5))
+
+    def tearDown(self):
+        self.f.close()
+        shutil.rmtree(self.tmpdir)
+
+    def checkSummary(self, summary, data):
+        good = data[~np.isnan(data)] if data.dtype.kind == 'f' else data.ravel()
+        self.assertEqual(summary['count'], good.size)
+        self.assertEqual(summary['nanCount'], data.size - good.size)
+        self.assertEqual(summary['min'], good.min())
+        self.assertEqual(summary['max'], good.max())
+        self.assertAlmostEqual(summary['mean'], good.astype('f8').mean())
+        self.assertAlmostEqual(summary['std'], good.astype('f8').std())
+
+    def testStats(self):
+        stats = getStats(self.filePath, 'dset_uuid', self.dset, 100)
+        self.assertEqual(stats.grid, (5, 5))
+        self.assertTrue(stats.valid.all())
+        self.checkSummary(stats.getSummary(), self.data)
+        self.assertEqual(stats.count[0, 0] + stats.nans[0, 0], 63)
+
+        # stored in the sidecar
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            grp = sidecarUtil.getGroup(f, STATS_KIND, 'dset_uuid', 100)
+            self.assertTrue(grp is not None)
+            stats = ChunkStats(self.dset, 100)
+            self.assertTrue(stats.load(grp))
+            self.assertFalse(stats.update(self.dset))
+
+        stats = getStats(self.filePath, 'ints_uuid', self.ints, 100)
+        self.checkSummary(stats.getSummary(), self.ints[...])
+        self.assertTrue(isinstance(stats.getSummary()['min'], int))
+        stats = getStats(self.filePath, 'scalar_uuid', self.scalar, 100)
+        self.checkSummary(stats.getSummary(), np.array([2.5]))
+
+        # all NaN
+        dset = self.f.create_dataset('nan', data=np.full((5,), np.nan))
+        summary = getStats(self.filePath, 'nan_uuid', dset, 100).getSummary()
+        self.assertEqual(summary['count'], 0)
+        self.assertEqual(summary['nanCount'], 5)
+        self.assertEqual(summary['mean'], None)
+
+    def testInvalidate(self):
+        stats = ChunkStats(self.dset)
+        stats.valid[...] = True
+        stats.invalidate(boxes=[(slice(8, 10), slice(0, 5)), (slice(0, 0), slice(0, 40))])
+        self.assertEqual(np.argwhere(~stats.valid).tolist(), [[1, 0]])
+        stats.invalidate(points=np.array([[29, 39], [0, 9]]))
+        self.assertEqual(np.argwhere(~stats.valid).tolist(), [[0, 1], [1, 0], [4, 4]])
+        stats.invalidate()
+        self.assertFalse(stats.valid.any())
+
+    def testUpdate(self):
+        getStats(self.filePath, 'dset_uuid', self.dset, 100)
+        # mark a chunk so it can be seen if it is recomputed
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            grp = sidecarUtil.getGroup(f, STATS_KIND, 'dset_uuid', 100)
+            grp['mean'][4, 4] = -1.0
+            grp['mean'][2, 2] = -2.0
+            grp['mean'].attrs['mark'] = 1  # kept unless the dataset is replaced
+
+        self.dset[10:12, 20:22] = 1000
+        self.data[10:12, 20:22] = 1000
+        updateStats(self.filePath, 'dset_uuid', self.dset, 101,
+            boxes=[(slice(10, 12), slice(20, 22))])
+        self.dset[0, 0] = -1000
+        self.data[0, 0] = -1000
+        updateStats(self.filePath, 'dset_uuid', self.dset, 102, points=np.array([[0, 0]]))
+        stats = getStats(self.filePath, 'dset_uuid', self.dset, 102)
+        self.assertEqual(stats.max[1, 2], 1000)
+        self.assertEqual(stats.min[0, 0], -1000)
+        self.assertEqual(stats.mean[4, 4], -1.0)  # not recomputed
+        self.dset[1, 1] = 2000
+        self.data[1, 1] = 2000
+        updateStats(self.filePath, 'dset_uuid', self.dset, 103,
+            points=np.array([[1, 1], [29, 38]]))
+        stats = getStats(self.filePath, 'dset_uuid', self.dset, 103)
+        self.assertEqual(stats.max[0, 0], 2000)
+        self.assertNotEqual(stats.mean[4, 4], -1.0)
+        self.assertEqual(stats.mean[2, 2], -2.0)  # not recomputed
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            grp = sidecarUtil.getGroup(f, STATS_KIND, 'dset_uuid', 103)
+            self.assertEqual(grp['mean'].attrs['mark'], 1)  # updated in place
+
+        # other sidecar data is marked stale, but not the statistics
+        with sidecarUtil.openSidecar(self.filePath, modify=True) as f:
+            sidecarUtil.createGroup(f, 'summary', 'dset_uuid', 102)
+        sidecarUtil.invalidate(self.filePath, 'dset_uuid', keep=(STATS_KIND,))
+        with sidecarUtil.openSidecar(self.filePath) as f:
+            self.assertTrue(sidecarUtil.getGroup(f, 'summary', 'dset_uuid', 102) is None)
+            self.assertTrue(sidecarUtil.getGroup(f, STATS_KIND, 'dset_uuid', 103) is not None)
+
+        # stale statistics are recomputed
+        sidecarUtil.invalidate(self.filePath, 'dset_uuid')
+        updateStats(self.filePath, 'dset_uuid', self.dset, 104, points=np.array([[0, 0]]))
+        stats = getStats(self.filePath, 'dset_uuid', self.dset, 104)
+        self.checkSummary(stats.getSummary(), self.data)
+
+
+if __name__ == '__main__':
+    #setup test files
+
+    unittest.main()